@@ -0,0 +1,327 @@
+"""
+Benchmarking and selection of noise backends.
+
+Noise is generated either by the scalar FastNoise engine, a point at
+a time, or by FastNoiseSIMD, a set of points at a time using the
+widest SIMD instruction set (SIMD level) that it was compiled for and
+that the cpu supports. Which is fastest depends on the host, and on
+the noise configuration: the number of octaves and generators.
+
+A NoiseBenchmark times each backend on the noise configurations of
+the build stages that generate noise, and select_backends picks the
+fastest SIMD level. FastNoiseSIMD's SIMD level applies to the whole
+process, so a single level is selected for all stages. The scalar
+engine generates different noise from FastNoiseSIMD, so it is never
+selected by timings, which would make a spheroid's maps depend on the
+host; it is only used when chosen explicitly. All SIMD levels
+generate the same noise.
+
+Example use from the command line:
+    python -m pyrostex.backends --points 65536
+"""
+
+import argparse
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .noise.noise import PyFastNoise
+from .noise.simdnoise import PyFastNoiseSIMD, SIMD_LEVEL_NAMES, \
+    available_simd_levels, get_simd_level, set_simd_level
+
+SCALAR = 'scalar'
+SIMD = 'simd'
+
+# build stages that generate noise, and those of them whose noise can
+# only be generated by FastNoiseSIMD.
+NOISE_STAGES = ('tectonic', 'detail', 'wind')
+SIMD_ONLY_STAGES = ('detail',)
+
+BENCHMARK_POINTS = 2 ** 15  # points at which each configuration is timed
+BENCHMARK_REPEATS = 3  # the fastest of repeated timings is kept
+BENCHMARK_RADIUS = 6.4e6  # radius of spheroid of benchmarked configs
+
+_host_lock = threading.Lock()
+_host_backends = None  # backends selected by host_backends
+
+
+class NoiseBackend:
+    """
+    A noise engine; scalar FastNoise, or FastNoiseSIMD at a SIMD level.
+    """
+
+    def __init__(self, engine, simd_level=None):
+        """
+        :param engine: str; SCALAR or SIMD
+        :param simd_level: int SIMD level of the SIMD engine; an index
+                    of SIMD_LEVEL_NAMES.
+        """
+        if engine not in (SCALAR, SIMD):
+            raise ValueError('Unknown noise engine: {!r}'.format(engine))
+        if (engine == SIMD) != (simd_level is not None):
+            raise ValueError('Expected a SIMD level for, and only for, '
+                             'the {} engine'.format(SIMD))
+        self.engine = engine
+        self.simd_level = simd_level
+
+    @property
+    def simd(self):
+        """
+        Gets whether backend is FastNoiseSIMD.
+        :return: bool
+        """
+        return self.engine == SIMD
+
+    @property
+    def name(self):
+        if not self.simd:
+            return self.engine
+        return '{}-{}'.format(self.engine, SIMD_LEVEL_NAMES[self.simd_level])
+
+    def new_noise(self, params):
+        """
+        Creates a noise generator of this backend.
+        The SIMD engine's level must have been set by set_simd_level.
+        :param params: dict of generator parameters, in the form of
+                    detail_noise_params. Missing parameters are left
+                    at the generator's defaults.
+        :return: PyFastNoise or PyFastNoiseSIMD
+        """
+        n = PyFastNoiseSIMD() if self.simd else PyFastNoise()
+        n.seed = params['seed']
+        n.frq = params['frq']
+        n.fractal_octaves = params['octaves']
+        if 'lacunarity' in params:
+            n.lacunarity = params['lacunarity']
+        if 'gain' in params:
+            n.fractal_gain = params['gain']
+        if 'fractal_type' in params:
+            n.fractal_type = params['fractal_type']
+        return n
+
+    def __eq__(self, other):
+        return isinstance(other, NoiseBackend) and \
+            (self.engine, self.simd_level) == \
+            (other.engine, other.simd_level)
+
+    def __hash__(self):
+        return hash((self.engine, self.simd_level))
+
+    def __repr__(self):
+        return 'NoiseBackend({!r}, {!r})'.format(self.engine, self.simd_level)
+
+
+def available_backends():
+    """
+    Gets backends that may be used on this host: the scalar engine,
+    and the SIMD engine at each SIMD level that was compiled and is
+    supported by the cpu.
+    :return: list of NoiseBackend
+    """
+    return [NoiseBackend(SCALAR)] + [
+        NoiseBackend(SIMD, level) for level in available_simd_levels()]
+
+
+def stage_noise_configs(radius=BENCHMARK_RADIUS, seed=0):
+    """
+    Gets the noise configurations of the build stages that generate
+    noise: the parameters of each noise generator that the stage
+    evaluates at every pixel.
+    :param radius: float spheroid radius
+    :param seed: int spheroid seed
+    :return: dict of stage name: list of dict generator parameters
+    """
+    from .height import detail_noise_params, tectonic_noise_params
+    from .wind import wind_noise_params
+
+    detail = detail_noise_params(radius, seed)
+    warp = [dict(detail['warp'], seed=seed + i * 100) for i in range(3)]
+    tectonic = tectonic_noise_params(seed)['warp']
+    return {
+        'tectonic': [dict(tectonic, seed=seed + i * 100) for i in range(3)],
+        'detail': warp + [detail['rm'], detail['amp']],
+        'wind': [wind_noise_params(seed, radius)],
+    }
+
+
+def benchmark_points(n_points, seed=0):
+    """
+    Gets points at which noise is benchmarked; random positions on
+    the unit sphere, at which the build stages sample noise.
+    :param n_points: int
+    :param seed: int
+    :return: float32 ndarray of shape (n_points, 3)
+    """
+    points = np.random.RandomState(seed).normal(size=(n_points, 3))
+    points /= np.linalg.norm(points, axis=1)[:, None]
+    return points.astype(np.float32)
+
+
+class NoiseBenchmark:
+    """
+    Times taken by noise backends to generate the noise of each stage.
+    """
+
+    def __init__(self, configs=None, backends=None,
+                 n_points=BENCHMARK_POINTS, repeats=BENCHMARK_REPEATS):
+        """
+        :param configs: dict of stage name: list of generator
+                    parameters, as returned by stage_noise_configs,
+                    which are used if None.
+        :param backends: list of NoiseBackend to time; those returned
+                    by available_backends if None.
+        :param n_points: int number of points at which noise is
+                    generated.
+        :param repeats: int number of times each backend is timed on
+                    each stage; the fastest time is kept.
+        """
+        self.configs = stage_noise_configs() if configs is None else configs
+        self.backends = available_backends() if backends is None \
+            else list(backends)
+        self.n_points = n_points
+        self.repeats = repeats
+        self.times = {}  # stage name: {NoiseBackend: seconds}
+
+    def run(self):
+        """
+        Times each backend on each stage's configuration.
+        The SIMD level is changed while SIMD backends are timed, so
+        no noise may be generated by other threads meanwhile. It is
+        restored once all backends have been timed.
+        :return: self
+        """
+        points = benchmark_points(self.n_points)
+        level = get_simd_level()
+        try:
+            for backend in self.backends:
+                if backend.simd:
+                    set_simd_level(backend.simd_level)
+                for stage, configs in self.configs.items():
+                    if stage in SIMD_ONLY_STAGES and not backend.simd:
+                        continue
+                    self.times.setdefault(stage, {})[backend] = \
+                        self._time(backend, configs, points)
+        finally:
+            set_simd_level(level)
+        return self
+
+    def _time(self, backend, configs, points):
+        """
+        Gets fastest of repeated timings of passed backend generating
+        noise of each of passed configurations at passed points.
+        :return: float seconds
+        """
+        generators = [backend.new_noise(params) for params in configs]
+        best = float('inf')
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            for n in generators:
+                n.get_noise(points, 'simplex_fractal')
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def fastest(self, stage, backends=None):
+        """
+        Gets fastest backend at generating the noise of passed stage.
+        :param stage: str stage name
+        :param backends: iterable of NoiseBackend to choose between;
+                    all timed backends if None.
+        :return: NoiseBackend
+        """
+        times = self.times[stage]
+        if backends is not None:
+            times = {b: times[b] for b in backends if b in times}
+        return min(times, key=times.get)
+
+    def __str__(self):
+        stages = sorted(self.times)
+        lines = ['{:<14}'.format('backend') +
+                 ''.join('{:>12}'.format(stage) for stage in stages)]
+        for backend in self.backends:
+            line = '{:<14}'.format(backend.name)
+            for stage in stages:
+                seconds = self.times[stage].get(backend)
+                line += '{:>12}'.format(
+                    '-' if seconds is None else
+                    '{:.1f} Mp/s'.format(self.n_points / seconds / 1e6))
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def select_backends(benchmark):
+    """
+    Picks the backend of each benchmarked stage: the SIMD backend
+    taking the least time over all stages, as the SIMD level applies
+    to the whole process. The scalar engine is not selected, as its
+    noise differs from that of the SIMD engine.
+    :param benchmark: NoiseBenchmark that has been run.
+    :return: dict of stage name: NoiseBackend
+    :raises ValueError: if no SIMD backend was benchmarked.
+    """
+    stages = list(benchmark.times)
+    simd = [b for b in benchmark.backends if b.simd]
+    if not simd:
+        raise ValueError('No SIMD backend was benchmarked')
+    fastest = min(simd, key=lambda b: sum(
+        benchmark.times[stage].get(b, float('inf')) for stage in stages))
+    return {stage: fastest for stage in stages}
+
+
+def host_backends():
+    """
+    Gets the fastest SIMD backend on this host for each stage, and
+    sets its SIMD level. Only SIMD backends are benchmarked; see
+    select_backends.
+    Backends are benchmarked by the first call in a process; later
+    calls return the same selection. As NoiseBenchmark.run, the first
+    call must not be made while noise is being generated.
+    :return: dict of stage name: NoiseBackend
+    """
+    global _host_backends
+    logger = logging.getLogger(__name__)
+    with _host_lock:
+        if _host_backends is None:
+            benchmark = NoiseBenchmark(backends=[
+                b for b in available_backends() if b.simd]).run()
+            logger.info('Noise backend benchmark:\n%s', benchmark)
+            selection = select_backends(benchmark)
+            for backend in selection.values():
+                if backend.simd:
+                    set_simd_level(backend.simd_level)
+            logger.info('Selected noise backends: %s', {
+                stage: backend.name for stage, backend in selection.items()})
+            _host_backends = selection
+        return dict(_host_backends)
+
+
+def main(argv=None):
+    """
+    Benchmarks noise backends on this host, and prints the backend
+    selected for each stage.
+    :param argv: list of str; sys.argv[1:] if None.
+    :return: int exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pyrostex.backends',
+        description='Benchmark noise backends on the noise of each stage.')
+    parser.add_argument(
+        '--points', type=int, default=BENCHMARK_POINTS,
+        help='points at which the noise of each stage is generated')
+    parser.add_argument(
+        '--repeats', type=int, default=BENCHMARK_REPEATS,
+        help='times each backend is timed; the fastest time is kept')
+    args = parser.parse_args(argv)
+
+    benchmark = NoiseBenchmark(
+        n_points=args.points, repeats=args.repeats).run()
+    print(benchmark)
+    for stage, backend in sorted(select_backends(benchmark).items()):
+        print('{}: {}'.format(stage, backend.name))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
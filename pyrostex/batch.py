@@ -0,0 +1,237 @@
+"""
+Generation of many spheroids at once, across a pool of processes.
+
+Example use from the command line; generating spheroids for seeds
+1 to 3, with other parameters read from base.json:
+    python -m pyrostex.batch --seeds 1 2 3 --params base.json --out out
+
+or generating spheroids whose parameters are listed in specs.jsonl:
+    python -m pyrostex.batch specs.jsonl --workers 8 --out out
+
+Spec files contain either a json list of objects, or one json object
+per line, each holding keyword arguments of Spheroid.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .context import ExecutionContext, available_cpus
+from .procede import OUT_PATH, Spheroid, spheroid_uid
+
+REQUIRED_PARAMS = (
+    'seed',
+    'planet_type',
+    'mass',
+    'mean_temp',
+    'radius',
+    'surface_gravities',
+)
+
+
+class BatchSummary:
+    """
+    Outcome of a batch of spheroid generations.
+    """
+
+    def __init__(self):
+        self.results = []  # (dir_path, seconds) of each spheroid made.
+        self.failures = []  # (spec, error message) of each failure.
+        self.elapsed = 0.
+
+    @property
+    def n_generated(self):
+        return len(self.results)
+
+    @property
+    def n_failed(self):
+        return len(self.failures)
+
+    @property
+    def throughput(self):
+        """
+        Gets number of spheroids generated per hour.
+        :return: float
+        """
+        if not self.elapsed:
+            return 0.
+        return self.n_generated * 3600 / self.elapsed
+
+    def __str__(self):
+        mean = sum(t for _, t in self.results) / self.n_generated \
+            if self.n_generated else 0.
+        return (
+            '{} spheroids generated, {} failed in {:.1f}s; '
+            '{:.1f} spheroids/hour, {:.1f}s mean per spheroid'.format(
+                self.n_generated, self.n_failed, self.elapsed,
+                self.throughput, mean))
+
+
+def load_specs(path):
+    """
+    Loads spheroid specs from a json file holding either a list of
+    objects, or one object per line.
+    :param path: str
+    :return: list of dict
+    """
+    with open(path, 'r') as f:
+        content = f.read()
+    try:
+        specs = json.loads(content)
+    except json.JSONDecodeError:
+        specs = [json.loads(line) for line in content.splitlines()
+                 if line.strip()]
+    if isinstance(specs, dict):
+        specs = [specs]
+    if not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError('Expected spheroid specs to be json objects')
+    return specs
+
+
+def make_specs(specs=(), seeds=(), params=None, out_dir=None):
+    """
+    Creates complete spheroid specs.
+    :param specs: iterable of dict spheroid specs.
+    :param seeds: iterable of int; a spec is created for each seed.
+    :param params: dict of parameters shared by all specs. Values
+                in each spec take precedence.
+    :param out_dir: str; if passed, each spec without a dir_path is
+                given its own directory within out_dir.
+    :return: list of dict
+    """
+    params = params or {}
+    specs = [dict(params, **spec) for spec in specs]
+    specs += [dict(params, seed=seed) for seed in seeds]
+    for spec in specs:
+        missing = [name for name in REQUIRED_PARAMS if name not in spec]
+        if missing:
+            raise ValueError(
+                'Spheroid spec {} is missing: {}'.format(spec, missing))
+        if out_dir is not None and spec.get('dir_path') is None:
+            spec['dir_path'] = os.path.join(out_dir, spheroid_uid(
+                spec['planet_type'], spec['seed'], spec['mass']))
+    # Specs without a dir_path default to OUT_PATH/<uid> (as in
+    # Spheroid.dir_path), so those are compared as well.
+    dir_paths = [os.path.abspath(spec.get('dir_path') or os.path.join(
+        OUT_PATH, spheroid_uid(
+            spec['planet_type'], spec['seed'], spec['mass'])))
+        for spec in specs]
+    duplicates = {p for p in dir_paths if dir_paths.count(p) > 1}
+    if duplicates:
+        raise ValueError(
+            'Spheroid specs share output directories: {}'
+            .format(sorted(duplicates)))
+    return specs
+
+
+def generate(spec, write_png=False, context=None):
+    """
+    Generates a single spheroid and writes its cache.
+    Run in worker processes.
+    :param spec: dict of Spheroid keyword arguments.
+    :param write_png: bool; whether debug pngs should be written.
+    :param context: ExecutionContext used to generate the spheroid.
+    :return: tuple(dir_path, seconds taken)
+    """
+    start = time.perf_counter()
+    spheroid = Spheroid(context=context, **spec)
+    spheroid.write_cache()
+    if write_png:
+        spheroid.write_debug_png()
+    return spheroid.dir_path, time.perf_counter() - start
+
+
+def generate_all(specs, workers=None, write_png=False, threads=None):
+    """
+    Generates spheroids from passed specs across a pool of processes.
+    Failures are logged and recorded in the returned summary, rather
+    than stopping the batch.
+    :param specs: list of dict as returned by make_specs.
+    :param workers: int maximum number of spheroids generated at
+                once. Defaults to the number of cpus.
+    :param write_png: bool; whether debug pngs should be written.
+    :param threads: int number of threads used to generate each
+                spheroid. Defaults to an equal share of the cpus.
+    :return: BatchSummary
+    """
+    logger = logging.getLogger(__name__)
+    summary = BatchSummary()
+    start = time.perf_counter()
+    workers = workers or available_cpus()
+    # spheroids generated at once share the host's cpus.
+    context = ExecutionContext(
+        threads=threads, share=max(1, min(workers, len(specs))))
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(generate, spec, write_png, context): spec
+            for spec in specs
+        }
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                dir_path, seconds = future.result()
+            except Exception as e:
+                logger.error('Failed to generate spheroid %s: %r', spec, e)
+                summary.failures.append((spec, repr(e)))
+            else:
+                logger.info('Generated %s in %.1fs', dir_path, seconds)
+                summary.results.append((dir_path, seconds))
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    """
+    Generates spheroids from command line arguments.
+    :param argv: list of str; sys.argv[1:] if None.
+    :return: int exit status; 1 if any spheroid failed.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m pyrostex.batch',
+        description='Generate many spheroids across a process pool.')
+    parser.add_argument(
+        'specs', nargs='*',
+        help='json files of spheroid specs; a list of objects, '
+             'or one object per line')
+    parser.add_argument(
+        '--seeds', nargs='+', type=int, default=[],
+        help='seeds of spheroids to generate with --params')
+    parser.add_argument(
+        '--params',
+        help='json file of parameters shared by all spheroids')
+    parser.add_argument(
+        '--out',
+        help='directory in which each spheroid gets its own directory')
+    parser.add_argument(
+        '--workers', type=int,
+        help='maximum number of spheroids generated at once')
+    parser.add_argument(
+        '--threads', type=int,
+        help='threads used to generate each spheroid; by default, '
+             'cpus are shared equally between workers')
+    parser.add_argument(
+        '--png', action='store_true',
+        help='write debug pngs of each spheroid')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    params = None
+    if args.params:
+        with open(args.params, 'r') as f:
+            params = json.load(f)
+    specs = [spec for path in args.specs for spec in load_specs(path)]
+    specs = make_specs(specs, args.seeds, params, args.out)
+    if not specs:
+        parser.error('no spheroids to generate')
+    summary = generate_all(specs, args.workers, args.png, args.threads)
+    print(summary)
+    return 1 if summary.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,479 @@
+"""
+Chunked, compressed on-disk storage for map data.
+
+A chunked map file divides a map's (height, width) array into a grid
+of square chunks, each of which is compressed independently, so that
+a region of the map can be read by decompressing only the chunks that
+it touches. By default, chunks of cube maps are sized so that no chunk
+spans more than one cube face.
+
+File layout (all integers little-endian):
+    magic           4 bytes: b'PTXC'
+    header size     uint32
+    header          utf-8 json: format version, dtype, shape,
+                    chunk size, codec, map type, geometry and,
+                    for grey maps, the quantization of values.
+    index           uint64 (offset, size) pair for each chunk,
+                    in row-major chunk order, offsets being relative
+                    to the start of the chunked map.
+    chunk data      compressed C-ordered bytes of each chunk.
+
+A tile pyramid file holds the chunked maps of many tiles of a
+spheroid, addressed by (face, level, x, y), in a single file to which
+tiles are appended as they are written:
+    magic           4 bytes: b'PTXP'
+    records         for each tile written, a uint8 face, uint8 level,
+                    uint32 x, uint32 y and uint64 size, followed by
+                    size bytes holding the tile's chunked map.
+The index of tiles is built by reading the record headers when the
+file is opened. A tile written more than once is read from its last
+record. Records are appended while holding an exclusive lock on the
+file, so that a pyramid may be shared by several processes.
+"""
+
+import bz2
+import fcntl
+import io
+import json
+import lzma
+import math
+import os
+import struct
+import threading
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+CHUNKED_SUFFIX = '.ptc'
+MAGIC = b'PTXC'
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_CODEC = 'zlib'
+
+_HEADER_SIZE_STRUCT = struct.Struct('<I')
+_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('size', '<u8')])
+
+PYRAMID_SUFFIX = '.ptp'
+PYRAMID_MAGIC = b'PTXP'
+# face, level, x, y, size of a tile pyramid record
+_RECORD_STRUCT = struct.Struct('<BBIIQ')
+
+# codec name: (compress(data, level), decompress(data), default level)
+CODECS = {
+    'none': (lambda data, level: data, bytes, 0),
+    'zlib': (lambda data, level: zlib.compress(data, level),
+             zlib.decompress, 6),
+    'bz2': (lambda data, level: bz2.compress(data, level),
+            bz2.decompress, 9),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level),
+             lzma.decompress, 6),
+}
+
+
+def default_chunk_size(geometry):
+    """
+    Gets the default chunk size for a map with the passed geometry.
+    Cube maps whose face size is not a multiple of DEFAULT_CHUNK_SIZE
+    are stored with one chunk per face.
+    :param geometry: tuple as returned by AbstractMap.geometry
+    :return: int
+    """
+    if geometry[0] == 'cube':
+        face_size = geometry[2] // 2
+        if face_size % DEFAULT_CHUNK_SIZE:
+            return face_size
+    return DEFAULT_CHUNK_SIZE
+
+
+def write_chunked(map_, path, chunk_size=None, codec=DEFAULT_CODEC,
+                  level=None, workers=None):
+    """
+    Writes map data to a chunked map file at the passed path.
+    Chunks are compressed concurrently; the stdlib codecs release
+    the GIL while compressing.
+    :param map_: AbstractMap
+    :param path: str
+    :param chunk_size: int side length of chunks in pixels.
+    :param codec: str; one of CODECS
+    :param level: int compression level; codec default if None.
+    :param workers: int maximum number of compression threads.
+    :return: None
+    """
+    with open(path, 'wb') as f:
+        _write_chunked(map_, f, chunk_size, codec, level, workers)
+
+
+def _write_chunked(map_, f, chunk_size, codec, level, workers):
+    """
+    Writes map data as a chunked map to passed seekable binary file,
+    from its current position.
+    """
+    if codec not in CODECS:
+        raise ValueError(f'Unknown codec: {codec!r}')
+    compress, _, default_level = CODECS[codec]
+    if level is None:
+        level = default_level
+    geometry = map_.geometry
+    if chunk_size is None:
+        chunk_size = default_chunk_size(geometry)
+    if chunk_size <= 0:
+        raise ValueError(f'Invalid chunk size: {chunk_size}')
+
+    arr = np.asarray(map_)
+    height, width = arr.shape
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'dtype': np.lib.format.dtype_to_descr(arr.dtype),
+        'shape': [height, width],
+        'chunk_size': chunk_size,
+        'codec': codec,
+        'map_type': type(map_).__name__,
+        'geometry': list(geometry),
+        'quantization': getattr(map_, 'quantization', None),
+    }).encode('utf-8')
+    bounds = _chunk_bounds(width, height, chunk_size)
+    index = np.zeros(len(bounds), _INDEX_DTYPE)
+
+    def compress_chunk(chunk_bounds):
+        x0, y0, x1, y1 = chunk_bounds
+        return compress(np.ascontiguousarray(arr[y0:y1, x0:x1]).tobytes(),
+                        level)
+
+    start = f.tell()
+    f.write(MAGIC)
+    f.write(_HEADER_SIZE_STRUCT.pack(len(header)))
+    f.write(header)
+    index_offset = f.tell()
+    offset = index_offset - start + index.nbytes
+    f.seek(start + offset)
+    # chunks are written in order as they finish compressing.
+    with ThreadPoolExecutor(workers) as executor:
+        for i, data in enumerate(executor.map(compress_chunk, bounds)):
+            f.write(data)
+            index[i] = offset, len(data)
+            offset += len(data)
+    end = f.tell()
+    f.seek(index_offset)
+    f.write(index.tobytes())
+    f.seek(end)
+
+
+class ChunkedMapFile:
+    """
+    Provides random access to the chunks of a chunked map file.
+    """
+
+    def __init__(self, path, offset=0):
+        """
+        :param path: str
+        :param offset: int position in file at which the chunked map
+                    starts; non-zero for the tiles of a tile pyramid.
+        """
+        self.path = path
+        self.offset = offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a chunked map file')
+            header_size, = _HEADER_SIZE_STRUCT.unpack(
+                f.read(_HEADER_SIZE_STRUCT.size))
+            header = json.loads(f.read(header_size).decode('utf-8'))
+            if header['version'] != FORMAT_VERSION:
+                raise ValueError(
+                    f'Unsupported chunked map version: {header["version"]}')
+            self.dtype = np.lib.format.descr_to_dtype(header['dtype'])
+            self.shape = tuple(header['shape'])
+            self.chunk_size = header['chunk_size']
+            self.codec = header['codec']
+            self.map_type = header['map_type']
+            self.geometry = tuple(header['geometry'])
+            # storage, scale and offset of grey map values.
+            self.quantization = header.get('quantization') or {}
+            if self.codec not in CODECS:
+                raise ValueError(f'Unknown codec: {self.codec!r}')
+            self._decompress = CODECS[self.codec][1]
+            self._bounds = _chunk_bounds(
+                self.width, self.height, self.chunk_size)
+            self._index = np.frombuffer(
+                f.read(len(self._bounds) * _INDEX_DTYPE.itemsize),
+                _INDEX_DTYPE)
+
+    @property
+    def width(self):
+        return self.shape[1]
+
+    @property
+    def height(self):
+        return self.shape[0]
+
+    @property
+    def n_chunks(self):
+        return len(self._bounds)
+
+    @property
+    def chunk_columns(self):
+        return math.ceil(self.width / self.chunk_size)
+
+    def chunk_bounds(self, i):
+        """
+        Gets the array bounds of the chunk with the passed index.
+        :param i: int chunk index
+        :return: tuple(x0, y0, x1, y1); x1, y1 exclusive.
+        """
+        return self._bounds[i]
+
+    def read_chunk(self, i):
+        """
+        Reads and decompresses the chunk with the passed index.
+        :param i: int chunk index
+        :return: ndarray of shape (y1 - y0, x1 - x0)
+        """
+        x0, y0, x1, y1 = self._bounds[i]
+        offset, size = self._index[i]
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset + int(offset))
+            data = f.read(int(size))
+        return np.frombuffer(
+            self._decompress(data), self.dtype).reshape(y1 - y0, x1 - x0)
+
+    def read_region(self, x0, y0, x1, y1, out=None, workers=None):
+        """
+        Reads the passed region of the stored array, decompressing
+        only the chunks that overlap it.
+        :param x0: int
+        :param y0: int
+        :param x1: int exclusive
+        :param y1: int exclusive
+        :param out: ndarray of shape (y1 - y0, x1 - x0) to read into.
+        :param workers: int maximum number of decompression threads.
+        :return: ndarray
+        """
+        if not (0 <= x0 < x1 <= self.width and 0 <= y0 < y1 <= self.height):
+            raise ValueError(
+                f'Region {(x0, y0, x1, y1)} outside of array with '
+                f'shape {self.shape}')
+        if out is None:
+            out = np.empty((y1 - y0, x1 - x0), self.dtype)
+        elif out.shape != (y1 - y0, x1 - x0) or out.dtype != self.dtype:
+            raise ValueError(
+                f'Expected output of shape {(y1 - y0, x1 - x0)} and '
+                f'dtype {self.dtype}, got {out.shape}, {out.dtype}')
+        size = self.chunk_size
+        columns = self.chunk_columns
+        indices = [
+            cy * columns + cx
+            for cy in range(y0 // size, (y1 - 1) // size + 1)
+            for cx in range(x0 // size, (x1 - 1) // size + 1)
+        ]
+
+        def read_into_out(i):
+            cx0, cy0, cx1, cy1 = self._bounds[i]
+            chunk = self.read_chunk(i)
+            # overlap of chunk and region, in array coordinates
+            ox0, oy0 = max(x0, cx0), max(y0, cy0)
+            ox1, oy1 = min(x1, cx1), min(y1, cy1)
+            out[oy0 - y0:oy1 - y0, ox0 - x0:ox1 - x0] = \
+                chunk[oy0 - cy0:oy1 - cy0, ox0 - cx0:ox1 - cx0]
+
+        with ThreadPoolExecutor(workers) as executor:
+            # list() re-raises any exception from a worker
+            list(executor.map(read_into_out, indices))
+        return out
+
+    def read(self, out=None, workers=None):
+        """
+        Reads the whole stored array.
+        :param out: ndarray of the stored shape to read into.
+        :param workers: int maximum number of decompression threads.
+        :return: ndarray
+        """
+        return self.read_region(
+            0, 0, self.width, self.height, out=out, workers=workers)
+
+
+def read_chunked(path, map_, workers=None):
+    """
+    Reads the chunked map file at passed path into an existing map.
+    :param path: str
+    :param map_: AbstractMap with the same dtype and shape as the
+                stored array.
+    :param workers: int maximum number of decompression threads.
+    :return: None
+    """
+    if map_.readonly:
+        raise ValueError('Map data is read-only')
+    ChunkedMapFile(path).read(out=np.asarray(map_), workers=workers)
+
+
+def load_chunked(path, workers=None, offset=0):
+    """
+    Creates a map of the stored type and geometry from the chunked
+    map file at passed path.
+    :param path: str
+    :param workers: int maximum number of decompression threads.
+    :param offset: int position in file at which the chunked map
+                starts.
+    :return: AbstractMap
+    """
+    from . import map as maps  # map imports this module
+    f = ChunkedMapFile(path, offset)
+    map_type = getattr(maps, f.map_type, None)
+    if map_type is None:
+        raise ValueError(f'Unknown map type: {f.map_type}')
+    kind, width, height = f.geometry[:3]
+    if kind == 'tile':
+        cube_face, p1x, p1y, p2x, p2y = f.geometry[3:8]
+        map_ = map_type(width=width, height=height, p1=(p1x, p1y),
+                        p2=(p2x, p2y), cube_face=cube_face,
+                        **f.quantization)
+    elif kind in ('cube', 'lat_lon'):
+        map_ = map_type(width=width, height=height, **f.quantization)
+    else:
+        raise ValueError(f'Cannot create map with geometry: {f.geometry}')
+    f.read(out=np.asarray(map_), workers=workers)
+    return map_
+
+
+class TilePyramidFile:
+    """
+    Stores the maps of a spheroid's tiles in a single tile pyramid
+    file, indexed by tile address. Tiles may be written and read
+    concurrently by the threads of a process, and by other processes
+    with their own TilePyramidFile. Records appended by others are
+    indexed when this instance next writes to the file.
+    """
+
+    def __init__(self, path):
+        """
+        Opens tile pyramid file at passed path, which is created when
+        the first tile is written, if it does not exist.
+        :param path: str
+        """
+        self.path = path
+        self._index = {}  # (face, level, x, y): (offset, size)
+        self._end = 0  # end of the last complete record
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self._read_index(f)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return tuple(key) in self._index
+
+    def keys(self):
+        """
+        Gets addresses of stored tiles.
+        :return: list of tuple(face, level, x, y)
+        """
+        with self._lock:
+            return list(self._index)
+
+    def write(self, key, map_, chunk_size=None, codec=DEFAULT_CODEC,
+              level=None, workers=None):
+        """
+        Appends map of tile with passed address to the file.
+        :param key: tuple(face, level, x, y)
+        :param map_: AbstractMap
+        :param chunk_size: int side length of chunks in pixels.
+        :param codec: str; one of CODECS
+        :param level: int compression level; codec default if None.
+        :param workers: int maximum number of compression threads.
+        :return: None
+        """
+        key = tuple(key)
+        # compressed outside of the lock, so that tiles written by
+        # several threads are compressed concurrently.
+        buffer = io.BytesIO()
+        _write_chunked(map_, buffer, chunk_size, codec, level, workers)
+        data = buffer.getvalue()
+        with self._lock:
+            dir_path = os.path.dirname(self.path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+            with open(self.path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # index records appended by others since last read
+                    self._read_index(f)
+                    # writers hold the lock until their record is
+                    # complete, so any bytes past the last complete
+                    # record are left by an interrupted write.
+                    f.truncate(self._end)
+                    if self._end == 0:
+                        f.write(PYRAMID_MAGIC)
+                    f.write(_RECORD_STRUCT.pack(*key, len(data)))
+                    offset = f.tell()
+                    f.write(data)
+                    f.flush()
+                    self._end = f.tell()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self._index[key] = offset, len(data)
+
+    def chunked_file(self, key):
+        """
+        Gets the chunked map of tile with passed address, giving
+        random access to its chunks.
+        :param key: tuple(face, level, x, y)
+        :return: ChunkedMapFile
+        """
+        return ChunkedMapFile(self.path, self._offset(key))
+
+    def load(self, key, workers=None):
+        """
+        Creates map of tile with passed address.
+        :param key: tuple(face, level, x, y)
+        :param workers: int maximum number of decompression threads.
+        :return: AbstractMap
+        """
+        return load_chunked(self.path, workers, self._offset(key))
+
+    def _offset(self, key):
+        with self._lock:
+            entry = self._index.get(tuple(key))
+        if entry is None:
+            raise KeyError(f'Tile not in {self.path}: {key}')
+        return entry[0]
+
+    def _read_index(self, f):
+        """
+        Adds records following the last indexed record of passed
+        open file to the index. A record that is cut short, by an
+        interrupted write or one in progress, ends the index.
+        """
+        file_size = f.seek(0, os.SEEK_END)
+        if self._end == 0:
+            if file_size == 0:
+                return
+            f.seek(0)
+            if f.read(len(PYRAMID_MAGIC)) != PYRAMID_MAGIC:
+                raise ValueError(f'{self.path} is not a tile pyramid file')
+            self._end = f.tell()
+        f.seek(self._end)
+        while True:
+            record = f.read(_RECORD_STRUCT.size)
+            if len(record) < _RECORD_STRUCT.size:
+                break
+            face, level, x, y, size = _RECORD_STRUCT.unpack(record)
+            offset = f.tell()
+            if offset + size > file_size:
+                break
+            self._index[face, level, x, y] = offset, size
+            self._end = f.seek(size, os.SEEK_CUR)
+
+
+def _chunk_bounds(width, height, chunk_size):
+    """
+    Gets bounds of each chunk of an array, in row-major chunk order.
+    :return: list of tuple(x0, y0, x1, y1)
+    """
+    return [
+        (x, y, min(x + chunk_size, width), min(y + chunk_size, height))
+        for y in range(0, height, chunk_size)
+        for x in range(0, width, chunk_size)
+    ]
@@ -0,0 +1,129 @@
+"""
+Runtime configuration of the parallel loops of map generation.
+
+An ExecutionContext is passed to the map generation functions
+(make_height_detail, make_tectonic_cube, make_warming_map and
+make_wind_map), which run their main loops with the context's number
+of threads, OpenMP schedule and chunk size.
+
+The number of threads defaults to the number of cpus available to the
+process. Where several generations share a host, such as a batch of
+spheroids generated across a process pool, each may be given a share
+of the cpus. The PYROSTEX_MAX_THREADS environment variable caps the
+number of threads of every context.
+"""
+
+import os
+
+MAX_THREADS_ENV = 'PYROSTEX_MAX_THREADS'
+
+# schedule name: OpenMP omp_sched_t value
+SCHEDULES = {
+    'static': 1,
+    'dynamic': 2,
+    'guided': 3,
+    'auto': 4,
+}
+DEFAULT_SCHEDULE = 'static'
+
+
+def available_cpus():
+    """
+    Gets number of cpus the current process may run on.
+    :return: int
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on all platforms
+        return os.cpu_count() or 1
+
+
+def max_threads():
+    """
+    Gets the cap on threads set by the PYROSTEX_MAX_THREADS
+    environment variable.
+    :return: int, or None if no cap is set.
+    """
+    value = os.environ.get(MAX_THREADS_ENV)
+    if not value:
+        return None
+    try:
+        cap = int(value)
+    except ValueError:
+        raise ValueError('{} must be an integer, got {!r}'
+                         .format(MAX_THREADS_ENV, value)) from None
+    if cap < 1:
+        raise ValueError('{} must be positive, got {}'
+                         .format(MAX_THREADS_ENV, cap))
+    return cap
+
+
+class ExecutionContext:
+    """
+    Thread count and loop scheduling used by map generation.
+    """
+
+    def __init__(self, threads=None, schedule=DEFAULT_SCHEDULE,
+                 chunk_size=0, share=1):
+        """
+        :param threads: int number of threads used by parallel loops.
+                    Defaults to the available cpus divided by share.
+        :param schedule: str OpenMP schedule of parallel loops;
+                    one of SCHEDULES.
+        :param chunk_size: int number of loop iterations (typically
+                    map rows) handed to a thread at once. 0 uses the
+                    OpenMP default for the schedule.
+        :param share: int number of concurrent generations sharing
+                    the host's cpus.
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError('Unknown schedule: {!r}; expected one of {}'
+                             .format(schedule, sorted(SCHEDULES)))
+        if chunk_size < 0:
+            raise ValueError('Invalid chunk size: {}'.format(chunk_size))
+        if share < 1:
+            raise ValueError('Invalid share: {}'.format(share))
+        if threads is None:
+            threads = max(1, available_cpus() // share)
+        elif threads < 1:
+            raise ValueError('Invalid thread count: {}'.format(threads))
+        cap = max_threads()
+        if cap is not None:
+            threads = min(threads, cap)
+        self.threads = threads
+        self.schedule = schedule
+        self.chunk_size = chunk_size
+
+    def shared(self, share):
+        """
+        Gets context for one of several generations run at once,
+        dividing this context's threads among them.
+        :param share: int number of generations run at once.
+        :return: ExecutionContext
+        """
+        if share < 1:
+            raise ValueError('Invalid share: {}'.format(share))
+        return ExecutionContext(
+            threads=max(1, self.threads // share), schedule=self.schedule,
+            chunk_size=self.chunk_size)
+
+    @property
+    def schedule_kind(self):
+        """
+        Gets OpenMP schedule kind of context's schedule.
+        :return: int
+        """
+        return SCHEDULES[self.schedule]
+
+    def __repr__(self):
+        return 'ExecutionContext(threads={}, schedule={!r}, ' \
+               'chunk_size={})'.format(
+                    self.threads, self.schedule, self.chunk_size)
+
+
+def default_context():
+    """
+    Gets context used when none is passed to a generation function.
+    :return: ExecutionContext
+    """
+    return ExecutionContext()
@@ -0,0 +1,3 @@
+# Units of elevation shared by the modules that read the tectonic map.
+
+DEF TEC_UNITS_PER_M = 300  # tectonic map values per meter above sea level
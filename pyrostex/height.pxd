@@ -1,7 +1,31 @@
-from .map cimport grey_map_t, GreyCubeMap, GreyLatLonMap
+from .map cimport grey_map_t, GreyCubeMap, GreyLatLonMap, GreyTileMap
 
-cpdef bint make_height_detail(grey_map_t height_map, object zone) except False
+cpdef bint make_height_detail(
+    grey_map_t height_map,
+    object zone,
+    object context=*,
+    object layer_cache=*,
+    object generator=*) except False
+cpdef bint make_height_detail_batch(
+    object height_maps,
+    object zone,
+    object context=*,
+    object generator=*) except False
+cpdef object make_refinable_height_detail(
+    GreyTileMap height_map,
+    object zone,
+    object context=*,
+    object generator=*)
+cpdef object refine_height_detail(
+    GreyTileMap height_map,
+    GreyTileMap parent_map,
+    object parent_layers,
+    object zone,
+    object context=*,
+    object generator=*)
 cpdef bint make_tectonic_cube(
     GreyCubeMap tec_map,
     GreyLatLonMap raw_tec_map,
-    object zone) except False
+    object zone,
+    object context=*,
+    bint simd=*) except False
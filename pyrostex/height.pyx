@@ -6,25 +6,83 @@ cimport cython
 cimport openmp
 
 from cython.parallel cimport prange, parallel, threadid
-from libc.math cimport fabs, sqrt, isnan
-from libc.stdlib cimport malloc, free
+from libc.math cimport fabs, sqrt, isnan, M_PI
+from libc.stdlib cimport malloc, calloc, free
+from libc.string cimport memcpy
+from cpython.ref cimport PyObject
 from libc.stdio cimport fprintf, stderr, printf
 
-from .map cimport GreyCubeMap, a_t, av
+from .map cimport GreyCubeMap, GreyTileMap, DirectionTable, \
+    direction_table_, a_t, av
 from .noise.noise cimport PyFastNoise
-from .noise.simdnoise cimport PyFastNoiseSIMD, FastNoiseVectorSet
+from .noise.simdnoise cimport PyFastNoiseSIMD, FastNoiseSIMD, \
+    FastNoiseVectorSet
 from .includes.cmathutils cimport vec2, vec3, vec4, vec3Normalize, vec2Zero, \
     vec3New, vec3Multiply, vec3Add
 
+from .layers import layer_key
+
 include "flags.pxi"
+include "parallel.pxi"
+include "elevation.pxi"
 
 IF DEBUG:
     from time import time
 
-IF ASSERTS:
-    DEF THREADS = 1
-ELSE:
-    DEF THREADS = 4  # todo: dynamically set
+DEF TAU = 6.2831853071795864769252867665590057683942
+
+# height detail noise parameters; frequencies are multiplied by radius.
+DEF WARP_FRQ = 1 / 800e3
+DEF WARP_OCTAVES = 3
+DEF RM_FRQ = 1 / 0.25e6
+DEF RM_OCTAVES = 8
+DEF RM_LACUNARITY = 2
+DEF IQ_SCALE = 1e4
+
+# DETAIL_COMBINE_VERSION should be incremented whenever a change to the
+# combination of height detail noise layers with the base height map
+# (hill scaling, erosion, etc) would change the resulting height.
+DEF DETAIL_COMBINE_VERSION = 1
+
+# tectonic cube warp parameters
+DEF TEC_WARP_FRQ = 0.5
+DEF TEC_WARP_OCTAVES = 2
+DEF TEC_WARP_AMP = 0.2
+
+# minimum number of samples per wavelength of a height detail noise
+# octave for a tile's data to be considered to resolve it.
+DEF SAMPLES_PER_WAVELENGTH = 4
+
+# maximum error of warped sample positions interpolated from a parent
+# tile, in wavelengths of the finest rigid-multi octave.
+DEF WARP_PHASE_TOLERANCE = 0.05
+
+# alignment in bytes of float sets passed to FastNoiseSIMD; the width
+# of the widest vectors of any SIMD level.
+DEF SET_ALIGNMENT = 64
+
+# kinds of pixel of a refined tile; see DetailRefiner
+DEF PIXEL_COINCIDENT = 0  # lies at the position of a parent pixel
+DEF PIXEL_INTERPOLATED = 1  # lies between parent pixels
+DEF PIXEL_EVALUATED = 2  # lies past the parent pixels, or has no parent
+
+
+cdef extern from "stdlib.h" nogil:
+    void *aligned_alloc(size_t alignment, size_t size)
+
+
+cdef float *new_noise_set(int size) nogil:
+    """
+    Allocates a set of floats that FastNoiseSIMD may load from and
+    store to at any SIMD level: aligned to, and padded to a whole
+    number of, the widest SIMD vectors. Unlike
+    PyFastNoiseSIMD.empty_set, the set does not depend on the current
+    SIMD level, so it may outlive a change of level.
+    Sets are released with free().
+    """
+    cdef size_t n_bytes = sizeof(float) * max(size, 1)
+    n_bytes = (n_bytes + SET_ALIGNMENT - 1) // SET_ALIGNMENT * SET_ALIGNMENT
+    return <float *>aligned_alloc(SET_ALIGNMENT, n_bytes)
 
 
 cdef class WarpGenerator:
@@ -93,185 +151,1150 @@ cdef class WarpGenSIMD:
         self.z_noise.fill_simplex_fractal_set(z_warp_set, v_set)
 
 
-cpdef bint make_height_detail(grey_map_t height_map, object zone) except False:
+cpdef bint make_height_detail(
+        grey_map_t height_map,
+        object zone,
+        object context=None,
+        object layer_cache=None,
+        object generator=None) except False:
     """
     Populates passed detail_map with height data from base_map.
+    :param context: ExecutionContext used by parallel loops.
+    :param layer_cache: NoiseLayerCache from which the map's noise
+                layers are read, and in which those evaluated are
+                stored, or None if noise layers are not to be cached.
+                Memory-mapped maps do not use the cache, as their
+                layers would be larger still.
+    :param generator: HeightDetailGenerator of zone's spheroid, or
+                None if one is to be created.
     """
+    cdef HeightDetailGenerator gen = zone_generator(zone, generator)
+    cdef int threads = begin_parallel(context)
+    cdef NoiseLayers layers = None
 
-    cdef GreyCubeMap tectonic_map = zone.tectonic_map
-    cdef double radius =    zone.radius
-    cdef int seed =         zone.seed
-
-    build_h0_map(height_map, tectonic_map, radius, seed)
+    if layer_cache is not None and height_map.backing_path is None:
+        layers = NoiseLayers(height_map, gen, layer_cache)
+    build_h0_map(height_map, gen, threads, layers)
+    if layers is not None:
+        layers.store()
     return 1
 
 
-@cython.cdivision(True)
-cdef bint build_h0_map(
-        grey_map_t  h_map,
-        GreyCubeMap base_height_map,
-        double      radius,
-        int         seed
-        ) except False:
+cpdef bint make_height_detail_batch(
+        object height_maps,
+        object zone,
+        object context=None,
+        object generator=None) except False:
     """
-    Creates the first layer of the height map.
-    """
-    cdef int h_width        = h_map.width
-    cdef int h_height       = h_map.height
-    cdef double iq_scale    = 1e4
-    cdef double warp_amp    = 1.6
-
-    cdef int x, y
-    cdef int *int_xy_pos
-    cdef int thread_id
-    cdef vec2 xy_pos
-    cdef vec3 pos_v, sample_pos_v, pos_warp_v
-    cdef FastNoiseVectorSet *pos_v_set
-    cdef FastNoiseVectorSet *warp_v_set
-    cdef float *pos_x_set  # arrays of noise sample positions
-    cdef float *pos_y_set
-    cdef float *pos_z_set
-    cdef float *warp_x_set
-    cdef float *warp_y_set
-    cdef float *warp_z_set
-    cdef float *rm_result_set  # arrays storing noise results
-    cdef float *rng_scale_set
-    cdef double rng_scaling
-    cdef double h, base_v, rm_result, base_scaling, scale_reduce, scaling
-    cdef double erosion_level, eroded_iq
-    cdef double b  # bump value
-
-    cdef WarpGenSIMD warp_gen        = WarpGenSIMD(seed, radius / 800e3, 3)
-    cdef PyFastNoiseSIMD amp_noise   = PyFastNoiseSIMD()
-    cdef PyFastNoiseSIMD bump_noise  = PyFastNoiseSIMD()
-    cdef PyFastNoiseSIMD rm_noise    = PyFastNoiseSIMD()
-
-    # set up rm_noise
-    rm_noise.seed = seed + 60
-    rm_noise.frq = radius / 0.25e6
-    rm_noise.fractal_octaves = 8
-    rm_noise.lacunarity = 2
-    rm_noise.fractal_gain = 0.5
-    rm_noise.fractal_type = 'RigidMulti'
-
-    # set up amp_noise
-    amp_noise.seed = seed + 10
-    amp_noise.frq = radius / 3.2e6  # ~50km base wavelength
-    amp_noise.fractal_octaves = 2
-    amp_noise.lacunarity = 4
-    amp_noise.fractal_gain = 0.25
-
-    # set up bump noise
-    bump_noise.seed = seed + 50
-    bump_noise.frq = radius / 100   # 100m base wavelength
-    bump_noise.fractal_octaves = 4
-    bump_noise.lacunarity = 4
-    bump_noise.fractal_gain = 0.25
+    Populates each of passed tile height maps with height data, as
+    make_height_detail would.
+    Noise generators are configured once for the whole batch, and rows
+    of all maps are divided between the threads of a single parallel
+    region, so that many small maps keep all threads busy.
+    :param height_maps: iterable of GreyTileMap
+    :param zone: Spheroid, or Tile of the spheroid that maps belong to.
+    :param context: ExecutionContext used by parallel loops.
+    :param generator: HeightDetailGenerator of zone's spheroid, or
+                None if one is to be created.
+    :return: bool
+    """
+    cdef list maps = list(height_maps)
+    cdef GreyTileMap h_map
+    cdef HeightDetailGenerator gen
+    cdef ScratchArena arena
+    cdef PyObject **map_ptrs
+    cdef int *row_maps  # index of map of each row of batch
+    cdef int *row_ys  # y index of each row of batch within its map
+    cdef int n_rows = 0, max_width = 0
+    cdef int i, y, row, thread_id
+    cdef int threads = begin_parallel(context)
+
+    for h_map in maps:  # type checks each map
+        n_rows += h_map.height
+        max_width = max(max_width, h_map.width)
+    if n_rows == 0:
+        return 1
+
+    gen = zone_generator(zone, generator)
+    map_ptrs = <PyObject **>malloc(sizeof(PyObject *) * len(maps))
+    row_maps = <int *>malloc(sizeof(int) * n_rows)
+    row_ys = <int *>malloc(sizeof(int) * n_rows)
+    if map_ptrs == NULL or row_maps == NULL or row_ys == NULL:
+        free(map_ptrs)
+        free(row_maps)
+        free(row_ys)
+        raise MemoryError('Could not allocate batch row tables')
+    row = 0
+    for i, h_map in enumerate(maps):
+        map_ptrs[i] = <PyObject *>h_map  # kept alive by maps list
+        for y in range(h_map.height):
+            row_maps[row] = i
+            row_ys[row] = y
+            row += 1
 
     IF DEBUG:
         t0 = time()
-        print('generating h0 map')
+        print('generating height detail of {} maps'.format(len(maps)))
 
-    with nogil, parallel(num_threads=THREADS):
-        # if not explicitly initialized here, threads will all attempt to
-        # use the same position struct. That would work poorly.
-        thread_id   = threadid()
-        xy_pos      = vec2Zero()
-        int_xy_pos  = <int *>malloc(sizeof(int) * 2)
-        pos_v_set   = <FastNoiseVectorSet *>malloc(sizeof(FastNoiseVectorSet))
-        pos_x_set   = <float *>malloc(sizeof(float) * h_width)
-        pos_y_set   = <float *>malloc(sizeof(float) * h_width)
-        pos_z_set   = <float *>malloc(sizeof(float) * h_width)
-        warp_v_set  = <FastNoiseVectorSet *>malloc(sizeof(FastNoiseVectorSet))
-        warp_x_set  = <float *>malloc(sizeof(float) * h_width)
-        warp_y_set  = <float *>malloc(sizeof(float) * h_width)
-        warp_z_set  = <float *>malloc(sizeof(float) * h_width)
-        rm_result_set   = <float *>malloc(sizeof(float) * h_width)
-        rng_scale_set   = <float *>malloc(sizeof(float) * h_width)
-
-        pos_v_set.size = h_width
-        pos_v_set.xSet = pos_x_set
-        pos_v_set.ySet = pos_y_set
-        pos_v_set.zSet = pos_z_set
+    arena = acquire_arena(threads, max_width)
+    try:
+        with nogil, parallel(num_threads=threads):
+            thread_id = threadid()
+            for row in prange(n_rows, schedule='runtime'):
+                gen.fill_row_(
+                    <GreyTileMap>map_ptrs[row_maps[row]],
+                    &arena.rows[thread_id],
+                    row_ys[row],
+                    NULL, NULL, NULL, NULL)
+    finally:
+        release_arena(arena)
+        free(map_ptrs)
+        free(row_maps)
+        free(row_ys)
+
+    IF DEBUG:
+        tf = time()
+        print('height detail batch generation time: {}'.format(tf - t0))
+    return 1
 
-        warp_v_set.size = h_width
-        warp_v_set.xSet = warp_x_set
-        warp_v_set.ySet = warp_y_set
-        warp_v_set.zSet = warp_z_set
 
-        for y in prange(h_height, schedule='static'):
-            int_xy_pos[1] = y
-            xy_pos.y = y
+cpdef object make_refinable_height_detail(
+        GreyTileMap height_map,
+        object zone,
+        object context=None,
+        object generator=None):
+    """
+    Populates passed tile height map with height data, as
+    make_height_detail would, keeping the noise layers from which the
+    height data of its sub-tiles may be refined.
+    Rigid-multi noise is summed an octave at a time, so heights may
+    differ from those of make_height_detail by float rounding.
+    :param height_map: GreyTileMap
+    :param zone: Tile or Spheroid
+    :param context: ExecutionContext used by parallel loops.
+    :param generator: HeightDetailGenerator of zone's spheroid, or
+                None if one is to be created.
+    :return: RefinementLayers of height_map
+    """
+    cdef DetailRefiner refiner = DetailRefiner(
+        zone_generator(zone, generator), height_map)
+    return refiner.run(begin_parallel(context))
+
+
+cpdef object refine_height_detail(
+        GreyTileMap height_map,
+        GreyTileMap parent_map,
+        object parent_layers,
+        object zone,
+        object context=None,
+        object generator=None):
+    """
+    Populates passed tile height map, which covers one quarter of
+    passed parent tile height map, refining the parent's data.
+
+    Every second pixel in each row and column of the tile lies at the
+    position of a parent pixel, and is copied from the parent. The
+    noise layers of the remaining pixels are interpolated from those
+    of the parent where the parent resolves them, and of the
+    rigid-multi noise, only the octaves finer than those the parent
+    resolves are evaluated and added to those interpolated. Where the
+    parent resolves all noise layers, heights of these pixels are
+    interpolated from those of the parent instead. Pixels in
+    the tile's last row and column lie past the parent's pixels, and
+    are evaluated in full.
+    :param height_map: GreyTileMap with the same width and height
+                as parent_map, covering a quarter of its area.
+    :param parent_map: GreyTileMap
+    :param parent_layers: RefinementLayers of parent_map, as returned
+                by make_refinable_height_detail or refine_height_detail.
+    :param zone: Tile or Spheroid
+    :param context: ExecutionContext used by parallel loops.
+    :param generator: HeightDetailGenerator of zone's spheroid, or
+                None if one is to be created.
+    :return: RefinementLayers of height_map
+    """
+    cdef DetailRefiner refiner = DetailRefiner(
+        zone_generator(zone, generator), height_map, parent_map,
+        parent_layers)
+    return refiner.run(begin_parallel(context))
+
+
+cdef HeightDetailGenerator zone_generator(object zone, object generator):
+    """
+    Gets passed generator, or if it is None, creates a generator for
+    passed zone's spheroid.
+    """
+    if generator is None:
+        return HeightDetailGenerator(
+            zone.tectonic_map, zone.radius, zone.seed)
+    return generator
+
+
+cdef struct RowScratch:
+    # buffers used by a single thread to generate a row of height data
+    int *x_set  # x index of each evaluated pixel in row
+    float *pos_x_set  # arrays of noise sample positions
+    float *pos_y_set
+    float *pos_z_set
+    float *warp_x_set
+    float *warp_y_set
+    float *warp_z_set
+    float *rm_result_set  # arrays storing noise results
+    float *rng_scale_set
+    FastNoiseVectorSet *pos_v_set
+    FastNoiseVectorSet *warp_v_set
+
+
+cdef struct LayerRows:
+    # a row of each of the noise layers of a map, read by fill_row_ in
+    # place of evaluating noise, or filled by it.
+    float *warp_x  # warped sample positions
+    float *warp_y
+    float *warp_z
+    float *rm_result
+    float *rng_scale
+    bint has_warp  # whether warp rows hold cached values
+    bint has_noise  # whether rm_result and rng_scale rows do
+
+
+cdef class ScratchArena:
+    """
+    Row scratch buffers for each thread of a parallel region.
+    Arenas are kept in a pool between calls (see acquire_arena), so
+    that buffers are not re-allocated for every map generated.
+    """
+    cdef RowScratch *rows  # one per thread
+    cdef int n_threads
+    cdef int width
+
+    def __cinit__(self):
+        self.rows = NULL
+        self.n_threads = 0
+        self.width = 0
+
+    def __dealloc__(self):
+        self.free_rows()
+
+    cdef bint reserve(self, int n_threads, int width) except False:
+        """
+        Ensures that arena holds buffers for at least passed number of
+        threads, each able to hold a row of passed width.
+        """
+        cdef int i
+        cdef RowScratch *scratch
+        if n_threads <= self.n_threads and width <= self.width:
+            return 1
+        n_threads = max(n_threads, self.n_threads)
+        width = max(width, self.width)
+        self.free_rows()
+        self.rows = <RowScratch *>calloc(n_threads, sizeof(RowScratch))
+        if self.rows == NULL:
+            raise MemoryError('Could not allocate scratch arena')
+        self.n_threads = n_threads
+        self.width = width
+        for i in range(n_threads):
+            scratch = &self.rows[i]
+            scratch.x_set = <int *>malloc(sizeof(int) * width)
+            scratch.pos_x_set = new_noise_set(width)
+            scratch.pos_y_set = new_noise_set(width)
+            scratch.pos_z_set = new_noise_set(width)
+            scratch.warp_x_set = new_noise_set(width)
+            scratch.warp_y_set = new_noise_set(width)
+            scratch.warp_z_set = new_noise_set(width)
+            scratch.rm_result_set = new_noise_set(width)
+            scratch.rng_scale_set = new_noise_set(width)
+            scratch.pos_v_set = <FastNoiseVectorSet *>malloc(
+                sizeof(FastNoiseVectorSet))
+            scratch.warp_v_set = <FastNoiseVectorSet *>malloc(
+                sizeof(FastNoiseVectorSet))
+            if scratch.x_set == NULL or scratch.pos_x_set == NULL or \
+                    scratch.pos_y_set == NULL or scratch.pos_z_set == NULL \
+                    or scratch.warp_x_set == NULL or \
+                    scratch.warp_y_set == NULL or \
+                    scratch.warp_z_set == NULL or \
+                    scratch.rm_result_set == NULL or \
+                    scratch.rng_scale_set == NULL or \
+                    scratch.pos_v_set == NULL or scratch.warp_v_set == NULL:
+                self.free_rows()
+                raise MemoryError('Could not allocate scratch arena')
+            scratch.pos_v_set.size = width
+            scratch.pos_v_set.xSet = scratch.pos_x_set
+            scratch.pos_v_set.ySet = scratch.pos_y_set
+            scratch.pos_v_set.zSet = scratch.pos_z_set
+            scratch.warp_v_set.size = width
+            scratch.warp_v_set.xSet = scratch.warp_x_set
+            scratch.warp_v_set.ySet = scratch.warp_y_set
+            scratch.warp_v_set.zSet = scratch.warp_z_set
+        return 1
+
+    cdef void free_rows(self):
+        cdef int i
+        cdef RowScratch *scratch
+        if self.rows == NULL:
+            return
+        for i in range(self.n_threads):
+            scratch = &self.rows[i]
+            free(scratch.x_set)
+            free(scratch.pos_x_set)
+            free(scratch.pos_y_set)
+            free(scratch.pos_z_set)
+            free(scratch.warp_x_set)
+            free(scratch.warp_y_set)
+            free(scratch.warp_z_set)
+            free(scratch.rm_result_set)
+            free(scratch.rng_scale_set)
+            free(scratch.pos_v_set)
+            free(scratch.warp_v_set)
+        free(self.rows)
+        self.rows = NULL
+        self.n_threads = 0
+        self.width = 0
+
+
+# arenas not currently in use. An arena is popped by each call that
+# needs one, so concurrent calls never share buffers.
+_scratch_arenas = []
+
+
+cdef ScratchArena acquire_arena(int n_threads, int width):
+    """
+    Gets an unused scratch arena with buffers for passed number of
+    threads and row width.
+    """
+    cdef ScratchArena arena
+    try:
+        arena = _scratch_arenas.pop()
+    except IndexError:
+        arena = ScratchArena()
+    try:
+        arena.reserve(n_threads, width)
+    except MemoryError:
+        _scratch_arenas.append(arena)
+        raise
+    return arena
+
 
-            # get position vectors in this row
+cdef void release_arena(ScratchArena arena):
+    """
+    Returns scratch arena to pool, for use by later calls.
+    """
+    _scratch_arenas.append(arena)
+
+
+def detail_noise_params(double radius, int seed):
+    """
+    Gets parameters of the noise generators used to generate height
+    detail, which identify the noise layers that they produce.
+    :param radius: float spheroid radius
+    :param seed: int spheroid seed
+    :return: dict of generator name: dict of parameters
+    """
+    return {
+        'warp': {
+            'seed': seed,
+            'frq': radius * WARP_FRQ,
+            'octaves': WARP_OCTAVES,
+        },
+        'rm': {
+            'seed': seed + 60,
+            'frq': radius * RM_FRQ,
+            'octaves': RM_OCTAVES,
+            'lacunarity': RM_LACUNARITY,
+            'gain': 0.5,
+            'fractal_type': 'RigidMulti',
+        },
+        'amp': {
+            'seed': seed + 10,
+            'frq': radius / 3.2e6,  # ~50km base wavelength
+            'octaves': 2,
+            'lacunarity': 4,
+            'gain': 0.25,
+            'fractal_type': 'FBM',
+        },
+        'bump': {
+            'seed': seed + 50,
+            'frq': radius / 100,  # 100m base wavelength
+            'octaves': 4,
+            'lacunarity': 4,
+            'gain': 0.25,
+            'fractal_type': 'FBM',
+        },
+    }
+
+
+def detail_combine_params():
+    """
+    Gets parameters of the combination of height detail noise layers
+    with the base height map, which, along with detail_noise_params,
+    identify the height detail that is produced.
+    :return: dict of parameters
+    """
+    return {
+        'version': DETAIL_COMBINE_VERSION,
+        'iq_scale': IQ_SCALE,
+    }
+
+
+def tectonic_noise_params(int seed):
+    """
+    Gets parameters of the noise generators used to warp the tectonic
+    cube map, in the form of detail_noise_params.
+    :param seed: int spheroid seed
+    :return: dict of generator name: dict of parameters
+    """
+    return {
+        'warp': {
+            'seed': seed,
+            'frq': TEC_WARP_FRQ,
+            'octaves': TEC_WARP_OCTAVES,
+        },
+    }
+
+
+def resolved_octaves(double spacing, double frq, int octaves,
+                     double lacunarity):
+    """
+    Gets number of leading octaves of a fractal noise that are
+    resolved by samples at passed spacing; that are sampled at least
+    SAMPLES_PER_WAVELENGTH times per wavelength.
+    :param spacing: float distance between samples, in the units of
+                the noise's sample positions.
+    :param frq: float frequency of the first octave.
+    :param octaves: int number of octaves.
+    :param lacunarity: float frequency multiplier of each octave.
+    :return: int
+    """
+    cdef int n = 0
+    while n < octaves and \
+            spacing * frq * lacunarity ** n * SAMPLES_PER_WAVELENGTH <= 1:
+        n += 1
+    return n
+
+
+def warp_resolved(double spacing, dict params):
+    """
+    Determines whether height detail warp may be interpolated from
+    samples at passed spacing: whether the error of interpolating the
+    finest warp octave, whose amplitude is at most 1, displaces sample
+    positions by no more than WARP_PHASE_TOLERANCE wavelengths of the
+    finest rigid-multi octave.
+    :param spacing: float distance between samples on the unit sphere.
+    :param params: dict of generator parameters, as returned by
+                detail_noise_params.
+    :return: bool
+    """
+    warp, rm = params['warp'], params['rm']
+    # WarpGenSIMD generators use the default lacunarity of 2.
+    warp_frq = warp['frq'] * 2 ** (warp['octaves'] - 1)
+    rm_frq = rm['frq'] * rm['lacunarity'] ** (rm['octaves'] - 1)
+    error = (M_PI * spacing * warp_frq) ** 2 / 2
+    return error * rm_frq <= WARP_PHASE_TOLERANCE
+
+
+def max_warp_spacing(warp):
+    """
+    Gets greatest distance between the warped sample positions of
+    horizontally or vertically adjacent pixels.
+    :param warp: float32 ndarray of warped positions; (3, h, w)
+    :return: float
+    """
+    return max(
+        float(np.linalg.norm(np.diff(warp, axis=2), axis=0).max(initial=0)),
+        float(np.linalg.norm(np.diff(warp, axis=1), axis=0).max(initial=0)))
+
+
+cdef PyFastNoiseSIMD _new_noise(dict params):
+    """
+    Creates noise generator with passed parameters, as returned
+    by detail_noise_params.
+    """
+    cdef PyFastNoiseSIMD n = PyFastNoiseSIMD()
+    n.seed = params['seed']
+    n.frq = params['frq']
+    n.fractal_octaves = params['octaves']
+    n.lacunarity = params['lacunarity']
+    n.fractal_gain = params['gain']
+    n.fractal_type = params['fractal_type']
+    return n
+
+
+cdef class HeightDetailGenerator:
+    """
+    Generates the first layer of height detail of a spheroid, holding
+    the noise generators used, which are configured once for the
+    spheroid's seed and radius.
+    """
+    cdef GreyCubeMap base_height_map
+    cdef dict params  # parameters of each noise generator
+    cdef dict owner  # identifies the spheroid in noise layer keys
+    cdef WarpGenSIMD warp_gen
+    cdef PyFastNoiseSIMD amp_noise
+    cdef PyFastNoiseSIMD bump_noise
+    cdef PyFastNoiseSIMD rm_noise
+    # generators of each single octave of rm_noise, and the weight of
+    # each octave in rm_noise's sum; used to refine tiles.
+    cdef list rm_octave_noise  # owns the generators of rm_octaves
+    cdef FastNoiseSIMD *rm_octaves[RM_OCTAVES]
+    cdef float rm_weights[RM_OCTAVES]
+
+    def __init__(self, GreyCubeMap base_height_map, double radius, int seed):
+        cdef PyFastNoiseSIMD octave_noise
+        cdef int i
+        self.base_height_map = base_height_map
+        self.params = detail_noise_params(radius, seed)
+        self.owner = {'seed': seed, 'radius': radius}
+        warp = self.params['warp']
+        self.warp_gen = WarpGenSIMD(warp['seed'], warp['frq'], warp['octaves'])
+        self.rm_noise = _new_noise(self.params['rm'])
+        self.amp_noise = _new_noise(self.params['amp'])
+        self.bump_noise = _new_noise(self.params['bump'])
+
+        # a rigid-multi fractal sums the inverted magnitude of each
+        # octave, subtracting all but the first, with the seed
+        # incremented and frequency multiplied by lacunarity per octave.
+        rm = self.params['rm']
+        self.rm_octave_noise = []
+        for i in range(RM_OCTAVES):
+            octave_noise = _new_noise(dict(
+                rm, seed=rm['seed'] + i,
+                frq=rm['frq'] * rm['lacunarity'] ** i, octaves=1))
+            self.rm_octave_noise.append(octave_noise)
+            self.rm_octaves[i] = octave_noise.n
+            self.rm_weights[i] = 1 if i == 0 else -rm['gain'] ** i
+
+    def layer_keys(self, tuple geometry):
+        """
+        Gets keys of the noise layers of a map of passed geometry:
+        the warped sample position of each pixel, and the rigid-multi
+        and amplitude noise at it.
+        :param geometry: tuple map geometry
+        :return: tuple(warp key, rm_result key, rng_scale key)
+        """
+        warp = {'warp': self.params['warp']}
+        rm = dict(warp, rm=self.params['rm'])
+        amp = dict(warp, amp=self.params['amp'])
+        return (
+            layer_key('warp', warp, geometry, self.owner),
+            layer_key('rm_result', rm, geometry, self.owner),
+            layer_key('rng_scale', amp, geometry, self.owner),
+        )
+
+    @cython.cdivision(True)
+    cdef bint fill_row_(
+            self,
+            grey_map_t h_map,
+            RowScratch *scratch,
+            int y,
+            float *dir_x,
+            float *dir_y,
+            float *dir_z,
+            LayerRows *layers) nogil:
+        """
+        Generates height of pixels in passed row of passed map, using
+        passed scratch buffers, which must be able to hold a row of
+        the map.
+        dir_x, dir_y and dir_z are the row's unit position vector
+        components from the map's DirectionTable, or NULL if position
+        vectors are to be computed.
+        layers are the row's noise layers, or NULL if noise layers are
+        not used. Cached layers are read rather than evaluated, and
+        others are filled once evaluated.
+        """
+        cdef int h_width = h_map.width
+        cdef int x, i, n
+        cdef int[2] int_xy_pos
+        cdef vec2 xy_pos
+        cdef vec3 pos_v
+        cdef float *pos_x_set = scratch.pos_x_set
+        cdef float *pos_y_set = scratch.pos_y_set
+        cdef float *pos_z_set = scratch.pos_z_set
+        cdef float *warp_x_set = scratch.warp_x_set
+        cdef float *warp_y_set = scratch.warp_y_set
+        cdef float *warp_z_set = scratch.warp_z_set
+        cdef float *rm_result_set = scratch.rm_result_set
+        cdef float *rng_scale_set = scratch.rng_scale_set
+
+        int_xy_pos[1] = y
+        xy_pos.y = y
+
+        # get position vectors of pixels in this row
+        n = h_width
+        if dir_x != NULL:
+            # row of direction table is copied into aligned sets
+            memcpy(pos_x_set, dir_x, sizeof(float) * h_width)
+            memcpy(pos_y_set, dir_y, sizeof(float) * h_width)
+            memcpy(pos_z_set, dir_z, sizeof(float) * h_width)
+        else:
             for x in range(h_width):
                 xy_pos.x = x
                 pos_v = vec3Normalize(h_map.vector_from_xy_(xy_pos))
                 pos_x_set[x] = pos_v.x
                 pos_y_set[x] = pos_v.y
                 pos_z_set[x] = pos_v.z
+        if n == 0:
+            return 1
+        scratch.pos_v_set.size = n
+        scratch.warp_v_set.size = n
 
+        if layers != NULL and layers.has_noise:
+            # only the combination of cached noise is needed
+            rm_result_set = layers.rm_result
+            rng_scale_set = layers.rng_scale
+        elif layers != NULL and layers.has_warp:
+            memcpy(warp_x_set, layers.warp_x, sizeof(float) * n)
+            memcpy(warp_y_set, layers.warp_y, sizeof(float) * n)
+            memcpy(warp_z_set, layers.warp_z, sizeof(float) * n)
+        else:
             # get vectors with which to warp sample positions
-            warp_gen.fill_warp(warp_x_set, warp_y_set, warp_z_set, pos_v_set)
+            self.warp_gen.fill_warp(
+                warp_x_set, warp_y_set, warp_z_set, scratch.pos_v_set)
 
             # add warp to unmodified position to create sample_pos
-            for x in range(h_width):
-                warp_x_set[x] += pos_x_set[x]
-                warp_y_set[x] += pos_y_set[x]
-                warp_z_set[x] = (warp_z_set[x] + pos_z_set[x]) * 0.75
+            for i in range(n):
+                warp_x_set[i] += pos_x_set[i]
+                warp_y_set[i] += pos_y_set[i]
+                warp_z_set[i] = (warp_z_set[i] + pos_z_set[i]) * 0.75
+
+            if layers != NULL:
+                memcpy(layers.warp_x, warp_x_set, sizeof(float) * n)
+                memcpy(layers.warp_y, warp_y_set, sizeof(float) * n)
+                memcpy(layers.warp_z, warp_z_set, sizeof(float) * n)
 
+        if layers == NULL or not layers.has_noise:
             # create mountain / hill noise map --------------------
 
             # populate rm results array
-            rm_noise.fill_simplex_fractal_set(rm_result_set, warp_v_set)
+            self.rm_noise.fill_simplex_fractal_set(
+                rm_result_set, scratch.warp_v_set)
 
             # scale hill value ------------------------------------
 
-            amp_noise.fill_simplex_fractal_set(rng_scale_set, warp_v_set)
+            self.amp_noise.fill_simplex_fractal_set(
+                rng_scale_set, scratch.warp_v_set)
 
-            # find base value -------------------------------------
+            if layers != NULL:
+                memcpy(layers.rm_result, rm_result_set, sizeof(float) * n)
+                memcpy(layers.rng_scale, rng_scale_set, sizeof(float) * n)
 
-            for x in range(h_width):
-                pos_v = vec3New(pos_x_set[x], pos_y_set[x], pos_z_set[x])
-                base_v = base_height_map.v_from_vector_(pos_v) / 300
+        # combine noise with base height ----------------------
 
-                # scale hill value ------------------------------------
+        for i in range(n):
+            pos_v = vec3New(pos_x_set[i], pos_y_set[i], pos_z_set[i])
+            int_xy_pos[0] = i
+            h_map.set_xy_(int_xy_pos, self.combine_(
+                pos_v, rm_result_set[i], rng_scale_set[i]))
+        return 1
 
-                rng_scaling = rng_scale_set[x] / 2 + 0.5
-                base_scaling = fabs(base_v / 1e4)
-                if base_scaling > 1:
-                    base_scaling = 1
-                scale_reduce = 1 - sqrt(base_scaling)
-                if scale_reduce > 0:
-                    rng_scaling = reduce(rng_scaling, scale_reduce)
-                scaling = rng_scaling / 2 + base_scaling / 2
+    @cython.cdivision(True)
+    cdef double combine_(self, vec3 pos_v, double rm, double rng) nogil:
+        """
+        Combines the rigid-multi and amplitude noise of the pixel at
+        passed unit position vector with the base height map.
+        :return: double height
+        """
+        cdef double base_v, rng_scaling, base_scaling, scale_reduce, scaling
+        cdef double rm_result, erosion_level, eroded_iq
 
-                # create pseudo-erosion -------------------------------
+        # find base value -------------------------------------
 
-                rm_result = -rm_result_set[x] / 2 + 0.5
-                erosion_level = scaling / 2
-                eroded_iq = erode(rm_result, erosion_level)
+        base_v = self.base_height_map.v_from_vector_(pos_v) / \
+            TEC_UNITS_PER_M
 
-                # create final height ---------------------------------
+        # scale hill value ------------------------------------
 
-                h = eroded_iq * scaling * iq_scale + base_v - \
-                    scaling / 2 / iq_scale
+        rng_scaling = rng / 2 + 0.5
+        base_scaling = fabs(base_v / 1e4)
+        if base_scaling > 1:
+            base_scaling = 1
+        scale_reduce = 1 - sqrt(base_scaling)
+        if scale_reduce > 0:
+            rng_scaling = reduce(rng_scaling, scale_reduce)
+        scaling = rng_scaling / 2 + base_scaling / 2
 
-                # store final result
-                int_xy_pos[0] = x
-                h_map.set_xy_(int_xy_pos, h)
+        # create pseudo-erosion -------------------------------
+
+        rm_result = -rm / 2 + 0.5
+        erosion_level = scaling / 2
+        eroded_iq = erode(rm_result, erosion_level)
+
+        # create final height ---------------------------------
+
+        return eroded_iq * scaling * IQ_SCALE + base_v - \
+            scaling / 2 / IQ_SCALE
 
-        free(int_xy_pos)
-        free(pos_v_set)
-        free(pos_x_set)
-        free(pos_y_set)
-        free(pos_z_set)
-        free(warp_v_set)
-        free(warp_x_set)
-        free(warp_y_set)
-        free(warp_z_set)
-        free(rm_result_set)
-        free(rng_scale_set)
+
+cdef class NoiseLayers:
+    """
+    Noise layers of a map's height detail, loaded from a
+    NoiseLayerCache where cached. Layers that were not cached are
+    filled by build_h0_map, and then stored.
+    """
+    cdef object cache
+    cdef tuple keys  # warp, rm_result and rng_scale layer keys
+    cdef object warp_arr, rm_result_arr, rng_scale_arr
+    cdef float[:, :, ::1] warp  # warped sample positions; (3, h, w)
+    cdef float[:, ::1] rm_result
+    cdef float[:, ::1] rng_scale
+    cdef bint has_warp, has_noise
+
+    def __init__(self, h_map, HeightDetailGenerator generator, cache):
+        """
+        :param h_map: map whose height detail is generated.
+        :param generator: HeightDetailGenerator
+        :param cache: NoiseLayerCache
+        """
+        shape = h_map.height, h_map.width
+        self.cache = cache
+        self.keys = generator.layer_keys(h_map.geometry)
+        warp_key, rm_key, rng_key = self.keys
+        self.warp_arr = self._load(warp_key, (3,) + shape)
+        self.rm_result_arr = self._load(rm_key, shape)
+        self.rng_scale_arr = self._load(rng_key, shape)
+        self.has_warp = self.warp_arr is not None
+        self.has_noise = self.rm_result_arr is not None and \
+            self.rng_scale_arr is not None
+        if self.has_noise:
+            # warp is not needed, and may be left uncached
+            self.has_warp = True
+            self.warp_arr = np.empty((3, 0, 0), np.float32)
+        else:
+            if not self.has_warp:
+                self.warp_arr = np.empty((3,) + shape, np.float32)
+            self.rm_result_arr = np.empty(shape, np.float32)
+            self.rng_scale_arr = np.empty(shape, np.float32)
+        self.warp = self.warp_arr
+        self.rm_result = self.rm_result_arr
+        self.rng_scale = self.rng_scale_arr
+
+    def _load(self, key, shape):
+        arr = self.cache.get(key)
+        if arr is None or arr.shape != shape or arr.dtype != np.float32 \
+                or not arr.flags.c_contiguous or not arr.flags.writeable:
+            return None
+        return arr
+
+    cdef LayerRows row(self, int y) nogil:
+        """
+        Gets pointers to passed row of each layer.
+        """
+        cdef LayerRows rows
+        rows.has_warp = self.has_warp
+        rows.has_noise = self.has_noise
+        rows.rm_result = &self.rm_result[y, 0]
+        rows.rng_scale = &self.rng_scale[y, 0]
+        if self.has_noise:
+            rows.warp_x = rows.warp_y = rows.warp_z = NULL
+        else:
+            rows.warp_x = &self.warp[0, y, 0]
+            rows.warp_y = &self.warp[1, y, 0]
+            rows.warp_z = &self.warp[2, y, 0]
+        return rows
+
+    def store(self):
+        """
+        Stores layers that were not loaded from the cache.
+        """
+        warp_key, rm_key, rng_key = self.keys
+        if not self.has_warp:
+            self.cache.put(warp_key, self.warp_arr)
+        if not self.has_noise:
+            self.cache.put(rm_key, self.rm_result_arr)
+            self.cache.put(rng_key, self.rng_scale_arr)
+        self.has_warp = True
+        self.has_noise = True
+
+
+cdef class RefinementLayers:
+    """
+    Noise layers of a tile's height detail, from which the height
+    detail of its sub-tiles is refined; see refine_height_detail.
+    """
+    cdef readonly object warp  # warped sample positions; (3, h, w)
+    cdef readonly object rng_scale  # amplitude noise
+    cdef readonly object rm_coarse  # sum of rm octaves resolved by tile
+    # greatest distance between warped sample positions of adjacent
+    # pixels, and the number of leading rm octaves that it resolves.
+    cdef readonly double warp_spacing
+    cdef readonly int n_coarse
+
+    def __init__(self, int width, int height):
+        self.warp = np.empty((3, height, width), np.float32)
+        self.rng_scale = np.empty((height, width), np.float32)
+        self.rm_coarse = np.empty((height, width), np.float32)
+        self.warp_spacing = 0
+        self.n_coarse = 0
+
+    @property
+    def nbytes(self):
+        return self.warp.nbytes + self.rng_scale.nbytes + \
+            self.rm_coarse.nbytes
+
+
+cdef class DetailRefiner:
+    """
+    Generates the height detail of a tile and its RefinementLayers,
+    from those of its parent tile if passed, or otherwise in full.
+    Rows are generated in two passes; the first fills the warp,
+    amplitude and rm_coarse layers, from which the rigid-multi octaves
+    resolved by the tile are found, and the second evaluates the
+    remaining octaves and combines the layers into heights. Where the
+    parent resolves all noise, heights are interpolated instead.
+    """
+    cdef HeightDetailGenerator generator
+    cdef GreyTileMap h_map, parent_map
+    cdef RefinementLayers layers
+    cdef float[:, ::1] warp_x, warp_y, warp_z, rng_scale, rm_coarse
+    cdef float[:, ::1] parent_warp_x, parent_warp_y, parent_warp_z
+    cdef float[:, ::1] parent_rng_scale, parent_rm_coarse
+    cdef bint has_parent
+    cdef bint interp_warp  # whether warp is interpolated from parent's
+    cdef bint interp_amp  # whether amplitude noise is interpolated
+    cdef bint interp_height  # whether heights are interpolated
+    cdef int width, height, x_offset, y_offset
+    cdef int n_parent  # rm octaves interpolated from parent's rm_coarse
+    cdef int n_coarse  # rm octaves summed into tile's rm_coarse
+
+    def __init__(self, HeightDetailGenerator generator, GreyTileMap h_map,
+                 GreyTileMap parent_map=None,
+                 RefinementLayers parent_layers=None):
+        self.generator = generator
+        self.h_map = h_map
+        self.width = h_map.width
+        self.height = h_map.height
+        self.layers = RefinementLayers(self.width, self.height)
+        self.warp_x, self.warp_y, self.warp_z = self.layers.warp
+        self.rng_scale = self.layers.rng_scale
+        self.rm_coarse = self.layers.rm_coarse
+        self.has_parent = parent_map is not None
+        self.interp_warp = self.interp_amp = self.interp_height = False
+        self.x_offset = self.y_offset = 0
+        self.n_parent = self.n_coarse = 0
+        if self.has_parent:
+            self._set_parent(parent_map, parent_layers)
+
+    cdef bint _set_parent(
+            self,
+            GreyTileMap parent_map,
+            RefinementLayers parent_layers) except False:
+        cdef int width = self.width, height = self.height
+        parent_p1, parent_p2 = parent_map.geometry[4:6], parent_map.geometry[6:8]
+        p1, p2 = self.h_map.geometry[4:6], self.h_map.geometry[6:8]
+        half_width = (parent_p2[0] - parent_p1[0]) / 2
+        half_height = (parent_p2[1] - parent_p1[1]) / 2
+        if parent_map.width != width or parent_map.height != height or \
+                width % 2 or height % 2:
+            raise ValueError(
+                'Expected tile and parent of equal, even width and height')
+        if parent_map.cube_face != self.h_map.cube_face or \
+                not abs((p2[0] - p1[0]) - half_width) < 1e-9 or \
+                not abs((p2[1] - p1[1]) - half_height) < 1e-9:
+            raise ValueError('Expected tile to be a quarter of parent tile')
+        if parent_layers is None or \
+                parent_layers.rng_scale.shape != (height, width):
+            raise ValueError('Expected refinement layers of parent tile')
+        self.x_offset = int(round((p1[0] - parent_p1[0]) / half_width)) * \
+            width // 2
+        self.y_offset = int(round((p1[1] - parent_p1[1]) / half_height)) * \
+            height // 2
+        self.parent_map = parent_map
+        self.parent_warp_x, self.parent_warp_y, self.parent_warp_z = \
+            parent_layers.warp
+        self.parent_rng_scale = parent_layers.rng_scale
+        self.parent_rm_coarse = parent_layers.rm_coarse
+
+        params = self.generator.params
+        amp = params['amp']
+        self.interp_warp = warp_resolved(
+            max(half_width, half_height) * 2 / width, params)
+        self.interp_amp = resolved_octaves(
+            parent_layers.warp_spacing, amp['frq'], amp['octaves'],
+            amp['lacunarity']) == amp['octaves']
+        self.n_parent = parent_layers.n_coarse
+        self.interp_height = self.interp_warp and self.interp_amp and \
+            self.n_parent == RM_OCTAVES
+        return 1
+
+    cdef RefinementLayers run(self, int threads):
+        """
+        Generates the tile's height detail and layers, using passed
+        number of threads.
+        :return: RefinementLayers
+        """
+        cdef int y, thread_id
+        cdef ScratchArena arena = acquire_arena(threads, self.width)
+        rm = self.generator.params['rm']
+
+        IF DEBUG:
+            print('refining tile; interpolating warp: {}, amplitude: {}, '
+                  '{} rm octaves'.format(
+                      self.interp_warp, self.interp_amp, self.n_parent))
+
+        try:
+            with nogil, parallel(num_threads=threads):
+                thread_id = threadid()
+                for y in prange(self.height, schedule='runtime'):
+                    self.layers_row_(&arena.rows[thread_id], y)
+            self.layers.warp_spacing = max_warp_spacing(self.layers.warp)
+            self.n_coarse = max(self.n_parent, resolved_octaves(
+                self.layers.warp_spacing, rm['frq'], rm['octaves'],
+                rm['lacunarity']))
+            self.layers.n_coarse = self.n_coarse
+            with nogil, parallel(num_threads=threads):
+                thread_id = threadid()
+                for y in prange(self.height, schedule='runtime'):
+                    self.heights_row_(&arena.rows[thread_id], y)
+        finally:
+            release_arena(arena)
+        return self.layers
+
+    cdef inline int kind_(self, int x, int y) nogil:
+        """
+        Gets kind of tile pixel at passed position; one of
+        PIXEL_COINCIDENT, PIXEL_INTERPOLATED or PIXEL_EVALUATED.
+        """
+        if not self.has_parent or x == self.width - 1 or \
+                y == self.height - 1:
+            return PIXEL_EVALUATED
+        if x % 2 == 0 and y % 2 == 0:
+            return PIXEL_COINCIDENT
+        return PIXEL_INTERPOLATED
+
+    cdef inline float interp_height_(self, int x, int y) nogil:
+        """
+        Gets height of the tile pixel at x, y, which lies between
+        parent pixels, interpolated from the parent pixels around it.
+        """
+        cdef Py_ssize_t i = <Py_ssize_t> (self.y_offset + y // 2) * \
+            self.width + self.x_offset + x // 2
+        cdef Py_ssize_t w = self.width
+        if y % 2 == 0:  # between left and right
+            return (self.parent_map.load_(i) +
+                    self.parent_map.load_(i + 1)) / 2
+        elif x % 2 == 0:  # between upper and lower
+            return (self.parent_map.load_(i) +
+                    self.parent_map.load_(i + w)) / 2
+        return (self.parent_map.load_(i) + self.parent_map.load_(i + 1) +
+                self.parent_map.load_(i + w) +
+                self.parent_map.load_(i + w + 1)) / 4
+
+    cdef inline float interp_(self, float[:, ::1] arr, int x, int y) nogil:
+        """
+        Gets value of passed parent layer at the position of the tile
+        pixel at x, y, which lies between parent pixels, interpolated
+        from the parent pixels around it.
+        """
+        cdef int px = self.x_offset + x // 2, py = self.y_offset + y // 2
+        if y % 2 == 0:  # between left and right
+            return (arr[py, px] + arr[py, px + 1]) / 2
+        elif x % 2 == 0:  # between upper and lower
+            return (arr[py, px] + arr[py + 1, px]) / 2
+        return (arr[py, px] + arr[py, px + 1] +
+                arr[py + 1, px] + arr[py + 1, px + 1]) / 4
+
+    cdef void layers_row_(self, RowScratch *scratch, int y) nogil:
+        """
+        Fills the warp, amplitude and rm_coarse layers of passed row,
+        rm_coarse holding only the octaves interpolated from the
+        parent, and copies the heights of pixels coinciding with
+        parent pixels.
+        """
+        cdef int x, i, n, kind
+        cdef int px, py = self.y_offset + y // 2
+        cdef vec2 xy_pos
+        cdef vec3 pos_v
+
+        # warp; evaluated where it is neither copied nor interpolated
+        xy_pos.y = y
+        n = 0
+        for x in range(self.width):
+            kind = self.kind_(x, y)
+            if kind == PIXEL_COINCIDENT:
+                px = self.x_offset + x // 2
+                self.warp_x[y, x] = self.parent_warp_x[py, px]
+                self.warp_y[y, x] = self.parent_warp_y[py, px]
+                self.warp_z[y, x] = self.parent_warp_z[py, px]
+            elif kind == PIXEL_INTERPOLATED and self.interp_warp:
+                self.warp_x[y, x] = self.interp_(self.parent_warp_x, x, y)
+                self.warp_y[y, x] = self.interp_(self.parent_warp_y, x, y)
+                self.warp_z[y, x] = self.interp_(self.parent_warp_z, x, y)
+            else:
+                xy_pos.x = x
+                pos_v = vec3Normalize(self.h_map.vector_from_xy_(xy_pos))
+                scratch.x_set[n] = x
+                scratch.pos_x_set[n] = pos_v.x
+                scratch.pos_y_set[n] = pos_v.y
+                scratch.pos_z_set[n] = pos_v.z
+                n += 1
+        if n > 0:
+            scratch.pos_v_set.size = n
+            self.generator.warp_gen.fill_warp(
+                scratch.warp_x_set, scratch.warp_y_set, scratch.warp_z_set,
+                scratch.pos_v_set)
+            for i in range(n):
+                x = scratch.x_set[i]
+                self.warp_x[y, x] = scratch.warp_x_set[i] + scratch.pos_x_set[i]
+                self.warp_y[y, x] = scratch.warp_y_set[i] + scratch.pos_y_set[i]
+                self.warp_z[y, x] = \
+                    (scratch.warp_z_set[i] + scratch.pos_z_set[i]) * 0.75
+
+        # amplitude noise and rm octaves resolved by parent
+        n = 0
+        for x in range(self.width):
+            kind = self.kind_(x, y)
+            if kind == PIXEL_COINCIDENT:
+                px = self.x_offset + x // 2
+                self.rng_scale[y, x] = self.parent_rng_scale[py, px]
+                self.rm_coarse[y, x] = self.parent_rm_coarse[py, px]
+                self.h_map.store_(
+                    <Py_ssize_t> y * self.width + x,
+                    self.parent_map.load_(<Py_ssize_t> py * self.width + px))
+                continue
+            if kind == PIXEL_INTERPOLATED:
+                self.rm_coarse[y, x] = self.interp_(
+                    self.parent_rm_coarse, x, y)
+                if self.interp_amp:
+                    self.rng_scale[y, x] = self.interp_(
+                        self.parent_rng_scale, x, y)
+                    continue
+            else:
+                self.rm_coarse[y, x] = 0
+            scratch.x_set[n] = x
+            scratch.warp_x_set[n] = self.warp_x[y, x]
+            scratch.warp_y_set[n] = self.warp_y[y, x]
+            scratch.warp_z_set[n] = self.warp_z[y, x]
+            n += 1
+        if n > 0:
+            scratch.warp_v_set.size = n
+            self.generator.amp_noise.fill_simplex_fractal_set(
+                scratch.rng_scale_set, scratch.warp_v_set)
+            for i in range(n):
+                self.rng_scale[y, scratch.x_set[i]] = scratch.rng_scale_set[i]
+
+    cdef void heights_row_(self, RowScratch *scratch, int y) nogil:
+        """
+        Evaluates the rm octaves of passed row that are not
+        interpolated from the parent, adding those resolved by the
+        tile to its rm_coarse layer, and combines the layers into the
+        heights of pixels not coinciding with parent pixels.
+        """
+        cdef int x, i, n, kind, octave
+        cdef float v
+        cdef float *fine = scratch.rm_result_set  # octaves past n_coarse
+        cdef vec2 xy_pos
+        cdef vec3 pos_v
+
+        for x in range(self.width):
+            fine[x] = 0
+        for octave in range(RM_OCTAVES):
+            n = 0
+            for x in range(self.width):
+                kind = self.kind_(x, y)
+                if kind != PIXEL_EVALUATED and octave < self.n_parent:
+                    continue  # interpolated from parent
+                if kind == PIXEL_COINCIDENT and octave >= self.n_coarse:
+                    continue  # only held by height copied from parent
+                scratch.x_set[n] = x
+                scratch.warp_x_set[n] = self.warp_x[y, x]
+                scratch.warp_y_set[n] = self.warp_y[y, x]
+                scratch.warp_z_set[n] = self.warp_z[y, x]
+                n += 1
+            if n == 0:
+                continue
+            scratch.warp_v_set.size = n
+            self.generator.rm_octaves[octave].FillSimplexFractalSet(
+                scratch.rng_scale_set, scratch.warp_v_set)
+            for i in range(n):
+                x = scratch.x_set[i]
+                v = self.generator.rm_weights[octave] * \
+                    scratch.rng_scale_set[i]
+                if octave < self.n_coarse:
+                    self.rm_coarse[y, x] += v
+                else:
+                    fine[x] += v
+
+        xy_pos.y = y
+        for x in range(self.width):
+            kind = self.kind_(x, y)
+            if kind == PIXEL_COINCIDENT:
+                continue
+            if kind == PIXEL_INTERPOLATED and self.interp_height:
+                self.h_map.store_(<Py_ssize_t> y * self.width + x,
+                                  self.interp_height_(x, y))
+                continue
+            xy_pos.x = x
+            pos_v = vec3Normalize(self.h_map.vector_from_xy_(xy_pos))
+            self.h_map.store_(
+                <Py_ssize_t> y * self.width + x,
+                self.generator.combine_(
+                    pos_v, self.rm_coarse[y, x] + fine[x],
+                    self.rng_scale[y, x]))
+
+
+cdef bint build_h0_map(
+        grey_map_t              h_map,
+        HeightDetailGenerator   generator,
+        int                     threads,
+        NoiseLayers             layers=None
+        ) except False:
+    """
+    Creates the first layer of the height map, using passed number
+    of threads.
+    If noise layers are passed, noise that they hold is read from
+    them rather than evaluated, and they are filled with the noise
+    that is evaluated.
+    Position vectors of cube maps are read from their geometry's
+    shared DirectionTable.
+    Memory-mapped maps are generated a band of rows at a time, each
+    band being written out and released before the next is started,
+    so that maps larger than memory may be generated. They do not use
+    direction tables, which would be larger still.
+    """
+    cdef int y, y0, y1, band_rows, thread_id
+    cdef Py_ssize_t offset
+    cdef DirectionTable table = None
+    cdef float *dir_x = NULL
+    cdef float *dir_y = NULL
+    cdef float *dir_z = NULL
+    cdef LayerRows rows
+    cdef LayerRows *rows_ptr
+    cdef bint use_layers = layers is not None
+    cdef ScratchArena arena
+
+    arena = acquire_arena(threads, h_map.width)
+    if grey_map_t is GreyCubeMap:
+        if h_map.backing_path is None:
+            table = direction_table_(h_map)
+            dir_x, dir_y, dir_z = table.x, table.y, table.z
+
+    IF DEBUG:
+        t0 = time()
+        print('generating h0 map')
+
+    band_rows = h_map.band_rows()
+    try:
+        for y0 in range(0, h_map.height, band_rows):
+            y1 = min(y0 + band_rows, h_map.height)
+            with nogil, parallel(num_threads=threads):
+                thread_id = threadid()
+                for y in prange(y0, y1, schedule='runtime'):
+                    if use_layers:
+                        rows = layers.row(y)
+                        rows_ptr = &rows
+                    else:
+                        rows_ptr = NULL
+                    if dir_x != NULL:
+                        offset = <Py_ssize_t> y * h_map.width
+                        generator.fill_row_(
+                            h_map, &arena.rows[thread_id], y,
+                            dir_x + offset, dir_y + offset, dir_z + offset,
+                            rows_ptr)
+                    else:
+                        generator.fill_row_(
+                            h_map, &arena.rows[thread_id], y,
+                            NULL, NULL, NULL, rows_ptr)
+            h_map.release_rows(y0, y1)
+    finally:
+        release_arena(arena)
 
     IF DEBUG:
         tf = time()
@@ -282,13 +1305,47 @@ cdef bint build_h0_map(
 cpdef bint make_tectonic_cube(
         GreyCubeMap tec_map,
         GreyLatLonMap raw_tec_map,
-        object zone) except False:
+        object zone,
+        object context=None,
+        bint simd=True) except False:
     """
     Creates tectonic cube map from raw tectonic lat-lon map.
     Warp is applied to introduce curvature of ridges in resulting map.
+    :param context: ExecutionContext used by parallel loops.
+    :param simd: bint; whether warp noise should be generated a row
+                at a time by FastNoiseSIMD, rather than a pixel at a
+                time by FastNoise. The two libraries produce different
+                (though statistically equivalent) noise.
+    """
+    cdef int threads = begin_parallel(context)
+
+    IF DEBUG:
+        t0 = time()
+        print('generating tectonic map from raw')
+
+    if simd:
+        build_tectonic_cube_simd(tec_map, raw_tec_map, zone.seed, threads)
+    else:
+        build_tectonic_cube(tec_map, raw_tec_map, zone.seed, threads)
+
+    IF DEBUG:
+        tf = time()
+        print('Tectonic CubeMap generation time: {}'.format(tf - t0))
+    return 1
+
+
+cdef bint build_tectonic_cube(
+        GreyCubeMap tec_map,
+        GreyLatLonMap raw_tec_map,
+        int seed,
+        int threads) except False:
+    """
+    Fills tectonic cube map, generating the warp of each pixel
+    individually.
     """
     cdef:
-        WarpGenerator warp_gen = WarpGenerator(zone.seed, 0.5, 2)
+        WarpGenerator warp_gen = WarpGenerator(
+            seed, TEC_WARP_FRQ, TEC_WARP_OCTAVES)
         int t_width     = tec_map.width
         int t_height    = tec_map.height
 
@@ -298,15 +1355,11 @@ cpdef bint make_tectonic_cube(
         vec3 pos_v, warped_v, warp
         float h
 
-    IF DEBUG:
-        t0 = time()
-        print('generating tectonic map from raw')
-
-    with nogil, parallel(num_threads=THREADS):
+    with nogil, parallel(num_threads=threads):
         xy_pos = vec2Zero()
         int_xy_pos = <int *>malloc(sizeof(int) * 2)
 
-        for y in prange(t_height):
+        for y in prange(t_height, schedule='runtime'):
             int_xy_pos[1] = y
             xy_pos.y = y
             for x in range(t_width):
@@ -314,15 +1367,96 @@ cpdef bint make_tectonic_cube(
                 xy_pos.x = x
 
                 pos_v = tec_map.vector_from_xy_(xy_pos)
-                warp = vec3Multiply(warp_gen.get_warp(pos_v), 0.2)
+                warp = vec3Multiply(warp_gen.get_warp(pos_v), TEC_WARP_AMP)
                 warped_v = vec3Add(pos_v, warp)
                 h = raw_tec_map.v_from_vector_(warped_v)
                 tec_map.set_xy_(int_xy_pos, h)
         free(int_xy_pos)
+    return 1
 
-    IF DEBUG:
-        tf = time()
-        print('Tectonic CubeMap generation time: {}'.format(tf - t0))
+
+@cython.cdivision(True)
+cdef bint build_tectonic_cube_simd(
+        GreyCubeMap tec_map,
+        GreyLatLonMap raw_tec_map,
+        int seed,
+        int threads) except False:
+    """
+    Fills tectonic cube map, generating the warp of each row of pixels
+    at once, before sampling the raw map at each warped position.
+    Positions are derived from the map's shared DirectionTable.
+    """
+    cdef:
+        WarpGenSIMD warp_gen = WarpGenSIMD(
+            seed, TEC_WARP_FRQ, TEC_WARP_OCTAVES)
+        DirectionTable table = direction_table_(tec_map)
+        int t_width     = tec_map.width
+        int t_height    = tec_map.height
+
+        int x, y
+        Py_ssize_t i
+        int *int_xy_pos
+        float dx, dy, dz, face_dist
+        vec3 warped_v
+        float h
+        FastNoiseVectorSet *pos_v_set
+        float *pos_x_set  # arrays of row positions
+        float *pos_y_set
+        float *pos_z_set
+        float *warp_x_set  # arrays of row warp values
+        float *warp_y_set
+        float *warp_z_set
+
+    with nogil, parallel(num_threads=threads):
+        # assigned here so that each thread has its own buffers.
+        int_xy_pos = <int *>malloc(sizeof(int) * 2)
+        pos_v_set = <FastNoiseVectorSet *>malloc(sizeof(FastNoiseVectorSet))
+        pos_x_set = new_noise_set(t_width)
+        pos_y_set = new_noise_set(t_width)
+        pos_z_set = new_noise_set(t_width)
+        warp_x_set = new_noise_set(t_width)
+        warp_y_set = new_noise_set(t_width)
+        warp_z_set = new_noise_set(t_width)
+
+        pos_v_set.size = t_width
+        pos_v_set.xSet = pos_x_set
+        pos_v_set.ySet = pos_y_set
+        pos_v_set.zSet = pos_z_set
+
+        for y in prange(t_height, schedule='runtime'):
+            int_xy_pos[1] = y
+
+            # get position vectors in this row. Warp is sampled at
+            # positions on the cube's surface, rather than the unit
+            # sphere, so direction vectors are scaled to the cube.
+            for x in range(t_width):
+                i = <Py_ssize_t> y * t_width + x
+                dx, dy, dz = table.x[i], table.y[i], table.z[i]
+                face_dist = max(fabs(dx), fabs(dy), fabs(dz))
+                pos_x_set[x] = dx / face_dist
+                pos_y_set[x] = dy / face_dist
+                pos_z_set[x] = dz / face_dist
+
+            warp_gen.fill_warp(warp_x_set, warp_y_set, warp_z_set, pos_v_set)
+
+            # sample raw map at warped positions
+            for x in range(t_width):
+                int_xy_pos[0] = x
+                warped_v = vec3New(
+                    pos_x_set[x] + warp_x_set[x] * TEC_WARP_AMP,
+                    pos_y_set[x] + warp_y_set[x] * TEC_WARP_AMP,
+                    pos_z_set[x] + warp_z_set[x] * TEC_WARP_AMP)
+                h = raw_tec_map.v_from_vector_(warped_v)
+                tec_map.set_xy_(int_xy_pos, h)
+
+        free(int_xy_pos)
+        free(pos_v_set)
+        free(pos_x_set)
+        free(pos_y_set)
+        free(pos_z_set)
+        free(warp_x_set)
+        free(warp_y_set)
+        free(warp_z_set)
     return 1
 
 
@@ -0,0 +1,195 @@
+"""
+Caching of intermediate noise layers of map generation.
+
+Generating a map's height detail evaluates several layers of noise
+(the warped sample position of each pixel, and the rigid-multi and
+amplitude noise at those positions) before combining them with the
+base height map. The noise depends only on the parameters of its
+generators and on the map's geometry, so it may be re-used when only
+the combination step changes, such as when tuning its constants.
+
+A NoiseLayerCache holds layers in a memory-bounded LRU cache, and if
+given a directory, also stores them there as .npy files, so that
+they are re-used by later runs. A directory may be shared by the
+caches of several spheroids; a stored layer is only replaced by a
+layer of the same name, spheroid and map geometry.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+# LAYER_CACHE_VERSION should be incremented whenever a change to the
+# code that generates a noise layer would invalidate cached layers.
+# Changes to the combination of layers do not require it.
+LAYER_CACHE_VERSION = 1
+LAYER_CACHE_BYTES = 512 * 2 ** 20  # default max bytes of layers in memory
+LAYER_SUFFIX = '.npy'
+
+
+def layer_key(layer, params, geometry, owner=None):
+    """
+    Gets key identifying a noise layer.
+    :param layer: str layer name.
+    :param params: json-serializable parameters of the generators
+                whose output the layer holds, including those of
+                any layers it was generated from.
+    :param geometry: tuple geometry of the map the layer is made for.
+    :param owner: json-serializable identity of the spheroid the
+                layer is made for, such as its seed and radius.
+    :return: tuple(layer name, str hash of the layer's owner and
+                geometry, str hash of layer's content)
+    """
+    scope = json.dumps({
+        'owner': owner,
+        'geometry': list(geometry),
+    }, sort_keys=True)
+    content = json.dumps({
+        'version': LAYER_CACHE_VERSION,
+        'layer': layer,
+        'params': params,
+        'scope': scope,
+    }, sort_keys=True)
+    return layer, _hash(scope), _hash(content)
+
+
+def _hash(s):
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()[:32]
+
+
+class NoiseLayerCache:
+    """
+    Memory and, optionally, disk cache of noise layers.
+    """
+
+    def __init__(self, dir_path=None, max_bytes=LAYER_CACHE_BYTES):
+        """
+        :param dir_path: str directory in which layers are stored, or
+                    None if layers are only to be held in memory.
+        :param max_bytes: int max number of bytes of layers held in
+                    memory. The most recently stored layer is kept
+                    even if it alone exceeds this.
+        """
+        self.dir_path = dir_path
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._layers = OrderedDict()  # key: ndarray, least recent first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._layers:
+                return True
+        return self.dir_path is not None and os.path.exists(self.path(key))
+
+    def path(self, key):
+        """
+        Gets path at which layer with passed key is stored.
+        :param key: tuple returned by layer_key
+        :return: str
+        """
+        return os.path.join(
+            self.dir_path, '{}-{}-{}{}'.format(*key, LAYER_SUFFIX))
+
+    def get(self, key):
+        """
+        Gets cached layer.
+        :param key: tuple returned by layer_key
+        :return: ndarray, or None if layer is not cached.
+        """
+        logger = logging.getLogger(__name__)
+        with self._lock:
+            arr = self._layers.get(key)
+            if arr is not None:
+                self._layers.move_to_end(key)
+                return arr
+        if self.dir_path is None or not os.path.exists(self.path(key)):
+            return None
+        try:
+            arr = np.load(self.path(key), allow_pickle=False)
+        except (OSError, ValueError) as e:
+            logger.warning('Could not load cached %s layer: %s', key[0], e)
+            return None
+        self._hold(key, arr)
+        return arr
+
+    def put(self, key, arr):
+        """
+        Stores layer. Stored layers of the same name, owner and
+        geometry with other keys are stale, and are removed from the
+        cache's directory.
+        :param key: tuple returned by layer_key
+        :param arr: ndarray
+        :return: None
+        """
+        self._hold(key, arr)
+        if self.dir_path is None:
+            return
+        os.makedirs(self.dir_path, exist_ok=True)
+        path = self.path(key)
+        self.clear(key[0], keep=path, scope=key[1])
+        # write to a temporary file first so that an interrupted
+        # write does not leave a broken file at the cached path.
+        tmp_path = os.path.join(
+            self.dir_path, '.tmp-' + os.path.basename(path))
+        with open(tmp_path, 'wb') as f:
+            np.save(f, arr, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+    def clear(self, layer=None, keep=None, scope=None):
+        """
+        Removes layers stored in the cache's directory.
+        Layers held in memory are kept.
+        :param layer: str name of layer to remove. If None, all
+                    layers are removed.
+        :param keep: str path of a stored layer not to remove.
+        :param scope: str hash of the owner and geometry of the
+                    layers to remove, from layer_key. If None, layers
+                    of any owner and geometry are removed. Only used
+                    along with layer.
+        :return: None
+        """
+        prefix = None
+        if layer is not None:
+            prefix = layer + '-'
+            if scope is not None:
+                prefix += scope + '-'
+        if self.dir_path is None or not os.path.exists(self.dir_path):
+            return
+        for name in os.listdir(self.dir_path):
+            path = os.path.join(self.dir_path, name)
+            if name.startswith('.tmp-'):
+                name = name[len('.tmp-'):]
+            if prefix is not None and not name.startswith(prefix):
+                continue
+            if keep is not None and \
+                    os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by a concurrent call
+
+    def _hold(self, key, arr):
+        """
+        Adds layer to the memory cache, evicting least recently used
+        layers until it holds no more than max_bytes.
+        """
+        with self._lock:
+            previous = self._layers.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._layers[key] = arr
+            self.nbytes += arr.nbytes
+            while self.nbytes > self.max_bytes and len(self._layers) > 1:
+                _, evicted = self._layers.popitem(last=False)
+                self.nbytes -= evicted.nbytes
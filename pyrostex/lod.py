@@ -0,0 +1,353 @@
+"""
+Level of detail management of spheroid tiles.
+
+Each face of a spheroid's cube is divided into a quadtree of tiles.
+A tile is addressed by (face, level, x, y): level 0 is a single tile
+covering the whole face, and each level divides the tiles of the
+level above into four, so that level n is a grid of 2^n x 2^n tiles,
+x increasing with the face's a axis, and y with its b axis.
+
+A TileManager generates tiles lazily, the first time they are
+requested, and keeps them in a memory-bounded LRU cache. Tiles evicted
+from the cache may be spilled to the spheroid's tile cache directory,
+from which they are re-loaded rather than re-generated. Spilled tiles
+are stored together in a single tile pyramid file (see
+TilePyramidFile), indexed by tile address, and named by a key of
+everything that affects the tiles' height maps (see Spheroid.tile_key),
+so that tiles spilled with other settings are not re-loaded. If refinement
+is enabled, each tile is generated from its parent's height data (see
+refine_height_detail), its ancestors being generated first if needed.
+All tiles of a TileManager share a single HeightDetailGenerator.
+"""
+
+import logging
+import os
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .chunked import PYRAMID_SUFFIX, TilePyramidFile
+from .height import HeightDetailGenerator
+from .procede import Tile, TILE_SIZE
+
+TILE_CACHE_BYTES = 256 * 2 ** 20  # default max bytes of cached tiles
+TILE_PYRAMID_PREFIX = 'tiles-'
+
+
+def tile_bounds(level, x, y):
+    """
+    Gets area of cube face covered by passed tile.
+    :param level: int
+    :param x: int
+    :param y: int
+    :return: tuple(p1, p2) of lower left and upper right corners.
+    """
+    n = 2 ** level
+    if not (0 <= x < n and 0 <= y < n):
+        raise ValueError(
+            'Tile {} outside of level {}'.format((x, y), level))
+    size = 2 / n
+    p1 = (-1 + x * size, -1 + y * size)
+    return p1, (p1[0] + size, p1[1] + size)
+
+
+def face_vector(face, a, b):
+    """
+    Gets the vector of the point at (a, b) on the plane of passed
+    cube face, following the orientation of TileMap.vector_from_xy.
+    a and b may lie outside the face's range of -1 to 1.
+    :param face: int cube face index
+    :param a: float
+    :param b: float
+    :return: tuple(x, y, z)
+    """
+    if face == 0:
+        return 1., a, b
+    elif face == 1:
+        return a, -1., b
+    elif face == 2:
+        return -1., -a, b
+    elif face == 3:
+        return -a, 1., b
+    elif face == 4:
+        return a, b, 1.
+    elif face == 5:
+        return -a, b, -1.
+    raise ValueError('Invalid face index: {}'.format(face))
+
+
+def face_position(vector):
+    """
+    Gets the cube face on which passed vector lies, and its position
+    on that face; the inverse of face_vector.
+    :param vector: tuple(x, y, z)
+    :return: tuple(face, a, b)
+    """
+    x, y, z = vector
+    ax, ay, az = abs(x), abs(y), abs(z)
+    if ax >= ay and ax >= az:
+        return (0, y / x, z / x) if x > 0 else (2, y / x, z / -x)
+    elif ay >= az:
+        return (3, x / -y, z / y) if y > 0 else (1, x / -y, z / -y)
+    return (4, x / z, y / z) if z > 0 else (5, x / z, y / -z)
+
+
+def tile_at(face, level, a, b):
+    """
+    Gets key of the tile of passed level containing position (a, b)
+    of passed cube face.
+    :return: tuple(face, level, x, y)
+    """
+    n = 2 ** level
+    x = min(max(int((a + 1) / 2 * n), 0), n - 1)
+    y = min(max(int((b + 1) / 2 * n), 0), n - 1)
+    return face, level, x, y
+
+
+def neighbours(face, level, x, y):
+    """
+    Gets keys of the tiles surrounding passed tile, including those
+    across the edges of its cube face.
+    :return: list of tuple(face, level, x, y)
+    """
+    key = face, level, x, y
+    size = 2 / 2 ** level
+    p1, _ = tile_bounds(level, x, y)
+    center_a, center_b = p1[0] + size / 2, p1[1] + size / 2
+    keys = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            a, b = center_a + dx * size, center_b + dy * size
+            if not (-1 < a < 1 and -1 < b < 1):
+                # position lies across the face's edge
+                n_face, a, b = face_position(face_vector(face, a, b))
+            else:
+                n_face = face
+            n_key = tile_at(n_face, level, a, b)
+            if n_key != key and n_key not in keys:
+                keys.append(n_key)
+    return keys
+
+
+def children(face, level, x, y):
+    """
+    Gets keys of the four tiles dividing passed tile, in the order of
+    Tile.make_sub_tile indices.
+    :return: list of tuple(face, level, x, y)
+    """
+    return [(face, level + 1, 2 * x + i % 2, 2 * y + i // 2)
+            for i in range(4)]
+
+
+def parent(face, level, x, y):
+    """
+    Gets key of the tile divided by passed tile.
+    :return: tuple(face, level, x, y), or None for level 0 tiles.
+    """
+    if level == 0:
+        return None
+    return face, level - 1, x // 2, y // 2
+
+
+class TileManager:
+    """
+    Lazily generates and caches the tiles of a spheroid.
+    """
+
+    def __init__(self, spheroid, max_bytes=TILE_CACHE_BYTES, spill=False,
+                 tile_size=TILE_SIZE, workers=None, refine=False):
+        """
+        :param spheroid: Spheroid
+        :param max_bytes: int max number of bytes of map data held by
+                    cached tiles. The most recently requested tile is
+                    kept even if it alone exceeds this.
+        :param spill: bool; whether evicted tiles should be written
+                    to the spheroid's tile pyramid file. The spheroid
+                    should be built before the manager is created, so
+                    that the file is keyed by its selected noise
+                    backends.
+        :param tile_size: int width and height of tile maps.
+        :param workers: int max number of tiles prefetched at once.
+        :param refine: bool; whether tiles should be refined from
+                    their parent tile's height map rather than
+                    generated in full.
+        """
+        self.spheroid = spheroid
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.tile_size = tile_size
+        self.refine = refine
+        self.nbytes = 0
+        self._tiles = OrderedDict()  # key: Tile, least recent first
+        self._building = {}  # key: Future of tiles being built
+        self._generator = None
+        self.key = spheroid.tile_key(tile_size, refine)
+        self._pyramid = TilePyramidFile(self.spill_path) if spill else None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(workers)
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def get(self, face, level, x, y):
+        """
+        Gets tile, generating it if it is neither cached in memory
+        nor spilled to disk.
+        :param face: int cube face index
+        :param level: int quadtree level
+        :param x: int
+        :param y: int
+        :return: Tile
+        """
+        key = face, level, x, y
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+            future = self._building.get(key)
+            owner = future is None
+            if owner:
+                future = self._building[key] = Future()
+        if not owner:
+            return future.result()  # tile is being built by another call
+        try:
+            tile = self._load(key)
+            if tile is None:
+                tile = self._make(key)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._building[key]
+            self._tiles[key] = tile
+            self.nbytes += tile.nbytes
+            evicted = self._evict()
+        future.set_result(tile)
+        for evicted_key, evicted_tile in evicted:
+            self._spill(evicted_key, evicted_tile)
+        return tile
+
+    def prefetch(self, face, level, x, y, include_neighbours=True,
+                 include_children=True):
+        """
+        Starts generating tiles likely to be requested after passed
+        tile, in the background.
+        :param include_neighbours: bool; whether the tiles surrounding
+                    passed tile should be prefetched.
+        :param include_children: bool; whether the tiles dividing
+                    passed tile should be prefetched.
+        :return: list of Future of prefetched tiles.
+        """
+        keys = []
+        if include_neighbours:
+            keys += neighbours(face, level, x, y)
+        if include_children:
+            keys += children(face, level, x, y)
+        with self._lock:
+            keys = [key for key in keys if key not in self._tiles]
+        return [self._executor.submit(self.get, *key) for key in keys]
+
+    def close(self):
+        """
+        Waits for prefetches to finish, and stops prefetch threads.
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+
+    @property
+    def generator(self):
+        """
+        Gets HeightDetailGenerator shared by the spheroid's tiles,
+        creating it when first used, once the spheroid's tectonic map
+        has been built.
+        :return: HeightDetailGenerator
+        """
+        with self._lock:
+            if self._generator is None:
+                self._generator = HeightDetailGenerator(
+                    self.spheroid.tectonic_map, self.spheroid.radius,
+                    self.spheroid.seed)
+            return self._generator
+
+    @property
+    def spill_path(self):
+        """
+        Gets path of the tile pyramid file to which tiles are spilled.
+        :return: str
+        """
+        return os.path.join(
+            self.spheroid.dir_path,
+            '{}{}{}'.format(TILE_PYRAMID_PREFIX, self.key, PYRAMID_SUFFIX))
+
+    def _load(self, key):
+        """
+        Loads tile previously spilled to disk.
+        :return: Tile, or None if tile has not been spilled.
+        """
+        if not self.spill or key not in self._pyramid:
+            return None
+        face, level, x, y = key
+        p1, p2 = tile_bounds(level, x, y)
+        height_map = self._pyramid.load(key)
+        if height_map.width != self.tile_size or \
+                height_map.geometry[3] != face or \
+                height_map.quantization != self.spheroid.tile_quantization:
+            return None  # tile was spilled with other settings
+        return Tile(self.spheroid, face, parent=self._parent_tile(key),
+                    p1=p1, p2=p2, size=self.tile_size,
+                    height_map=height_map, generator=self.generator)
+
+    def _make(self, key):
+        """
+        Generates tile.
+        :return: Tile
+        """
+        logger = logging.getLogger(__name__)
+        face, level, x, y = key
+        p1, p2 = tile_bounds(level, x, y)
+        if self.refine and level > 0:
+            parent_tile = self.get(*parent(*key))
+        else:
+            parent_tile = self._parent_tile(key)
+        logger.debug('Generating tile %s', key)
+        return Tile(self.spheroid, face, parent=parent_tile,
+                    p1=p1, p2=p2, size=self.tile_size, refine=self.refine,
+                    generator=self.generator)
+
+    def _parent_tile(self, key):
+        """
+        Gets parent of tile with passed key, if it is cached.
+        :return: Tile or None
+        """
+        parent_key = parent(*key)
+        if parent_key is None:
+            return None
+        with self._lock:
+            return self._tiles.get(parent_key)
+
+    def _evict(self):
+        """
+        Removes least recently requested tiles from cache until it
+        holds no more than max_bytes. Must be called with lock held.
+        :return: list of (key, Tile) evicted.
+        """
+        evicted = []
+        while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+            key, tile = self._tiles.popitem(last=False)
+            self.nbytes -= tile.nbytes
+            evicted.append((key, tile))
+        return evicted
+
+    def _spill(self, key, tile):
+        """
+        Writes evicted tile to disk, if spilling is enabled.
+        """
+        if self.spill and key not in self._pyramid:
+            self._pyramid.write(key, tile.height_map)
@@ -3,7 +3,9 @@
 
 include "flags.pxi"
 
-from cymacro import macro  # dummy function for defining macros
+# from cymacro import macro  # dummy function for defining macros
+
+cimport numpy as np
 
 from .includes.cmathutils cimport vec2, vec3, mat3x3
 from .includes.structs cimport latlon
@@ -74,15 +76,34 @@ cdef class AbstractMap:
     cdef:
         void *_arr
         bint has_original_array
+        object _base  # object owning wrapped array memory, if any
+        readonly bint readonly
+        readonly unicode backing_path  # path of memory-mapped file, if any
         public int width, height
         public char *data_type
         vec2 _ref_pos
+        Py_ssize_t[2] _buf_shape
+        Py_ssize_t[2] _buf_strides
 
     # array handling methods
     cdef bint _allocate_arr(self) except False
+    cdef bint _wrap_arr(self, object arr) except False
+    cdef bint _validate_arr(self, object arr) except False
+    cdef Py_ssize_t _item_size(self) except -1
+    cdef const char *_buffer_format(self)
+    cdef bint _export_buffer(
+            self,
+            Py_buffer *buffer,
+            int flags,
+            char *origin,
+            Py_ssize_t row_length) except False
     cdef bint clone(self, AbstractMap p) except False
     cpdef bint load_arr(self, unicode path) except False
     cpdef bint save(self, unicode path) except False
+    cpdef bint flush(self) except False
+    cpdef int band_rows(self, Py_ssize_t max_bytes=*) except -1
+    cpdef bint release_rows(self, int y0, int y1) except False
+    cdef bint _map_file(self, unicode path, str mmap_mode) except False
     cdef bint set_arr(self, void *arr) except False
     cdef void *get_arr(self) except NULL
     cdef bint _view_arr(self, AbstractMap m) except False
@@ -102,7 +123,9 @@ cdef class AbstractMap:
     cdef latlon lat_lon_from_xy_(self, vec2 xy_pos) nogil
 
     # out
-    cpdef bint write_png(self, unicode out) except False
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=*, tuple value_range=*
+            ) except False
 
 
 cdef class CubeMap(AbstractMap):
@@ -143,7 +166,7 @@ cdef class TileMap(AbstractMap):
 
     cdef:
         vec2 p1, p2
-        TileMap parent  # super-tile that contains this sub-tile
+        readonly TileMap parent  # super-tile that contains this sub-tile
         CubeMap cube  # cube that Tile is a member of (if any)
         public short cube_face
 
@@ -163,8 +186,19 @@ cdef class CubeSide(TileMap):
 cdef class GreyCubeMap(CubeMap):
     
     
+    cdef int _storage  # storage kind of values; see GREY_STORAGES
+    cdef readonly float scale, offset  # decoding of 16 bit storages
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False
     cdef bint clone_(self, grey_map_t p) except False
     
+    # storage access
+    cdef a_t load_(self, Py_ssize_t i) nogil
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil
+    cpdef np.ndarray values(self)
+    cpdef bint set_values(self, values) except False
+    
     # value retrieval methods
     cpdef a_t v_from_lat_lon(self, pos) except? -1.
     cdef a_t v_from_lat_lon_(self, latlon pos)
@@ -176,10 +210,19 @@ cdef class GreyCubeMap(CubeMap):
     cpdef a_t v_from_vector(self, vector) except? -1.
     cdef a_t v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    cpdef np.ndarray v_from_rel_xys(self, positions)
+    
     # value setters
     cpdef bint set_xy(self, pos, v) except False
     cdef void set_xy_(self, int[2] pos, a_t v) nogil
     
+    # output
+    cpdef tuple value_range(self)
+    
     # TextureMap specific methods
     cpdef object gradient_from_xy(self, tuple[double] pos)
     cdef vec2 gradient_from_xy_(self, vec2 pos) 
@@ -196,6 +239,8 @@ cdef class GreyCubeMap(CubeMap):
     cdef inline void ur_px_(self, int[2] new_pos, int[2] old_pos)
     
     cdef a_t sample(self, vec2 pos) nogil except? -1.
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.
     
     cdef double gauss_smooth_xy_(
             self, vec2 pos, double radius, int samples) except -1.
@@ -205,8 +250,19 @@ cdef class GreyCubeMap(CubeMap):
 cdef class GreyLatLonMap(LatLonMap):
     
     
+    cdef int _storage  # storage kind of values; see GREY_STORAGES
+    cdef readonly float scale, offset  # decoding of 16 bit storages
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False
     cdef bint clone_(self, grey_map_t p) except False
     
+    # storage access
+    cdef a_t load_(self, Py_ssize_t i) nogil
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil
+    cpdef np.ndarray values(self)
+    cpdef bint set_values(self, values) except False
+    
     # value retrieval methods
     cpdef a_t v_from_lat_lon(self, pos) except? -1.
     cdef a_t v_from_lat_lon_(self, latlon pos)
@@ -218,10 +274,19 @@ cdef class GreyLatLonMap(LatLonMap):
     cpdef a_t v_from_vector(self, vector) except? -1.
     cdef a_t v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    cpdef np.ndarray v_from_rel_xys(self, positions)
+    
     # value setters
     cpdef bint set_xy(self, pos, v) except False
     cdef void set_xy_(self, int[2] pos, a_t v) nogil
     
+    # output
+    cpdef tuple value_range(self)
+    
     # TextureMap specific methods
     cpdef object gradient_from_xy(self, tuple[double] pos)
     cdef vec2 gradient_from_xy_(self, vec2 pos) 
@@ -238,6 +303,8 @@ cdef class GreyLatLonMap(LatLonMap):
     cdef inline void ur_px_(self, int[2] new_pos, int[2] old_pos)
     
     cdef a_t sample(self, vec2 pos) nogil except? -1.
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.
     
     cdef double gauss_smooth_xy_(
             self, vec2 pos, double radius, int samples) except -1.
@@ -247,8 +314,19 @@ cdef class GreyLatLonMap(LatLonMap):
 cdef class GreyTileMap(TileMap):
     
     
+    cdef int _storage  # storage kind of values; see GREY_STORAGES
+    cdef readonly float scale, offset  # decoding of 16 bit storages
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False
     cdef bint clone_(self, grey_map_t p) except False
     
+    # storage access
+    cdef a_t load_(self, Py_ssize_t i) nogil
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil
+    cpdef np.ndarray values(self)
+    cpdef bint set_values(self, values) except False
+    
     # value retrieval methods
     cpdef a_t v_from_lat_lon(self, pos) except? -1.
     cdef a_t v_from_lat_lon_(self, latlon pos)
@@ -260,10 +338,19 @@ cdef class GreyTileMap(TileMap):
     cpdef a_t v_from_vector(self, vector) except? -1.
     cdef a_t v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    cpdef np.ndarray v_from_rel_xys(self, positions)
+    
     # value setters
     cpdef bint set_xy(self, pos, v) except False
     cdef void set_xy_(self, int[2] pos, a_t v) nogil
     
+    # output
+    cpdef tuple value_range(self)
+    
     # TextureMap specific methods
     cpdef object gradient_from_xy(self, tuple[double] pos)
     cdef vec2 gradient_from_xy_(self, vec2 pos) 
@@ -280,6 +367,8 @@ cdef class GreyTileMap(TileMap):
     cdef inline void ur_px_(self, int[2] new_pos, int[2] old_pos)
     
     cdef a_t sample(self, vec2 pos) nogil except? -1.
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.
     
     cdef double gauss_smooth_xy_(
             self, vec2 pos, double radius, int samples) except -1.
@@ -289,8 +378,19 @@ cdef class GreyTileMap(TileMap):
 cdef class GreyCubeSide(CubeSide):
     
     
+    cdef int _storage  # storage kind of values; see GREY_STORAGES
+    cdef readonly float scale, offset  # decoding of 16 bit storages
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False
     cdef bint clone_(self, grey_map_t p) except False
     
+    # storage access
+    cdef a_t load_(self, Py_ssize_t i) nogil
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil
+    cpdef np.ndarray values(self)
+    cpdef bint set_values(self, values) except False
+    
     # value retrieval methods
     cpdef a_t v_from_lat_lon(self, pos) except? -1.
     cdef a_t v_from_lat_lon_(self, latlon pos)
@@ -302,10 +402,19 @@ cdef class GreyCubeSide(CubeSide):
     cpdef a_t v_from_vector(self, vector) except? -1.
     cdef a_t v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    cpdef np.ndarray v_from_rel_xys(self, positions)
+    
     # value setters
     cpdef bint set_xy(self, pos, v) except False
     cdef void set_xy_(self, int[2] pos, a_t v) nogil
     
+    # output
+    cpdef tuple value_range(self)
+    
     # TextureMap specific methods
     cpdef object gradient_from_xy(self, tuple[double] pos)
     cdef vec2 gradient_from_xy_(self, vec2 pos) 
@@ -322,6 +431,8 @@ cdef class GreyCubeSide(CubeSide):
     cdef inline void ur_px_(self, int[2] new_pos, int[2] old_pos)
     
     cdef a_t sample(self, vec2 pos) nogil except? -1.
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.
     
     cdef double gauss_smooth_xy_(
             self, vec2 pos, double radius, int samples) except -1.
@@ -350,11 +461,17 @@ cdef class VecCubeMap(CubeMap):
     cpdef av v_from_vector(self, vector) except *
     cdef av v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False
     cdef void set_xy_(self, int[2] pos, av vec) nogil
     
     cdef av sample(self, vec2 pos) nogil
+    cdef av sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -374,11 +491,17 @@ cdef class VecLatLonMap(LatLonMap):
     cpdef av v_from_vector(self, vector) except *
     cdef av v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False
     cdef void set_xy_(self, int[2] pos, av vec) nogil
     
     cdef av sample(self, vec2 pos) nogil
+    cdef av sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -398,11 +521,17 @@ cdef class VecTileMap(TileMap):
     cpdef av v_from_vector(self, vector) except *
     cdef av v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False
     cdef void set_xy_(self, int[2] pos, av vec) nogil
     
     cdef av sample(self, vec2 pos) nogil
+    cdef av sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -422,11 +551,17 @@ cdef class VecCubeSide(CubeSide):
     cpdef av v_from_vector(self, vector) except *
     cdef av v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False
     cdef void set_xy_(self, int[2] pos, av vec) nogil
     
     cdef av sample(self, vec2 pos) nogil
+    cdef av sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -452,11 +587,17 @@ cdef class RegCubeMap(CubeMap):
     cpdef rt v_from_vector(self, vector) except *
     cdef rt v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False
     cdef void set_xy_(self, int[2] pos, rt r) nogil
     
     cdef rt sample(self, vec2 pos) nogil
+    cdef rt sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -476,11 +617,17 @@ cdef class RegLatLonMap(LatLonMap):
     cpdef rt v_from_vector(self, vector) except *
     cdef rt v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False
     cdef void set_xy_(self, int[2] pos, rt r) nogil
     
     cdef rt sample(self, vec2 pos) nogil
+    cdef rt sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -500,11 +647,17 @@ cdef class RegTileMap(TileMap):
     cpdef rt v_from_vector(self, vector) except *
     cdef rt v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False
     cdef void set_xy_(self, int[2] pos, rt r) nogil
     
     cdef rt sample(self, vec2 pos) nogil
+    cdef rt sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
@@ -524,15 +677,44 @@ cdef class RegCubeSide(CubeSide):
     cpdef rt v_from_vector(self, vector) except *
     cdef rt v_from_vector_(self, vec3 vector) nogil
     
+    # batch value retrieval methods
+    cpdef np.ndarray v_from_vectors(self, vectors)
+    cpdef np.ndarray v_from_lat_lons(self, positions)
+    cpdef np.ndarray v_from_xys(self, positions)
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False
     cdef void set_xy_(self, int[2] pos, rt r) nogil
     
     cdef rt sample(self, vec2 pos) nogil
+    cdef rt sample_index_(self, int p2, float a_mod, float b_mod) nogil
     
     
 
 
+#######################################################################
+# DIRECTION TABLES
+#######################################################################
+
+
+cdef class DirectionTable:
+    cdef readonly tuple key
+    cdef readonly int width
+    cdef readonly int height
+    # unit position vector components, in row-major order
+    cdef float *x
+    cdef float *y
+    cdef float *z
+    # latitude and longitude; NULL unless requested
+    cdef float *lat
+    cdef float *lon
+
+    cdef bint compute_lat_lon_(self) except False
+
+
+cdef DirectionTable direction_table_(AbstractMap m, bint lat_lon=*)
+
+
 #######################################################################
 # FUNCTIONS
 #######################################################################
@@ -24,20 +24,33 @@ import png
 import itertools as itr
 import struct  # used for storing bytes in files
 
+import mmap
+import os
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 cimport numpy as np
 cimport cython
 
+from cython.parallel cimport prange
+
 from mathutils import Vector
 
 from math import radians
-from libc.math cimport cos, sin, atan2, sqrt, pow, fabs, ceil, log2, isnan
+from libc.math cimport cos, sin, atan2, sqrt, pow, fabs, ceil, log2, isnan, \
+    lrint
 from libc.stdlib cimport malloc, free
+from libc.stdint cimport int16_t, uint16_t, uint32_t
 from libc.stdio cimport fprintf, stderr
+from cpython.buffer cimport PyBUF_FORMAT, PyBUF_ND, PyBUF_STRIDES, \
+    PyBUF_WRITABLE, PyBUF_C_CONTIGUOUS
 
 # from cymacro import macro  # dummy function for defining macros
 
 # project imports
 from .includes cimport cmathutils as mu
+from .chunked import CHUNKED_SUFFIX, read_chunked, write_chunked
 
 # includes
 include "flags.pxi"
@@ -56,6 +69,52 @@ DEF LON_RANGE = TAU
 
 DEF GAUSS_SAMPLES = 4
 
+# PEP 3118 formats of the data types stored by maps
+DEF GREY_FORMAT = b'f'
+DEF GREY_F16_FORMAT = b'e'
+DEF GREY_I16_FORMAT = b'h'
+DEF GREY_U16_FORMAT = b'H'
+DEF VEC_FORMAT = b'T{f:x:f:y:}'
+DEF REG_FORMAT = b'T{B:r0:B:r1:B:r2:B:r3:f:w0:f:w1:f:w2:f:w3:}'
+
+# max bytes of a memory-mapped map generated before its pages are
+# written out and released; see AbstractMap.band_rows
+STREAM_BAND_BYTES = 64 * 2 ** 20
+
+# numpy equivalents of a_t, av and rt
+GREY_DTYPE = np.dtype(np.float32)
+VEC_DTYPE = np.dtype([('x', np.float32), ('y', np.float32)])
+REG_DTYPE = np.dtype([
+    ('r0', np.uint8), ('r1', np.uint8), ('r2', np.uint8), ('r3', np.uint8),
+    ('w0', np.float32), ('w1', np.float32),
+    ('w2', np.float32), ('w3', np.float32),
+])
+
+# storage kinds of grey map values. Values of maps stored as 16 bit
+# types are decoded as stored * scale + offset; see GreyCubeMap.storage
+DEF GREY_FLOAT32 = 0
+DEF GREY_FLOAT16 = 1
+DEF GREY_INT16 = 2
+DEF GREY_UINT16 = 3
+
+DEF HALF_MAX = 65504.  # largest finite float16
+
+# storage name: storage kind
+GREY_STORAGES = {
+    'float32': GREY_FLOAT32,
+    'float16': GREY_FLOAT16,
+    'int16': GREY_INT16,
+    'uint16': GREY_UINT16,
+}
+DEFAULT_GREY_STORAGE = 'float32'
+# numpy dtype of each storage kind, by kind
+GREY_STORAGE_DTYPES = (
+    GREY_DTYPE,
+    np.dtype(np.float16),
+    np.dtype(np.int16),
+    np.dtype(np.uint16),
+)
+
 
 #######################################################################
 # DEFINITION MACROS
@@ -88,7 +147,14 @@ cdef class AbstractMap:
         """
         Creates a LatLonMap either from a passed file path or
         passed parameters.
-        :param kwargs: path, width, height
+        If an ndarray is passed as 'arr', the map will use it as its
+        data array without copying; the array must be C-contiguous and
+        match the map's dtype and (height, width) shape.
+        If 'mmap_mode' is passed along with 'path', the map's data will
+        be backed directly by the memory-mapped .npy file rather than
+        copied into memory. Modes are those of numpy.load
+        ('r', 'r+', 'c'), as well as 'w+', which creates a new file.
+        :param kwargs: path, mmap_mode, arr, prototype, width, height
         """
         if not isinstance(width, int):
             raise TypeError(f'Expected w to be an int, got: {width}')
@@ -98,17 +164,28 @@ cdef class AbstractMap:
         self.height = height
         self._ref_pos = mu.vec2Zero()
 
+        if sum([k in kwargs.keys() for k in ('path', 'arr', 'prototype')]) > 1:
+            raise ValueError(
+                "Only one of {'path', 'arr', 'prototype'} should be passed")
+
+        mmap_mode = kwargs.get('mmap_mode')
+        if mmap_mode is not None and 'path' not in kwargs:
+            raise ValueError('mmap_mode requires a path to be passed')
+
         if viewed_map:
             self.has_original_array = 0
             self._view_arr(viewed_map)
+        elif mmap_mode is not None:
+            self.has_original_array = 0
+            self._map_file(kwargs['path'], mmap_mode)
+        elif 'arr' in kwargs:
+            self.has_original_array = 0
+            self._wrap_arr(kwargs['arr'])
         else:
             self.has_original_array = 1
             self._allocate_arr()
 
-        if sum([k in kwargs.keys() for k in ('path', 'arr', 'prototype')]) > 1:
-            raise ValueError(
-                "Only one of {'path', 'arr', 'prototype'} should be passed")
-        if 'path' in kwargs:
+        if 'path' in kwargs and mmap_mode is None:
             path = kwargs['path']
             self.load_arr(path)
         # get data from prototype if one was passed
@@ -134,6 +211,71 @@ cdef class AbstractMap:
         :param m: AbstractMap
         """
         self._arr = m.get_arr()
+        self.readonly = m.readonly
+        return 1
+
+    cdef bint _map_file(self, unicode path, str mmap_mode) except False:
+        """
+        Sets map data to be backed by the memory-mapped .npy file at
+        the passed path.
+        :param path: unicode str
+        :param mmap_mode: str; one of 'r', 'r+', 'c' or 'w+'
+        """
+        if mmap_mode == 'w+':
+            arr = np.lib.format.open_memmap(
+                path, mode='w+', dtype=self.dtype,
+                shape=(self.height, self.width))
+        elif mmap_mode in ('r', 'r+', 'c'):
+            arr = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        else:
+            raise ValueError(f'Unexpected mmap_mode: {mmap_mode}')
+        self._wrap_arr(arr)
+        self.backing_path = path
+        return 1
+
+    cdef bint _wrap_arr(self, object arr) except False:
+        """
+        Sets map data to be the memory of the passed ndarray.
+        A reference to the array is kept for the lifetime of the map.
+        :param arr: np.ndarray
+        """
+        self._validate_arr(arr)
+        if not arr.flags.c_contiguous:
+            raise ValueError('Wrapped array must be C-contiguous')
+        self._base = arr
+        self._arr = np.PyArray_DATA(<np.ndarray> arr)
+        self.readonly = not arr.flags.writeable
+        return 1
+
+    cdef bint _validate_arr(self, object arr) except False:
+        """
+        Checks that passed ndarray has the data type and shape
+        of this map's data array.
+        :param arr: np.ndarray
+        """
+        if not arr.dtype == self.dtype:
+            raise TypeError(
+                f'Loaded arr had wrong data type. Got: {arr.dtype} '
+                f'Expected: {self.dtype}'
+            )
+
+        if not arr.ndim == 2:
+            raise ValueError(
+                f'Passed array of unexpected dimensions. Got: {arr.ndim}, '
+                f'expected 2'
+            )
+
+        if not len(arr) == self.height:
+            raise ValueError(
+                f'Passed array of unexpected height. Got: {len(arr)}, '
+                f'expected {self.height}'
+            )
+
+        if not arr.shape[1] == self.width:
+            raise ValueError(
+                f'Passed array of unexpected width. Got: {arr.shape[1]}, '
+                f'expected {self.width}'
+            )
         return 1
 
     def __dealloc__(self):
@@ -145,26 +287,178 @@ cdef class AbstractMap:
         if self.has_original_array:
             free(self._arr)
 
-    cpdef bint load_arr(self, unicode path) except False:
+    # Buffer protocol
+
+    cdef Py_ssize_t _item_size(self) except -1:
+        """
+        Returns size in bytes of a single value stored by map.
+        """
+        raise NotImplementedError(
+            'Abstract map without data type has no item size')
+
+    cdef const char *_buffer_format(self):
+        """
+        Returns PEP 3118 format string describing a single value
+        stored by map.
+        """
+        return NULL
+
+    @property
+    def dtype(self):
         """
-        Loads and returns texture data from passed path.
-        :param str path
+        numpy dtype of values stored by map.
         """
         raise NotImplementedError
 
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        """
+        Exposes map data as a 2d (height, width) buffer, allowing
+        data to be viewed without copying; ex: np.asarray(map).
+        """
+        self._export_buffer(buffer, flags, <char *> self._arr, self.width)
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        pass
+
+    cdef bint _export_buffer(
+            self,
+            Py_buffer *buffer,
+            int flags,
+            char *origin,
+            Py_ssize_t row_length) except False:
+        """
+        Fills passed buffer struct with a view of map data.
+        :param origin: pointer to first value of map data.
+        :param row_length: number of values between the start of
+                    consecutive rows.
+        """
+        cdef Py_ssize_t item_size = self._item_size()
+        cdef bint contiguous = row_length == self.width
+
+        if not contiguous and \
+                (flags & PyBUF_C_CONTIGUOUS) == PyBUF_C_CONTIGUOUS:
+            raise BufferError('Map data is not C-contiguous')
+        if (flags & PyBUF_STRIDES) != PyBUF_STRIDES and not contiguous:
+            raise BufferError('Map data requires strides to be viewed')
+        if flags & PyBUF_WRITABLE and self.readonly:
+            raise BufferError('Map data is read-only')
+
+        self._buf_shape[0] = self.height
+        self._buf_shape[1] = self.width
+        self._buf_strides[0] = row_length * item_size
+        self._buf_strides[1] = item_size
+
+        buffer.buf = origin
+        buffer.obj = self
+        buffer.len = self.width * self.height * item_size
+        buffer.readonly = self.readonly
+        buffer.itemsize = item_size
+        buffer.format = <char *> self._buffer_format() \
+            if flags & PyBUF_FORMAT else NULL
+        buffer.ndim = 2
+        buffer.shape = self._buf_shape if flags & PyBUF_ND else NULL
+        buffer.strides = self._buf_strides \
+            if (flags & PyBUF_STRIDES) == PyBUF_STRIDES else NULL
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+        return 1
+
+    cpdef bint load_arr(self, unicode path) except False:
+        """
+        Loads array data from passed filepath.
+        Paths ending in CHUNKED_SUFFIX are read as chunked map files,
+        others as .npy files.
+        :param path: unicode str
+        """
+        if path.endswith(CHUNKED_SUFFIX):
+            read_chunked(path, self)
+            return 1
+        arr = np.load(path, allow_pickle=False)
+        self._validate_arr(arr)
+        np.copyto(np.asarray(self), arr)
+        return 1
+
     cpdef bint save(self, unicode path) except False:
         """
-        Saves TextureMap data to passed path.
-        :param str path
+        Saves map data to passed file path.
+        Paths ending in CHUNKED_SUFFIX are written as compressed
+        chunked map files, others as .npy files.
+        :param path: unicode str
         """
-        raise NotImplementedError
+        if path.endswith(CHUNKED_SUFFIX):
+            write_chunked(self, path)
+        else:
+            np.save(path, np.asarray(self), allow_pickle=False)
+        return 1
+
+    cpdef bint flush(self) except False:
+        """
+        Writes any changes to map data to its backing file, if map
+        is memory-mapped. Otherwise does nothing.
+        """
+        if self.backing_path is not None:
+            self._base.flush()
+        return 1
+
+    cpdef int band_rows(self, Py_ssize_t max_bytes=STREAM_BAND_BYTES) \
+            except -1:
+        """
+        Gets number of rows of map generated at once before being
+        released with release_rows. Maps that are not memory-mapped
+        are generated at once.
+        :param max_bytes: int max bytes of map data in a band.
+        :return: int
+        """
+        if self.backing_path is None:
+            return self.height
+        return min(self.height,
+                   max(1, max_bytes // (self.width * self.dtype.itemsize)))
+
+    cpdef bint release_rows(self, int y0, int y1) except False:
+        """
+        Writes passed rows of a memory-mapped map to its backing file,
+        and releases the memory holding them, so that maps larger than
+        memory can be generated a band of rows at a time. Released rows
+        are re-read from the file if accessed again. Does nothing if
+        map is not memory-mapped, or is mapped copy-on-write, since
+        changes to its rows are then held only in memory.
+        :param y0: int first row
+        :param y1: int row after last row
+        """
+        if not 0 <= y0 <= y1 <= self.height:
+            raise ValueError(f'Invalid rows: {y0} to {y1}')
+        if self.backing_path is None or y0 == y1 or \
+                getattr(self._base, 'mode', None) == 'c':
+            return 1
+        mm = getattr(self._base, '_mmap', None)
+        if mm is None:
+            return 1
+        row_bytes = self.width * self.dtype.itemsize
+        # numpy maps the file from the allocation granularity boundary
+        # preceding the array's offset.
+        start = self._base.offset % mmap.ALLOCATIONGRANULARITY + \
+            y0 * row_bytes
+        end = start + (y1 - y0) * row_bytes
+        # only whole pages within the rows may be released.
+        start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        end = end // mmap.PAGESIZE * mmap.PAGESIZE
+        if end <= start:
+            return 1
+        mm.flush(start, end - start)
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+            mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+        return 1
 
     cdef bint set_arr(self, void *arr) except False:
         """
         Sets array to that passed
         """
-        free(self._arr)
+        if self.has_original_array:
+            free(self._arr)
         self.has_original_array = False
+        self._base = None
+        self.backing_path = None
+        self.readonly = False
         self._arr = arr
         return 1
 
@@ -188,6 +482,15 @@ cdef class AbstractMap:
 
     # Position conversions
 
+    @property
+    def geometry(self):
+        """
+        Tuple identifying the arrangement of this map's values on the
+        sphere. Maps with equal geometries map each array position
+        to the same position vector, regardless of data type.
+        """
+        raise NotImplementedError
+
     cpdef tuple xy_from_lat_lon(self, pos):
         raise NotImplementedError()
 
@@ -227,7 +530,9 @@ cdef class AbstractMap:
 
     # Out
 
-    cpdef bint write_png(self, unicode out) except False:
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=8, tuple value_range=None
+            ) except False:
         raise NotImplementedError()
 
     @property
@@ -273,6 +578,42 @@ cdef class CubeMap(AbstractMap):
             # uppermost tile has no parent.
             self.tile_maps.append(tile)
 
+    @property
+    def geometry(self):
+        return 'cube', self.width, self.height
+
+    def write_face_pngs(
+            self, unicode out, int bit_depth=8, tuple value_range=None,
+            workers=None):
+        """
+        Writes each face of a grey cube map to its own greyscale png.
+        Faces are written concurrently, and share a value range, so
+        that they may be compared.
+        :param out: path String; the index of each face is appended
+                    to its file name. ex: 'height.png' -> 'height_0.png'
+        :param bit_depth: 8 or 16
+        :param value_range: tuple(min, max) of values mapped to black
+                    and white. Values outside the range are clipped.
+        :param workers: int maximum number of faces written at once.
+        :return: list of paths written.
+        """
+        root, ext = os.path.splitext(out)
+        paths = [f'{root}_{i}{ext or ".png"}' for i in range(6)]
+        values = self.values()
+        if value_range is None:
+            value_range = png_value_range(*grey_value_range(values))
+
+        def write_face(i):
+            x, y = self.tile_maps[i].reference_position
+            x, y = int(x), int(y)
+            face = values[y:y + self.tile_height, x:x + self.tile_width]
+            write_grey_png(face, paths[i], bit_depth, value_range)
+
+        with ThreadPoolExecutor(workers) as executor:
+            # list() re-raises any exception from a worker
+            list(executor.map(write_face, range(6)))
+        return paths
+
     cpdef tuple xy_from_lat_lon(self, pos):
         """
         Gets xy mapping of passed latitude and longitude.
@@ -605,6 +946,10 @@ cdef class LatLonMap(AbstractMap):
         """
         super().__init__(**kwargs)
 
+    @property
+    def geometry(self):
+        return 'lat_lon', self.width, self.height
+
     cpdef tuple xy_from_vector(self, vector):
         """
         Gets pixel value at passed position on this map.
@@ -702,11 +1047,21 @@ cdef class TileMap(AbstractMap):
         assert height > 0, height
         if not isinstance(cube_face, int):
             raise TypeError(f'Expected cube side index, got {cube_face}')
-        super().__init__(width, height, viewed_map, **kwargs)
+        # geometry must be set before super().__init__, which may
+        # clone values from a prototype.
         self.cube_face = cube_face
         self.p1 = cp2v_2d(p1)
         self.p2 = cp2v_2d(p2)
         self.parent = None
+        super().__init__(width, height, viewed_map, **kwargs)
+
+    @property
+    def geometry(self):
+        return (
+            'tile', self.width, self.height, self.cube_face,
+            self.p1.x, self.p1.y, self.p2.x, self.p2.y,
+            self._ref_pos.x, self._ref_pos.y
+        )
 
     cpdef tuple xy_from_lat_lon(self, pos):
         """
@@ -814,12 +1169,52 @@ cdef class TileMap(AbstractMap):
 
     cpdef get_sub_tile(self, p1, p2):
         """
-        Gets sub-tile of this tile map
-        :param p1: lower left corner
-        :param p2: upper right corner
+        Gets sub-tile of this tile map, covering the passed area of
+        this map's cube face, with values interpolated from this map.
+        The sub-tile has the same width and height as this map, and
+        so a higher resolution.
+        :param p1: lower left corner; within the area of this map.
+        :param p2: upper right corner; within the area of this map.
         :return: TileMap
         """
-        # todo
+        cdef vec2 p1_ = cp2v_2d(p1)
+        cdef vec2 p2_ = cp2v_2d(p2)
+        cdef TileMap sub
+        if not (self.p1.x <= p1_.x < p2_.x <= self.p2.x and
+                self.p1.y <= p1_.y < p2_.y <= self.p2.y):
+            raise ValueError(
+                'Sub-tile {}, {} is outside of tile {}, {}'.format(
+                    p1, p2, (self.p1.x, self.p1.y), (self.p2.x, self.p2.y)))
+        # sub-tiles of grey maps are stored in the same way as this map.
+        quantization = getattr(self, 'quantization', {})
+        sub = TILE_MAP_TYPES[self.dtype](
+            width=self.width, height=self.height,
+            p1=p1, p2=p2, cube_face=self.cube_face, **quantization)
+        # positions in this map of each sub-tile column and row,
+        # clamped so that edge values are not interpolated past.
+        x = (p1_.x - self.p1.x + np.arange(self.width) / self.width *
+             (p2_.x - p1_.x)) / (self.p2.x - self.p1.x) * self.width
+        y = (p1_.y - self.p1.y + np.arange(self.height) / self.height *
+             (p2_.y - p1_.y)) / (self.p2.y - self.p1.y) * self.height
+        xs, ys = np.meshgrid(
+            np.minimum(x, self.width - 1), np.minimum(y, self.height - 1))
+        src = self
+        if isinstance(self, CubeSide):
+            # cube side rows are strided within the cube's data, so
+            # are sampled from a contiguous copy.
+            src = TILE_MAP_TYPES[self.dtype](
+                width=self.width, height=self.height,
+                p1=(self.p1.x, self.p1.y), p2=(self.p2.x, self.p2.y),
+                cube_face=self.cube_face,
+                arr=np.ascontiguousarray(np.asarray(self)), **quantization)
+        values = src.v_from_xys(np.stack((xs.ravel(), ys.ravel()), axis=1))
+        values = values.reshape((self.height, self.width))
+        if quantization:
+            sub.set_values(values)
+        else:
+            np.asarray(sub)[:] = values
+        sub.parent = self
+        return sub
 
     cpdef vector_from_xy(self, pos):
         cdef vec2 pos_ = cp2v_2d(pos)
@@ -882,6 +1277,11 @@ cdef class TileMap(AbstractMap):
                 with gil:
                     raise ValueError(
                         'Invalid face index: {}'.format(self.cube_face))
+            ELSE:
+                fprintf(stderr,
+                    'TileMap.vector_from_xy_(): invalid face: %d\n',
+                    self.cube_face)
+                return mu.vec3Nan()
         return vector
 
 
@@ -929,6 +1329,30 @@ cdef class CubeSide(TileMap):
     def reference_position(self):
         return self._ref_pos.x, self._ref_pos.y
 
+    # Buffer protocol; cube sides are strided views of their cube's data
+
+    cdef Py_ssize_t _item_size(self) except -1:
+        return self.cube._item_size()
+
+    cdef const char *_buffer_format(self):
+        return self.cube._buffer_format()
+
+    @property
+    def dtype(self):
+        return self.cube.dtype
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        """
+        Exposes the region of the cube's data belonging to this side.
+        """
+        cdef char *origin = <char *> self._arr + (
+            <Py_ssize_t> self._ref_pos.y * self.cube.width +
+            <Py_ssize_t> self._ref_pos.x) * self._item_size()
+        self._export_buffer(buffer, flags, origin, self.cube.width)
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        pass
+
 
 #######################################################################
 # TEXTURE MAPS  (Floating Point Maps)
@@ -937,57 +1361,133 @@ cdef class CubeSide(TileMap):
 
 cdef class GreyCubeMap(CubeMap):
     
+    def __cinit__(
+            self, *args, storage=DEFAULT_GREY_STORAGE, scale=1., offset=0.,
+            **kwargs):
+        """
+        Sets the type in which the map's values are stored, before the
+        map's data is allocated or loaded.
+        :param storage: str; one of GREY_STORAGES. Maps stored as float16,
+                    int16 or uint16 use half the memory of float32 maps,
+                    and decode each value as stored * scale + offset.
+        :param scale: float; see grey_quantization.
+        :param offset: float
+        """
+        self._set_storage(storage, scale, offset)
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False:
+        """
+        Sets storage type, scale and offset of map values.
+        """
+        if storage not in GREY_STORAGES:
+            raise ValueError(f'Unknown grey map storage: {storage!r}; '
+                             f'expected one of {sorted(GREY_STORAGES)}')
+        if not 0 < scale < float('inf'):
+            raise ValueError(f'Invalid scale: {scale}')
+        if GREY_STORAGES[storage] == GREY_FLOAT32 and \
+                (scale != 1 or offset != 0):
+            raise ValueError('float32 maps cannot be scaled or offset')
+        self._storage = GREY_STORAGES[storage]
+        self.scale = scale
+        self.offset = offset
+        return 1
+    
     cdef bint _allocate_arr(self) except False:
-        self._arr = malloc(self.width * self.height * sizeof(a_t))
+        self._arr = malloc(self.width * self.height * self._item_size())
         return 1
     
-    cpdef bint load_arr(self, unicode path) except False:
+    cdef bint _view_arr(self, AbstractMap m) except False:
         """
-        Loads array data from passed filepath.
-        :param path: unicode str
+        Sets map data to be a view of passed map's data, which is stored
+        in the same way as passed map's, if it is a grey map.
+        :param m: AbstractMap
         """
-        cdef np.ndarray arr
+        AbstractMap._view_arr(self, m)
+        if isinstance(m, GREY_MAP_TYPES):
+            self._set_storage(m.storage, m.scale, m.offset)
+        return 1
     
-        arr = np.load(path, allow_pickle=False)
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(a_t) if self._storage == GREY_FLOAT32 else 2
     
-        # validate data
-        if not arr.dtype == np.float32:
-            raise TypeError(
-                f'Loaded arr had wrong data type. Got: {arr.dtype} '
-                f'Expected: float32'
-            )
+    cdef const char *_buffer_format(self):
+        if self._storage == GREY_FLOAT16:
+            return GREY_F16_FORMAT
+        elif self._storage == GREY_INT16:
+            return GREY_I16_FORMAT
+        elif self._storage == GREY_UINT16:
+            return GREY_U16_FORMAT
+        return GREY_FORMAT
     
-        if not len(arr) == self.height:
-            raise ValueError(
-                f'Passed array of unexpected height. Got: {len(arr)}, '
-                f'expected {self.height}'
-            )
+    @property
+    def dtype(self):
+        return GREY_STORAGE_DTYPES[self._storage]
     
-        if not len(arr[0]) == self.width:
-            raise ValueError(
-                f'Passed array of unexpected width. Got: {len(arr[1])}, '
-                f'expected {self.width}'
-            )
+    @property
+    def storage(self):
+        """
+        Name of the type in which map values are stored; one of
+        GREY_STORAGES.
+        """
+        return GREY_STORAGE_DTYPES[self._storage].name
     
-        # transfer values
-        for y in range(self.height):
-            for x in range(self.width):
-                (<a_t *>self._arr)[y * self.width + x] = arr[y, x]
-        return 1
+    @property
+    def quantization(self):
+        """
+        Storage, scale and offset of map values, as keyword arguments of
+        the map's constructor.
+        :return: dict
+        """
+        return {'storage': self.storage,
+                'scale': self.scale,
+                'offset': self.offset}
     
-    cpdef bint save(self, unicode path) except False:
+    cdef a_t load_(self, Py_ssize_t i) nogil:
         """
-        Saves map data to passed file path
-        :param path: unicode str
+        Gets decoded value stored at passed index of map data.
+        :param i: index
+        :return: a_t
+        """
+        return grey_load_(self._arr, self._storage, self.scale, self.offset, i)
+    
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil:
         """
-        n_arr = np.ndarray((self.height, self.width), dtype=np.float32)
+        Encodes and stores value at passed index of map data.
+        :param i: index
+        :param v: a_t
+        """
+        grey_store_(self._arr, self._storage, self.scale, self.offset, i, v)
     
-        # populate numpy arr
-        for y in range(self.height):
-            for x in range(self.width):
-                n_arr[y, x] = (<a_t *>self._arr)[y * self.width + x]
+    cpdef np.ndarray values(self):
+        """
+        Gets map values as a float32 array. Maps stored as float32 return
+        a view of their data; others return a decoded copy.
+        :return: np.ndarray
+        """
+        arr = np.asarray(self)
+        if self._storage == GREY_FLOAT32:
+            return arr
+        return arr.astype(np.float32) * np.float32(self.scale) + \
+            np.float32(self.offset)
     
-        np.save(path, n_arr, allow_pickle=False)
+    cpdef bint set_values(self, values) except False:
+        """
+        Sets map values from passed array of floats, encoding them as
+        they would be by set_xy.
+        :param values: array_like of shape (height, width)
+        """
+        arr = np.asarray(self)
+        values = np.asarray(values, np.float32)
+        if self._storage == GREY_FLOAT32:
+            arr[:] = values
+            return 1
+        q = (values - np.float32(self.offset)) / np.float32(self.scale)
+        if self._storage == GREY_FLOAT16:
+            arr[:] = q.astype(np.float16)
+        else:
+            info = np.iinfo(arr.dtype)
+            arr[:] = np.rint(np.clip(q, info.min, info.max))
         return 1
     
     cdef bint clone(self, AbstractMap p) except False:
@@ -1010,21 +1510,17 @@ cdef class GreyCubeMap(CubeMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, grey_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef a_t v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            self.store_(i, p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i]))
         return 1
     
     cpdef a_t v_from_lat_lon(self, pos) except? -1.:
@@ -1108,7 +1604,7 @@ cdef class GreyCubeMap(CubeMap):
             assert 0 <= pos[1] <= self.height - 1, \
                 f'{pos[1]} outside height range 0 - {self.height - 1}'
     
-        return (<a_t *> self._arr)[pos[1] * self.width + pos[0]]
+        return self.load_(pos[1] * self.width + pos[0])
     
     cpdef a_t v_from_vector(self, vector) except? -1.:
         """
@@ -1126,6 +1622,78 @@ cdef class GreyCubeMap(CubeMap):
         """
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_rel_xys(self, positions):
+        """
+        Gets values at each of the passed relative x, y positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs, each
+                    in range (0-1) inclusive
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(positions, 1, 1, True)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef double x_scale = self.width - 1, y_scale = self.height - 1
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(mu.vec2New(
+                positions_[i, 0] * x_scale, positions_[i, 1] * y_scale))
+        return out
+    
     cpdef object gradient_from_xy(self, tuple[double] pos):
         """
         Gets gradient of map as a vec2 at passed position.
@@ -1256,6 +1824,8 @@ cdef class GreyCubeMap(CubeMap):
     
     cpdef bint set_xy(self, pos, v) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = <int>pos[0]
         pos_[1] = <int>pos[1]
         if not 0 <= pos_[0] < self.width:
@@ -1271,7 +1841,7 @@ cdef class GreyCubeMap(CubeMap):
         IF ASSERTS:
             if isnan(v):
                 fprintf(stderr, 'GreyMap.set_xy_(): got NaN value')
-        (<a_t *> self._arr)[pos[1] * self.width + pos[0]] = v
+        self.store_(pos[1] * self.width + pos[0], v)
     
     @cython.wraparound(False)
     @cython.initializedcheck(False)
@@ -1287,10 +1857,8 @@ cdef class GreyCubeMap(CubeMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef a_t left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef a_t *arr = <a_t *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -1301,16 +1869,34 @@ cdef class GreyCubeMap(CubeMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return a_t
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef a_t left0, left1, right0, right1, vf
+        cdef void *arr = self._arr
+        cdef int kind = self._storage
+        cdef float scale = self.scale, offset = self.offset
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
             p1 = p2 + self.width
             p0 = p1 + 1
     
-            left0 = arr[p2]
-            left1 = arr[p1]
-            right0 = arr[p3]
-            right1 = arr[p0]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
+            right1 = grey_load_(arr, kind, scale, offset, p0)
     
             left0 = left1 * b_mod + left0 * (1 - b_mod)
             right0 = right1 * b_mod + right0 * (1 - b_mod)
@@ -1318,132 +1904,176 @@ cdef class GreyCubeMap(CubeMap):
         elif a_mod:  # if a_mod > 0 and b_mod == 0:
             # if only one row
             p3 = p2 + 1
-            left0 = arr[p2]
-            right0 = arr[p3]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
             vf = right0 * a_mod + left0 * (1 - a_mod)
         elif b_mod:  # if b_mod > 0 and a_mod == 0:
             # if only one column
             p1 = p2 + self.width  # get pixel above base (p2) pixel
-            left0 = arr[p2]
-            left1 = arr[p1]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
             vf = left1 * b_mod + left0 * (1 - b_mod)
         else:  # both a_mod and b_mod are 0.:
             # if both passed values are whole numbers, just get the
             # corresponding value
-            vf = arr[p2]
+            vf = grey_load_(arr, kind, scale, offset, p2)
     
         return vf
     
     
-    @cython.cdivision(True)
-    @cython.wraparound(False)
-    cpdef bint write_png(self, unicode out) except False:
+    cpdef tuple value_range(self):
+        """
+        Gets the minimum and maximum values stored in map.
+        :return: tuple(min, max)
+        """
+        return grey_value_range(self.values())
+    
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=8, tuple value_range=None
+            ) except False:
         """
-        Writes map as a png to the passed path.
+        Writes map as a greyscale png to the passed path.
+        Unless a value range is passed, the png spans 0-64, expanded to
+        the nearest power of two on either side if the map's values lie
+        outside of that range.
         :param out: path String
+        :param bit_depth: 8 or 16
+        :param value_range: tuple(min, max) of values mapped to black
+                    and white. Values outside the range are clipped.
         :return: None
         """
-        cdef float max = 64, min = 0
-        cdef int x, y
-        cdef float v
-        cdef int[2] pos
-        cdef np.ndarray out_arr
-        if '.' not in out:
-            out += '.png'  # adjust out path
-        while True:
-            # try to get array to print. if a value is outside range,
-            # start over and increase max.
-            # this lets us see a map that is scaled to fit the t range
-            # of a planet.
-            restart = False  # reset flag
-            out_arr = np.ndarray((self.height, self.width), np.uint8)
-            for y in range(self.height):
-                pos[1] = y
-                for x in range(self.width):
-                    pos[0] = x
-                    v = self.v_from_xy_indices_(pos)
-                    if v > max:
-                        # increase max
-                        max = 2 ** ceil(log2(v))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    if v < min:
-                        # decrease min
-                        min = -(2 ** ceil(log2(abs(v))))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    out_v = (v - min) * 255 / (max - min)
-                    IF ASSERTS:
-                        assert 0 <= out_v < 256, f'{x},{y}: data: {v} out: {out_v}'
-                    out_arr[y][x] = out_v
-                if restart:
-                    break
-            if not restart:
-                break
-    
-        with open(out, 'wb') as f:
-            height = len(out_arr)
-            width = len(out_arr[0])
-            w = png.Writer(width, height, greyscale=True)
-            w.write(f, out_arr)
-        return 1
+        return write_grey_png(self.values(), out, bit_depth, value_range)
     
 
 cdef class GreyLatLonMap(LatLonMap):
     
+    def __cinit__(
+            self, *args, storage=DEFAULT_GREY_STORAGE, scale=1., offset=0.,
+            **kwargs):
+        """
+        Sets the type in which the map's values are stored, before the
+        map's data is allocated or loaded.
+        :param storage: str; one of GREY_STORAGES. Maps stored as float16,
+                    int16 or uint16 use half the memory of float32 maps,
+                    and decode each value as stored * scale + offset.
+        :param scale: float; see grey_quantization.
+        :param offset: float
+        """
+        self._set_storage(storage, scale, offset)
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False:
+        """
+        Sets storage type, scale and offset of map values.
+        """
+        if storage not in GREY_STORAGES:
+            raise ValueError(f'Unknown grey map storage: {storage!r}; '
+                             f'expected one of {sorted(GREY_STORAGES)}')
+        if not 0 < scale < float('inf'):
+            raise ValueError(f'Invalid scale: {scale}')
+        if GREY_STORAGES[storage] == GREY_FLOAT32 and \
+                (scale != 1 or offset != 0):
+            raise ValueError('float32 maps cannot be scaled or offset')
+        self._storage = GREY_STORAGES[storage]
+        self.scale = scale
+        self.offset = offset
+        return 1
+    
     cdef bint _allocate_arr(self) except False:
-        self._arr = malloc(self.width * self.height * sizeof(a_t))
+        self._arr = malloc(self.width * self.height * self._item_size())
         return 1
     
-    cpdef bint load_arr(self, unicode path) except False:
+    cdef bint _view_arr(self, AbstractMap m) except False:
         """
-        Loads array data from passed filepath.
-        :param path: unicode str
+        Sets map data to be a view of passed map's data, which is stored
+        in the same way as passed map's, if it is a grey map.
+        :param m: AbstractMap
         """
-        cdef np.ndarray arr
+        AbstractMap._view_arr(self, m)
+        if isinstance(m, GREY_MAP_TYPES):
+            self._set_storage(m.storage, m.scale, m.offset)
+        return 1
     
-        arr = np.load(path, allow_pickle=False)
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(a_t) if self._storage == GREY_FLOAT32 else 2
     
-        # validate data
-        if not arr.dtype == np.float32:
-            raise TypeError(
-                f'Loaded arr had wrong data type. Got: {arr.dtype} '
-                f'Expected: float32'
-            )
+    cdef const char *_buffer_format(self):
+        if self._storage == GREY_FLOAT16:
+            return GREY_F16_FORMAT
+        elif self._storage == GREY_INT16:
+            return GREY_I16_FORMAT
+        elif self._storage == GREY_UINT16:
+            return GREY_U16_FORMAT
+        return GREY_FORMAT
     
-        if not len(arr) == self.height:
-            raise ValueError(
-                f'Passed array of unexpected height. Got: {len(arr)}, '
-                f'expected {self.height}'
-            )
+    @property
+    def dtype(self):
+        return GREY_STORAGE_DTYPES[self._storage]
     
-        if not len(arr[0]) == self.width:
-            raise ValueError(
-                f'Passed array of unexpected width. Got: {len(arr[1])}, '
-                f'expected {self.width}'
-            )
+    @property
+    def storage(self):
+        """
+        Name of the type in which map values are stored; one of
+        GREY_STORAGES.
+        """
+        return GREY_STORAGE_DTYPES[self._storage].name
     
-        # transfer values
-        for y in range(self.height):
-            for x in range(self.width):
-                (<a_t *>self._arr)[y * self.width + x] = arr[y, x]
-        return 1
+    @property
+    def quantization(self):
+        """
+        Storage, scale and offset of map values, as keyword arguments of
+        the map's constructor.
+        :return: dict
+        """
+        return {'storage': self.storage,
+                'scale': self.scale,
+                'offset': self.offset}
     
-    cpdef bint save(self, unicode path) except False:
+    cdef a_t load_(self, Py_ssize_t i) nogil:
         """
-        Saves map data to passed file path
-        :param path: unicode str
+        Gets decoded value stored at passed index of map data.
+        :param i: index
+        :return: a_t
+        """
+        return grey_load_(self._arr, self._storage, self.scale, self.offset, i)
+    
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil:
+        """
+        Encodes and stores value at passed index of map data.
+        :param i: index
+        :param v: a_t
         """
-        n_arr = np.ndarray((self.height, self.width), dtype=np.float32)
+        grey_store_(self._arr, self._storage, self.scale, self.offset, i, v)
     
-        # populate numpy arr
-        for y in range(self.height):
-            for x in range(self.width):
-                n_arr[y, x] = (<a_t *>self._arr)[y * self.width + x]
+    cpdef np.ndarray values(self):
+        """
+        Gets map values as a float32 array. Maps stored as float32 return
+        a view of their data; others return a decoded copy.
+        :return: np.ndarray
+        """
+        arr = np.asarray(self)
+        if self._storage == GREY_FLOAT32:
+            return arr
+        return arr.astype(np.float32) * np.float32(self.scale) + \
+            np.float32(self.offset)
     
-        np.save(path, n_arr, allow_pickle=False)
+    cpdef bint set_values(self, values) except False:
+        """
+        Sets map values from passed array of floats, encoding them as
+        they would be by set_xy.
+        :param values: array_like of shape (height, width)
+        """
+        arr = np.asarray(self)
+        values = np.asarray(values, np.float32)
+        if self._storage == GREY_FLOAT32:
+            arr[:] = values
+            return 1
+        q = (values - np.float32(self.offset)) / np.float32(self.scale)
+        if self._storage == GREY_FLOAT16:
+            arr[:] = q.astype(np.float16)
+        else:
+            info = np.iinfo(arr.dtype)
+            arr[:] = np.rint(np.clip(q, info.min, info.max))
         return 1
     
     cdef bint clone(self, AbstractMap p) except False:
@@ -1466,21 +2096,17 @@ cdef class GreyLatLonMap(LatLonMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, grey_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef a_t v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            self.store_(i, p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i]))
         return 1
     
     cpdef a_t v_from_lat_lon(self, pos) except? -1.:
@@ -1564,7 +2190,7 @@ cdef class GreyLatLonMap(LatLonMap):
             assert 0 <= pos[1] <= self.height - 1, \
                 f'{pos[1]} outside height range 0 - {self.height - 1}'
     
-        return (<a_t *> self._arr)[pos[1] * self.width + pos[0]]
+        return self.load_(pos[1] * self.width + pos[0])
     
     cpdef a_t v_from_vector(self, vector) except? -1.:
         """
@@ -1582,6 +2208,78 @@ cdef class GreyLatLonMap(LatLonMap):
         """
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_rel_xys(self, positions):
+        """
+        Gets values at each of the passed relative x, y positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs, each
+                    in range (0-1) inclusive
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(positions, 1, 1, True)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef double x_scale = self.width - 1, y_scale = self.height - 1
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(mu.vec2New(
+                positions_[i, 0] * x_scale, positions_[i, 1] * y_scale))
+        return out
+    
     cpdef object gradient_from_xy(self, tuple[double] pos):
         """
         Gets gradient of map as a vec2 at passed position.
@@ -1712,6 +2410,8 @@ cdef class GreyLatLonMap(LatLonMap):
     
     cpdef bint set_xy(self, pos, v) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = <int>pos[0]
         pos_[1] = <int>pos[1]
         if not 0 <= pos_[0] < self.width:
@@ -1727,7 +2427,7 @@ cdef class GreyLatLonMap(LatLonMap):
         IF ASSERTS:
             if isnan(v):
                 fprintf(stderr, 'GreyMap.set_xy_(): got NaN value')
-        (<a_t *> self._arr)[pos[1] * self.width + pos[0]] = v
+        self.store_(pos[1] * self.width + pos[0], v)
     
     @cython.wraparound(False)
     @cython.initializedcheck(False)
@@ -1743,10 +2443,8 @@ cdef class GreyLatLonMap(LatLonMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef a_t left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef a_t *arr = <a_t *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -1757,16 +2455,34 @@ cdef class GreyLatLonMap(LatLonMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return a_t
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef a_t left0, left1, right0, right1, vf
+        cdef void *arr = self._arr
+        cdef int kind = self._storage
+        cdef float scale = self.scale, offset = self.offset
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
             p1 = p2 + self.width
             p0 = p1 + 1
     
-            left0 = arr[p2]
-            left1 = arr[p1]
-            right0 = arr[p3]
-            right1 = arr[p0]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
+            right1 = grey_load_(arr, kind, scale, offset, p0)
     
             left0 = left1 * b_mod + left0 * (1 - b_mod)
             right0 = right1 * b_mod + right0 * (1 - b_mod)
@@ -1774,132 +2490,176 @@ cdef class GreyLatLonMap(LatLonMap):
         elif a_mod:  # if a_mod > 0 and b_mod == 0:
             # if only one row
             p3 = p2 + 1
-            left0 = arr[p2]
-            right0 = arr[p3]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
             vf = right0 * a_mod + left0 * (1 - a_mod)
         elif b_mod:  # if b_mod > 0 and a_mod == 0:
             # if only one column
             p1 = p2 + self.width  # get pixel above base (p2) pixel
-            left0 = arr[p2]
-            left1 = arr[p1]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
             vf = left1 * b_mod + left0 * (1 - b_mod)
         else:  # both a_mod and b_mod are 0.:
             # if both passed values are whole numbers, just get the
             # corresponding value
-            vf = arr[p2]
+            vf = grey_load_(arr, kind, scale, offset, p2)
     
         return vf
     
     
-    @cython.cdivision(True)
-    @cython.wraparound(False)
-    cpdef bint write_png(self, unicode out) except False:
+    cpdef tuple value_range(self):
+        """
+        Gets the minimum and maximum values stored in map.
+        :return: tuple(min, max)
+        """
+        return grey_value_range(self.values())
+    
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=8, tuple value_range=None
+            ) except False:
         """
-        Writes map as a png to the passed path.
+        Writes map as a greyscale png to the passed path.
+        Unless a value range is passed, the png spans 0-64, expanded to
+        the nearest power of two on either side if the map's values lie
+        outside of that range.
         :param out: path String
+        :param bit_depth: 8 or 16
+        :param value_range: tuple(min, max) of values mapped to black
+                    and white. Values outside the range are clipped.
         :return: None
         """
-        cdef float max = 64, min = 0
-        cdef int x, y
-        cdef float v
-        cdef int[2] pos
-        cdef np.ndarray out_arr
-        if '.' not in out:
-            out += '.png'  # adjust out path
-        while True:
-            # try to get array to print. if a value is outside range,
-            # start over and increase max.
-            # this lets us see a map that is scaled to fit the t range
-            # of a planet.
-            restart = False  # reset flag
-            out_arr = np.ndarray((self.height, self.width), np.uint8)
-            for y in range(self.height):
-                pos[1] = y
-                for x in range(self.width):
-                    pos[0] = x
-                    v = self.v_from_xy_indices_(pos)
-                    if v > max:
-                        # increase max
-                        max = 2 ** ceil(log2(v))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    if v < min:
-                        # decrease min
-                        min = -(2 ** ceil(log2(abs(v))))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    out_v = (v - min) * 255 / (max - min)
-                    IF ASSERTS:
-                        assert 0 <= out_v < 256, f'{x},{y}: data: {v} out: {out_v}'
-                    out_arr[y][x] = out_v
-                if restart:
-                    break
-            if not restart:
-                break
-    
-        with open(out, 'wb') as f:
-            height = len(out_arr)
-            width = len(out_arr[0])
-            w = png.Writer(width, height, greyscale=True)
-            w.write(f, out_arr)
-        return 1
+        return write_grey_png(self.values(), out, bit_depth, value_range)
     
 
 cdef class GreyTileMap(TileMap):
     
+    def __cinit__(
+            self, *args, storage=DEFAULT_GREY_STORAGE, scale=1., offset=0.,
+            **kwargs):
+        """
+        Sets the type in which the map's values are stored, before the
+        map's data is allocated or loaded.
+        :param storage: str; one of GREY_STORAGES. Maps stored as float16,
+                    int16 or uint16 use half the memory of float32 maps,
+                    and decode each value as stored * scale + offset.
+        :param scale: float; see grey_quantization.
+        :param offset: float
+        """
+        self._set_storage(storage, scale, offset)
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False:
+        """
+        Sets storage type, scale and offset of map values.
+        """
+        if storage not in GREY_STORAGES:
+            raise ValueError(f'Unknown grey map storage: {storage!r}; '
+                             f'expected one of {sorted(GREY_STORAGES)}')
+        if not 0 < scale < float('inf'):
+            raise ValueError(f'Invalid scale: {scale}')
+        if GREY_STORAGES[storage] == GREY_FLOAT32 and \
+                (scale != 1 or offset != 0):
+            raise ValueError('float32 maps cannot be scaled or offset')
+        self._storage = GREY_STORAGES[storage]
+        self.scale = scale
+        self.offset = offset
+        return 1
+    
     cdef bint _allocate_arr(self) except False:
-        self._arr = malloc(self.width * self.height * sizeof(a_t))
+        self._arr = malloc(self.width * self.height * self._item_size())
         return 1
     
-    cpdef bint load_arr(self, unicode path) except False:
+    cdef bint _view_arr(self, AbstractMap m) except False:
         """
-        Loads array data from passed filepath.
-        :param path: unicode str
+        Sets map data to be a view of passed map's data, which is stored
+        in the same way as passed map's, if it is a grey map.
+        :param m: AbstractMap
         """
-        cdef np.ndarray arr
+        AbstractMap._view_arr(self, m)
+        if isinstance(m, GREY_MAP_TYPES):
+            self._set_storage(m.storage, m.scale, m.offset)
+        return 1
     
-        arr = np.load(path, allow_pickle=False)
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(a_t) if self._storage == GREY_FLOAT32 else 2
     
-        # validate data
-        if not arr.dtype == np.float32:
-            raise TypeError(
-                f'Loaded arr had wrong data type. Got: {arr.dtype} '
-                f'Expected: float32'
-            )
+    cdef const char *_buffer_format(self):
+        if self._storage == GREY_FLOAT16:
+            return GREY_F16_FORMAT
+        elif self._storage == GREY_INT16:
+            return GREY_I16_FORMAT
+        elif self._storage == GREY_UINT16:
+            return GREY_U16_FORMAT
+        return GREY_FORMAT
     
-        if not len(arr) == self.height:
-            raise ValueError(
-                f'Passed array of unexpected height. Got: {len(arr)}, '
-                f'expected {self.height}'
-            )
+    @property
+    def dtype(self):
+        return GREY_STORAGE_DTYPES[self._storage]
     
-        if not len(arr[0]) == self.width:
-            raise ValueError(
-                f'Passed array of unexpected width. Got: {len(arr[1])}, '
-                f'expected {self.width}'
-            )
+    @property
+    def storage(self):
+        """
+        Name of the type in which map values are stored; one of
+        GREY_STORAGES.
+        """
+        return GREY_STORAGE_DTYPES[self._storage].name
     
-        # transfer values
-        for y in range(self.height):
-            for x in range(self.width):
-                (<a_t *>self._arr)[y * self.width + x] = arr[y, x]
-        return 1
+    @property
+    def quantization(self):
+        """
+        Storage, scale and offset of map values, as keyword arguments of
+        the map's constructor.
+        :return: dict
+        """
+        return {'storage': self.storage,
+                'scale': self.scale,
+                'offset': self.offset}
     
-    cpdef bint save(self, unicode path) except False:
+    cdef a_t load_(self, Py_ssize_t i) nogil:
         """
-        Saves map data to passed file path
-        :param path: unicode str
+        Gets decoded value stored at passed index of map data.
+        :param i: index
+        :return: a_t
         """
-        n_arr = np.ndarray((self.height, self.width), dtype=np.float32)
+        return grey_load_(self._arr, self._storage, self.scale, self.offset, i)
     
-        # populate numpy arr
-        for y in range(self.height):
-            for x in range(self.width):
-                n_arr[y, x] = (<a_t *>self._arr)[y * self.width + x]
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil:
+        """
+        Encodes and stores value at passed index of map data.
+        :param i: index
+        :param v: a_t
+        """
+        grey_store_(self._arr, self._storage, self.scale, self.offset, i, v)
+    
+    cpdef np.ndarray values(self):
+        """
+        Gets map values as a float32 array. Maps stored as float32 return
+        a view of their data; others return a decoded copy.
+        :return: np.ndarray
+        """
+        arr = np.asarray(self)
+        if self._storage == GREY_FLOAT32:
+            return arr
+        return arr.astype(np.float32) * np.float32(self.scale) + \
+            np.float32(self.offset)
     
-        np.save(path, n_arr, allow_pickle=False)
+    cpdef bint set_values(self, values) except False:
+        """
+        Sets map values from passed array of floats, encoding them as
+        they would be by set_xy.
+        :param values: array_like of shape (height, width)
+        """
+        arr = np.asarray(self)
+        values = np.asarray(values, np.float32)
+        if self._storage == GREY_FLOAT32:
+            arr[:] = values
+            return 1
+        q = (values - np.float32(self.offset)) / np.float32(self.scale)
+        if self._storage == GREY_FLOAT16:
+            arr[:] = q.astype(np.float16)
+        else:
+            info = np.iinfo(arr.dtype)
+            arr[:] = np.rint(np.clip(q, info.min, info.max))
         return 1
     
     cdef bint clone(self, AbstractMap p) except False:
@@ -1922,21 +2682,17 @@ cdef class GreyTileMap(TileMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, grey_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef a_t v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            self.store_(i, p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i]))
         return 1
     
     cpdef a_t v_from_lat_lon(self, pos) except? -1.:
@@ -2020,7 +2776,7 @@ cdef class GreyTileMap(TileMap):
             assert 0 <= pos[1] <= self.height - 1, \
                 f'{pos[1]} outside height range 0 - {self.height - 1}'
     
-        return (<a_t *> self._arr)[pos[1] * self.width + pos[0]]
+        return self.load_(pos[1] * self.width + pos[0])
     
     cpdef a_t v_from_vector(self, vector) except? -1.:
         """
@@ -2038,6 +2794,78 @@ cdef class GreyTileMap(TileMap):
         """
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_rel_xys(self, positions):
+        """
+        Gets values at each of the passed relative x, y positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs, each
+                    in range (0-1) inclusive
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(positions, 1, 1, True)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef double x_scale = self.width - 1, y_scale = self.height - 1
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(mu.vec2New(
+                positions_[i, 0] * x_scale, positions_[i, 1] * y_scale))
+        return out
+    
     cpdef object gradient_from_xy(self, tuple[double] pos):
         """
         Gets gradient of map as a vec2 at passed position.
@@ -2168,6 +2996,8 @@ cdef class GreyTileMap(TileMap):
     
     cpdef bint set_xy(self, pos, v) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = <int>pos[0]
         pos_[1] = <int>pos[1]
         if not 0 <= pos_[0] < self.width:
@@ -2183,7 +3013,7 @@ cdef class GreyTileMap(TileMap):
         IF ASSERTS:
             if isnan(v):
                 fprintf(stderr, 'GreyMap.set_xy_(): got NaN value')
-        (<a_t *> self._arr)[pos[1] * self.width + pos[0]] = v
+        self.store_(pos[1] * self.width + pos[0], v)
     
     @cython.wraparound(False)
     @cython.initializedcheck(False)
@@ -2199,10 +3029,8 @@ cdef class GreyTileMap(TileMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef a_t left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef a_t *arr = <a_t *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -2213,16 +3041,34 @@ cdef class GreyTileMap(TileMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return a_t
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef a_t left0, left1, right0, right1, vf
+        cdef void *arr = self._arr
+        cdef int kind = self._storage
+        cdef float scale = self.scale, offset = self.offset
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
             p1 = p2 + self.width
             p0 = p1 + 1
     
-            left0 = arr[p2]
-            left1 = arr[p1]
-            right0 = arr[p3]
-            right1 = arr[p0]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
+            right1 = grey_load_(arr, kind, scale, offset, p0)
     
             left0 = left1 * b_mod + left0 * (1 - b_mod)
             right0 = right1 * b_mod + right0 * (1 - b_mod)
@@ -2230,132 +3076,176 @@ cdef class GreyTileMap(TileMap):
         elif a_mod:  # if a_mod > 0 and b_mod == 0:
             # if only one row
             p3 = p2 + 1
-            left0 = arr[p2]
-            right0 = arr[p3]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
             vf = right0 * a_mod + left0 * (1 - a_mod)
         elif b_mod:  # if b_mod > 0 and a_mod == 0:
             # if only one column
             p1 = p2 + self.width  # get pixel above base (p2) pixel
-            left0 = arr[p2]
-            left1 = arr[p1]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
             vf = left1 * b_mod + left0 * (1 - b_mod)
         else:  # both a_mod and b_mod are 0.:
             # if both passed values are whole numbers, just get the
             # corresponding value
-            vf = arr[p2]
+            vf = grey_load_(arr, kind, scale, offset, p2)
     
         return vf
     
     
-    @cython.cdivision(True)
-    @cython.wraparound(False)
-    cpdef bint write_png(self, unicode out) except False:
+    cpdef tuple value_range(self):
+        """
+        Gets the minimum and maximum values stored in map.
+        :return: tuple(min, max)
+        """
+        return grey_value_range(self.values())
+    
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=8, tuple value_range=None
+            ) except False:
         """
-        Writes map as a png to the passed path.
+        Writes map as a greyscale png to the passed path.
+        Unless a value range is passed, the png spans 0-64, expanded to
+        the nearest power of two on either side if the map's values lie
+        outside of that range.
         :param out: path String
+        :param bit_depth: 8 or 16
+        :param value_range: tuple(min, max) of values mapped to black
+                    and white. Values outside the range are clipped.
         :return: None
         """
-        cdef float max = 64, min = 0
-        cdef int x, y
-        cdef float v
-        cdef int[2] pos
-        cdef np.ndarray out_arr
-        if '.' not in out:
-            out += '.png'  # adjust out path
-        while True:
-            # try to get array to print. if a value is outside range,
-            # start over and increase max.
-            # this lets us see a map that is scaled to fit the t range
-            # of a planet.
-            restart = False  # reset flag
-            out_arr = np.ndarray((self.height, self.width), np.uint8)
-            for y in range(self.height):
-                pos[1] = y
-                for x in range(self.width):
-                    pos[0] = x
-                    v = self.v_from_xy_indices_(pos)
-                    if v > max:
-                        # increase max
-                        max = 2 ** ceil(log2(v))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    if v < min:
-                        # decrease min
-                        min = -(2 ** ceil(log2(abs(v))))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    out_v = (v - min) * 255 / (max - min)
-                    IF ASSERTS:
-                        assert 0 <= out_v < 256, f'{x},{y}: data: {v} out: {out_v}'
-                    out_arr[y][x] = out_v
-                if restart:
-                    break
-            if not restart:
-                break
-    
-        with open(out, 'wb') as f:
-            height = len(out_arr)
-            width = len(out_arr[0])
-            w = png.Writer(width, height, greyscale=True)
-            w.write(f, out_arr)
-        return 1
+        return write_grey_png(self.values(), out, bit_depth, value_range)
     
 
 cdef class GreyCubeSide(CubeSide):
     
+    def __cinit__(
+            self, *args, storage=DEFAULT_GREY_STORAGE, scale=1., offset=0.,
+            **kwargs):
+        """
+        Sets the type in which the map's values are stored, before the
+        map's data is allocated or loaded.
+        :param storage: str; one of GREY_STORAGES. Maps stored as float16,
+                    int16 or uint16 use half the memory of float32 maps,
+                    and decode each value as stored * scale + offset.
+        :param scale: float; see grey_quantization.
+        :param offset: float
+        """
+        self._set_storage(storage, scale, offset)
+    
+    cdef bint _set_storage(
+            self, str storage, double scale, double offset) except False:
+        """
+        Sets storage type, scale and offset of map values.
+        """
+        if storage not in GREY_STORAGES:
+            raise ValueError(f'Unknown grey map storage: {storage!r}; '
+                             f'expected one of {sorted(GREY_STORAGES)}')
+        if not 0 < scale < float('inf'):
+            raise ValueError(f'Invalid scale: {scale}')
+        if GREY_STORAGES[storage] == GREY_FLOAT32 and \
+                (scale != 1 or offset != 0):
+            raise ValueError('float32 maps cannot be scaled or offset')
+        self._storage = GREY_STORAGES[storage]
+        self.scale = scale
+        self.offset = offset
+        return 1
+    
     cdef bint _allocate_arr(self) except False:
-        self._arr = malloc(self.width * self.height * sizeof(a_t))
+        self._arr = malloc(self.width * self.height * self._item_size())
         return 1
     
-    cpdef bint load_arr(self, unicode path) except False:
+    cdef bint _view_arr(self, AbstractMap m) except False:
         """
-        Loads array data from passed filepath.
-        :param path: unicode str
+        Sets map data to be a view of passed map's data, which is stored
+        in the same way as passed map's, if it is a grey map.
+        :param m: AbstractMap
         """
-        cdef np.ndarray arr
+        AbstractMap._view_arr(self, m)
+        if isinstance(m, GREY_MAP_TYPES):
+            self._set_storage(m.storage, m.scale, m.offset)
+        return 1
     
-        arr = np.load(path, allow_pickle=False)
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(a_t) if self._storage == GREY_FLOAT32 else 2
     
-        # validate data
-        if not arr.dtype == np.float32:
-            raise TypeError(
-                f'Loaded arr had wrong data type. Got: {arr.dtype} '
-                f'Expected: float32'
-            )
+    cdef const char *_buffer_format(self):
+        if self._storage == GREY_FLOAT16:
+            return GREY_F16_FORMAT
+        elif self._storage == GREY_INT16:
+            return GREY_I16_FORMAT
+        elif self._storage == GREY_UINT16:
+            return GREY_U16_FORMAT
+        return GREY_FORMAT
     
-        if not len(arr) == self.height:
-            raise ValueError(
-                f'Passed array of unexpected height. Got: {len(arr)}, '
-                f'expected {self.height}'
-            )
+    @property
+    def dtype(self):
+        return GREY_STORAGE_DTYPES[self._storage]
     
-        if not len(arr[0]) == self.width:
-            raise ValueError(
-                f'Passed array of unexpected width. Got: {len(arr[1])}, '
-                f'expected {self.width}'
-            )
+    @property
+    def storage(self):
+        """
+        Name of the type in which map values are stored; one of
+        GREY_STORAGES.
+        """
+        return GREY_STORAGE_DTYPES[self._storage].name
     
-        # transfer values
-        for y in range(self.height):
-            for x in range(self.width):
-                (<a_t *>self._arr)[y * self.width + x] = arr[y, x]
-        return 1
+    @property
+    def quantization(self):
+        """
+        Storage, scale and offset of map values, as keyword arguments of
+        the map's constructor.
+        :return: dict
+        """
+        return {'storage': self.storage,
+                'scale': self.scale,
+                'offset': self.offset}
     
-    cpdef bint save(self, unicode path) except False:
+    cdef a_t load_(self, Py_ssize_t i) nogil:
         """
-        Saves map data to passed file path
-        :param path: unicode str
+        Gets decoded value stored at passed index of map data.
+        :param i: index
+        :return: a_t
         """
-        n_arr = np.ndarray((self.height, self.width), dtype=np.float32)
+        return grey_load_(self._arr, self._storage, self.scale, self.offset, i)
     
-        # populate numpy arr
-        for y in range(self.height):
-            for x in range(self.width):
-                n_arr[y, x] = (<a_t *>self._arr)[y * self.width + x]
+    cdef void store_(self, Py_ssize_t i, a_t v) nogil:
+        """
+        Encodes and stores value at passed index of map data.
+        :param i: index
+        :param v: a_t
+        """
+        grey_store_(self._arr, self._storage, self.scale, self.offset, i, v)
+    
+    cpdef np.ndarray values(self):
+        """
+        Gets map values as a float32 array. Maps stored as float32 return
+        a view of their data; others return a decoded copy.
+        :return: np.ndarray
+        """
+        arr = np.asarray(self)
+        if self._storage == GREY_FLOAT32:
+            return arr
+        return arr.astype(np.float32) * np.float32(self.scale) + \
+            np.float32(self.offset)
     
-        np.save(path, n_arr, allow_pickle=False)
+    cpdef bint set_values(self, values) except False:
+        """
+        Sets map values from passed array of floats, encoding them as
+        they would be by set_xy.
+        :param values: array_like of shape (height, width)
+        """
+        arr = np.asarray(self)
+        values = np.asarray(values, np.float32)
+        if self._storage == GREY_FLOAT32:
+            arr[:] = values
+            return 1
+        q = (values - np.float32(self.offset)) / np.float32(self.scale)
+        if self._storage == GREY_FLOAT16:
+            arr[:] = q.astype(np.float16)
+        else:
+            info = np.iinfo(arr.dtype)
+            arr[:] = np.rint(np.clip(q, info.min, info.max))
         return 1
     
     cdef bint clone(self, AbstractMap p) except False:
@@ -2378,21 +3268,17 @@ cdef class GreyCubeSide(CubeSide):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, grey_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef a_t v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            self.store_(i, p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i]))
         return 1
     
     cpdef a_t v_from_lat_lon(self, pos) except? -1.:
@@ -2476,7 +3362,7 @@ cdef class GreyCubeSide(CubeSide):
             assert 0 <= pos[1] <= self.height - 1, \
                 f'{pos[1]} outside height range 0 - {self.height - 1}'
     
-        return (<a_t *> self._arr)[pos[1] * self.width + pos[0]]
+        return self.load_(pos[1] * self.width + pos[0])
     
     cpdef a_t v_from_vector(self, vector) except? -1.:
         """
@@ -2494,6 +3380,78 @@ cdef class GreyCubeSide(CubeSide):
         """
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_rel_xys(self, positions):
+        """
+        Gets values at each of the passed relative x, y positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs, each
+                    in range (0-1) inclusive
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(positions, 1, 1, True)
+        cdef np.ndarray out = np.empty(positions_.shape[0], GREY_DTYPE)
+        cdef a_t[::1] out_ = out
+        cdef double x_scale = self.width - 1, y_scale = self.height - 1
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(mu.vec2New(
+                positions_[i, 0] * x_scale, positions_[i, 1] * y_scale))
+        return out
+    
     cpdef object gradient_from_xy(self, tuple[double] pos):
         """
         Gets gradient of map as a vec2 at passed position.
@@ -2624,6 +3582,8 @@ cdef class GreyCubeSide(CubeSide):
     
     cpdef bint set_xy(self, pos, v) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = <int>pos[0]
         pos_[1] = <int>pos[1]
         if not 0 <= pos_[0] < self.width:
@@ -2639,7 +3599,7 @@ cdef class GreyCubeSide(CubeSide):
         IF ASSERTS:
             if isnan(v):
                 fprintf(stderr, 'GreyMap.set_xy_(): got NaN value')
-        (<a_t *> self._arr)[pos[1] * self.width + pos[0]] = v
+        self.store_(pos[1] * self.width + pos[0], v)
     
     @cython.wraparound(False)
     @cython.initializedcheck(False)
@@ -2655,10 +3615,8 @@ cdef class GreyCubeSide(CubeSide):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef a_t left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef a_t *arr = <a_t *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -2669,16 +3627,34 @@ cdef class GreyCubeSide(CubeSide):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef a_t sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil except? -1.:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return a_t
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef a_t left0, left1, right0, right1, vf
+        cdef void *arr = self._arr
+        cdef int kind = self._storage
+        cdef float scale = self.scale, offset = self.offset
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
             p1 = p2 + self.width
             p0 = p1 + 1
     
-            left0 = arr[p2]
-            left1 = arr[p1]
-            right0 = arr[p3]
-            right1 = arr[p0]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
+            right1 = grey_load_(arr, kind, scale, offset, p0)
     
             left0 = left1 * b_mod + left0 * (1 - b_mod)
             right0 = right1 * b_mod + right0 * (1 - b_mod)
@@ -2686,77 +3662,45 @@ cdef class GreyCubeSide(CubeSide):
         elif a_mod:  # if a_mod > 0 and b_mod == 0:
             # if only one row
             p3 = p2 + 1
-            left0 = arr[p2]
-            right0 = arr[p3]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            right0 = grey_load_(arr, kind, scale, offset, p3)
             vf = right0 * a_mod + left0 * (1 - a_mod)
         elif b_mod:  # if b_mod > 0 and a_mod == 0:
             # if only one column
             p1 = p2 + self.width  # get pixel above base (p2) pixel
-            left0 = arr[p2]
-            left1 = arr[p1]
+            left0 = grey_load_(arr, kind, scale, offset, p2)
+            left1 = grey_load_(arr, kind, scale, offset, p1)
             vf = left1 * b_mod + left0 * (1 - b_mod)
         else:  # both a_mod and b_mod are 0.:
             # if both passed values are whole numbers, just get the
             # corresponding value
-            vf = arr[p2]
+            vf = grey_load_(arr, kind, scale, offset, p2)
     
         return vf
     
     
-    @cython.cdivision(True)
-    @cython.wraparound(False)
-    cpdef bint write_png(self, unicode out) except False:
+    cpdef tuple value_range(self):
+        """
+        Gets the minimum and maximum values stored in map.
+        :return: tuple(min, max)
+        """
+        return grey_value_range(self.values())
+    
+    cpdef bint write_png(
+            self, unicode out, int bit_depth=8, tuple value_range=None
+            ) except False:
         """
-        Writes map as a png to the passed path.
+        Writes map as a greyscale png to the passed path.
+        Unless a value range is passed, the png spans 0-64, expanded to
+        the nearest power of two on either side if the map's values lie
+        outside of that range.
         :param out: path String
+        :param bit_depth: 8 or 16
+        :param value_range: tuple(min, max) of values mapped to black
+                    and white. Values outside the range are clipped.
         :return: None
         """
-        cdef float max = 64, min = 0
-        cdef int x, y
-        cdef float v
-        cdef int[2] pos
-        cdef np.ndarray out_arr
-        if '.' not in out:
-            out += '.png'  # adjust out path
-        while True:
-            # try to get array to print. if a value is outside range,
-            # start over and increase max.
-            # this lets us see a map that is scaled to fit the t range
-            # of a planet.
-            restart = False  # reset flag
-            out_arr = np.ndarray((self.height, self.width), np.uint8)
-            for y in range(self.height):
-                pos[1] = y
-                for x in range(self.width):
-                    pos[0] = x
-                    v = self.v_from_xy_indices_(pos)
-                    if v > max:
-                        # increase max
-                        max = 2 ** ceil(log2(v))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    if v < min:
-                        # decrease min
-                        min = -(2 ** ceil(log2(abs(v))))
-                        # awkwardly use flag to break nested loop
-                        restart = True
-                        break
-                    out_v = (v - min) * 255 / (max - min)
-                    IF ASSERTS:
-                        assert 0 <= out_v < 256, f'{x},{y}: data: {v} out: {out_v}'
-                    out_arr[y][x] = out_v
-                if restart:
-                    break
-            if not restart:
-                break
-    
-        with open(out, 'wb') as f:
-            height = len(out_arr)
-            width = len(out_arr[0])
-            w = png.Writer(width, height, greyscale=True)
-            w.write(f, out_arr)
-        return 1
+        return write_grey_png(self.values(), out, bit_depth, value_range)
     
 
 
@@ -2772,6 +3716,16 @@ cdef class VecCubeMap(CubeMap):
         self._arr = malloc(self.width * self.height * sizeof(av))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(av)
+    
+    cdef const char *_buffer_format(self):
+        return VEC_FORMAT
+    
+    @property
+    def dtype(self):
+        return VEC_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -2792,21 +3746,18 @@ cdef class VecCubeMap(CubeMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, vec_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef av v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef av *arr = <av *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -2837,10 +3788,65 @@ cdef class VecCubeMap(CubeMap):
     cdef av v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False:
         cdef int[2] pos_
         cdef av vec_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         vec_.x = vec[0]
@@ -2865,10 +3871,8 @@ cdef class VecCubeMap(CubeMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef av left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef av *arr = <av *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -2879,6 +3883,22 @@ cdef class VecCubeMap(CubeMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef av sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return av
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef av left0, left1, right0, right1, vf
+        cdef av *arr = <av *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -2921,6 +3941,16 @@ cdef class VecLatLonMap(LatLonMap):
         self._arr = malloc(self.width * self.height * sizeof(av))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(av)
+    
+    cdef const char *_buffer_format(self):
+        return VEC_FORMAT
+    
+    @property
+    def dtype(self):
+        return VEC_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -2941,21 +3971,18 @@ cdef class VecLatLonMap(LatLonMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, vec_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef av v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef av *arr = <av *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -2986,10 +4013,65 @@ cdef class VecLatLonMap(LatLonMap):
     cdef av v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False:
         cdef int[2] pos_
         cdef av vec_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         vec_.x = vec[0]
@@ -3014,10 +4096,8 @@ cdef class VecLatLonMap(LatLonMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef av left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef av *arr = <av *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3028,6 +4108,22 @@ cdef class VecLatLonMap(LatLonMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef av sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return av
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef av left0, left1, right0, right1, vf
+        cdef av *arr = <av *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3070,6 +4166,16 @@ cdef class VecTileMap(TileMap):
         self._arr = malloc(self.width * self.height * sizeof(av))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(av)
+    
+    cdef const char *_buffer_format(self):
+        return VEC_FORMAT
+    
+    @property
+    def dtype(self):
+        return VEC_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3090,21 +4196,18 @@ cdef class VecTileMap(TileMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, vec_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef av v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef av *arr = <av *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3135,10 +4238,65 @@ cdef class VecTileMap(TileMap):
     cdef av v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False:
         cdef int[2] pos_
         cdef av vec_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         vec_.x = vec[0]
@@ -3163,10 +4321,8 @@ cdef class VecTileMap(TileMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef av left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef av *arr = <av *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3177,6 +4333,22 @@ cdef class VecTileMap(TileMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef av sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return av
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef av left0, left1, right0, right1, vf
+        cdef av *arr = <av *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3219,6 +4391,16 @@ cdef class VecCubeSide(CubeSide):
         self._arr = malloc(self.width * self.height * sizeof(av))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(av)
+    
+    cdef const char *_buffer_format(self):
+        return VEC_FORMAT
+    
+    @property
+    def dtype(self):
+        return VEC_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3239,21 +4421,18 @@ cdef class VecCubeSide(CubeSide):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, vec_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef av v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef av *arr = <av *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3284,10 +4463,65 @@ cdef class VecCubeSide(CubeSide):
     cdef av v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], VEC_DTYPE)
+        cdef av[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, vec) except False:
         cdef int[2] pos_
         cdef av vec_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         vec_.x = vec[0]
@@ -3312,10 +4546,8 @@ cdef class VecCubeSide(CubeSide):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef av left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef av *arr = <av *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3326,6 +4558,22 @@ cdef class VecCubeSide(CubeSide):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef av sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return av
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef av left0, left1, right0, right1, vf
+        cdef av *arr = <av *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3374,6 +4622,16 @@ cdef class RegCubeMap(CubeMap):
         self._arr = malloc(self.width * self.height * sizeof(rt))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(rt)
+    
+    cdef const char *_buffer_format(self):
+        return REG_FORMAT
+    
+    @property
+    def dtype(self):
+        return REG_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3393,21 +4651,18 @@ cdef class RegCubeMap(CubeMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, reg_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef rt v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef rt *arr = <rt *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3438,9 +4693,64 @@ cdef class RegCubeMap(CubeMap):
     cdef rt v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         self.set_xy_(pos_, r)
@@ -3463,10 +4773,8 @@ cdef class RegCubeMap(CubeMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef rt left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef rt *arr = <rt *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3477,6 +4785,22 @@ cdef class RegCubeMap(CubeMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef rt sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return rt
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef rt left0, left1, right0, right1, vf
+        cdef rt *arr = <rt *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3519,6 +4843,16 @@ cdef class RegLatLonMap(LatLonMap):
         self._arr = malloc(self.width * self.height * sizeof(rt))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(rt)
+    
+    cdef const char *_buffer_format(self):
+        return REG_FORMAT
+    
+    @property
+    def dtype(self):
+        return REG_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3538,21 +4872,18 @@ cdef class RegLatLonMap(LatLonMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, reg_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef rt v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef rt *arr = <rt *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3583,9 +4914,64 @@ cdef class RegLatLonMap(LatLonMap):
     cdef rt v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         self.set_xy_(pos_, r)
@@ -3608,10 +4994,8 @@ cdef class RegLatLonMap(LatLonMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef rt left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef rt *arr = <rt *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3622,6 +5006,22 @@ cdef class RegLatLonMap(LatLonMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef rt sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return rt
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef rt left0, left1, right0, right1, vf
+        cdef rt *arr = <rt *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3664,6 +5064,16 @@ cdef class RegTileMap(TileMap):
         self._arr = malloc(self.width * self.height * sizeof(rt))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(rt)
+    
+    cdef const char *_buffer_format(self):
+        return REG_FORMAT
+    
+    @property
+    def dtype(self):
+        return REG_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3683,21 +5093,18 @@ cdef class RegTileMap(TileMap):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, reg_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef rt v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef rt *arr = <rt *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3728,9 +5135,64 @@ cdef class RegTileMap(TileMap):
     cdef rt v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         self.set_xy_(pos_, r)
@@ -3753,10 +5215,8 @@ cdef class RegTileMap(TileMap):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef rt left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef rt *arr = <rt *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3767,6 +5227,22 @@ cdef class RegTileMap(TileMap):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef rt sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return rt
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef rt left0, left1, right0, right1, vf
+        cdef rt *arr = <rt *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3809,6 +5285,16 @@ cdef class RegCubeSide(CubeSide):
         self._arr = malloc(self.width * self.height * sizeof(rt))
         return 1
     
+    cdef Py_ssize_t _item_size(self) except -1:
+        return sizeof(rt)
+    
+    cdef const char *_buffer_format(self):
+        return REG_FORMAT
+    
+    @property
+    def dtype(self):
+        return REG_DTYPE
+    
     cdef bint clone(self, AbstractMap p) except False:
         """
         Clones passed map. If map is of a different type
@@ -3828,21 +5314,18 @@ cdef class RegCubeSide(CubeSide):
             raise TypeError(f'Unexpected prototype map type: {p}')
         return 1
     
+    @cython.wraparound(False)
     cdef bint clone_(self, reg_map_t p) except False:
-        cdef vec2 pos
-        cdef vec3 vector
-        cdef int[2] map_pos
-        cdef rt v
-        for x in range(self.width):
-            for y in range(self.height):
-                # get vector corresponding to position
-                pos.x = x
-                pos.y = y
-                vector = self.vector_from_xy_(pos)
-                v = p.v_from_vector_(vector)
-                map_pos[0] = x
-                map_pos[1] = y
-                self.set_xy_(map_pos, v)
+        """
+        Copies values from passed prototype, using a cached remap table
+        of sample positions for the prototype and this map's geometries.
+        """
+        cdef RemapTable table = remap_table_(p, self)
+        cdef rt *arr = <rt *> self._arr
+        cdef Py_ssize_t i
+        for i in prange(table.size, nogil=True, schedule='static'):
+            arr[i] = p.sample_index_(
+                table.index[i], table.a_mod[i], table.b_mod[i])
         return 1
     
     # value retrieval methods
@@ -3873,9 +5356,64 @@ cdef class RegCubeSide(CubeSide):
     cdef rt v_from_vector_(self, vec3 vector) nogil:
         return self.v_from_xy_(self.xy_from_vector_(vector))
     
+    # batch value retrieval methods
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_vectors(self, vectors):
+        """
+        Gets values identified by each of the passed vectors.
+        Values are sampled in parallel, without the GIL.
+        :param vectors: array-like of shape (n, 3)
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] vectors_ = batch_positions_(vectors, 3)
+        cdef np.ndarray out = np.empty(vectors_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(vectors_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(mu.vec3New(
+                vectors_[i, 0], vectors_[i, 1], vectors_[i, 2]))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_lat_lons(self, positions):
+        """
+        Gets values at each of the passed latitude, longitude positions.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (lat, lon) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_lat_lons_(positions)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_vector_(vector_from_lat_lon_(
+                cp2ll_(positions_[i, 0], positions_[i, 1])))
+        return out
+    
+    @cython.wraparound(False)
+    cpdef np.ndarray v_from_xys(self, positions):
+        """
+        Gets values at each of the passed x, y positions on this map.
+        Values are sampled in parallel, without the GIL.
+        :param positions: array-like of shape (n, 2); (x, y) pairs
+        :return np.ndarray of n values
+        """
+        cdef double[:, ::1] positions_ = batch_xys_(
+            positions, self.width, self.height)
+        cdef np.ndarray out = np.empty(positions_.shape[0], REG_DTYPE)
+        cdef rt[::1] out_ = out
+        cdef Py_ssize_t i
+        for i in prange(positions_.shape[0], nogil=True, schedule='static'):
+            out_[i] = self.v_from_xy_(
+                mu.vec2New(positions_[i, 0], positions_[i, 1]))
+        return out
+    
     # setters
     cpdef bint set_xy(self, pos, r) except False:
         cdef int[2] pos_
+        if self.readonly:
+            raise ValueError('Map data is read-only')
         pos_[0] = pos[0]
         pos_[1] = pos[1]
         self.set_xy_(pos_, r)
@@ -3898,10 +5436,8 @@ cdef class RegCubeSide(CubeSide):
         :param w int width of passed array
         :return int
         """
-        cdef int p0, p1, p2, p3  # relative array positions
-        cdef rt left0, left1, right0, right1, vf
+        cdef int p2  # relative array position
         cdef float a_mod, b_mod
-        cdef rt *arr = <rt *> self._arr
     
         pos = mu.vec2Add(pos, self._ref_pos)
     
@@ -3912,6 +5448,22 @@ cdef class RegCubeSide(CubeSide):
     
         p2 = (<int> pos.y) * self.width + (<int> pos.x)
     
+        return self.sample_index_(p2, a_mod, b_mod)
+    
+    @cython.wraparound(False)
+    @cython.initializedcheck(False)
+    cdef rt sample_index_(
+            self, int p2, float a_mod, float b_mod) nogil:
+        """
+        Samples array at the position p2 + (a_mod, b_mod), where p2 is
+        the index of the value preceding the position in both x and y,
+        and a_mod and b_mod are the fractional parts of the position.
+        :return rt
+        """
+        cdef int p0, p1, p3  # relative array positions
+        cdef rt left0, left1, right0, right1, vf
+        cdef rt *arr = <rt *> self._arr
+    
         if a_mod and b_mod:
             # if all 4 pixels are to be used
             p3 = p2 + 1
@@ -3947,8 +5499,284 @@ cdef class RegCubeSide(CubeSide):
     
     
 
+
+# tile map type storing each data type, used for sub-tiles
+TILE_MAP_TYPES = {
+    VEC_DTYPE: VecTileMap,
+    REG_DTYPE: RegTileMap,
+    **{dtype: GreyTileMap for dtype in GREY_STORAGE_DTYPES},
+}
+
     
     
+#######################################################################
+# REMAP TABLES
+#######################################################################
+
+
+cdef class RemapTable:
+    """
+    Stores, for each position in a destination map, the position in a
+    source map's data array from which its value is sampled.
+    Positions depend only on the geometry of the two maps, so a table
+    may be used to copy values between any maps sharing those
+    geometries, regardless of data type.
+    """
+
+    cdef readonly tuple key
+    cdef readonly Py_ssize_t size
+    cdef int *index  # index of value preceding position in x and y
+    cdef float *a_mod  # fractional x component of position
+    cdef float *b_mod  # fractional y component of position
+
+    def __cinit__(self, tuple key, Py_ssize_t size):
+        self.key = key
+        self.size = size
+        self.index = <int *> malloc(size * sizeof(int))
+        self.a_mod = <float *> malloc(size * sizeof(float))
+        self.b_mod = <float *> malloc(size * sizeof(float))
+        if self.index == NULL or self.a_mod == NULL or self.b_mod == NULL:
+            raise MemoryError(f'Could not allocate remap table for {key}')
+
+    def __dealloc__(self):
+        free(self.index)
+        free(self.a_mod)
+        free(self.b_mod)
+
+    @property
+    def nbytes(self):
+        return self.size * (sizeof(int) + 2 * sizeof(float))
+
+
+REMAP_CACHE_SIZE = 8  # max number of remap tables kept
+
+_remap_tables = OrderedDict()  # remap tables, least recently used first
+
+
+def clear_remap_tables():
+    """
+    Discards all cached remap tables.
+    """
+    _remap_tables.clear()
+
+
+cdef RemapTable remap_table_(AbstractMap src, AbstractMap dst):
+    """
+    Gets remap table for sampling src values into dst.
+    Tables are cached by the geometries of the two maps, and are
+    only computed if not already present in the cache.
+    :param src: AbstractMap whose values are to be sampled.
+    :param dst: AbstractMap whose positions are to be sampled.
+    :return RemapTable
+    """
+    cdef tuple key = (src.geometry, dst.geometry)
+    cdef RemapTable table = _remap_tables.get(key)
+    if table is None:
+        table = _make_remap_table(src, dst, key)
+        _remap_tables[key] = table
+        while len(_remap_tables) > REMAP_CACHE_SIZE:
+            _remap_tables.popitem(last=False)
+    else:
+        _remap_tables.move_to_end(key)
+    return table
+
+
+@cython.wraparound(False)
+cdef RemapTable _make_remap_table(
+        AbstractMap src, AbstractMap dst, tuple key):
+    """
+    Computes the source position of each destination map position.
+    Positions are found in the same way as by
+    src.v_from_vector_(dst.vector_from_xy_(pos)), so that values
+    sampled using the table are identical.
+    """
+    cdef RemapTable table = RemapTable(key, dst.width * dst.height)
+    cdef int width = dst.width, height = dst.height
+    cdef int x, y
+    cdef Py_ssize_t i
+    cdef vec2 pos
+
+    IF DEBUG:
+        print(f'computing remap table for {key}')
+
+    for y in prange(height, nogil=True, schedule='static'):
+        for x in range(width):
+            i = y * width + x
+            pos = mu.vec2Add(
+                src.xy_from_vector_(
+                    dst.vector_from_xy_(mu.vec2New(x, y))),
+                src._ref_pos)
+            table.index[i] = (<int> pos.y) * src.width + (<int> pos.x)
+            table.a_mod[i] = pos.x % 1
+            table.b_mod[i] = pos.y % 1
+    return table
+
+
+#######################################################################
+# DIRECTION TABLES
+#######################################################################
+
+
+cdef class DirectionTable:
+    """
+    Stores the unit position vector of each position of maps with a
+    given geometry, and optionally its latitude and longitude.
+    Each component is stored in its own contiguous, row-major array,
+    so that a row of vectors may be passed directly to noise
+    generators as a FastNoiseVectorSet.
+    """
+
+    def __cinit__(self, tuple key, int width, int height):
+        cdef Py_ssize_t size = <Py_ssize_t> width * height
+        self.key = key
+        self.width = width
+        self.height = height
+        self.x = <float *> malloc(size * sizeof(float))
+        self.y = <float *> malloc(size * sizeof(float))
+        self.z = <float *> malloc(size * sizeof(float))
+        self.lat = NULL
+        self.lon = NULL
+        if self.x == NULL or self.y == NULL or self.z == NULL:
+            raise MemoryError(f'Could not allocate direction table for {key}')
+
+    def __dealloc__(self):
+        free(self.x)
+        free(self.y)
+        free(self.z)
+        free(self.lat)
+        free(self.lon)
+
+    @property
+    def has_lat_lon(self):
+        return self.lat != NULL
+
+    @property
+    def nbytes(self):
+        return self.width * self.height * sizeof(float) * (
+            5 if self.has_lat_lon else 3)
+
+    def arrays(self):
+        """
+        Gets copies of the table's components.
+        :return: tuple of (height, width) float32 ndarrays; x, y, z,
+                    followed by lat, lon if the table holds them.
+        """
+        cdef int h = self.height, w = self.width
+        components = [
+            np.asarray(<float[:h, :w]> self.x).copy(),
+            np.asarray(<float[:h, :w]> self.y).copy(),
+            np.asarray(<float[:h, :w]> self.z).copy(),
+        ]
+        if self.has_lat_lon:
+            components.append(np.asarray(<float[:h, :w]> self.lat).copy())
+            components.append(np.asarray(<float[:h, :w]> self.lon).copy())
+        return tuple(components)
+
+    @cython.wraparound(False)
+    cdef bint compute_lat_lon_(self) except False:
+        """
+        Computes latitude and longitude of each position, if not
+        already computed.
+        """
+        cdef Py_ssize_t size = <Py_ssize_t> self.width * self.height
+        cdef Py_ssize_t i
+        cdef float *lat
+        cdef float *lon
+        cdef latlon lat_lon
+        if self.lat != NULL:
+            return 1
+        lat = <float *> malloc(size * sizeof(float))
+        lon = <float *> malloc(size * sizeof(float))
+        if lat == NULL or lon == NULL:
+            free(lat)
+            free(lon)
+            raise MemoryError(
+                f'Could not allocate direction table for {self.key}')
+        for i in prange(size, nogil=True, schedule='static'):
+            lat_lon = lat_lon_from_vector_(
+                mu.vec3New(self.x[i], self.y[i], self.z[i]))
+            lat[i] = lat_lon.lat
+            lon[i] = lat_lon.lon
+        if self.lat != NULL:  # computed concurrently by another thread
+            free(lat)
+            free(lon)
+        else:
+            self.lat = lat
+            self.lon = lon
+        return 1
+
+
+DIRECTION_CACHE_SIZE = 4  # max number of direction tables kept
+
+# direction tables, least recently used first
+_direction_tables = OrderedDict()
+
+
+def clear_direction_tables():
+    """
+    Discards all cached direction tables.
+    """
+    _direction_tables.clear()
+
+
+def direction_table(AbstractMap m, bint lat_lon=False):
+    """
+    Gets the direction table of passed map's geometry.
+    :param m: AbstractMap
+    :param lat_lon: bool; whether table should hold lat and lon.
+    :return: DirectionTable
+    """
+    return direction_table_(m, lat_lon)
+
+
+cdef DirectionTable direction_table_(AbstractMap m, bint lat_lon=False):
+    """
+    Gets table of the unit position vectors of passed map's positions.
+    Tables are cached by map geometry, so maps of any data type that
+    share a geometry share a table, which is only computed once.
+    :param m: AbstractMap
+    :param lat_lon: bint; whether table should hold lat and lon.
+    :return DirectionTable
+    """
+    cdef tuple key = m.geometry
+    cdef DirectionTable table = _direction_tables.get(key)
+    if table is None:
+        table = _make_direction_table(m, key)
+        _direction_tables[key] = table
+        while len(_direction_tables) > DIRECTION_CACHE_SIZE:
+            _direction_tables.popitem(last=False)
+    else:
+        _direction_tables.move_to_end(key)
+    if lat_lon:
+        table.compute_lat_lon_()
+    return table
+
+
+@cython.wraparound(False)
+cdef DirectionTable _make_direction_table(AbstractMap m, tuple key):
+    """
+    Computes the unit position vector of each map position, as
+    vec3Normalize(m.vector_from_xy_(pos)).
+    """
+    cdef DirectionTable table = DirectionTable(key, m.width, m.height)
+    cdef int width = m.width, height = m.height
+    cdef int x, y
+    cdef Py_ssize_t i
+    cdef vec3 vector
+
+    IF DEBUG:
+        print(f'computing direction table for {key}')
+
+    for y in prange(height, nogil=True, schedule='static'):
+        for x in range(width):
+            i = <Py_ssize_t> y * width + x
+            vector = mu.vec3Normalize(m.vector_from_xy_(mu.vec2New(x, y)))
+            table.x[i] = vector.x
+            table.y[i] = vector.y
+            table.z[i] = vector.z
+    return table
+
+
 #######################################################################
 # FUNCTIONS
 #######################################################################
@@ -4025,6 +5853,366 @@ ELSE:
         return lat_lon
 
 
+cdef inline latlon cp2ll_(double lat, double lon) nogil:
+    """
+    Creates latlon struct from passed latitude and longitude
+    """
+    cdef latlon ll
+    ll.lat = lat
+    ll.lon = lon
+    return ll
+
+
+#######################################################################
+# BATCH INPUT FUNCTIONS
+#######################################################################
+
+
+cdef double[:, ::1] batch_positions_(object positions, int n_dims):
+    """
+    Converts passed array-like of positions into a contiguous
+    (n, n_dims) array of doubles that may be read without the GIL.
+    :param positions: array-like of shape (n, n_dims)
+    :param n_dims: int number of values in each position
+    :return double[:, ::1]
+    """
+    arr = np.ascontiguousarray(positions, dtype=np.float64)
+    if arr.ndim == 1 and arr.size == 0:
+        arr = arr.reshape((0, n_dims))
+    if arr.ndim != 2 or arr.shape[1] != n_dims:
+        raise ValueError(
+            f'Expected positions of shape (n, {n_dims}). Got: {arr.shape}')
+    return arr
+
+
+cdef double[:, ::1] batch_lat_lons_(object positions):
+    """
+    Converts and validates passed array-like of (lat, lon) pairs.
+    :param positions: array-like of shape (n, 2)
+    :return double[:, ::1]
+    """
+    cdef double[:, ::1] arr = batch_positions_(positions, 2)
+    lat = np.asarray(arr[:, 0])
+    lon = np.asarray(arr[:, 1])
+    if np.any((lat < MIN_LAT) | (lat > MAX_LAT)):
+        raise ValueError('latitude outside range: {}-{}'
+                         .format(MIN_LAT, MAX_LAT))
+    if np.any((lon < MIN_LON) | (lon > MAX_LON)):
+        raise ValueError('longitude outside range: {}-{}'
+                         .format(MIN_LON, MAX_LON))
+    return arr
+
+
+cdef double[:, ::1] batch_xys_(
+        object positions, double width, double height, bint inclusive=False):
+    """
+    Converts and validates passed array-like of (x, y) positions.
+    :param positions: array-like of shape (n, 2)
+    :param width: upper bound of x values
+    :param height: upper bound of y values
+    :param inclusive: whether upper bounds are valid values
+    :return double[:, ::1]
+    """
+    cdef double[:, ::1] arr = batch_positions_(positions, 2)
+    x = np.asarray(arr[:, 0])
+    y = np.asarray(arr[:, 1])
+    x_outside = (x < 0) | (x > width if inclusive else x >= width)
+    y_outside = (y < 0) | (y > height if inclusive else y >= height)
+    if np.any(x_outside):
+        raise ValueError('x value outside range: 0-{}'.format(width))
+    if np.any(y_outside):
+        raise ValueError('y value outside range: 0-{}'.format(height))
+    return arr
+
+
+#######################################################################
+# IMAGE OUTPUT FUNCTIONS
+#######################################################################
+
+DEF DEFAULT_PNG_MIN = 0
+DEF DEFAULT_PNG_MAX = 64
+
+
+@cython.wraparound(False)
+cpdef tuple grey_value_range(float[:, :] arr):
+    """
+    Finds the minimum and maximum of passed 2d array of floats.
+    Rows are reduced in parallel.
+    :param arr: float[:, :] or map exporting one.
+    :return: tuple(min, max)
+    """
+    cdef int y, x
+    cdef int height = arr.shape[0], width = arr.shape[1]
+    cdef float v, row_min, row_max
+    cdef float[::1] row_mins = np.empty(height, np.float32)
+    cdef float[::1] row_maxes = np.empty(height, np.float32)
+    if height == 0 or width == 0:
+        raise ValueError('Cannot find value range of empty array')
+    for y in prange(height, nogil=True, schedule='static'):
+        row_min = arr[y, 0]
+        row_max = arr[y, 0]
+        for x in range(1, width):
+            v = arr[y, x]
+            if v < row_min:
+                row_min = v
+            if v > row_max:
+                row_max = v
+        row_mins[y] = row_min
+        row_maxes[y] = row_max
+    return float(np.min(row_mins)), float(np.max(row_maxes))
+
+
+cpdef tuple png_value_range(float min_, float max_):
+    """
+    Gets the default range of values spanned by a png of data with
+    passed minimum and maximum; the range 0-64, expanded to the
+    nearest power of two on either side if it does not contain the
+    data, so that images of similar data share a scale.
+    :param min_: float
+    :param max_: float
+    :return: tuple(min, max)
+    """
+    cdef float min = DEFAULT_PNG_MIN, max = DEFAULT_PNG_MAX
+    if max_ > max:
+        max = 2 ** ceil(log2(max_))
+    if min_ < min:
+        min = -(2 ** ceil(log2(fabs(min_))))
+    return min, max
+
+
+@cython.cdivision(True)
+@cython.wraparound(False)
+cpdef np.ndarray quantize_grey(
+        float[:, :] arr, float min, float max, int bit_depth=8):
+    """
+    Scales values of passed array from range min-max to the range of
+    unsigned integers of passed bit depth, clipping values outside
+    of min-max. Rows are quantized in parallel.
+    :param arr: float[:, :] or map exporting one.
+    :param min: float value mapped to 0.
+    :param max: float value mapped to the maximum integer value.
+    :param bit_depth: 8 or 16
+    :return: ndarray of uint8 or big-endian uint16, as stored in pngs.
+    """
+    cdef int y, x
+    cdef int height = arr.shape[0], width = arr.shape[1]
+    cdef float v, scale
+    cdef np.uint8_t[:, ::1] out_8
+    cdef np.uint16_t[:, ::1] out_16
+    if not max > min:
+        raise ValueError(f'Invalid value range: {min}-{max}')
+    if bit_depth == 8:
+        scale = 255 / (max - min)
+        out = np.empty((height, width), np.uint8)
+        out_8 = out
+        for y in prange(height, nogil=True, schedule='static'):
+            for x in range(width):
+                v = (arr[y, x] - min) * scale
+                out_8[y, x] = <np.uint8_t> (
+                    0 if v < 0 else 255 if v > 255 else v + 0.5)
+    elif bit_depth == 16:
+        scale = 65535 / (max - min)
+        out = np.empty((height, width), np.uint16)
+        out_16 = out
+        for y in prange(height, nogil=True, schedule='static'):
+            for x in range(width):
+                v = (arr[y, x] - min) * scale
+                out_16[y, x] = <np.uint16_t> (
+                    0 if v < 0 else 65535 if v > 65535 else v + 0.5)
+        out = out.astype('>u2', copy=False)  # pngs are big-endian
+    else:
+        raise ValueError(f'Unsupported bit depth: {bit_depth}')
+    return out
+
+
+cpdef bint write_grey_png(
+        float[:, :] arr,
+        unicode out,
+        int bit_depth=8,
+        tuple value_range=None,
+        int compression=6) except False:
+    """
+    Writes passed array of floats as a greyscale png.
+    Quantized rows are streamed to the png encoder, which
+    compresses them incrementally.
+    :param arr: float[:, :] or map exporting one.
+    :param out: unicode path; '.png' is appended if no extension is
+                present.
+    :param bit_depth: 8 or 16
+    :param value_range: tuple(min, max) of values mapped to black
+                and white. If not passed, the range returned by
+                png_value_range for the data is used.
+    :param compression: zlib compression level.
+    :return: None
+    """
+    if '.' not in out:
+        out += '.png'  # adjust out path
+    if value_range is None:
+        value_range = png_value_range(*grey_value_range(arr))
+    pixels = quantize_grey(arr, value_range[0], value_range[1], bit_depth)
+    w = png.Writer(
+        pixels.shape[1], pixels.shape[0], greyscale=True,
+        bitdepth=bit_depth, compression=compression)
+    with open(out, 'wb') as f:
+        # each row of the byte view is one packed png row.
+        w.write_packed(f, pixels.view(np.uint8))
+    return 1
+
+
+#######################################################################
+# GREY STORAGE
+#######################################################################
+
+
+GREY_MAP_TYPES = (GreyCubeMap, GreyLatLonMap, GreyTileMap, GreyCubeSide)
+
+
+def grey_quantization(unicode storage, double min_, double max_):
+    """
+    Gets the scale and offset with which values in the range min-max
+    are stored by grey maps of passed storage.
+    Integer storages spread the range over all of their values, so
+    that values lying on the resulting grid of offset + n * scale are
+    stored losslessly. float16 storage is unscaled for ranges within
+    its limits, so that values representable as float16 are stored
+    losslessly, and is otherwise scaled to fit the range.
+    :param storage: str; one of GREY_STORAGES
+    :param min_: float
+    :param max_: float
+    :return: tuple(scale, offset)
+    """
+    cdef double scale, half_range, mid
+    if storage not in GREY_STORAGES:
+        raise ValueError(f'Unknown grey map storage: {storage!r}')
+    if not max_ >= min_:
+        raise ValueError(f'Invalid value range: {min_}-{max_}')
+    kind = GREY_STORAGES[storage]
+    if kind == GREY_FLOAT32:
+        return 1., 0.
+    elif kind == GREY_FLOAT16:
+        if max(fabs(min_), fabs(max_)) <= HALF_MAX:
+            return 1., 0.
+        mid = (min_ + max_) / 2
+        half_range = (max_ - min_) / 2
+        return max(1., half_range / HALF_MAX), mid
+    scale = (max_ - min_) / 65535 if max_ > min_ else 1.
+    if kind == GREY_INT16:
+        return scale, min_ + 32768 * scale
+    return scale, min_
+
+
+cdef union float_bits:
+    float f
+    uint32_t u
+
+
+cdef inline float half_to_float_(uint16_t h) nogil:
+    """
+    Converts IEEE 754 half precision float bits to a float.
+    :param h: uint16_t
+    :return: float
+    """
+    cdef float_bits bits
+    cdef uint32_t sign = (<uint32_t> h & 0x8000) << 16
+    cdef uint32_t exp = (h >> 10) & 0x1f
+    cdef uint32_t mant = h & 0x3ff
+    if exp == 0x1f:  # inf or nan
+        bits.u = sign | 0x7f800000 | (mant << 13)
+    elif exp:
+        bits.u = sign | ((exp + 112) << 23) | (mant << 13)
+    elif mant:  # subnormal half; normalize
+        exp = 113
+        while not mant & 0x400:
+            mant <<= 1
+            exp -= 1
+        bits.u = sign | (exp << 23) | ((mant & 0x3ff) << 13)
+    else:
+        bits.u = sign
+    return bits.f
+
+
+cdef inline uint16_t float_to_half_(float f) nogil:
+    """
+    Converts a float to IEEE 754 half precision float bits, rounding
+    to the nearest half, ties to even.
+    :param f: float
+    :return: uint16_t
+    """
+    cdef float_bits bits
+    cdef uint32_t u, sign, mant, rem, halfway, h
+    cdef int shift
+    bits.f = f
+    u = bits.u
+    sign = (u >> 16) & 0x8000
+    u &= 0x7fffffff
+    if u >= 0x7f800000:  # inf or nan
+        return sign | 0x7c00 | (0x200 if u > 0x7f800000 else 0)
+    if u >= 0x477ff000:  # rounds past the largest half
+        return sign | 0x7c00
+    if u >= 0x38800000:  # normal half
+        u += 0xfff + ((u >> 13) & 1)
+        return sign | ((u - 0x38000000) >> 13)
+    if u <= 0x33000000:  # rounds to zero
+        return sign
+    # subnormal half
+    shift = 126 - (u >> 23)
+    mant = (u & 0x7fffff) | 0x800000
+    h = mant >> shift
+    rem = mant & ((1 << shift) - 1)
+    halfway = 1 << (shift - 1)
+    if rem > halfway or (rem == halfway and h & 1):
+        h += 1
+    return sign | h
+
+
+cdef inline float grey_load_(
+        void *arr, int kind, float scale, float offset, Py_ssize_t i) nogil:
+    """
+    Gets decoded value at passed index of grey map data.
+    :param arr: map data
+    :param kind: storage kind of map data.
+    :param i: index
+    :return: float
+    """
+    if kind == GREY_FLOAT32:
+        return (<float *> arr)[i]
+    elif kind == GREY_FLOAT16:
+        return half_to_float_((<uint16_t *> arr)[i]) * scale + offset
+    elif kind == GREY_INT16:
+        return (<int16_t *> arr)[i] * scale + offset
+    return (<uint16_t *> arr)[i] * scale + offset
+
+
+cdef inline void grey_store_(
+        void *arr,
+        int kind,
+        float scale,
+        float offset,
+        Py_ssize_t i,
+        float v) nogil:
+    """
+    Encodes and stores value at passed index of grey map data.
+    Values outside the range of integer storages are clipped.
+    :param arr: map data
+    :param kind: storage kind of map data.
+    :param i: index
+    :param v: float
+    """
+    cdef float q
+    if kind == GREY_FLOAT32:
+        (<float *> arr)[i] = v
+        return
+    q = (v - offset) / scale
+    if kind == GREY_FLOAT16:
+        (<uint16_t *> arr)[i] = float_to_half_(q)
+    elif kind == GREY_INT16:
+        q = -32768 if q < -32768 else 32767 if q > 32767 else q
+        (<int16_t *> arr)[i] = <int16_t> lrint(q)
+    else:
+        q = 0 if q < 0 else 65535 if q > 65535 else q
+        (<uint16_t *> arr)[i] = <uint16_t> lrint(q)
+
+
 #######################################################################
 # DATA FUNCTIONS
 #######################################################################
@@ -56,3 +56,7 @@ cdef class PyFastNoise:
     cdef float get_simplex_fractal_3d_   (PyFastNoise self, const vec3 p) nogil
     cdef float get_perlin_3d_            (PyFastNoise self, const vec3 p) nogil
     cdef float get_perlin_fractal_3d_    (PyFastNoise self, const vec3 p) nogil
+
+    cdef float noise_2d_(PyFastNoise self, int kind, float x, float y) nogil
+    cdef float noise_3d_(
+            PyFastNoise self, int kind, float x, float y, float z) nogil
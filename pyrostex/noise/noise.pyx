@@ -1,12 +1,21 @@
+# cython: boundscheck=False, wraparound=False, nonecheck=False, language_level=3, initializedcheck=False
 """
 Handles use of fast noise library
 """
 
 from libc.stdlib cimport free
 
+import numpy as np
+
+from .points import as_axis, as_points, noise_type_index
+
 cdef enum FractalType:
     FBM, Billow, RigidMulti
 
+# indices of NOISE_TYPES
+cdef enum NoiseType:
+    SIMPLEX, SIMPLEX_FRACTAL, PERLIN, PERLIN_FRACTAL
+
 
 cdef class PyFastNoise:
     """
@@ -119,7 +128,7 @@ cdef class PyFastNoise:
         return self.n.GetPerlinFractal(p.x, p.y)
         
     cdef float get_simplex_3d_          (PyFastNoise self, const vec3 p) nogil:
-        return self.n.GetPerlin(p.x, p.y, p.z)
+        return self.n.GetSimplex(p.x, p.y, p.z)
         
     cdef float get_simplex_fractal_3d_  (PyFastNoise self, const vec3 p) nogil:
         return self.n.GetSimplexFractal(p.x, p.y, p.z)
@@ -129,3 +138,85 @@ cdef class PyFastNoise:
         
     cdef float get_perlin_fractal_3d_   (PyFastNoise self, const vec3 p) nogil:
         return self.n.GetPerlinFractal(p.x, p.y, p.z)
+
+    # arrays
+
+    def get_noise(self, points, unicode noise_type='simplex_fractal'):
+        """
+        Gets noise at each of an array of points.
+        :param points: array_like of shape (..., 2) or (..., 3) of
+                    2d or 3d point coordinates.
+        :param noise_type: str; one of NOISE_TYPES. Fractal noise
+                    uses the generator's fractal_type.
+        :return: float32 ndarray of points' shape, less its last axis.
+        """
+        cdef int kind = noise_type_index(noise_type)
+        flat, shape = as_points(points)
+        out = np.empty(len(flat), np.float32)
+        cdef const float[:, ::1] p = flat
+        cdef float[::1] result = out
+        cdef Py_ssize_t i
+        with nogil:
+            if p.shape[1] == 2:
+                for i in range(p.shape[0]):
+                    result[i] = self.noise_2d_(kind, p[i, 0], p[i, 1])
+            else:
+                for i in range(p.shape[0]):
+                    result[i] = self.noise_3d_(
+                        kind, p[i, 0], p[i, 1], p[i, 2])
+        return out.reshape(shape)
+
+    def get_noise_grid(self, x, y, z=None,
+                       unicode noise_type='simplex_fractal'):
+        """
+        Gets noise at each point of a grid.
+        :param x: array_like of shape (nx,) of grid x coordinates.
+        :param y: array_like of shape (ny,) of grid y coordinates.
+        :param z: array_like of shape (nz,) of grid z coordinates,
+                    or None for a 2d grid.
+        :param noise_type: str; one of NOISE_TYPES.
+        :return: float32 ndarray of shape (ny, nx), or (nz, ny, nx).
+        """
+        cdef int kind = noise_type_index(noise_type)
+        cdef const float[::1] xs = as_axis(x)
+        cdef const float[::1] ys = as_axis(y)
+        cdef const float[::1] zs = as_axis([0] if z is None else z)
+        cdef bint is_3d = z is not None
+        cdef Py_ssize_t i, j, k
+        if not is_3d:
+            out = np.empty((ys.shape[0], xs.shape[0]), np.float32)
+        else:
+            out = np.empty((zs.shape[0], ys.shape[0], xs.shape[0]),
+                           np.float32)
+        cdef float[:, :, ::1] result = out.reshape(
+            -1, ys.shape[0], xs.shape[0])
+        with nogil:
+            for k in range(result.shape[0]):
+                for j in range(ys.shape[0]):
+                    for i in range(xs.shape[0]):
+                        if is_3d:
+                            result[k, j, i] = self.noise_3d_(
+                                kind, xs[i], ys[j], zs[k])
+                        else:
+                            result[k, j, i] = self.noise_2d_(
+                                kind, xs[i], ys[j])
+        return out
+
+    cdef float noise_2d_(PyFastNoise self, int kind, float x, float y) nogil:
+        if kind == NoiseType.SIMPLEX:
+            return self.n.GetSimplex(x, y)
+        elif kind == NoiseType.SIMPLEX_FRACTAL:
+            return self.n.GetSimplexFractal(x, y)
+        elif kind == NoiseType.PERLIN:
+            return self.n.GetPerlin(x, y)
+        return self.n.GetPerlinFractal(x, y)
+
+    cdef float noise_3d_(
+            PyFastNoise self, int kind, float x, float y, float z) nogil:
+        if kind == NoiseType.SIMPLEX:
+            return self.n.GetSimplex(x, y, z)
+        elif kind == NoiseType.SIMPLEX_FRACTAL:
+            return self.n.GetSimplexFractal(x, y, z)
+        elif kind == NoiseType.PERLIN:
+            return self.n.GetPerlin(x, y, z)
+        return self.n.GetPerlinFractal(x, y, z)
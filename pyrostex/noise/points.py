@@ -0,0 +1,52 @@
+"""
+Argument handling shared by the array methods of the noise wrappers.
+"""
+
+import numpy as np
+
+# names of noise types generated by the array methods; the index of
+# each name is the noise type's value in the wrappers' nogil loops.
+NOISE_TYPES = ('simplex', 'simplex_fractal', 'perlin', 'perlin_fractal')
+
+
+def noise_type_index(noise_type):
+    """
+    Gets index of passed noise type name.
+    :param noise_type: str; one of NOISE_TYPES.
+    :return: int
+    """
+    try:
+        return NOISE_TYPES.index(noise_type)
+    except ValueError:
+        raise ValueError('Unknown noise type: {!r}; expected one of {}'
+                         .format(noise_type, NOISE_TYPES)) from None
+
+
+def as_points(points):
+    """
+    Gets passed points as a contiguous float32 array with a single
+    row per point.
+    :param points: array_like of shape (..., 2) or (..., 3).
+    :return: tuple(ndarray of shape (n, 2) or (n, 3), shape of
+                the array of noise values of passed points).
+    """
+    points = np.asarray(points, dtype=np.float32)
+    if points.ndim < 1 or points.shape[-1] not in (2, 3):
+        raise ValueError(
+            'Expected points of shape (..., 2) or (..., 3), got {}'
+            .format(points.shape))
+    shape = points.shape[:-1]
+    return np.ascontiguousarray(points.reshape(-1, points.shape[-1])), shape
+
+
+def as_axis(coordinates):
+    """
+    Gets passed grid coordinates as a contiguous float32 array.
+    :param coordinates: array_like of shape (n,).
+    :return: ndarray
+    """
+    coordinates = np.ascontiguousarray(coordinates, dtype=np.float32)
+    if coordinates.ndim != 1:
+        raise ValueError('Expected 1d grid coordinates, got shape {}'
+                         .format(coordinates.shape))
+    return coordinates
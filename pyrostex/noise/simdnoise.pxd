@@ -8,23 +8,40 @@ cdef extern from "fast_simd/FastNoiseSIMD/FastNoiseSIMD.h":
         @staticmethod
         FastNoiseSIMD *NewFastNoiseSIMD() except +
 
+        # float sets aligned for, and padded to a whole number of,
+        # the SIMD vectors of the instruction set in use.
+        @staticmethod
+        float *GetEmptySet(int size) nogil
+        @staticmethod
+        void FreeNoiseSet(float *noiseSet) nogil
+
+        # SIMD level used by newly created instances
+        @staticmethod
+        int GetSIMDLevel() nogil
+        @staticmethod
+        void SetSIMDLevel(int level) nogil
+
         # getter / setters
         void SetSeed(int seed) nogil
         int GetSeed() nogil
         void SetFrequency(float frequency) nogil
-        float GetFrequency() nogil
         void SetFractalOctaves(int octaves) nogil
-        int GetFractalOctaves() nogil
         void SetFractalLacunarity(float lacunarity) nogil
-        float GetFractalLacunarity() nogil
         void SetFractalGain(float gain) nogil
-        float GetFractalGain() nogil
         void SetFractalType(FractalType fractalType) nogil
-        FractalType GetFractalType() nogil
 
+        void FillSimplexSet(
+            float *noiseSet,
+            FastNoiseVectorSet *vectorSet) nogil
         void FillSimplexFractalSet(
             float *noiseSet,
             FastNoiseVectorSet *vectorSet) nogil
+        void FillPerlinSet(
+            float *noiseSet,
+            FastNoiseVectorSet *vectorSet) nogil
+        void FillPerlinFractalSet(
+            float *noiseSet,
+            FastNoiseVectorSet *vectorSet) nogil
 
 
     cdef cppclass FastNoiseVectorSet:
@@ -48,6 +65,10 @@ cdef extern from "fast_simd/FastNoiseSIMD/FastNoiseSIMD.h":
 
 cdef class PyFastNoiseSIMD:
     cdef FastNoiseSIMD *n  # wrapped C++ instance
+    cdef readonly int simd_level  # SIMD level of wrapped instance
+    # parameters set on the wrapped instance, which has no getters
+    cdef float _frq, _lacunarity, _gain
+    cdef int _octaves, _fractal_type
 
     cdef void _init_wrapped_noise(self)
 
@@ -55,3 +76,12 @@ cdef class PyFastNoiseSIMD:
             self,
             float *noise_set,
             FastNoiseVectorSet *vector_set) nogil
+    cdef void fill_set(
+            self,
+            int kind,
+            float *noise_set,
+            FastNoiseVectorSet *vector_set) nogil
+    cdef float *empty_set(self, int size) nogil
+    cdef void free_set(self, float *noise_set) nogil
+    cdef FastNoiseVectorSet *new_vector_set(self, int size) nogil
+    cdef void free_vector_set(self, FastNoiseVectorSet *vector_set) nogil
@@ -1,20 +1,105 @@
+# cython: boundscheck=False, wraparound=False, nonecheck=False, language_level=3, initializedcheck=False
 
-from libc.stdlib cimport free
+from libc.stdlib cimport malloc, free
+
+import numpy as np
+
+from .points import as_axis, as_points, noise_type_index
 
 cdef enum FractalType:
     FBM, Billow, RigidMulti
 
+FRACTAL_TYPES = ('FBM', 'Billow', 'RigidMulti')  # by FractalType value
+
+# indices of NOISE_TYPES
+cdef enum NoiseType:
+    SIMPLEX, SIMPLEX_FRACTAL, PERLIN, PERLIN_FRACTAL
+
+DEF CHUNK_SIZE = 4096  # max points generated by a single fill call
+
+# names of the instruction sets of FastNoiseSIMD's SIMD levels, by level.
+SIMD_LEVEL_NAMES = ('fallback', 'SSE2', 'SSE4.1', 'AVX2', 'AVX512', 'NEON')
+AUTO_SIMD_LEVEL = -1  # selects the fastest level supported by the cpu
+
+
+def get_simd_level():
+    """
+    Gets SIMD level used by newly created noise generators.
+    :return: int index of SIMD_LEVEL_NAMES
+    """
+    return FastNoiseSIMD.GetSIMDLevel()
+
+
+def set_simd_level(int level):
+    """
+    Sets SIMD level used by newly created noise generators. Levels
+    that were not compiled fall back to the highest that was.
+    Noise sets are allocated for the current SIMD level, so it must
+    not be changed while noise is being generated.
+    :param level: int index of SIMD_LEVEL_NAMES, or AUTO_SIMD_LEVEL.
+    :raises ValueError: if level is not supported by the cpu.
+    """
+    if level != AUTO_SIMD_LEVEL and \
+            not 0 <= level <= fastest_simd_level():
+        raise ValueError('SIMD level {} is not supported; levels up to {} '
+                         'are'.format(level, fastest_simd_level()))
+    FastNoiseSIMD.SetSIMDLevel(level)
+
+
+def fastest_simd_level():
+    """
+    Gets fastest SIMD level supported by the cpu.
+    :return: int index of SIMD_LEVEL_NAMES
+    """
+    cdef int level = FastNoiseSIMD.GetSIMDLevel()
+    cdef int fastest
+    FastNoiseSIMD.SetSIMDLevel(AUTO_SIMD_LEVEL)
+    fastest = FastNoiseSIMD.GetSIMDLevel()
+    FastNoiseSIMD.SetSIMDLevel(level)
+    return fastest
+
+
+def available_simd_levels():
+    """
+    Gets SIMD levels that are both supported by the cpu and compiled,
+    and so may be selected by set_simd_level. As set_simd_level, must
+    not be called while noise is being generated.
+    :return: list of int
+    """
+    cdef int level = FastNoiseSIMD.GetSIMDLevel()
+    levels = []
+    try:
+        for candidate in range(fastest_simd_level() + 1):
+            FastNoiseSIMD.SetSIMDLevel(candidate)
+            if PyFastNoiseSIMD().simd_level == candidate:
+                levels.append(candidate)
+    finally:
+        FastNoiseSIMD.SetSIMDLevel(level)
+    return levels
+
 
 cdef class PyFastNoiseSIMD:
     """
-    Cython class wrapping the C++ FastNoise class
+    Cython class wrapping the C++ FastNoiseSIMD class.
+    The wrapped generator uses the SIMD level that was set when it
+    was created; see set_simd_level.
     """
 
     def __cinit__(self):
         self._init_wrapped_noise()
+        # creating a generator sets the current level to its own,
+        # which may be lower than requested if it was not compiled.
+        self.simd_level = FastNoiseSIMD.GetSIMDLevel()
+        # FastNoiseSIMD has no getters for these, so they are kept
+        # here; initial values are FastNoiseSIMD's defaults.
+        self._frq = 0.01
+        self._octaves = 3
+        self._lacunarity = 2
+        self._gain = 0.5
+        self._fractal_type = FractalType.FBM
 
     def __dealloc__(self):
-        free(self.n)
+        del self.n
 
     cdef void _init_wrapped_noise(self):
         self.n = FastNoiseSIMD.NewFastNoiseSIMD()
@@ -31,47 +116,55 @@ cdef class PyFastNoiseSIMD:
 
     @property
     def frq(self):
-        raise NotImplementedError
+        return self._frq
 
     @frq.setter
     def frq(self, frq):
-        self.n.SetFrequency(frq)
+        self._frq = frq
+        self.n.SetFrequency(self._frq)
 
     @property
     def fractal_octaves(self):
-        raise NotImplementedError
+        return self._octaves
 
     @fractal_octaves.setter
     def fractal_octaves(self, octaves):
-        self.n.SetFractalOctaves(int(octaves))
+        self._octaves = int(octaves)
+        self.n.SetFractalOctaves(self._octaves)
 
     @property
     def lacunarity(self):
-        raise NotImplementedError
+        return self._lacunarity
 
     @lacunarity.setter
     def lacunarity(self, lacunarity):
-        self.n.SetFractalLacunarity(lacunarity)
+        self._lacunarity = lacunarity
+        self.n.SetFractalLacunarity(self._lacunarity)
 
     @property
     def fractal_gain(self):
-        raise NotImplementedError
+        return self._gain
 
     @fractal_gain.setter
     def fractal_gain(self, gain):
-        self.n.SetFractalGain(gain)
+        self._gain = gain
+        self.n.SetFractalGain(self._gain)
 
     @property
     def fractal_type(self):
-        raise NotImplementedError
+        return FRACTAL_TYPES[self._fractal_type]
 
     @fractal_type.setter
     def fractal_type(self, unicode fractal_type):
-        if fractal_type == 'FBM':
+        if fractal_type not in FRACTAL_TYPES:
+            raise ValueError('Unknown fractal type: {!r}; expected one of {}'
+                             .format(fractal_type, FRACTAL_TYPES))
+        self._fractal_type = FRACTAL_TYPES.index(fractal_type)
+        if self._fractal_type == FractalType.FBM:
             self.n.SetFractalType(FractalType.FBM)
-        elif fractal_type == 'Billow':
+        elif self._fractal_type == FractalType.Billow:
             self.n.SetFractalType(FractalType.Billow)
-        elif fractal_type == 'RigidMulti':
+        else:
             self.n.SetFractalType(FractalType.RigidMulti)
 
     # Noise generation methods
@@ -81,3 +174,144 @@ cdef class PyFastNoiseSIMD:
             float *noise_set,
             FastNoiseVectorSet *vector_set) nogil:
         self.n.FillSimplexFractalSet(noise_set, vector_set)
+
+    cdef void fill_set(
+            self,
+            int kind,
+            float *noise_set,
+            FastNoiseVectorSet *vector_set) nogil:
+        """
+        Fills noise set with noise of passed type; an index of
+        NOISE_TYPES.
+        """
+        if kind == NoiseType.SIMPLEX:
+            self.n.FillSimplexSet(noise_set, vector_set)
+        elif kind == NoiseType.SIMPLEX_FRACTAL:
+            self.n.FillSimplexFractalSet(noise_set, vector_set)
+        elif kind == NoiseType.PERLIN:
+            self.n.FillPerlinSet(noise_set, vector_set)
+        else:
+            self.n.FillPerlinFractalSet(noise_set, vector_set)
+
+    # arrays
+
+    def get_noise(self, points, unicode noise_type='simplex_fractal'):
+        """
+        Gets noise at each of an array of points.
+        Noise is generated in chunks of up to CHUNK_SIZE points, each
+        filled by a single call to the noise generator.
+        The generator's noise is 3d only; 2d points are given a z
+        coordinate of 0.
+        :param points: array_like of shape (..., 2) or (..., 3) of
+                    2d or 3d point coordinates.
+        :param noise_type: str; one of NOISE_TYPES. Fractal noise
+                    uses the generator's fractal_type.
+        :return: float32 ndarray of points' shape, less its last axis.
+        """
+        cdef int kind = noise_type_index(noise_type)
+        flat, shape = as_points(points)
+        out = np.empty(len(flat), np.float32)
+        cdef const float[:, ::1] p = flat
+        cdef float[::1] result = out
+        cdef bint is_3d = p.shape[1] == 3
+        cdef Py_ssize_t start, i, size
+        cdef FastNoiseVectorSet *pos_v_set
+        cdef float *noise_set
+        with nogil:
+            pos_v_set = self.new_vector_set(CHUNK_SIZE)
+            noise_set = self.empty_set(CHUNK_SIZE)
+            start = 0
+            while start < p.shape[0]:
+                size = min(CHUNK_SIZE, p.shape[0] - start)
+                for i in range(size):
+                    pos_v_set.xSet[i] = p[start + i, 0]
+                    pos_v_set.ySet[i] = p[start + i, 1]
+                    pos_v_set.zSet[i] = p[start + i, 2] if is_3d else 0
+                pos_v_set.size = size
+                self.fill_set(kind, noise_set, pos_v_set)
+                for i in range(size):
+                    result[start + i] = noise_set[i]
+                start += size
+            self.free_vector_set(pos_v_set)
+            self.free_set(noise_set)
+        return out.reshape(shape)
+
+    def get_noise_grid(self, x, y, z=None,
+                       unicode noise_type='simplex_fractal'):
+        """
+        Gets noise at each point of a grid.
+        Each row of the grid is generated by a single call to the
+        noise generator.
+        :param x: array_like of shape (nx,) of grid x coordinates.
+        :param y: array_like of shape (ny,) of grid y coordinates.
+        :param z: array_like of shape (nz,) of grid z coordinates,
+                    or None for a 2d grid, at a z of 0.
+        :param noise_type: str; one of NOISE_TYPES.
+        :return: float32 ndarray of shape (ny, nx), or (nz, ny, nx).
+        """
+        cdef int kind = noise_type_index(noise_type)
+        cdef const float[::1] xs = as_axis(x)
+        cdef const float[::1] ys = as_axis(y)
+        cdef const float[::1] zs = as_axis([0] if z is None else z)
+        cdef int width = xs.shape[0]
+        if z is None:
+            out = np.empty((ys.shape[0], width), np.float32)
+        else:
+            out = np.empty((zs.shape[0], ys.shape[0], width), np.float32)
+        cdef float[:, :, ::1] result = out.reshape(-1, ys.shape[0], width)
+        cdef Py_ssize_t i, j, k
+        cdef FastNoiseVectorSet *pos_v_set
+        cdef float *noise_set
+        if width == 0:
+            return out
+        with nogil:
+            pos_v_set = self.new_vector_set(width)
+            noise_set = self.empty_set(width)
+            for i in range(width):
+                pos_v_set.xSet[i] = xs[i]
+            for k in range(result.shape[0]):
+                for i in range(width):
+                    pos_v_set.zSet[i] = zs[k]
+                for j in range(ys.shape[0]):
+                    for i in range(width):
+                        pos_v_set.ySet[i] = ys[j]
+                    self.fill_set(kind, noise_set, pos_v_set)
+                    for i in range(width):
+                        result[k, j, i] = noise_set[i]
+            self.free_vector_set(pos_v_set)
+            self.free_set(noise_set)
+        return out
+
+    # Set allocation
+
+    cdef float *empty_set(self, int size) nogil:
+        """
+        Allocates a set of floats aligned as required by the noise
+        generation methods, padded so that the last SIMD vector of a
+        set of passed size may be loaded from, and stored to, it.
+        Sets are released with free_set.
+        """
+        return FastNoiseSIMD.GetEmptySet(size)
+
+    cdef void free_set(self, float *noise_set) nogil:
+        FastNoiseSIMD.FreeNoiseSet(noise_set)
+
+    cdef FastNoiseVectorSet *new_vector_set(self, int size) nogil:
+        """
+        Allocates a vector set of passed size, whose x, y and z sets
+        are allocated with empty_set.
+        Vector sets are released with free_vector_set.
+        """
+        cdef FastNoiseVectorSet *vector_set = <FastNoiseVectorSet *>malloc(
+            sizeof(FastNoiseVectorSet))
+        vector_set.size = size
+        vector_set.xSet = self.empty_set(size)
+        vector_set.ySet = self.empty_set(size)
+        vector_set.zSet = self.empty_set(size)
+        return vector_set
+
+    cdef void free_vector_set(self, FastNoiseVectorSet *vector_set) nogil:
+        self.free_set(vector_set.xSet)
+        self.free_set(vector_set.ySet)
+        self.free_set(vector_set.zSet)
+        free(vector_set)
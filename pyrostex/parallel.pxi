@@ -0,0 +1,23 @@
+# Applies an ExecutionContext to the parallel loops of the including
+# module. Loops run with num_threads=begin_parallel(context) and
+# schedule='runtime' follow the context's thread count and schedule.
+
+from openmp cimport omp_set_schedule, omp_sched_t
+
+from .context import default_context
+
+
+cdef int begin_parallel(object context) except -1:
+    """
+    Sets the OpenMP schedule of runtime-scheduled loops subsequently
+    started by the calling thread to that of passed context.
+    :param context: ExecutionContext, or None for default context.
+    :return: int number of threads loops should be run with.
+    """
+    if context is None:
+        context = default_context()
+    omp_set_schedule(<omp_sched_t> context.schedule_kind, context.chunk_size)
+    IF ASSERTS:
+        return 1
+    ELSE:
+        return context.threads
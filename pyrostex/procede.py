@@ -1,13 +1,31 @@
+import functools
+import hashlib
+import json
 import logging
 import os
+import subprocess
+import time
+import weakref
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+
 import settings
 
-from .map import GreyLatLonMap, GreyCubeMap, GreyTileMap
-from .temp import make_warming_map
+from .backends import NOISE_STAGES, SIMD_ONLY_STAGES, SCALAR, SIMD, \
+    NoiseBackend, host_backends
+from .chunked import CHUNKED_SUFFIX, ChunkedMapFile
+from .context import ExecutionContext
+from .layers import NoiseLayerCache
+from .map import GreyLatLonMap, GreyCubeMap, GreyTileMap, VecCubeMap, \
+    grey_quantization
+from .stages import Stage, StageGraph
+from .temp import make_warming_map, make_temp_map
 from .wind import make_wind_map
-from .height import make_height_detail, make_tectonic_cube
+from .height import detail_combine_params, detail_noise_params, \
+    make_height_detail, make_height_detail_batch, \
+    make_refinable_height_detail, make_tectonic_cube, refine_height_detail
+from .noise.simdnoise import get_simd_level
 
 TN_PATH = os.path.join(settings.ROOT_PATH, 'pyrostex')
 TN_RESOURCE_PATH = os.path.join(TN_PATH, 'resources')
@@ -18,6 +36,8 @@ BASE_MAP_WIDTH = 2048
 BASE_MAP_DIMENSIONS = BASE_MAP_WIDTH, BASE_MAP_HEIGHT
 BASE_MAP_NAME = 'base_height'
 HEIGHTFIELD_SUFFIX = '.heightfield'
+# seeds 46338 and larger cause failures. reason unknown.
+SEED_MODULUS = 46337
 
 HEIGHT_MAP_NAME = 'height.npy'  # needs extension
 MIN_HEIGHT_MAP_EL = -1.2e7
@@ -25,6 +45,56 @@ MAX_HEIGHT_MAP_EL = 1.2e7
 HEIGHT_MAP_RANGE = MAX_HEIGHT_MAP_EL - MIN_HEIGHT_MAP_EL
 
 WARMING_MAP_NAME = 'warming.npy'
+HEIGHT_DETAIL_NAME = 'height_detail.npy'
+TILE_HEIGHT_NAME = 'height.npy'
+# cached map data is stored in compressed, chunked map files.
+HEIGHT_CUBE_CACHE_NAME = 'height_cube' + CHUNKED_SUFFIX
+HEIGHT_DETAIL_CACHE_NAME = 'height_detail' + CHUNKED_SUFFIX
+TILE_HEIGHT_CACHE_NAME = 'height' + CHUNKED_SUFFIX
+
+# outputs of build stages are cached in STAGE_CACHE_DIR_NAME, under
+# keys derived from the inputs that affect them. STAGE_CACHE_VERSION
+# should be incremented whenever a change to the code that generates
+# a stage's output, or to the map storage format, would invalidate
+# previously cached outputs.
+STAGE_CACHE_DIR_NAME = 'stages'
+STAGE_CACHE_VERSION = 2
+# noise layers evaluated by build stages are cached separately, so
+# that they are re-used when only the stage's use of them changes.
+LAYER_CACHE_DIR_NAME = 'layers'
+TECTONIC_CUBE_WIDTH = 1536
+TECTONIC_CUBE_HEIGHT = 1024
+WARMING_REL_RES = 0.5
+DETAIL_CUBE_WIDTH = 768
+DETAIL_CUBE_HEIGHT = 512
+TILE_SIZE = 1024  # width and height of tile maps
+
+# ways in which the noise backend of each stage may be chosen:
+# 'simd' uses FastNoiseSIMD at the fastest SIMD level of the cpu,
+# 'scalar' uses FastNoise where a stage is able to, and 'auto' uses
+# FastNoiseSIMD at the SIMD level measured to be fastest (see
+# host_backends). The engines produce different (though statistically
+# equivalent) noise, while SIMD levels produce the same noise, so only
+# 'scalar' changes a spheroid's maps. The engine used by each stage is
+# recorded in the spheroid's BUILD_INFO_NAME file.
+NOISE_BACKEND_MODES = ('simd', 'scalar', 'auto')
+BUILD_INFO_NAME = 'build.json'
+
+
+def spheroid_uid(planet_type, seed, mass):
+    """
+    Gets unique identifier of a spheroid,
+    composed of type, seed, and mass.
+    :param planet_type: str
+    :param seed: int
+    :param mass: float
+    :return: str
+    """
+    return '{type}{seed}{mass}'.format(
+        type=planet_type,
+        seed=seed % SEED_MODULUS,
+        mass='{:.0f}'.format(mass)[:12]
+    ).strip('.')  # remove any '.'
 
 
 class Spheroid:
@@ -46,11 +116,18 @@ class Spheroid:
             albedo=0.3,
             tidal_locked=False,
             dir_path=None,
+            use_mmap=False,
+            use_cache=True,
+            build_workers=None,
+            context=None,
+            detail_face_size=None,
+            tile_storage='float32',
+            layer_cache=None,
+            noise_backend='simd',
     ):
         logger = logging.getLogger(__name__)
         logger.info('Creating spheroid')
-        # seeds 46338 and larger cause failures. reason unknown.
-        self.seed = seed % 46337
+        self.seed = seed % SEED_MODULUS
         self.type = planet_type
         self.mass = mass
         self.mean_temp = mean_temp
@@ -62,6 +139,50 @@ class Spheroid:
         self.albedo = albedo
         self.tidal_locked = tidal_locked
         self._dir_path = dir_path
+        # whether large maps should be backed by memory-mapped files
+        # in dir_path rather than held in memory.
+        self.use_mmap = use_mmap
+        # whether stage outputs should be loaded from, and stored in,
+        # the stage cache.
+        self.use_cache = use_cache
+        # maximum number of build stages run concurrently.
+        self.build_workers = build_workers
+        # seconds taken by each build stage, by stage name.
+        self.stage_timings = {}
+        # thread count and scheduling of map generation loops.
+        self.context = context if context is not None else \
+            ExecutionContext()
+        # resolution of detail height cube. Memory-mapped detail maps
+        # are generated in bands, so their size is limited by disk
+        # space rather than memory.
+        if detail_face_size is None:
+            self.detail_width = DETAIL_CUBE_WIDTH
+            self.detail_height = DETAIL_CUBE_HEIGHT
+        elif detail_face_size > 0:
+            self.detail_width = detail_face_size * 3
+            self.detail_height = detail_face_size * 2
+        else:
+            raise ValueError(
+                'Invalid detail face size: {}'.format(detail_face_size))
+        # storage type of tile height maps; 16 bit storages halve the
+        # memory used by each cached tile. See grey_quantization.
+        self.tile_storage = tile_storage
+        self.tile_scale, self.tile_offset = grey_quantization(
+            tile_storage, MIN_HEIGHT_MAP_EL, MAX_HEIGHT_MAP_EL)
+        # cache of the noise layers of the detail height map. May be
+        # shared by spheroids to re-use layers held in memory.
+        if layer_cache is None and use_cache:
+            layer_cache = NoiseLayerCache(
+                os.path.join(self.dir_path, LAYER_CACHE_DIR_NAME))
+        self.layer_cache = layer_cache
+        # how noise backends are chosen; one of NOISE_BACKEND_MODES.
+        if noise_backend not in NOISE_BACKEND_MODES:
+            raise ValueError(
+                'Unknown noise backend: {!r}; expected one of {}'
+                .format(noise_backend, NOISE_BACKEND_MODES))
+        self.noise_backend = noise_backend
+        # NoiseBackend of each stage that generates noise; set by build.
+        self.noise_backends = None
 
         # maps
         self.tectonic_map = None
@@ -85,23 +206,278 @@ class Spheroid:
         composed of type, seed, and mass.
         :return: None
         """
-        return '{type}{seed}{mass}'.format(
-            type=self.type,
-            seed=self.seed,
-            mass='{:.0f}'.format(self.mass)[:12]
-        ).strip('.')  # remove any '.'
+        return spheroid_uid(self.type, self.seed, self.mass)
 
     def build(self):
+        """
+        Builds spheroid maps, running the stages returned by
+        stage_graph concurrently where they do not depend on each
+        other. Time taken by each stage is stored in stage_timings.
+        :return: None
+        """
+        logger = logging.getLogger(__name__)
         tiles_dir = os.path.join(self.dir_path, 'tiles')
         if not os.path.exists(tiles_dir):
             os.mkdir(tiles_dir)
-        self.tectonic_map = self.make_tectonic_map()
-        self.warming_map = self.make_warming_map()
+        start = time.perf_counter()
+        self.noise_backends = self.select_noise_backends()
+        self.write_build_info()
+        self.stage_timings = self.stage_graph().run(
+            self.build_workers, self.context)
+        logger.info('Built spheroid in %.3fs',
+                    time.perf_counter() - start)
+
+    def select_noise_backends(self):
+        """
+        Gets the backend with which each stage generates noise,
+        following the spheroid's noise_backend mode.
+        Must not be called while noise is being generated, as 'auto'
+        mode benchmarks backends the first time it is used.
+        :return: dict of stage name: NoiseBackend
+        """
+        if self.noise_backend == 'auto':
+            return host_backends()
+        simd = NoiseBackend(SIMD, get_simd_level())
+        return {
+            stage: simd if self.noise_backend == 'simd' or
+            stage in SIMD_ONLY_STAGES else NoiseBackend(SCALAR)
+            for stage in NOISE_STAGES
+        }
+
+    def write_build_info(self):
+        """
+        Records the noise engine used by each stage in the spheroid's
+        BUILD_INFO_NAME file, as the engine determines the noise, and
+        so the maps, generated from the spheroid's seed.
+        :return: None
+        """
+        with open(os.path.join(self.dir_path, BUILD_INFO_NAME), 'w') as f:
+            json.dump({
+                'noise_backend': self.noise_backend,
+                'noise_engines': {
+                    stage: backend.engine
+                    for stage, backend in self.noise_backends.items()},
+            }, f, indent=2, sort_keys=True)
+
+    def uses_simd(self, stage):
+        """
+        Gets whether passed stage generates noise with FastNoiseSIMD.
+        :param stage: str name of a stage in NOISE_STAGES
+        :return: bool
+        """
+        return self.noise_backends is None or \
+            self.noise_backends[stage].simd
+
+    def stage_keys(self):
+        """
+        Gets keys of the cached stages that build the spheroid's maps.
+        :return: dict of stage name: str key returned by stage_key
+        """
+        keys = {}
+        keys['tectonic'] = self.stage_key(
+            'tectonic',
+            simd=self.uses_simd('tectonic'),
+            base_map_dimensions=BASE_MAP_DIMENSIONS,
+            width=TECTONIC_CUBE_WIDTH,
+            height=TECTONIC_CUBE_HEIGHT)
+        keys['warming'] = self.stage_key(
+            'warming',
+            inputs=(keys['tectonic'],),
+            rel_res=WARMING_REL_RES,
+            mean_temp=self.mean_temp,
+            surface_pressure=self.surface_pressure,
+            atm_warming=self.atm_warming,
+            surface_gravities=self.surface_gravities)
+        keys['wind'] = self.stage_key(
+            'wind',
+            inputs=(keys['warming'],),
+            simd=self.uses_simd('wind'),
+            surface_pressure=self.surface_pressure)
+        # detail parameters include those of its combination step, so
+        # that changes to it re-make the detail map from cached noise
+        # layers, without invalidating other stages.
+        keys['detail'] = self.stage_key(
+            'detail',
+            inputs=(keys['tectonic'],),
+            noise=detail_noise_params(self.radius, self.seed),
+            combine=detail_combine_params(),
+            width=self.detail_width,
+            height=self.detail_height)
+        return keys
+
+    def tile_key(self, size, refine):
+        """
+        Gets key identifying the height maps of the spheroid's tiles,
+        derived from the key of the detail stage, whose noise and
+        combination they share, and from the tiles' settings.
+        :param size: int width and height of tile maps.
+        :param refine: bool; whether tiles are refined from their
+                    parent tile's height map.
+        :return: str
+        """
+        return self.stage_key(
+            'tiles', inputs=(self.stage_keys()['detail'],), size=size,
+            refine=refine, quantization=self.tile_quantization)
+
+    @property
+    def tile_quantization(self):
+        """
+        Gets storage, scale and offset of tile height map values, as
+        keyword arguments of the map's constructor.
+        :return: dict
+        """
+        return dict(storage=self.tile_storage, scale=self.tile_scale,
+                    offset=self.tile_offset)
+
+    def stage_graph(self):
+        """
+        Gets graph of the stages that build the spheroid's maps,
+        each of which requires the stages whose output it uses.
+        :return: StageGraph
+        """
+        keys = self.stage_keys()
+
+        def cached(attr, stage, map_type, make, backed=False):
+            def run(context=None):
+                setattr(self, attr, self.cached_stage(
+                    stage, keys[stage], map_type,
+                    functools.partial(make, context=context), backed))
+            return run
+
+        def uncached(attr, make):
+            def run(context=None):
+                setattr(self, attr, make(context=context))
+            return run
+
+        stages = [
+            Stage('tectonic', cached(
+                'tectonic_map', 'tectonic', GreyCubeMap,
+                self.make_tectonic_map)),
+            Stage('warming', cached(
+                'warming_map', 'warming', GreyCubeMap,
+                self.make_warming_map), requires=('tectonic',)),
+            Stage('temp', uncached('temp_map', self.make_temp_map),
+                  requires=('tectonic',)),
+            Stage('detail', cached(
+                'height_map', 'detail', GreyCubeMap,
+                self._make_detail_h_map, backed=True),
+                requires=('tectonic',)),
+            Stage('tex', uncached('tex_map', self.make_tex_map),
+                  requires=('detail', 'temp')),
+        ]
         if self.surface_pressure > 0.01:
-            self.wind_map = self.make_wind_map()
-        self.temp_map = self.make_temp_map()
-        self.make_detail_h_map()
-        self.tex_map = self.make_tex_map()
+            stages.append(Stage('wind', cached(
+                'wind_map', 'wind', VecCubeMap,
+                self.make_wind_map), requires=('warming',)))
+        return StageGraph(stages)
+
+    def stage_key(self, stage, inputs=(), **params):
+        """
+        Gets key identifying the output of a build stage.
+        The key is derived from everything that affects the output:
+        the spheroid's seed, radius and mass, the stage's parameters
+        (including map resolution), the keys of the stages whose
+        output it uses, and STAGE_CACHE_VERSION.
+        :param stage: str stage name
+        :param inputs: keys of stages whose output is used by stage.
+        :param params: json-serializable stage parameters.
+        :return: str
+        """
+        content = json.dumps({
+            'version': STAGE_CACHE_VERSION,
+            'stage': stage,
+            'seed': self.seed,
+            'radius': self.radius,
+            'mass': self.mass,
+            'inputs': list(inputs),
+            'params': params,
+        }, sort_keys=True)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+    def stage_path(self, stage, key):
+        """
+        Gets path at which output of a stage with passed key is cached.
+        Outputs are stored as .npy files that can be memory-mapped
+        if the spheroid uses memory-mapped maps, and as compressed
+        chunked map files otherwise.
+        :param stage: str stage name
+        :param key: str key returned by stage_key
+        :return: str
+        """
+        suffix = '.npy' if self.use_mmap else CHUNKED_SUFFIX
+        return os.path.join(
+            self.dir_path, STAGE_CACHE_DIR_NAME,
+            '{}-{}{}'.format(stage, key, suffix))
+
+    def cached_stage(self, stage, key, map_type, make, backed=False):
+        """
+        Gets output of a build stage from the stage cache, or, if it
+        has not yet been cached, makes and caches it.
+        Cached outputs of the stage with other keys are stale,
+        and are removed.
+        :param stage: str stage name
+        :param key: str key returned by stage_key
+        :param map_type: type of map produced by stage.
+        :param make: callable returning the stage's output map.
+        :param backed: bool; whether make accepts the path of the file
+                    to which its output map should be memory-mapped.
+                    If the spheroid uses memory-mapped maps, the map
+                    is then generated directly into the cache file,
+                    rather than being copied to it.
+        :return: AbstractMap
+        """
+        logger = logging.getLogger(__name__)
+        if not self.use_cache:
+            return make()
+        path = self.stage_path(stage, key)
+        if os.path.exists(path):
+            try:
+                map_ = load_map(map_type, path, self.use_mmap)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(
+                    'Could not load cached %s stage: %s', stage, e)
+            else:
+                logger.info('Loaded %s stage from cache', stage)
+                return map_
+        self.clear_stage_cache(stage, keep=path)
+        # write to a temporary file first so that an interrupted
+        # write does not leave a broken file at the cached path.
+        tmp_path = os.path.join(
+            os.path.dirname(path), '.tmp-' + os.path.basename(path))
+        if backed and self.use_mmap:
+            map_ = make(tmp_path)
+            write_map(map_, tmp_path)  # only flushes map
+            os.replace(tmp_path, path)
+            # re-map the moved file, as a cache hit would.
+            return load_map(map_type, path, self.use_mmap)
+        map_ = make()
+        write_map(map_, tmp_path)
+        os.replace(tmp_path, path)
+        return map_
+
+    def clear_stage_cache(self, stage=None, keep=None):
+        """
+        Removes cached stage outputs.
+        :param stage: str name of stage whose outputs should be
+                    removed. If None, all outputs are removed.
+        :param keep: str path of a cached output not to remove.
+        :return: None
+        """
+        cache_dir = os.path.join(self.dir_path, STAGE_CACHE_DIR_NAME)
+        if not os.path.exists(cache_dir):
+            # stages may be run concurrently
+            os.makedirs(cache_dir, exist_ok=True)
+            return
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.startswith('.tmp-'):
+                name = name[len('.tmp-'):]
+            if stage is not None and not name.startswith(stage + '-'):
+                continue
+            if keep is not None and \
+                    os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            os.remove(path)
 
     def make_dir(self):
         """
@@ -113,107 +489,138 @@ class Spheroid:
 
     def make_tectonic_arr(self):
         """
-        Converts base height map into grey-scale npy arr.
-        :return: None
+        Reads base height map into a grey-scale array.
+        :return: float32 ndarray
         """
         base_map_path = os.path.join(
             self.dir_path, BASE_MAP_NAME + HEIGHTFIELD_SUFFIX)
         height_field = HeightField(base_map_path)
-        width = BASE_MAP_WIDTH
-        height = height_field.n_rows
-        arr = np.ndarray((height, width), np.float32)
-
-        for y, row in enumerate(height_field.filled_rows):
-            arr[y] = row
-        for row in arr:
-            assert any(value for value in row), row
-
-        # get path to file to save in
-        height_map_path = os.path.join(self.dir_path, HEIGHT_MAP_NAME)
-
-        np.save(height_map_path, arr)
+        if height_field.n_cols != BASE_MAP_WIDTH:
+            raise ValueError('Expected {} columns in {}, got {}'.format(
+                BASE_MAP_WIDTH, base_map_path, height_field.n_cols))
+        arr = np.ascontiguousarray(height_field.filled_arr)
+        assert arr.any(axis=1).all(), 'height field contains blank rows'
+        return arr
 
     def call_planet_subprocess(self):
-        # we need to change working directory to planet_gen path
-        initial_dir = os.curdir
-        os.chdir(settings.PLANET_GEN_DIR)
-        base_map_path = os.path.join(self.dir_path, BASE_MAP_NAME)
-        # For some unfathomable reason,
-        # subprocess breaks when this command is run.
-        # It seems to only apply a select few of the arguments passed.
-        os.system(
-            './planet -o {out} '
-            '-pprojection=q '
-            '-s {seed} '
-            '-n '
-            '-S '
-            '-w {w} '
-            '-h {h} '
-            '-H'
-            .format(
-                out=base_map_path,
-                seed=self.seed,
-                w=BASE_MAP_DIMENSIONS[0],
-                h=BASE_MAP_DIMENSIONS[1],
-            )
+        """
+        Runs the planet generator to create the base height field.
+        The generator is run with its own directory as working
+        directory, without changing that of this process, so that
+        several spheroids may be generated in one process.
+        :return: None
+        """
+        base_map_path = os.path.abspath(
+            os.path.join(self.dir_path, BASE_MAP_NAME))
+        subprocess.run(
+            [
+                settings.PLANET_GEN_PATH,
+                '-o', base_map_path,
+                '-pprojection=q',
+                '-s', str(self.seed),
+                '-n',
+                '-S',
+                '-w', str(BASE_MAP_DIMENSIONS[0]),
+                '-h', str(BASE_MAP_DIMENSIONS[1]),
+                '-H',
+            ],
+            cwd=settings.PLANET_GEN_DIR,
+            stdout=subprocess.DEVNULL,
+            check=True,
         )
-        os.chdir(initial_dir)  # change dir back to whatever it started as
 
-    def make_tectonic_map(self):
+    def make_tectonic_map(self, context=None):
         """
         Creates cube map from lat-lon map
+        :param context: ExecutionContext; defaults to spheroid's context.
         :return: None
         """
         self.call_planet_subprocess()
-        self.make_tectonic_arr()
-        height_map_path = os.path.join(self.dir_path, HEIGHT_MAP_NAME)
+        arr = self.make_tectonic_arr()
+        # map uses array directly, rather than a copy.
         lat_lon_map = GreyLatLonMap(
-            height=1302, width=2048, path=height_map_path)  # load from file
-        cube_map = GreyCubeMap(height=1024, width=1536)
-        make_tectonic_cube(cube_map, lat_lon_map, self)
+            height=arr.shape[0], width=arr.shape[1], arr=arr)
+        cube_map = GreyCubeMap(
+            height=TECTONIC_CUBE_HEIGHT, width=TECTONIC_CUBE_WIDTH)
+        make_tectonic_cube(cube_map, lat_lon_map, self,
+                           context or self.context,
+                           self.uses_simd('tectonic'))
 
         return cube_map
 
-    def make_warming_map(self):
+    def make_warming_map(self, context=None):
         """
         Creates a map that stores information about warming areas of
         the planet surface.
+        :param context: ExecutionContext; defaults to spheroid's context.
         :return: TMap
         """
         return make_warming_map(
             height_map=self.tectonic_map,
-            rel_res=0.5,  # relative resolution
+            rel_res=WARMING_REL_RES,  # relative resolution
             mean_temp=self.mean_temp,
             base_atm=self.surface_pressure,
             atm_warming=self.atm_warming,
             base_gravity=self.surface_gravities,
-            radius=self.radius)
+            radius=self.radius,
+            context=context or self.context)
 
-    def make_wind_map(self):
+    def make_wind_map(self, context=None):
         return make_wind_map(
             self.warming_map,
             self.seed + 100,
             self.mass,
             self.radius,
-            self.surface_pressure)
+            self.surface_pressure,
+            context or self.context,
+            self.uses_simd('wind'))
 
-    def make_temp_map(self):
+    def make_temp_map(self, context=None):
         """
         Creates temperature cube map from height map + other
         information about planet. (mean temp, mass, atmosphere, etc)
-        :return: None
+        :param context: ExecutionContext; defaults to spheroid's context.
+        :return: GreyCubeMap
         """
+        return make_temp_map(
+            height_map=self.tectonic_map,
+            mean_temp=self.mean_temp,
+            base_atm=self.surface_pressure,
+            atm_warming=self.atm_warming,
+            base_gravity=self.surface_gravities,
+            context=context or self.context)
 
-    def make_detail_h_map(self):
+    def make_detail_h_map(self, path=None, context=None):
+        """
+        Creates detail height map.
+        :param path: str path of the file to which the map is
+                    memory-mapped if the spheroid uses memory-mapped
+                    maps. Defaults to HEIGHT_DETAIL_NAME in the
+                    spheroid's directory.
+        :param context: ExecutionContext; defaults to spheroid's context.
+        :return: None
+        """
         if self.height_map is None:
-            # self.height_map = GreyCubeMap(height=2048, width=3072)
-            # self.height_map = GreyCubeMap(height=1024, width=1536)
-            self.height_map = GreyCubeMap(height=512, width=768)
-        make_height_detail(self.height_map, self)
-
-    def make_tex_map(self):
+            if self.use_mmap:
+                self.height_map = GreyCubeMap(
+                    height=self.detail_height, width=self.detail_width,
+                    path=path or os.path.join(
+                        self.dir_path, HEIGHT_DETAIL_NAME),
+                    mmap_mode='w+')
+            else:
+                self.height_map = GreyCubeMap(
+                    height=self.detail_height, width=self.detail_width)
+        make_height_detail(
+            self.height_map, self, context or self.context, self.layer_cache)
+
+    def _make_detail_h_map(self, path=None, context=None):
+        self.make_detail_h_map(path, context)
+        return self.height_map
+
+    def make_tex_map(self, context=None):
         """
         Creates map
+        :param context: ExecutionContext; defaults to spheroid's context.
         :return:
         """
 
@@ -222,12 +629,20 @@ class Spheroid:
         Writes maps to png files for debug purposes
         :return:
         """
-        self.tectonic_map.write_png(os.path.join(
-            self.dir_path, 'height_cube.png'))
-        self.warming_map.write_png(os.path.join(self.dir_path, 'warming.png'))
-        self.height_map.write_png(
-            os.path.join(self.dir_path, 'height_detail.png'))
-        # todo: temp + others
+        # maps are quantized and compressed without holding the GIL,
+        # so are written concurrently.
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(map_.write_png, os.path.join(
+                    self.dir_path, name)) for map_, name in (
+                    (self.tectonic_map, 'height_cube.png'),
+                    (self.warming_map, 'warming.png'),
+                    (self.temp_map, 'temp.png'),
+                    (self.height_map, 'height_detail.png'),
+                )
+            ]
+            for future in futures:
+                future.result()  # re-raise any exception
 
     def write_cache(self) -> None:
         """
@@ -235,8 +650,10 @@ class Spheroid:
         if spheroid needs to be re-created.
         :return: None
         """
-        self.tectonic_map.save(os.path.join(self.dir_path, 'height_cube.npy'))
-        self.height_map.save(os.path.join(self.dir_path, 'height_detail.npy'))
+        write_map(self.tectonic_map,
+                  os.path.join(self.dir_path, HEIGHT_CUBE_CACHE_NAME))
+        write_map(self.height_map,
+                  os.path.join(self.dir_path, HEIGHT_DETAIL_CACHE_NAME))
 
     @property
     def dir_path(self):
@@ -246,59 +663,68 @@ class Spheroid:
 class HeightField:
     """
     Handles information from height field file.
+    The file is parsed once, on first access, into an array that
+    is shared by all properties.
     """
 
     def __init__(self, path):
         self.path = path
-        self._rows = None
-        self._cols = None
+        self._arr = None
+        self._filled_range = None
+
+    @property
+    def arr(self):
+        """
+        Gets all values in height field file, including blank rows.
+        :return: float32 ndarray of shape (rows, columns)
+        """
+        if self._arr is None:
+            with open(self.path, 'r') as f:
+                n_cols = len(f.readline().split())
+            # values are parsed by numpy rather than per token in python.
+            values = np.fromfile(self.path, dtype=np.float32, sep=' ')
+            if not n_cols or values.size % n_cols:
+                raise ValueError(
+                    '{} does not contain rows of equal length'
+                    .format(self.path))
+            self._arr = values.reshape(-1, n_cols)
+        return self._arr
 
     @property
     def n_rows(self):
-        if not self._rows:
-            self._rows = len(self.filled_range)
-        return self._rows
+        return len(self.filled_range)
 
     @property
     def n_cols(self):
-        if not self._cols:
-            with open(self.path, 'r') as f:
-                self._rows = len(f.readline().rstrip().split())
-        return self._cols
+        return self.arr.shape[1]
 
     @property
     def filled_range(self):
         """
-        Gets range of rows with useful data.
+        Gets range of rows with useful data; from the first row
+        containing a non-zero value to the last.
         :return: range
         """
-        with open(self.path, 'r') as f:
-            content = False
-            first_row = None
-            last_row = None
-            counter = 0
-            for y, line in enumerate(f.readlines()):
-                blank = all([not int(i) for i in line.rstrip().split()])
-                if not content and not blank:
-                    first_row = y
-                    content = True
-                elif content and blank:
-                    last_row = y - 1
-                counter = y
-            if not first_row:
-                first_row = 0
-            if not last_row:
-                last_row = counter
-            if not self._rows:
-                self._rows = counter
-            return range(first_row, last_row)
+        if self._filled_range is None:
+            filled = np.flatnonzero(self.arr.any(axis=1))
+            if filled.size:
+                self._filled_range = range(filled[0], filled[-1] + 1)
+            else:
+                self._filled_range = range(0, 0)
+        return self._filled_range
+
+    @property
+    def filled_arr(self):
+        """
+        Gets array of rows with useful data.
+        :return: float32 ndarray view of shape (n_rows, n_cols)
+        """
+        rng = self.filled_range
+        return self.arr[rng.start:rng.stop]
 
     @property
     def filled_rows(self):
-        with open(self.path, 'r') as f:
-            rng = self.filled_range
-            for row in f.readlines()[slice(rng.start, rng.stop)]:
-                yield [int(n) for n in row.rstrip().split()]
+        yield from self.filled_arr
 
 
 class Tile:
@@ -306,49 +732,136 @@ class Tile:
     Handles generation of data for a tile belonging to a Spheroid.
     """
 
-    def __init__(self, spheroid, face, parent=None, p1=(-1, -1), p2=(1, 1)):
+    def __init__(self, spheroid, face, parent=None, p1=(-1, -1), p2=(1, 1),
+                 size=TILE_SIZE, height_map=None, refine=False,
+                 generator=None):
         """
         Initializes sub-tile of a spheroid.
         :param spheroid: Spheroid
-        :param parent: tile parent
+        :param parent: tile parent. Only a weak reference to it is
+                kept, so that a tile does not keep its ancestors'
+                maps in memory; see Tile.parent.
         :param face: index of the cube face on which this tile resides.
         :param p1: lower left tile corner position, with valid range
                 being (-1, 1)
         :param p2: upper right tile corner position, with valid range
                 being (-1, 1)
+        :param size: width and height of tile maps.
+        :param height_map: previously generated GreyTileMap; if passed,
+                the tile is not built.
+        :param refine: bool; whether the height map should be refined
+                from the parent tile's height map, rather than
+                generated in full. See refine_height_detail.
+        :param generator: HeightDetailGenerator of the spheroid, shared
+                by its tiles so that its noise generators are created
+                once. If None, one is created for each tile built.
         """
         # validate data
         if p1[0] > p2[0] or p1[1] > p2[1]:
             raise ValueError(
                 'p1, p2 mismatch: p1: {}, p2: {}'.format(p1, p2))
         self.spheroid = spheroid
-        self.parent = parent
+        self._parent = None if parent is None else weakref.ref(parent)
         self.face = face
         self.p1 = p1
         self.p2 = p2
         self.rel_width = p2[0] - p1[0]  # width relative to spheroid
         self.radius = spheroid.radius
         self.seed = spheroid.seed  # should use same height fractals, etc
+        self.size = size
+        self.refine = refine
+        self.generator = generator
 
         # tile maps
-        self.height_map = None
+        self.height_map = height_map
+        # noise layers from which sub-tiles are refined; only kept
+        # by tiles that are built with refine set.
+        self.layers = None
 
-        self.sub_tiles = []
+        # sub-tiles, by index; see make_sub_tile
+        self.sub_tiles = [None] * 4
 
-        self.build()  # build maps
+        if height_map is None:
+            self.build()  # build maps
 
     def make_sub_tile(self, index):
+        """
+        Creates one of the four sub-tiles that divide this tile.
+        Index 0 is the lower left quarter of the tile, 1 lower right,
+        2 upper left and 3 upper right.
+        :param index: int
+        :return: Tile
+        """
         if not 0 <= index < 4:
             raise ValueError('Unexpected index received: {}'.format(index))
-        # todo
+        half_width = (self.p2[0] - self.p1[0]) / 2
+        half_height = (self.p2[1] - self.p1[1]) / 2
+        p1 = (self.p1[0] + index % 2 * half_width,
+              self.p1[1] + index // 2 * half_height)
+        p2 = (p1[0] + half_width, p1[1] + half_height)
+        tile = Tile(self.spheroid, self.face, parent=self, p1=p1, p2=p2,
+                    size=self.size, refine=self.refine,
+                    generator=self.generator)
+        self.sub_tiles[index] = tile
+        return tile
+
+    def make_sub_tiles(self):
+        """
+        Creates all four sub-tiles that divide this tile, generating
+        their height maps together in a single batch, unless they are
+        refined from this tile's height map.
+        :return: list of Tile, by index; see make_sub_tile
+        """
+        if self.refine:
+            return [self.make_sub_tile(i) for i in range(4)]
+        half_width = (self.p2[0] - self.p1[0]) / 2
+        half_height = (self.p2[1] - self.p1[1]) / 2
+        bounds = []
+        for index in range(4):
+            p1 = (self.p1[0] + index % 2 * half_width,
+                  self.p1[1] + index // 2 * half_height)
+            bounds.append((p1, (p1[0] + half_width, p1[1] + half_height)))
+        height_maps = [
+            new_tile_height_map(self.spheroid, self.face, p1, p2, self.size)
+            for p1, p2 in bounds
+        ]
+        make_height_detail_batch(height_maps, self, self.spheroid.context,
+                                 self.generator)
+        self.sub_tiles = [
+            Tile(self.spheroid, self.face, parent=self, p1=p1, p2=p2,
+                 size=self.size, height_map=height_map,
+                 generator=self.generator)
+            for (p1, p2), height_map in zip(bounds, height_maps)
+        ]
+        return list(self.sub_tiles)
+
+    @property
+    def parent(self):
+        """
+        Gets parent tile, if it is still held elsewhere, such as by
+        the caller or a TileManager's cache.
+        :return: Tile or None
+        """
+        return None if self._parent is None else self._parent()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Gets number of bytes of map data held by tile.
+        :return: int
+        """
+        if self.height_map is None:
+            return 0
+        nbytes = np.asarray(self.height_map).nbytes
+        if self.layers is not None:
+            nbytes += self.layers.nbytes
+        return nbytes
 
     def build(self) -> None:
         """
         Creates height, color, etc map.
         :return: None
         """
-        if not os.path.exists(self.dir_path):
-            os.mkdir(self.dir_path)
         self.make_height_map()
 
     def make_height_map(self) -> None:
@@ -357,17 +870,32 @@ class Tile:
         :return:
         """
         # create height_map if it does not yet exist.
-        self.height_map = self.height_map or GreyTileMap(
-            width=1024, height=1024,
-            p1=self.p1, p2=self.p2, cube_face=self.face
-        )
-        make_height_detail(self.height_map, self)
+        if self.height_map is None:
+            self.height_map = new_tile_height_map(
+                self.spheroid, self.face, self.p1, self.p2, self.size)
+        context = self.spheroid.context
+        parent = self.parent
+        if not self.refine:
+            make_height_detail(
+                self.height_map, self, context, None, self.generator)
+        elif parent is not None and parent.layers is not None \
+                and parent.size == self.size:
+            self.layers = refine_height_detail(
+                self.height_map, parent.height_map, parent.layers,
+                self, context, self.generator)
+        else:
+            # parent is missing, or was loaded without its layers
+            self.layers = make_refinable_height_detail(
+                self.height_map, self, context, self.generator)
 
     def write_debug_png(self) -> None:
         """
         Writes maps to png files for debug purposes
         :return:
         """
+        # tiles made by make_sub_tiles are not built, so their
+        # directory may not yet exist.
+        os.makedirs(self.dir_path, exist_ok=True)
         self.height_map.write_png(os.path.join(
             self.dir_path, 'height.png'))
 
@@ -377,7 +905,9 @@ class Tile:
         if tile needs to be re-created.
         :return: None
         """
-        self.height_map.save(os.path.join(self.dir_path, 'height.npy'))
+        os.makedirs(self.dir_path, exist_ok=True)
+        write_map(self.height_map,
+                  os.path.join(self.dir_path, TILE_HEIGHT_CACHE_NAME))
 
     @property
     def dir_path(self) -> str:
@@ -387,8 +917,7 @@ class Tile:
         other output (such as debug images, etc).
         :return: str
         """
-        return os.path.join(
-            self.spheroid.dir_path, 'tiles', str(self.pos_hash))
+        return tile_dir_path(self.spheroid, self.face, self.p1, self.p2)
 
     @property
     def pos_hash(self) -> int:
@@ -402,8 +931,93 @@ class Tile:
         Tiles therefor should be stored within
         :return:
         """
-        return hash((self.face, self.p1, self.p2))
+        return tile_pos_hash(self.face, self.p1, self.p2)
 
     @property
     def tectonic_map(self):
         return self.spheroid.tectonic_map
+
+
+def new_tile_height_map(spheroid, face, p1, p2, size):
+    """
+    Creates an empty height map for a tile, backed by a file in the
+    tile's directory if the spheroid uses memory-mapped maps.
+    :param spheroid: Spheroid
+    :param face: int cube face index
+    :param p1: tuple lower left tile corner position
+    :param p2: tuple upper right tile corner position
+    :param size: int width and height of map.
+    :return: GreyTileMap stored as the spheroid's tile_storage.
+    """
+    storage = spheroid.tile_quantization
+    if spheroid.use_mmap:
+        dir_path = tile_dir_path(spheroid, face, p1, p2)
+        os.makedirs(dir_path, exist_ok=True)
+        return GreyTileMap(
+            width=size, height=size, p1=p1, p2=p2, cube_face=face,
+            path=os.path.join(dir_path, TILE_HEIGHT_NAME), mmap_mode='w+',
+            **storage)
+    return GreyTileMap(
+        width=size, height=size, p1=p1, p2=p2, cube_face=face, **storage)
+
+
+def tile_pos_hash(face, p1, p2):
+    """
+    Produces a hash unique to a tile position; see Tile.pos_hash.
+    :param face: int cube face index
+    :param p1: tuple lower left tile corner position
+    :param p2: tuple upper right tile corner position
+    :return: int
+    """
+    return hash((face, tuple(p1), tuple(p2)))
+
+
+def tile_dir_path(spheroid, face, p1, p2):
+    """
+    Gets the directory in which the tile of passed spheroid at passed
+    position stores its data; see Tile.dir_path.
+    :param spheroid: Spheroid
+    :param face: int cube face index
+    :param p1: tuple lower left tile corner position
+    :param p2: tuple upper right tile corner position
+    :return: str
+    """
+    return os.path.join(
+        spheroid.dir_path, 'tiles', str(tile_pos_hash(face, p1, p2)))
+
+
+def load_map(map_type, path, use_mmap=False):
+    """
+    Loads map of passed type from a .npy or chunked map file.
+    If use_mmap is True, .npy files are memory-mapped copy-on-write,
+    so that changes made to the map are not written to the file.
+    :param map_type: type of map to create.
+    :param path: str
+    :param use_mmap: bool
+    :return: AbstractMap
+    """
+    if path.endswith(CHUNKED_SUFFIX):
+        height, width = ChunkedMapFile(path).shape
+        return map_type(width=width, height=height, path=path)
+    height, width = np.load(path, mmap_mode='r').shape
+    if use_mmap:
+        return map_type(width=width, height=height, path=path, mmap_mode='c')
+    return map_type(width=width, height=height, path=path)
+
+
+def write_map(map_, path):
+    """
+    Writes map data to the file at passed path.
+    Memory-mapped maps are flushed to their backing file; maps
+    that are already memory-mapped to the passed path are not
+    re-written.
+    :param map_: AbstractMap
+    :param path: str
+    :return: None
+    """
+    backing_path = map_.backing_path
+    if backing_path is not None:
+        map_.flush()
+        if os.path.abspath(backing_path) == os.path.abspath(path):
+            return
+    map_.save(path)
@@ -0,0 +1,140 @@
+"""
+Scheduling of build stages that depend on each other's output.
+
+Stages are run on a thread pool as soon as every stage they require
+has finished, so that independent stages run concurrently. The map
+generation functions release the GIL for their main loops, and the
+planet generator runs as its own process, so threads are sufficient
+for stages to make use of multiple cores. Stages run at once divide
+the threads of the graph's ExecutionContext between them, rather than
+each running its loops with every cpu.
+"""
+
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage:
+    """
+    A named step of a build, which is run once all the stages it
+    requires have finished.
+    """
+
+    def __init__(self, name, run, requires=()):
+        """
+        :param name: str unique name of stage.
+        :param run: callable taking no arguments, or, if the graph is
+                    run with a context, the ExecutionContext with
+                    which the stage should run its parallel loops.
+        :param requires: names of stages that must finish before
+                    this stage is run.
+        """
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+
+    def __repr__(self):
+        return 'Stage({!r}, requires={!r})'.format(self.name, self.requires)
+
+
+class StageGraph:
+    """
+    Directed acyclic graph of stages.
+    """
+
+    def __init__(self, stages):
+        """
+        :param stages: iterable of Stage
+        :raises ValueError: if stage names are not unique, a required
+                    stage is missing, or stages require each other
+                    cyclically.
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError('Duplicate stage: {}'.format(stage.name))
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            for name in stage.requires:
+                if name not in self.stages:
+                    raise ValueError('Stage {} requires unknown stage: {}'
+                                     .format(stage.name, name))
+        self.order = self._sort()
+
+    def _sort(self):
+        """
+        Orders stages so that each follows those it requires.
+        :return: list of stage names.
+        """
+        order = []
+        done = set()
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items()
+                     if all(r in done for r in stage.requires)]
+            if not ready:
+                raise ValueError(
+                    'Stages require each other cyclically: {}'
+                    .format(sorted(remaining)))
+            for name in ready:
+                order.append(name)
+                done.add(name)
+                del remaining[name]
+        return order
+
+    def run(self, workers=None, context=None):
+        """
+        Runs all stages, running stages whose requirements have been
+        met concurrently.
+        If a stage raises an exception, no further stages are started,
+        and the exception is re-raised once running stages finish.
+        :param workers: int maximum number of stages run at once.
+        :param context: ExecutionContext divided between the stages.
+                    Each stage is passed a share of its threads, by
+                    the number of stages running when it is started.
+                    If None, stages are run without arguments.
+        :return: dict of stage name: seconds taken to run stage,
+                    in order of completion.
+        """
+        logger = logging.getLogger(__name__)
+        timings = {}
+        done = set()
+        running = {}  # future: stage name
+
+        def timed(stage, stage_context):
+            start = time.perf_counter()
+            if stage_context is None:
+                stage.run()
+            else:
+                stage.run(stage_context)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(workers) as executor:
+            pending = list(self.order)
+            while pending or running:
+                ready = [name for name in pending if all(
+                    r in done for r in self.stages[name].requires)]
+                n_running = len(running) + len(ready)
+                if workers is not None:
+                    n_running = min(n_running, workers)
+                for name in ready:
+                    pending.remove(name)
+                    stage_context = None if context is None else \
+                        context.shared(n_running)
+                    future = executor.submit(
+                        timed, self.stages[name], stage_context)
+                    running[future] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        wait(running)
+                        raise error
+                    timings[name] = future.result()
+                    done.add(name)
+                    logger.info(
+                        'Stage %s finished in %.3fs', name, timings[name])
+        return timings
@@ -0,0 +1,40 @@
+cimport numpy as np
+
+from .map cimport AbstractMap
+
+
+cpdef np.ndarray pad_faces(AbstractMap m, int halo, object context=*)
+cpdef AbstractMap apply_kernel(
+        AbstractMap m, kernel, AbstractMap out=*, object context=*)
+cpdef AbstractMap apply_separable_kernel(
+        AbstractMap m,
+        kernel_x,
+        kernel_y=*,
+        AbstractMap out=*,
+        object context=*)
+cpdef AbstractMap gaussian_blur(
+        AbstractMap m,
+        double sigma,
+        int radius=*,
+        AbstractMap out=*,
+        object context=*)
+cpdef AbstractMap smooth(
+        AbstractMap m,
+        double sigma,
+        AbstractMap out=*,
+        object pyramid=*,
+        object context=*)
+cpdef AbstractMap laplacian(
+        AbstractMap m, AbstractMap out=*, object context=*)
+cpdef AbstractMap gradient(AbstractMap m, object context=*)
+cpdef AbstractMap slope(
+        AbstractMap m,
+        double pixel_size=*,
+        AbstractMap out=*,
+        object context=*)
+cpdef AbstractMap thermal_erosion(
+        AbstractMap m,
+        double talus,
+        double rate=*,
+        int iterations=*,
+        object context=*)
@@ -0,0 +1,912 @@
+# cython: infer_types=True, boundscheck=False, nonecheck=False, language_level=3, wraparound=False, initializedcheck=False
+
+"""
+Neighbourhood (stencil) operations on grey maps; kernels, blur,
+laplacian, gradient, slope and erosion, and mip pyramids of cube and
+tile maps, from which large blurs are computed.
+
+The six faces of a cube map are packed 3x2 in one array, so the
+neighbours of a pixel on the edge of a face lie on an adjacent face,
+rotated relative to it, or not adjacent in the array at all. Stencils
+are therefore applied to padded faces; copies of each face bordered by
+a halo of pixels gathered from the adjacent faces, in the orientation
+of the padded face, so that a kernel crossing the edge of a face sees
+the same neighbourhood it would anywhere else on the sphere. Tile maps
+have no data beyond their edges, so their halos repeat their edge
+pixels.
+
+The map array index of each padded pixel is stored in a halo table,
+cached by map geometry and halo width. Faces are padded and kernels
+applied a row at a time, in parallel.
+"""
+
+import numpy as np
+
+from collections import OrderedDict
+
+cimport cython
+cimport numpy as np
+
+from cython.parallel cimport prange
+from libc.math cimport sqrt
+
+from .map cimport AbstractMap, GreyCubeMap, GreyTileMap, VecCubeMap, \
+    VecTileMap
+from .map import GREY_MAP_TYPES
+
+include "flags.pxi"
+include "parallel.pxi"
+
+DEF SQRT_2 = 1.4142135623730950488016887242096980785697
+
+HALO_CACHE_SIZE = 8  # max number of halo tables kept
+
+# halo tables, least recently used first
+_halo_tables = OrderedDict()
+
+
+#######################################################################
+# HALOS
+#######################################################################
+
+
+def clear_halo_tables():
+    """
+    Discards all cached halo tables.
+    """
+    _halo_tables.clear()
+
+
+def face_layout(AbstractMap m):
+    """
+    Gets the faces of passed map that stencils are applied to.
+    :param m: GreyCubeMap or GreyTileMap
+    :return: tuple(width, height, origins) of the faces; origins is
+                a list of the (x, y) position in the map's array of
+                each face's first pixel.
+    """
+    kind = m.geometry[0]
+    if kind == 'cube':
+        w, h = m.width // 3, m.height // 2
+        return w, h, [(face % 3 * w, face // 3 * h) for face in range(6)]
+    elif kind == 'tile':
+        return m.width, m.height, [(0, 0)]
+    raise TypeError(
+        f'Stencils can only be applied to cube and tile maps, got: {m}')
+
+
+def halo_table(AbstractMap m, int halo, bint centered=False):
+    """
+    Gets the map array index of each pixel of passed map's faces,
+    padded with passed halo width.
+    Tables are cached by map geometry and halo, so maps of any data
+    type that share a geometry share a table.
+    :param m: cube or tile map.
+    :param halo: int width in pixels of the border around each face.
+    :param centered: bool; whether pixels of the map are centered on
+                the squares dividing each face, as in mip levels,
+                rather than spanning the face from edge to edge.
+    :return: ndarray of np.intp, of shape
+                (faces, height + 2 * halo, width + 2 * halo)
+    """
+    key = m.geometry, halo, centered
+    table = _halo_tables.get(key)
+    if table is None:
+        table = _make_halo_table(m, halo, centered)
+        table.flags.writeable = False
+        _halo_tables[key] = table
+        while len(_halo_tables) > HALO_CACHE_SIZE:
+            _halo_tables.popitem(last=False)
+    else:
+        _halo_tables.move_to_end(key)
+    return table
+
+
+def _make_halo_table(AbstractMap m, int halo, bint centered=False):
+    """
+    Computes halo table of passed map's geometry.
+    Face pixel x spans the face's a axis from -1 to 1 as x goes from
+    0 to width - 1, as in CubeMap.xy_from_vector, so halo pixels past
+    the edge of a face lie on the extended plane of the face. Each is
+    projected onto the face containing its position vector, and
+    takes the nearest pixel of that face.
+    Centered pixels instead divide the face into squares, pixel x
+    lying at the center of the x-th square along the a axis.
+    """
+    w, h, origins = face_layout(m)
+    if not 0 <= halo < min(w, h):
+        raise ValueError(f'Invalid halo: {halo} for faces of {w}x{h}')
+    IF DEBUG:
+        print(f'computing halo table for {m.geometry}, halo: {halo}')
+    px, py = np.meshgrid(np.arange(-halo, w + halo),
+                         np.arange(-halo, h + halo))
+    inside = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+    table = np.empty((len(origins), h + 2 * halo, w + 2 * halo), np.intp)
+    if m.geometry[0] == 'tile':
+        # tiles have no neighbouring data; edge pixels are repeated.
+        table[0] = np.clip(py, 0, h - 1) * w + np.clip(px, 0, w - 1)
+        return table
+    for face, (x0, y0) in enumerate(origins):
+        if centered:
+            a = (px + 0.5) / w * 2 - 1
+            b = (py + 0.5) / h * 2 - 1
+        else:
+            a = px / max(1, w - 1) * 2 - 1
+            b = py / max(1, h - 1) * 2 - 1
+        n_face, n_a, n_b = _face_positions(*_face_vectors(face, a, b))
+        if centered:
+            n_x = np.clip(np.floor((n_a + 1) / 2 * w), 0, w - 1)
+            n_y = np.clip(np.floor((n_b + 1) / 2 * h), 0, h - 1)
+        else:
+            n_x = np.clip(np.rint((n_a + 1) / 2 * (w - 1)), 0, w - 1)
+            n_y = np.clip(np.rint((n_b + 1) / 2 * (h - 1)), 0, h - 1)
+        index = (n_face // 3 * h + n_y.astype(np.intp)) * m.width + \
+            n_face % 3 * w + n_x.astype(np.intp)
+        # pixels within the face are not projected, so that those on
+        # its edges are not taken from the face adjoining them.
+        table[face] = np.where(inside, (y0 + py) * m.width + x0 + px, index)
+    return table
+
+
+def _face_vectors(int face, a, b):
+    """
+    Gets vectors of positions (a, b) on the plane of passed cube face,
+    following the orientation of CubeMap.vector_from_xy.
+    :param face: int
+    :param a: ndarray
+    :param b: ndarray
+    :return: tuple(x, y, z) of ndarrays.
+    """
+    one = np.ones_like(a)
+    if face == 0:
+        return one, a, b
+    elif face == 1:
+        return a, -one, b
+    elif face == 2:
+        return -one, -a, b
+    elif face == 3:
+        return -a, one, b
+    elif face == 4:
+        return a, b, one
+    elif face == 5:
+        return -a, b, -one
+    raise ValueError(f'Invalid face index: {face}')
+
+
+def _face_positions(x, y, z):
+    """
+    Gets the cube face on which each passed vector lies, and its
+    position (a, b) on that face; the inverse of _face_vectors,
+    following CubeMap.xy_from_vector.
+    :return: tuple(face, a, b) of ndarrays.
+    """
+    ax, ay, az = np.abs(x), np.abs(y), np.abs(z)
+    on_x = (ax >= ay) & (ax >= az)
+    on_y = ~on_x & (ay >= az)
+    on_z = ~on_x & ~on_y
+    face = np.select(
+        [on_x & (x > 0), on_x, on_y & (y > 0), on_y, z > 0], [0, 2, 3, 1, 4],
+        default=5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.select(
+            [on_x, on_y, on_z], [y / x, x / -y, x / z])
+        b = np.select(
+            [on_x, on_y, on_z],
+            [z / ax, z / ay, np.where(z > 0, y / z, y / -z)])
+    return face, a, b
+
+
+cpdef np.ndarray pad_faces(
+        AbstractMap m, int halo, object context=None):
+    """
+    Gets copies of passed grey map's faces, bordered by halos of
+    pixels from the faces adjoining them.
+    :param m: grey cube or tile map.
+    :param halo: int width of halo.
+    :param context: ExecutionContext used by parallel loops.
+    :return: float32 ndarray of shape
+                (faces, height + 2 * halo, width + 2 * halo)
+    """
+    _check_grey(m)
+    return _pad(m.values(), halo_table(m, halo), begin_parallel(context))
+
+
+cdef np.ndarray _pad(np.ndarray values, np.ndarray table, int threads):
+    """
+    Gathers the map values of passed halo table's pixels.
+    :param values: float32 ndarray of map values.
+    :param table: halo table
+    :param threads: int
+    :return: float32 ndarray of table's shape.
+    """
+    cdef const float[::1] src = np.ascontiguousarray(values).reshape(-1)
+    cdef const Py_ssize_t[:, :, ::1] index = table
+    cdef int ph = index.shape[1], pw = index.shape[2]
+    cdef int n_rows = index.shape[0] * ph
+    cdef int r, f, y, x
+    out = np.empty((index.shape[0], ph, pw), np.float32)
+    cdef float[:, :, ::1] dst = out
+    for r in prange(n_rows, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // ph
+        y = r % ph
+        for x in range(pw):
+            dst[f, y, x] = src[index[f, y, x]]
+    return out
+
+
+#######################################################################
+# KERNELS
+#######################################################################
+
+
+cpdef AbstractMap apply_kernel(
+        AbstractMap m, kernel, AbstractMap out=None, object context=None):
+    """
+    Applies a square kernel of odd width to each pixel of passed grey
+    map. Each output pixel is the sum of the kernel's weights times
+    the pixels around it; kernel[k + dy, k + dx], where k is half the
+    kernel's width, weighs the pixel at (x + dx, y + dy) of the face.
+    Kernels crossing the edge of a cube face are applied to the
+    pixels of the adjoining face.
+    :param m: grey cube or tile map.
+    :param kernel: 2d array_like of floats.
+    :param out: grey map of m's geometry to write to; may be m
+                itself. If None, a map like m is created.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    cdef float[:, ::1] k = np.ascontiguousarray(kernel, np.float32)
+    if k.shape[0] != k.shape[1] or k.shape[0] % 2 == 0:
+        raise ValueError(
+            f'Expected square kernel of odd width, got {kernel}')
+    _check_grey(m)
+    out = _check_out(m, out)
+    w, h, origins = face_layout(m)
+    cdef int threads = begin_parallel(context)
+    padded = _pad(m.values(), halo_table(m, k.shape[0] // 2), threads)
+    result = _result_values(out)
+    _correlate(padded, k, result, w, h, _origin_array(origins), threads)
+    return _store_result(out, result)
+
+
+cpdef AbstractMap apply_separable_kernel(
+        AbstractMap m,
+        kernel_x,
+        kernel_y=None,
+        AbstractMap out=None,
+        object context=None):
+    """
+    Applies the kernel that is the outer product of passed kernels,
+    as a pass along each row followed by a pass along each column;
+    see apply_kernel.
+    :param m: grey cube or tile map.
+    :param kernel_x: 1d array_like of odd length, applied along rows.
+    :param kernel_y: 1d array_like of the same length, applied along
+                columns. Defaults to kernel_x.
+    :param out: grey map of m's geometry to write to; may be m
+                itself. If None, a map like m is created.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    cdef float[::1] kx = np.ascontiguousarray(kernel_x, np.float32)
+    cdef float[::1] ky = np.ascontiguousarray(
+        kernel_x if kernel_y is None else kernel_y, np.float32)
+    if kx.shape[0] % 2 == 0 or ky.shape[0] != kx.shape[0]:
+        raise ValueError('Expected kernels of equal, odd length')
+    _check_grey(m)
+    out = _check_out(m, out)
+    w, h, origins = face_layout(m)
+    cdef int threads = begin_parallel(context)
+    padded = _pad(m.values(), halo_table(m, kx.shape[0] // 2), threads)
+    result = _result_values(out)
+    _correlate_separable(
+        padded, kx, ky, result, w, h, _origin_array(origins), threads)
+    return _store_result(out, result)
+
+
+def gaussian_kernel(double sigma, int radius):
+    """
+    Gets normalized 1d gaussian kernel.
+    :param sigma: float standard deviation in pixels.
+    :param radius: int half width of kernel.
+    :return: float32 ndarray of length 2 * radius + 1
+    """
+    x = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+cpdef AbstractMap gaussian_blur(
+        AbstractMap m,
+        double sigma,
+        int radius=-1,
+        AbstractMap out=None,
+        object context=None):
+    """
+    Blurs passed grey map with a gaussian kernel.
+    :param m: grey cube or tile map.
+    :param sigma: float standard deviation of kernel, in pixels.
+    :param radius: int half width of kernel; 3 sigma if negative.
+    :param out: grey map of m's geometry to write to.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    if not sigma > 0:
+        raise ValueError(f'Invalid sigma: {sigma}')
+    if radius < 0:
+        radius = max(1, int(3 * sigma + 0.5))
+    return apply_separable_kernel(
+        m, gaussian_kernel(sigma, radius), out=out, context=context)
+
+
+# 5 point discrete laplacian
+LAPLACIAN_KERNEL = np.array([
+    [0., 1., 0.],
+    [1., -4., 1.],
+    [0., 1., 0.],
+], np.float32)
+
+
+cpdef AbstractMap laplacian(
+        AbstractMap m, AbstractMap out=None, object context=None):
+    """
+    Gets the discrete laplacian of passed grey map, per square pixel.
+    :param m: grey cube or tile map.
+    :param out: grey map of m's geometry to write to.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    return apply_kernel(m, LAPLACIAN_KERNEL, out=out, context=context)
+
+
+cdef bint _correlate(
+        float[:, :, ::1] padded,
+        float[:, ::1] kernel,
+        float[:, :] result,
+        int w,
+        int h,
+        int[:, ::1] origins,
+        int threads) except False:
+    """
+    Applies kernel to each pixel of padded faces, writing to the
+    faces' positions in result.
+    """
+    cdef int k = kernel.shape[0] // 2
+    cdef int pad = (padded.shape[2] - w) // 2
+    cdef int n_rows = padded.shape[0] * h
+    cdef int r, f, x, y, i, j, x0, y0
+    cdef float v
+    for r in prange(n_rows, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // h
+        y = r % h
+        x0 = origins[f, 0]
+        y0 = origins[f, 1]
+        for x in range(w):
+            v = 0
+            for j in range(-k, k + 1):
+                for i in range(-k, k + 1):
+                    v = v + kernel[k + j, k + i] * \
+                        padded[f, pad + y + j, pad + x + i]
+            result[y0 + y, x0 + x] = v
+    return 1
+
+
+cdef bint _correlate_separable(
+        float[:, :, ::1] padded,
+        float[::1] kernel_x,
+        float[::1] kernel_y,
+        float[:, :] result,
+        int w,
+        int h,
+        int[:, ::1] origins,
+        int threads) except False:
+    """
+    Applies kernel_x along each row of padded faces, including halo
+    rows, then kernel_y along each column of the result, writing to
+    the faces' positions in result.
+    """
+    cdef int k = kernel_x.shape[0] // 2
+    cdef int pad = (padded.shape[2] - w) // 2
+    cdef int ph = padded.shape[1]
+    cdef int n_faces = padded.shape[0]
+    cdef int r, f, x, y, i, j, x0, y0
+    cdef float v, wt
+    rows = np.empty((n_faces, ph, w), np.float32)
+    cdef float[:, :, ::1] tmp = rows
+    for r in prange(n_faces * ph, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // ph
+        y = r % ph
+        for x in range(w):
+            v = 0
+            for i in range(-k, k + 1):
+                v = v + kernel_x[k + i] * padded[f, y, pad + x + i]
+            tmp[f, y, x] = v
+    # columns are summed a row at a time, so that rows are read in order.
+    for r in prange(n_faces * h, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // h
+        y = r % h
+        x0 = origins[f, 0]
+        y0 = origins[f, 1]
+        for x in range(w):
+            result[y0 + y, x0 + x] = 0
+        for j in range(-k, k + 1):
+            wt = kernel_y[k + j]
+            for x in range(w):
+                result[y0 + y, x0 + x] += wt * tmp[f, pad + y + j, x]
+    return 1
+
+
+#######################################################################
+# MIP PYRAMIDS
+#######################################################################
+
+
+MIN_MIP_FACE = 8  # min width and height of the faces of a mip level
+MIN_LEVEL_SIGMA = 1.  # min sigma, in level pixels, blurred by smooth
+
+
+class MipPyramid:
+    """
+    Successively halved copies of a cube or tile map. Each level
+    halves the width and height of the faces of the level below by
+    averaging blocks of 2x2 pixels, which never straddle the edge of
+    a face. Level 0 is the map itself; levels above it are stored as
+    float32, whatever the storage of the map.
+    """
+
+    def __init__(self, AbstractMap m, levels=None, object context=None):
+        """
+        :param m: grey or vector cube or tile map.
+        :param levels: int max number of levels above level 0 to
+                    build. Levels are built until a face can no longer
+                    be halved, or would be smaller than MIN_MIP_FACE,
+                    if None.
+        :param context: ExecutionContext used by parallel loops.
+        """
+        w, h, _ = face_layout(m)
+        vector = not isinstance(m, GREY_MAP_TYPES)
+        threads = begin_parallel(context)
+        self.levels = [m]
+        while levels is None or len(self.levels) <= levels:
+            if w % 2 or h % 2 or w // 2 < MIN_MIP_FACE or \
+                    h // 2 < MIN_MIP_FACE:
+                break
+            w, h = w // 2, h // 2
+            self.levels.append(_downsample_map(
+                self.levels[len(self.levels) - 1], vector, threads))
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, int level):
+        return self.levels[level]
+
+    @property
+    def base(self):
+        return self.levels[0]
+
+
+def mip_pyramid(AbstractMap m, levels=None, object context=None):
+    """
+    Builds mip pyramid of passed map; see MipPyramid.
+    :param m: grey or vector cube or tile map.
+    :param levels: int max number of levels above level 0.
+    :param context: ExecutionContext used by parallel loops.
+    :return: MipPyramid
+    """
+    return MipPyramid(m, levels, context)
+
+
+def gauss_smooth_sigma(double radius, int samples):
+    """
+    Gets the standard deviation, in cube map pixels, of the gaussian
+    equivalent to the ring sampling of gauss_smooth_xy_ with passed
+    radius and number of samples.
+    gauss_smooth_xy_ averages samples^2 points, on rings spaced
+    pi / 2 / map height * radius / samples radians apart around the
+    smoothed position, while a face spans pi / 2 radians across its
+    width of map height / 2 pixels; the gaussian has the same mean
+    squared distance from the smoothed position. Pixels near the
+    edges of a face span a smaller angle than those near its center,
+    so the gaussian smooths a little more than gauss_smooth_xy_ near
+    the center of faces, and a little less near their edges.
+    :param radius: float radius passed to gauss_smooth_xy_.
+    :param samples: int samples passed to gauss_smooth_xy_.
+    :return: float
+    """
+    if samples < 1:
+        raise ValueError(f'Samples must be >= 1. Got: {samples}')
+    ring_spacing = radius / 2 / samples  # in pixels
+    return ring_spacing * sqrt((samples - 1) * (2 * samples - 1) / 12.)
+
+
+cpdef AbstractMap smooth(
+        AbstractMap m,
+        double sigma,
+        AbstractMap out=None,
+        object pyramid=None,
+        object context=None):
+    """
+    Blurs passed grey map with a gaussian of large radius.
+    Rather than applying a kernel some 6 sigma wide to every pixel,
+    the blur is applied to the coarsest level of the map's mip
+    pyramid at which it is still at least MIN_LEVEL_SIGMA pixels
+    wide, and the result is interpolated back to the map's pixels.
+    The variance added by averaging pixels into that level, and by
+    interpolating out of it, is taken from that of the blur, so that
+    the result approximates gaussian_blur(m, sigma). Small blurs are
+    passed to gaussian_blur.
+    :param m: grey cube or tile map.
+    :param sigma: float standard deviation of blur, in pixels.
+    :param out: grey map of m's geometry to write to; may be m
+                itself. If None, a map like m is created.
+    :param pyramid: MipPyramid of m, if one was built already.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    if not sigma > 0:
+        raise ValueError(f'Invalid sigma: {sigma}')
+    _check_grey(m)
+    if pyramid is not None and pyramid.base is not m:
+        raise ValueError('Mip pyramid was not built from passed map')
+    out = _check_out(m, out)
+    level, level_sigma = _smooth_level(m, sigma, pyramid)
+    if level == 0:
+        return gaussian_blur(m, sigma, out=out, context=context)
+    if pyramid is None or len(pyramid) <= level:
+        pyramid = MipPyramid(m, level, context)
+    cdef AbstractMap coarse = pyramid[level]
+    cdef int threads = begin_parallel(context)
+    wc, hc, coarse_origins = face_layout(coarse)
+    # mip level pixels are centered in the squares of a face, so their
+    # halos are gathered accordingly.
+    kernel = gaussian_kernel(level_sigma, max(1, int(3 * level_sigma + 0.5)))
+    padded = _pad(coarse.values(), halo_table(
+        coarse, kernel.shape[0] // 2, centered=True), threads)
+    blurred = np.empty((coarse.height, coarse.width), np.float32)
+    _correlate_separable(padded, kernel, kernel, blurred, wc, hc,
+                         _origin_array(coarse_origins), threads)
+    padded = _pad(blurred, halo_table(coarse, 1, centered=True), threads)
+    w, h, origins = face_layout(m)
+    result = _result_values(out)
+    _upsample(padded, result, w, h, _origin_array(origins), 1 << level,
+              threads)
+    return _store_result(out, result)
+
+
+def _smooth_level(AbstractMap m, double sigma, pyramid):
+    """
+    Gets the mip level from which smooth blurs passed map, and the
+    sigma of the blur at that level.
+    :return: tuple(int level, float sigma in level pixels)
+    """
+    w, h, _ = face_layout(m)
+    max_level = 0
+    if pyramid is not None:
+        max_level = len(pyramid) - 1
+    else:
+        while w % 2 == 0 and h % 2 == 0 and w // 2 >= MIN_MIP_FACE and \
+                h // 2 >= MIN_MIP_FACE:
+            w, h = w // 2, h // 2
+            max_level += 1
+    for level in range(max_level, 0, -1):
+        scale = 2 ** level
+        # a level pixel averages scale^2 pixels of the map, and
+        # interpolation spreads it over two level pixels.
+        variance = sigma ** 2 - (scale ** 2 - 1) / 12 - scale ** 2 / 6
+        if variance >= (MIN_LEVEL_SIGMA * scale) ** 2:
+            return level, sqrt(variance) / scale
+    return 0, sigma
+
+
+cdef AbstractMap _downsample_map(AbstractMap m, bint vector, int threads):
+    """
+    Creates the mip level above passed map.
+    """
+    if m.geometry[0] == 'cube':
+        map_type = VecCubeMap if vector else GreyCubeMap
+        level = map_type(width=m.width // 2, height=m.height // 2)
+    else:
+        cube_face, p1x, p1y, p2x, p2y = m.geometry[3:8]
+        map_type = VecTileMap if vector else GreyTileMap
+        level = map_type(width=m.width // 2, height=m.height // 2,
+                         p1=(p1x, p1y), p2=(p2x, p2y), cube_face=cube_face)
+    if vector:
+        src, dst = np.asarray(m), np.asarray(level)
+        _downsample(src['x'], dst['x'], threads)
+        _downsample(src['y'], dst['y'], threads)
+    else:
+        _downsample(m.values(), np.asarray(level), threads)
+    return level
+
+
+cdef bint _downsample(
+        const float[:, :] src, float[:, :] dst, int threads) except False:
+    """
+    Averages each block of 2x2 pixels of src into a pixel of dst.
+    """
+    cdef int x, y
+    for y in prange(dst.shape[0], nogil=True, schedule='runtime',
+                    num_threads=threads):
+        for x in range(dst.shape[1]):
+            dst[y, x] = (src[2 * y, 2 * x] + src[2 * y, 2 * x + 1] +
+                         src[2 * y + 1, 2 * x] +
+                         src[2 * y + 1, 2 * x + 1]) * 0.25
+    return 1
+
+
+@cython.cdivision(True)
+cdef bint _upsample(
+        float[:, :, ::1] padded,
+        float[:, :] result,
+        int w,
+        int h,
+        int[:, ::1] origins,
+        int scale,
+        int threads) except False:
+    """
+    Bilinearly interpolates faces of a mip level, padded by a halo of
+    one pixel, at the pixel centers of faces scale times as wide,
+    writing to the faces' positions in result.
+    """
+    cdef int n_rows = padded.shape[0] * h
+    cdef int r, f, x, y, x0, y0, i, j
+    cdef float u, v, fu, fv
+    for r in prange(n_rows, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // h
+        y = r % h
+        x0 = origins[f, 0]
+        y0 = origins[f, 1]
+        # position in the padded level, of which pixel centers are
+        # at integers; -0.5 and the halo's +1 cancel out.
+        v = (y + 0.5) / scale + 0.5
+        j = <int>v
+        fv = v - j
+        for x in range(w):
+            u = (x + 0.5) / scale + 0.5
+            i = <int>u
+            fu = u - i
+            result[y0 + y, x0 + x] = \
+                (padded[f, j, i] * (1 - fu) +
+                 padded[f, j, i + 1] * fu) * (1 - fv) + \
+                (padded[f, j + 1, i] * (1 - fu) +
+                 padded[f, j + 1, i + 1] * fu) * fv
+    return 1
+
+
+#######################################################################
+# SLOPE
+#######################################################################
+
+
+cpdef AbstractMap gradient(AbstractMap m, object context=None):
+    """
+    Gets the gradient of passed grey map by central differences, per
+    pixel, along the x and y axes of each face.
+    :param m: grey cube or tile map.
+    :param context: ExecutionContext used by parallel loops.
+    :return: VecCubeMap or VecTileMap of m's geometry.
+    """
+    _check_grey(m)
+    out = _new_map(m, vector=True)
+    arr = np.asarray(out)
+    _gradient(m, arr['x'], arr['y'], None, 1., context)
+    return out
+
+
+cpdef AbstractMap slope(
+        AbstractMap m,
+        double pixel_size=1.,
+        AbstractMap out=None,
+        object context=None):
+    """
+    Gets the magnitude of the gradient of passed grey map; the rise
+    over run of its values.
+    :param m: grey cube or tile map.
+    :param pixel_size: float distance between pixels, in the units
+                of map values.
+    :param out: grey map of m's geometry to write to.
+    :param context: ExecutionContext used by parallel loops.
+    :return: out
+    """
+    if not pixel_size > 0:
+        raise ValueError(f'Invalid pixel size: {pixel_size}')
+    _check_grey(m)
+    out = _check_out(m, out)
+    result = _result_values(out)
+    _gradient(m, None, None, result, pixel_size, context)
+    return _store_result(out, result)
+
+
+@cython.cdivision(True)
+cdef bint _gradient(
+        AbstractMap m,
+        float[:, :] gx,
+        float[:, :] gy,
+        float[:, :] magnitude,
+        double pixel_size,
+        object context) except False:
+    """
+    Computes central difference gradient of m, writing its x and y
+    components and its magnitude divided by pixel_size, to those
+    of the passed arrays that are not None.
+    """
+    w, h, origins_ = face_layout(m)
+    cdef int[:, ::1] origins = _origin_array(origins_)
+    cdef int threads = begin_parallel(context)
+    cdef float[:, :, ::1] p = _pad(m.values(), halo_table(m, 1), threads)
+    cdef int face_w = w, face_h = h
+    cdef int r, f, x, y, x0, y0
+    cdef float dx, dy
+    cdef float inv_size = 1 / pixel_size
+    cdef bint with_components = gx is not None
+    cdef bint with_magnitude = magnitude is not None
+    for r in prange(p.shape[0] * face_h, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // face_h
+        y = r % face_h
+        x0 = origins[f, 0]
+        y0 = origins[f, 1]
+        for x in range(face_w):
+            dx = (p[f, y + 1, x + 2] - p[f, y + 1, x]) / 2
+            dy = (p[f, y + 2, x + 1] - p[f, y, x + 1]) / 2
+            if with_components:
+                gx[y0 + y, x0 + x] = dx
+                gy[y0 + y, x0 + x] = dy
+            if with_magnitude:
+                magnitude[y0 + y, x0 + x] = \
+                    sqrt(dx * dx + dy * dy) * inv_size
+    return 1
+
+
+#######################################################################
+# EROSION
+#######################################################################
+
+
+cpdef AbstractMap thermal_erosion(
+        AbstractMap m,
+        double talus,
+        double rate=0.5,
+        int iterations=1,
+        object context=None):
+    """
+    Erodes passed grey height map in place. Each iteration, material
+    moves between each pixel and its eight neighbours in proportion
+    to the amount by which the height difference between them exceeds
+    the talus; the steepest stable difference. Material is exchanged
+    symmetrically, so that it is moved rather than lost.
+    :param m: grey cube or tile map.
+    :param talus: float max stable height difference between
+                adjacent pixels. Diagonal neighbours are allowed
+                sqrt(2) times the difference.
+    :param rate: float fraction of excess difference moved per
+                iteration; greater than 0, and at most 1.
+    :param iterations: int
+    :param context: ExecutionContext used by parallel loops.
+    :return: m
+    """
+    if not 0 < rate <= 1:
+        raise ValueError(f'Invalid erosion rate: {rate}')
+    if talus < 0:
+        raise ValueError(f'Invalid talus: {talus}')
+    _check_grey(m)
+    w, h, origins = face_layout(m)
+    cdef int threads = begin_parallel(context)
+    table = halo_table(m, 1)
+    work = _result_values(m)
+    if m.storage != 'float32':
+        work[:] = m.values()
+    for _ in range(iterations):
+        _erode(_pad(work, table, threads), work, w, h,
+               _origin_array(origins), talus, rate, threads)
+    return _store_result(m, work)
+
+
+@cython.cdivision(True)
+cdef bint _erode(
+        float[:, :, ::1] p,
+        float[:, :] result,
+        int w,
+        int h,
+        int[:, ::1] origins,
+        float talus,
+        float rate,
+        int threads) except False:
+    """
+    Applies one thermal erosion iteration to padded faces, writing
+    eroded heights to the faces' positions in result.
+    """
+    cdef int r, f, x, y, x0, y0, i, j
+    cdef float h0, d, delta, t
+    cdef float diagonal_talus = talus * SQRT_2
+    cdef float step = rate / 8
+    for r in prange(p.shape[0] * h, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // h
+        y = r % h
+        x0 = origins[f, 0]
+        y0 = origins[f, 1]
+        for x in range(w):
+            h0 = p[f, y + 1, x + 1]
+            d = 0
+            for j in range(3):
+                for i in range(3):
+                    t = diagonal_talus if i != 1 and j != 1 else talus
+                    delta = p[f, y + j, x + i] - h0
+                    if delta > t:
+                        d = d + delta - t
+                    elif delta < -t:
+                        d = d + delta + t
+            result[y0 + y, x0 + x] = h0 + step * d
+    return 1
+
+
+#######################################################################
+# HELPERS
+#######################################################################
+
+
+cdef bint _check_grey(AbstractMap m) except False:
+    if not isinstance(m, GREY_MAP_TYPES):
+        raise TypeError(f'Expected grey map, got: {m}')
+    return 1
+
+
+cdef AbstractMap _check_out(AbstractMap m, AbstractMap out):
+    """
+    Checks that passed output map has passed map's geometry.
+    :return: out, or a new map like m if out is None.
+    """
+    if out is None:
+        return _new_map(m)
+    _check_grey(out)
+    if out.geometry[:8] != m.geometry[:8]:
+        raise ValueError(
+            f'Output geometry {out.geometry} differs from {m.geometry}')
+    if out.readonly:
+        raise ValueError('Output map is read-only')
+    return out
+
+
+cdef AbstractMap _new_map(AbstractMap m, bint vector=False):
+    """
+    Creates a map with passed map's geometry; a grey map stored as m
+    is, or a vector map.
+    """
+    quantization = {} if vector else m.quantization
+    if m.geometry[0] == 'cube':
+        map_type = VecCubeMap if vector else GreyCubeMap
+        return map_type(width=m.width, height=m.height, **quantization)
+    cube_face, p1x, p1y, p2x, p2y = m.geometry[3:8]
+    map_type = VecTileMap if vector else GreyTileMap
+    return map_type(width=m.width, height=m.height, p1=(p1x, p1y),
+                    p2=(p2x, p2y), cube_face=cube_face, **quantization)
+
+
+cdef np.ndarray _result_values(AbstractMap out):
+    """
+    Gets float32 array to which values of out are computed; its data,
+    if it is stored as float32.
+    """
+    if out.storage == 'float32':
+        return np.asarray(out)
+    return np.empty((out.height, out.width), np.float32)
+
+
+cdef AbstractMap _store_result(AbstractMap out, np.ndarray result):
+    """
+    Stores computed values in out, if they were not computed in place.
+    """
+    if out.storage != 'float32':
+        out.set_values(result)
+    return out
+
+
+cdef int[:, ::1] _origin_array(list origins):
+    return np.array(origins, np.int32).reshape(-1, 2)
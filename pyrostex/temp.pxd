@@ -11,4 +11,14 @@ cpdef GreyCubeMap make_warming_map(
         float base_atm,
         float atm_warming,
         float base_gravity,
-        float radius)
+        float radius,
+        object context=*)
+
+
+cpdef GreyCubeMap make_temp_map(
+        GreyCubeMap height_map,
+        float mean_temp,
+        float base_atm,
+        float atm_warming,
+        float base_gravity,
+        object context=*)
@@ -5,26 +5,31 @@ Handles generation of temperature map from height map
 """
 
 # imports from packages
-from libc.math cimport exp, cos, log2, ceil
+from libc.math cimport exp, sqrt
 
+import numpy as np
 import png
 
 cimport cython
 
+from cython.parallel cimport prange
+
 # imports from within project
-from .map cimport GreyCubeMap, lat_lon_from_vector_
+from .map cimport GreyCubeMap, DirectionTable, direction_table_
 
 include "flags.pxi"
+include "parallel.pxi"
+include "elevation.pxi"
 
 DEF MAX_LAT = 1.57079632679489661923132169163975144209855
 
 DEF ATM_M = 0.029  # molar mass of atmosphere
 DEF R = 8.3144598  # gas constant
+DEF G = 9.80665  # standard gravity, in m/s^2
 
 DEF MAX_T = 8192  # for sanity-checking
 
 DEF MEAN_CS = 0.866  # average cross section
-DEF BASE_H_VAL = 32767
 
 
 cpdef GreyCubeMap make_warming_map(
@@ -34,51 +39,106 @@ cpdef GreyCubeMap make_warming_map(
         float base_atm,
         float atm_warming,
         float base_gravity,
-        float radius):
+        float radius,
+        object context=None):
     """
     Creates warming map from height map.
     This map approximates the amount of heat imparted to the atmosphere
     at any given position.
+    :param height_map: GreyCubeMap; used only for its geometry, which
+                the warming map has, scaled by rel_res. Its values
+                are not read.
+    :param context: ExecutionContext used by parallel loops.
     """
-    cdef int x, y
-    cdef vec2 xy_pos
-    cdef vec2 src_xy
-    cdef latlon lat_lon
-    cdef int[2] xy_int_pos
-    cdef float t
-
     cdef int width = int(height_map.width * rel_res)
     cdef int height = int(height_map.height * rel_res)
     cdef GreyCubeMap warming_map = GreyCubeMap(
         width=width,
         height=height)
+    cdef float no_atm_temp = _no_atm_temp(mean_temp, atm_warming)
+    # cross sections of warming map positions are those of the height
+    # map positions they are scaled from.
+    cdef DirectionTable table = direction_table_(warming_map)
+    cdef float[:, ::1] out = np.asarray(warming_map)
+    cdef int threads = begin_parallel(context)
+    cdef int x, y
+    cdef Py_ssize_t i
+    for y in prange(height, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        for x in range(width):
+            i = <Py_ssize_t> y * width + x
+            # temperature for position as it would be without atm
+            out[y, x] = no_atm_temp * find_cs_ratio(table.z[i])
+    return warming_map
 
-    no_atm_temp = mean_temp - atm_warming # temp at mean lat in w/o atmosphere
+
+cpdef GreyCubeMap make_temp_map(
+        GreyCubeMap height_map,
+        float mean_temp,
+        float base_atm,
+        float atm_warming,
+        float base_gravity,
+        object context=None):
+    """
+    Creates surface temperature map from height map, with the height
+    map's geometry.
+    Each position is warmed as on the warming map, and by its
+    atmosphere in proportion to the pressure at its elevation, which
+    falls with elevation as found by find_pressure. Positions below
+    sea level are taken to lie at the surface of a sea.
+    Warming, pressure and temperature are computed in a single pass
+    over the map, in parallel over rows.
+    :param height_map: tectonic GreyCubeMap, of elevations above sea
+                level in tectonic map units; TEC_UNITS_PER_M per meter.
+    :param mean_temp: float mean surface temperature, in kelvin.
+    :param base_atm: float pressure at base elevation, in atmospheres.
+    :param atm_warming: float warming of the surface at base
+                elevation by the atmosphere, in kelvin.
+    :param base_gravity: float surface gravity, in gravities.
+    :param context: ExecutionContext used by parallel loops.
+    :return: GreyCubeMap
+    """
+    cdef int width = height_map.width, height = height_map.height
+    cdef GreyCubeMap temp_map = GreyCubeMap(width=width, height=height)
+    cdef float no_atm_temp = _no_atm_temp(mean_temp, atm_warming)
+    cdef DirectionTable table = direction_table_(temp_map)
+    cdef float[:, ::1] out = np.asarray(temp_map)
+    cdef int threads = begin_parallel(context)
+    cdef int x, y
+    cdef Py_ssize_t i
+    cdef float h, t, base_t, warming
+    for y in prange(height, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        for x in range(width):
+            i = <Py_ssize_t> y * width + x
+            base_t = no_atm_temp * find_cs_ratio(table.z[i])
+            h = height_map.load_(i) / TEC_UNITS_PER_M  # meters
+            if h > 0 and base_atm > 0:
+                warming = atm_warming * find_pressure(
+                    h, base_atm, base_t + atm_warming, base_gravity) / base_atm
+            else:
+                warming = atm_warming
+            t = base_t + warming
+            IF ASSERTS:
+                if not 0 <= t <= MAX_T:
+                    with gil:
+                        assert False, (t, base_atm)  # sanity check
+            out[y, x] = t
+    return temp_map
+
+
+cdef float _no_atm_temp(float mean_temp, float atm_warming) except -1:
+    """
+    Gets temperature at mean latitude without atmosphere.
+    """
+    no_atm_temp = mean_temp - atm_warming
     if not 0 <= no_atm_temp <= MAX_T:
         assert False, no_atm_temp  # sanity check
-    for x in range(width):
-        xy_pos.x = x
-        xy_int_pos[0] = x
-        src_xy.x = xy_pos.x / width * height_map.width
-        for y in range(height):
-            # get lat of position
-            xy_pos.y = y
-            xy_int_pos[1] = y
-            src_xy.y = xy_pos.y / height * height_map.height
-
-            h = height_map.v_from_xy_(src_xy) - BASE_H_VAL
-            lat_lon = height_map.lat_lon_from_xy_(src_xy)
-            # calculate temperature for position as it would be without atm
-            t = find_cs_ratio(lat_lon.lat) * no_atm_temp
-            if not 0 <= t <= MAX_T:
-                assert False, t  # sanity check
-            if not 0 <= t <= MAX_T:
-                assert False, (t, base_atm)  # sanity check
-            warming_map.set_xy_(xy_int_pos, t)
+    return no_atm_temp
 
-    return warming_map
 
-cdef inline float find_pressure(float h, float pb, float tb, float g):
+@cython.cdivision(True)
+cdef inline float find_pressure(float h, float pb, float tb, float g) nogil:
     """
     Calculates pressure at a given point
     :param h: elevation above base (~sea level)
@@ -86,13 +146,17 @@ cdef inline float find_pressure(float h, float pb, float tb, float g):
     :param tb: temperature at base elevation
     :param g: gravities at surface
     """
-    return pb * exp((-g * ATM_M * h) / (R * tb))
+    return pb * exp((-g * G * ATM_M * h) / (R * tb))
 
 
 @cython.cdivision(True)
-cdef inline float find_cs_ratio(double lat):
+cdef inline float find_cs_ratio(float z) nogil:
     """
     Finds relative cross section compared to mean latitude (30 deg)
-    :param lat: double; latitude in radians
+    :param z: float; z component of unit position vector, the sine
+                of latitude.
     """
-    return cos(lat) / MEAN_CS  # get ratio relative to average cs
\ No newline at end of file
+    cdef float cos_lat_sq = 1 - z * z
+    if cos_lat_sq <= 0:
+        return 0  # float z of a pole may slightly exceed 1
+    return sqrt(cos_lat_sq) / MEAN_CS  # get ratio relative to average cs
@@ -7,4 +7,6 @@ cpdef VecCubeMap make_wind_map(
         int seed,
         float mass,
         float radius,
-        float atm_pressure)
+        float atm_pressure,
+        object context=*,
+        bint simd=*)
@@ -5,13 +5,23 @@ Handles generation of wind current map
 """
 
 include "flags.pxi"  # debug, assert, etc flags
+include "parallel.pxi"
+
+import numpy as np
 
 cimport cython
 
+from cython.parallel cimport prange, parallel
+from libc.stdlib cimport malloc, free
+
 from .noise.noise cimport PyFastNoise
-from .includes.cmathutils cimport vec3Normalize
+from .noise.simdnoise cimport PyFastNoiseSIMD, FastNoiseVectorSet
+from .map cimport DirectionTable, direction_table_
+from .stencil cimport smooth, pad_faces
+from .stencil import gauss_smooth_sigma, face_layout
+from .includes.cmathutils cimport vec3New
 
-from libc.math cimport sqrt
+from libc.math cimport sqrt, sin, fabs
 
 IF DEBUG:
     from settings import ROOT_PATH  # used for output
@@ -25,80 +35,107 @@ DEF BASE_RADIUS = 6.356e6
 
 DEF MAP_NOISE_BASE_FRQ = 1.
 DEF MAP_NOISE_OCT = 8
-DEF NOISE_SCALE = 32767
-DEF MEAN_NOISE_V = 32767
 DEF LACUNARITY = 2
 DEF GAIN = 0.5
 
+DEF HEMI_BANDS = 3  # circulation cells per hemisphere
+DEF HALF_PI = 1.57079632679489661923132169163975144209855
+DEF MIN_AXIS_DIST = 1e-6  # distance from polar axis below which
+                          # there is no east direction
+
 
 # generate simplex noise map
 # generate pressure gradient map
 # for point on map:
 #     get starting value from pressure gradient
 #     get modifier value from noise map gradient, rotated 90 deg.
-#     get banding modifier sin(lat / MAX_LAT * 2 * n_bands)
+#     get banding modifier -sin(2 * n_bands * abs(lat)), along east
 #     sum
 #     add to map
 
 
+def wind_noise_params(int seed, double radius, int hemi_bands=HEMI_BANDS):
+    """
+    Gets parameters of the noise generator of the wind noise map.
+    :param seed: int spheroid seed
+    :param radius: float spheroid radius
+    :param hemi_bands: int circulation cells per hemisphere
+    :return: dict of parameters
+    """
+    return {
+        'seed': seed,
+        'frq': MAP_NOISE_BASE_FRQ * sqrt(radius / BASE_RADIUS) *
+            hemi_bands / 2,
+        'octaves': MAP_NOISE_OCT,
+        'lacunarity': LACUNARITY,
+        'gain': GAIN,
+        'fractal_type': 'FBM',
+    }
+
+
 cpdef VecCubeMap make_wind_map(
         GreyCubeMap warming_map,
         int seed,
         float mass,
         float radius,
-        float atm_pressure):
+        float atm_pressure,
+        object context=None,
+        bint simd=True):
     """
     Generates wind vector map, containing 2d vectors indicating the x, y
     velocity of wind at each given position on the cube map.
+    Vectors are relative to the x and y axes of the cube face on which
+    each position lies.
+    :param context: ExecutionContext used by parallel loops.
+    :param simd: bint; whether noise should be generated a row at a
+                time by FastNoiseSIMD, rather than a pixel at a time
+                by FastNoise. The two libraries produce different
+                (though statistically equivalent) noise.
     """
     cdef int width = warming_map.width, height = warming_map.height
+    cdef int threads = begin_parallel(context)
+
+    # create noise map that will be used to create approximated
+    # high / low pressure systems
+    cdef GreyCubeMap noise_map = _make_noise_map(
+        seed, width, height, radius, HEMI_BANDS, threads, simd)
+
+    cdef GreyCubeMap pressure_map = _make_pressure_map(warming_map, context)
 
     # create map to store wind vectors within
     cdef VecCubeMap wind_map = VecCubeMap(
         width=width,
         height=height)
-
-    # create noise map that will be used to create approximated
-    # high / low pressure systems
-    cdef GreyCubeMap noise_map = \
-        _make_noise_map(seed, width, height, radius, 3)
-
-    # cdef GreyCubeMap smoothed_pressure = _make_pressure_map(warming_map)
+    _fill_wind_map(wind_map, pressure_map, noise_map, HEMI_BANDS, context)
+    return wind_map
 
 
 cdef GreyCubeMap _make_noise_map(
-        int seed, int width, int height, float radius, int hemi_bands):
-
+        int seed,
+        int width,
+        int height,
+        float radius,
+        int hemi_bands,
+        int threads,
+        bint simd):
+    """
+    Generates simplex noise map, by passed number of threads.
+    Loops follow the schedule set by begin_parallel.
+    """
     cdef GreyCubeMap noise_map = \
         GreyCubeMap(width=width, height=height)
-
-    cdef PyFastNoise n = PyFastNoise()
-    n.seed = seed
-    n.frq = MAP_NOISE_BASE_FRQ * sqrt(radius / BASE_RADIUS) * hemi_bands / 2
-    n.fractal_octaves = MAP_NOISE_OCT
-    n.lacunarity = LACUNARITY
-    n.fractal_gain = GAIN
+    cdef float frq = wind_noise_params(seed, radius, hemi_bands)['frq']
 
     IF DEBUG:
         print('generating wind noise map')
-        print('frq: ' + str(n.frq))
-        print('oct: ' + str(n.fractal_octaves))
+        print('frq: ' + str(frq))
+        print('oct: ' + str(MAP_NOISE_OCT))
         t0 = time()
 
-    cdef int[2] pos
-    cdef vec2 dbl_pos
-    cdef vec3 vec
-    cdef int v
-    for x in range(width):
-        pos[0] = x
-        dbl_pos.x = x
-        for y in range(height):
-            pos[1] = y
-            dbl_pos.y = y
-            vec = vec3Normalize(noise_map.vector_from_xy_(dbl_pos))
-            v = int(n.get_simplex_fractal_3d_(vec) *
-                    NOISE_SCALE + MEAN_NOISE_V)
-            noise_map.set_xy_(pos, v)
+    if simd:
+        _fill_noise_map_simd(noise_map, seed, frq, threads)
+    else:
+        _fill_noise_map(noise_map, seed, frq, threads)
 
     IF DEBUG:
         tf = time()
@@ -108,42 +145,107 @@ cdef GreyCubeMap _make_noise_map(
             ROOT_PATH + '/test/resources/out/test_spheroid/wind_noise.png')
         print('done writing noise map')
 
+    return noise_map
+
+
+cdef bint _fill_noise_map(
+        GreyCubeMap noise_map, int seed, float frq, int threads) except False:
+    """
+    Fills noise map, generating the noise of each pixel individually.
+    """
+    cdef PyFastNoise n = PyFastNoise()
+    n.seed = seed
+    n.frq = frq
+    n.fractal_octaves = MAP_NOISE_OCT
+    n.lacunarity = LACUNARITY
+    n.fractal_gain = GAIN
+
+    # unit position vectors at which noise is sampled
+    cdef DirectionTable table = direction_table_(noise_map)
+    cdef float[:, ::1] out = np.asarray(noise_map)
+    cdef int width = noise_map.width, height = noise_map.height
+    cdef int x, y
+    cdef Py_ssize_t i
+    for y in prange(height, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        for x in range(width):
+            i = <Py_ssize_t> y * width + x
+            out[y, x] = n.get_simplex_fractal_3d_(
+                vec3New(table.x[i], table.y[i], table.z[i]))
+    return 1
+
+
+cdef bint _fill_noise_map_simd(
+        GreyCubeMap noise_map, int seed, float frq, int threads) except False:
+    """
+    Fills noise map, generating the noise of each row of pixels at
+    once. Positions are copied from the map's shared DirectionTable
+    into sets allocated by the noise generator, which aligns them for
+    its vector loads and stores.
+    """
+    cdef PyFastNoiseSIMD n = PyFastNoiseSIMD()
+    n.seed = seed
+    n.frq = frq
+    n.fractal_octaves = MAP_NOISE_OCT
+    n.lacunarity = LACUNARITY
+    n.fractal_gain = GAIN
+
+    cdef DirectionTable table = direction_table_(noise_map)
+    cdef float[:, ::1] out = np.asarray(noise_map)
+    cdef int width = noise_map.width, height = noise_map.height
+    cdef int x, y
+    cdef Py_ssize_t i
+    cdef FastNoiseVectorSet *pos_v_set
+    cdef float *noise_set
+    with nogil, parallel(num_threads=threads):
+        # assigned here so that each thread has its own sets.
+        pos_v_set = <FastNoiseVectorSet *>malloc(sizeof(FastNoiseVectorSet))
+        pos_v_set.size = width
+        pos_v_set.xSet = n.empty_set(width)
+        pos_v_set.ySet = n.empty_set(width)
+        pos_v_set.zSet = n.empty_set(width)
+        noise_set = n.empty_set(width)
+        for y in prange(height, schedule='runtime'):
+            for x in range(width):
+                i = <Py_ssize_t> y * width + x
+                pos_v_set.xSet[x] = table.x[i]
+                pos_v_set.ySet[x] = table.y[i]
+                pos_v_set.zSet[x] = table.z[i]
+            n.fill_simplex_fractal_set(noise_set, pos_v_set)
+            for x in range(width):
+                out[y, x] = noise_set[x]
+        n.free_set(pos_v_set.xSet)
+        n.free_set(pos_v_set.ySet)
+        n.free_set(pos_v_set.zSet)
+        n.free_set(noise_set)
+        free(pos_v_set)
+    return 1
+
 
 DEF GAUSS_SAMPLES = 8  # for both x and y; total of n^2 samples taken
 DEF GAUSS_RADIUS = 32.
 
 
-cdef GreyCubeMap _make_pressure_map(GreyCubeMap warming_map):
+cdef GreyCubeMap _make_pressure_map(
+        GreyCubeMap warming_map, object context):
     """
     Generates a smoothed pressure map from the passed warming map
     The generated map stores arbitrary relative pressure, not absolute values.
     The pressure should only be used for calculating wind vector.
+    The warming map is smoothed by a gaussian equivalent to sampling
+    it with gauss_smooth_xy_ at GAUSS_RADIUS and GAUSS_SAMPLES, blurred
+    from the warming map's mip pyramid.
     """
-    cdef int width = warming_map.width, height = warming_map.height
-    cdef int x, y  # iterated x and y values
-    cdef int[2] int_pos  # stores x, y position indices
-    cdef vec2 dbl_pos  # stores position as dbl (prevents repeated casts)
-    cdef double v  # stores retrieved, smoothed value
-
     IF DEBUG:
         t0 = time()
         print('generating pressure map')
 
-    cdef GreyCubeMap p_map = GreyCubeMap(width=width, height=height)
-
-    for x in range(width):
-        int_pos[0] = x
-        dbl_pos.x = x
-        for y in range(height):
-            int_pos[1] = y
-            dbl_pos.y = y
-
-            # get smoothed value from warming_map
-            v = warming_map.gauss_smooth_xy_(
-                dbl_pos, GAUSS_RADIUS, GAUSS_SAMPLES)
-            IF ASSERTS:
-                assert v > 0.
-            p_map.set_xy_(int_pos, int(v))
+    cdef GreyCubeMap p_map = smooth(
+        warming_map,
+        gauss_smooth_sigma(GAUSS_RADIUS, GAUSS_SAMPLES),
+        None,  # out
+        None,  # pyramid
+        context)
 
     IF DEBUG:
         tf = time()
@@ -154,3 +256,92 @@ cdef GreyCubeMap _make_pressure_map(GreyCubeMap warming_map):
         print('done writing pressure map')
 
     return p_map
+
+
+@cython.cdivision(True)
+cdef bint _fill_wind_map(
+        VecCubeMap wind_map,
+        GreyCubeMap pressure_map,
+        GreyCubeMap noise_map,
+        int hemi_bands,
+        object context) except False:
+    """
+    Sums the wind of each position of wind map in a single pass:
+        - surface wind blowing up the gradient of pressure map, since
+          air rises where it is warmed, lowering surface pressure.
+          Pressure is taken relative to its mean.
+        - the gradient of noise map rotated 90 degrees, approximating
+          the circulation around high and low pressure systems.
+        - zonal winds of hemi_bands circulation cells per hemisphere;
+          easterly near the equator and poles, westerly between.
+    Gradients are taken across the edges of cube faces, and are per
+    radian of the sphere's surface, so that the wind does not depend on
+    the map's resolution.
+    """
+    w, h, origins_ = face_layout(wind_map)
+    cdef int[:, ::1] origins = np.array(origins_, np.int32).reshape(-1, 2)
+    cdef float[:, :, ::1] p = pad_faces(pressure_map, 1, context)
+    cdef float[:, :, ::1] n = pad_faces(noise_map, 1, context)
+    cdef DirectionTable table = direction_table_(wind_map, True)
+    arr = np.asarray(wind_map)
+    cdef float[:, :] wind_x = arr['x']
+    cdef float[:, :] wind_y = arr['y']
+    cdef int threads = begin_parallel(context)
+    cdef int face_w = w, face_h = h, width = wind_map.width
+    cdef int r, f, x, y, gx, gy
+    cdef Py_ssize_t i
+    cdef float px, py, pz, axis_dist, band, east_x, east_y
+    cdef float mean_pressure = np.mean(pressure_map.values(), dtype=np.float64)
+    # half of a central difference, times pixels per radian; a face
+    # spans pi / 2 radians.
+    cdef float pressure_scale = PRESSURE_COEF * face_w / HALF_PI / 2
+    cdef float noise_scale = SIMPLEX_COEF * face_w / HALF_PI / 2
+    if mean_pressure > 0:
+        pressure_scale /= mean_pressure
+    for r in prange(p.shape[0] * face_h, nogil=True, schedule='runtime',
+                    num_threads=threads):
+        f = r // face_h
+        y = r % face_h
+        gy = origins[f, 1] + y
+        for x in range(face_w):
+            gx = origins[f, 0] + x
+            i = <Py_ssize_t> gy * width + gx
+            # zonal wind, along the east direction z x pos in the
+            # face's x, y axes.
+            band = -BANDING_COEF * sin(2 * hemi_bands * fabs(table.lat[i]))
+            px, py, pz = table.x[i], table.y[i], table.z[i]
+            axis_dist = sqrt(px * px + py * py)
+            if axis_dist < MIN_AXIS_DIST:
+                east_x = east_y = 0
+            else:
+                _face_east(f, -py / axis_dist, px / axis_dist,
+                           &east_x, &east_y)
+            wind_x[gy, gx] = \
+                (p[f, y + 1, x + 2] - p[f, y + 1, x]) * pressure_scale - \
+                (n[f, y + 2, x + 1] - n[f, y, x + 1]) * noise_scale + \
+                band * east_x
+            wind_y[gy, gx] = \
+                (p[f, y + 2, x + 1] - p[f, y, x + 1]) * pressure_scale + \
+                (n[f, y + 1, x + 2] - n[f, y + 1, x]) * noise_scale + \
+                band * east_y
+    return 1
+
+
+cdef inline void _face_east(
+        int face, float ex, float ey, float *x, float *y) nogil:
+    """
+    Gets the components, along the x and y axes of passed cube face,
+    of the horizontal east vector (ex, ey, 0).
+    """
+    if face == 0:
+        x[0], y[0] = ey, 0
+    elif face == 1:
+        x[0], y[0] = ex, 0
+    elif face == 2:
+        x[0], y[0] = -ey, 0
+    elif face == 3:
+        x[0], y[0] = -ex, 0
+    elif face == 4:
+        x[0], y[0] = ex, ey
+    else:
+        x[0], y[0] = -ex, ey
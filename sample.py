@@ -12,7 +12,6 @@ import os
 import shutil
 import matplotlib.pyplot as plt
 import numpy as np
-import itertools as itr
 
 from mpl_toolkits.mplot3d import Axes3D
 from time import time
@@ -64,11 +63,10 @@ def make_sample_spheroid(view_w):
     d_samples = 100
     X = np.linspace(-view_w / 2, view_w / 2, d_samples)
     Y = np.linspace(-view_w / 2, view_w / 2, d_samples)
-    Z = np.ndarray((len(X), len(Y)), np.float32)
-    for i, (x, y) in enumerate(itr.product(X, Y)):
-        rel_x = x / view_w + 0.5
-        rel_y = y / view_w + 0.5
-        Z[i // d_samples][i % d_samples] = h_map.v_from_rel_xy((rel_x, rel_y))
+    rel_x, rel_y = np.meshgrid(X / view_w + 0.5, Y / view_w + 0.5,
+                               indexing='ij')
+    Z = h_map.v_from_rel_xys(np.column_stack((rel_x.ravel(), rel_y.ravel())))
+    Z = Z.reshape((len(X), len(Y)))
     X, Y = np.meshgrid(X, Y)
     print("d_samples: " + str(d_samples))
     print('sub-tile shape: ({w}, {w})'.format(w=view_w))
@@ -177,7 +177,8 @@ def set_up_project():
                 Extension(
                     name='pyrostex.map',
                     sources=['pyrostex/map.pyx.cm'],
-                    extra_compile_args=["-ffast-math", "-Ofast"],
+                    extra_compile_args=["-ffast-math", "-Ofast", "-fopenmp"],
+                    extra_link_args=['-fopenmp'],
                 ),
                 Extension(
                     name='pyrostex.brush',
@@ -187,7 +188,14 @@ def set_up_project():
                 Extension(
                     name='pyrostex.temp',
                     sources=['pyrostex/temp.pyx'],
-                    extra_compile_args=["-ffast-math", "-Ofast"]
+                    extra_compile_args=["-ffast-math", "-Ofast", "-fopenmp"],
+                    extra_link_args=['-fopenmp'],
+                ),
+                Extension(
+                    name='pyrostex.stencil',
+                    sources=['pyrostex/stencil.pyx'],
+                    extra_compile_args=["-ffast-math", "-Ofast", "-fopenmp"],
+                    extra_link_args=['-fopenmp'],
                 ),
                 Extension(
                     name='pyrostex.height',
@@ -200,7 +208,9 @@ def set_up_project():
                     name='pyrostex.wind',
                     sources=['pyrostex/wind.pyx'],
                     language='c++',
-                    extra_compile_args=["-ffast-math", "-Ofast", '-std=c++11']
+                    extra_compile_args=[
+                        "-ffast-math", "-Ofast", "-fopenmp", '-std=c++11'],
+                    extra_link_args=['-fopenmp'],
                 ),
                 Extension(
                     name='pyrostex.noise.noise',
@@ -0,0 +1,85 @@
+"""
+Tests functionality of backends module
+"""
+
+from unittest import TestCase
+
+from pyrostex.backends import SCALAR, SIMD, NoiseBackend, NoiseBenchmark, \
+    available_backends, select_backends, stage_noise_configs
+
+SCALAR_BACKEND = NoiseBackend(SCALAR)
+SSE2 = NoiseBackend(SIMD, 1)
+AVX2 = NoiseBackend(SIMD, 3)
+
+
+def make_benchmark(times):
+    benchmark = NoiseBenchmark(
+        configs={}, backends=[SCALAR_BACKEND, SSE2, AVX2], n_points=1000)
+    benchmark.times = times
+    return benchmark
+
+
+class TestNoiseBackend(TestCase):
+    def test_backends_are_compared_by_engine_and_level(self):
+        self.assertEqual(NoiseBackend(SIMD, 3), AVX2)
+        self.assertNotEqual(SSE2, AVX2)
+        self.assertEqual(2, len({SCALAR_BACKEND, AVX2, NoiseBackend(SIMD, 3)}))
+
+    def test_name_includes_simd_level(self):
+        self.assertEqual('scalar', SCALAR_BACKEND.name)
+        self.assertEqual('simd-AVX2', AVX2.name)
+
+    def test_simd_engine_requires_level(self):
+        with self.assertRaises(ValueError):
+            NoiseBackend(SIMD)
+        with self.assertRaises(ValueError):
+            NoiseBackend(SCALAR, 3)
+        with self.assertRaises(ValueError):
+            NoiseBackend('gpu')
+
+    def test_scalar_and_simd_backends_are_available(self):
+        backends = available_backends()
+        self.assertIn(SCALAR_BACKEND, backends)
+        self.assertTrue(any(backend.simd for backend in backends))
+
+
+class TestSelectBackends(TestCase):
+    def test_scalar_engine_is_not_selected(self):
+        # scalar noise differs from SIMD noise, so selecting it by
+        # timings would make maps depend on the host.
+        selection = select_backends(make_benchmark({
+            'tectonic': {SCALAR_BACKEND: 1., SSE2: 3., AVX2: 2.},
+            'wind': {SCALAR_BACKEND: 1., SSE2: 3., AVX2: 2.},
+        }))
+        self.assertEqual({'tectonic': AVX2, 'wind': AVX2}, selection)
+
+    def test_benchmark_without_simd_backends_raises_value_error(self):
+        benchmark = NoiseBenchmark(
+            configs={}, backends=[SCALAR_BACKEND], n_points=1000)
+        benchmark.times = {'tectonic': {SCALAR_BACKEND: 1.}}
+        with self.assertRaises(ValueError):
+            select_backends(benchmark)
+
+    def test_single_simd_level_is_selected(self):
+        # SSE2 is fastest at tectonic, but slower over all stages.
+        selection = select_backends(make_benchmark({
+            'tectonic': {SCALAR_BACKEND: 9., SSE2: 1., AVX2: 2.},
+            'wind': {SCALAR_BACKEND: 9., SSE2: 5., AVX2: 2.},
+        }))
+        self.assertEqual({'tectonic': AVX2, 'wind': AVX2}, selection)
+
+    def test_detail_stage_uses_simd_engine(self):
+        selection = select_backends(make_benchmark({
+            'detail': {SSE2: 3., AVX2: 2.},
+        }))
+        self.assertEqual({'detail': AVX2}, selection)
+
+    def test_benchmark_times_each_stage(self):
+        configs = {stage: configs[:1] for stage, configs in
+                   stage_noise_configs().items()}
+        benchmark = NoiseBenchmark(configs, n_points=256, repeats=1).run()
+        self.assertEqual(set(configs), set(benchmark.times))
+        self.assertNotIn(SCALAR_BACKEND, benchmark.times['detail'])
+        self.assertIn(SCALAR_BACKEND, benchmark.times['wind'])
+        self.assertIn(select_backends(benchmark)['wind'], benchmark.backends)
+        self.assertIn('Mp/s', str(benchmark))
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+
+from pyrostex.batch import BatchSummary, load_specs, make_specs
+
+PARAMS = {
+    'planet_type': 'rock',
+    'mass': 1e26,
+    'mean_temp': 220,
+    'radius': 5e6,
+    'surface_gravities': 0.5,
+}
+
+
+class TestBatchSpecs(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_specs_are_loaded_from_json_list(self):
+        path = os.path.join(self.tmp_dir.name, 'specs.json')
+        with open(path, 'w') as f:
+            json.dump([{'seed': 1}, {'seed': 2}], f)
+        self.assertEqual([{'seed': 1}, {'seed': 2}], load_specs(path))
+
+    def test_specs_are_loaded_from_json_lines(self):
+        path = os.path.join(self.tmp_dir.name, 'specs.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"seed": 1}\n\n{"seed": 2}\n')
+        self.assertEqual([{'seed': 1}, {'seed': 2}], load_specs(path))
+
+    def test_spec_is_made_for_each_seed(self):
+        specs = make_specs(seeds=(1, 2), params=PARAMS)
+        self.assertEqual([1, 2], [spec['seed'] for spec in specs])
+        self.assertEqual(1e26, specs[1]['mass'])
+
+    def test_spec_values_take_precedence_over_params(self):
+        specs = make_specs([{'seed': 1, 'mass': 2e26}], params=PARAMS)
+        self.assertEqual(2e26, specs[0]['mass'])
+
+    def test_each_spec_gets_own_directory(self):
+        specs = make_specs(seeds=(1, 2), params=PARAMS, out_dir='out')
+        self.assertEqual(os.path.join('out', 'rock1100000000000'),
+                         specs[0]['dir_path'])
+        self.assertNotEqual(specs[0]['dir_path'], specs[1]['dir_path'])
+
+    def test_incomplete_spec_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            make_specs([{'seed': 1}])
+
+    def test_specs_sharing_directory_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            make_specs(seeds=(1, 1), params=PARAMS, out_dir='out')
+
+    def test_specs_sharing_default_directory_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            make_specs([{'seed': 1, 'radius': 4e6}, {'seed': 1}],
+                       params=PARAMS)
+
+
+class TestBatchSummary(TestCase):
+    def test_throughput_is_per_hour(self):
+        summary = BatchSummary()
+        summary.results = [('a', 10.), ('b', 20.)]
+        summary.elapsed = 36.
+        self.assertEqual(200., summary.throughput)
+        self.assertIn('2 spheroids generated', str(summary))
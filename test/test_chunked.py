@@ -0,0 +1,168 @@
+import os
+import tempfile
+
+import numpy as np
+
+from unittest import TestCase
+
+from pyrostex.chunked import ChunkedMapFile, TilePyramidFile, \
+    write_chunked, load_chunked, default_chunk_size
+from pyrostex.map import GreyCubeMap, GreyTileMap, VecLatLonMap
+
+
+class TestChunkedMapFile(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'height.ptc')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cube_map_chunks_do_not_span_faces(self):
+        self.assertEqual(96, default_chunk_size(('cube', 288, 192)))
+        self.assertEqual(256, default_chunk_size(('cube', 1536, 1024)))
+
+    def test_saved_map_can_be_loaded(self):
+        m = GreyCubeMap(width=288, height=192)
+        np.asarray(m)[:] = np.random.rand(192, 288)
+        m.save(self.path)
+        loaded = GreyCubeMap(width=288, height=192, path=self.path)
+        np.testing.assert_array_equal(np.asarray(m), np.asarray(loaded))
+
+    def test_map_with_partial_chunks_can_be_loaded(self):
+        m = VecLatLonMap(width=100, height=70)
+        np.asarray(m)['x'] = np.random.rand(70, 100)
+        np.asarray(m)['y'] = np.random.rand(70, 100)
+        for codec in ('none', 'zlib', 'bz2', 'lzma'):
+            write_chunked(m, self.path, chunk_size=32, codec=codec)
+            loaded = load_chunked(self.path)
+            self.assertIsInstance(loaded, VecLatLonMap)
+            np.testing.assert_array_equal(np.asarray(m), np.asarray(loaded))
+
+    def test_tile_map_is_loaded_with_stored_geometry(self):
+        m = GreyTileMap(width=64, height=64, p1=(-1, 0), p2=(0, 1),
+                        cube_face=3)
+        np.asarray(m)[:] = np.random.rand(64, 64)
+        m.save(self.path)
+        loaded = load_chunked(self.path)
+        self.assertEqual(m.geometry, loaded.geometry)
+        np.testing.assert_array_equal(np.asarray(m), np.asarray(loaded))
+
+    def test_region_is_read_correctly(self):
+        m = GreyCubeMap(width=288, height=192)
+        np.asarray(m)[:] = np.random.rand(192, 288)
+        write_chunked(m, self.path, chunk_size=40)
+        region = ChunkedMapFile(self.path).read_region(35, 10, 130, 81)
+        np.testing.assert_array_equal(np.asarray(m)[10:81, 35:130], region)
+
+    def test_chunk_is_read_correctly(self):
+        m = GreyCubeMap(width=288, height=192)
+        np.asarray(m)[:] = np.random.rand(192, 288)
+        write_chunked(m, self.path)
+        f = ChunkedMapFile(self.path)
+        self.assertEqual(6, f.n_chunks)
+        self.assertEqual((96, 96, 192, 192), f.chunk_bounds(4))
+        np.testing.assert_array_equal(
+            np.asarray(m)[96:192, 96:192], f.read_chunk(4))
+
+    def test_region_outside_array_raises_value_error(self):
+        write_chunked(GreyCubeMap(width=288, height=192), self.path)
+        with self.assertRaises(ValueError):
+            ChunkedMapFile(self.path).read_region(0, 0, 289, 10)
+
+    def test_compressed_file_is_smaller_than_array(self):
+        m = GreyCubeMap(width=288, height=192)
+        np.asarray(m)[:] = 1.5
+        m.save(self.path)
+        self.assertLess(os.path.getsize(self.path), np.asarray(m).nbytes)
+
+    def test_quantized_map_is_loaded_with_stored_quantization(self):
+        m = GreyTileMap(width=64, height=64, p1=(-1, 0), p2=(0, 1),
+                        cube_face=3, storage='int16', scale=0.5, offset=8.)
+        m.set_values(np.random.rand(64, 64) * 100)
+        m.save(self.path)
+        loaded = load_chunked(self.path)
+        self.assertEqual(m.quantization, loaded.quantization)
+        np.testing.assert_array_equal(m.values(), loaded.values())
+
+
+def random_tile(face, seed):
+    m = GreyTileMap(width=64, height=64, p1=(-1, 0), p2=(0, 1),
+                    cube_face=face)
+    np.asarray(m)[:] = np.random.RandomState(seed).rand(64, 64)
+    return m
+
+
+class TestTilePyramidFile(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tiles', 'tiles.ptp')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_tiles_are_loaded_by_address(self):
+        pyramid = TilePyramidFile(self.path)
+        tiles = {(3, 1, 0, 1): random_tile(3, 0),
+                 (3, 2, 1, 3): random_tile(3, 1)}
+        for key, m in tiles.items():
+            pyramid.write(key, m)
+        reopened = TilePyramidFile(self.path)
+        self.assertEqual(sorted(tiles), sorted(reopened.keys()))
+        self.assertNotIn((3, 2, 0, 0), reopened)
+        for key, m in tiles.items():
+            loaded = reopened.load(key)
+            self.assertEqual(m.geometry, loaded.geometry)
+            np.testing.assert_array_equal(np.asarray(m), np.asarray(loaded))
+
+    def test_chunk_of_tile_is_read_correctly(self):
+        pyramid = TilePyramidFile(self.path)
+        m = random_tile(2, 0)
+        pyramid.write((2, 0, 0, 0), random_tile(2, 1))
+        pyramid.write((2, 1, 1, 1), m, chunk_size=16)
+        f = pyramid.chunked_file((2, 1, 1, 1))
+        np.testing.assert_array_equal(
+            np.asarray(m)[16:32, 32:48], f.read_chunk(f.chunk_columns + 2))
+
+    def test_rewritten_tile_is_loaded_from_last_record(self):
+        pyramid = TilePyramidFile(self.path)
+        pyramid.write((1, 0, 0, 0), random_tile(1, 0))
+        m = random_tile(1, 1)
+        pyramid.write((1, 0, 0, 0), m)
+        np.testing.assert_array_equal(
+            np.asarray(m), np.asarray(TilePyramidFile(self.path).load(
+                (1, 0, 0, 0))))
+
+    def test_interrupted_record_is_dropped(self):
+        pyramid = TilePyramidFile(self.path)
+        pyramid.write((0, 0, 0, 0), random_tile(0, 0))
+        size = os.path.getsize(self.path)
+        pyramid.write((0, 1, 0, 0), random_tile(0, 1))
+        with open(self.path, 'r+b') as f:
+            f.truncate(size + 40)
+        reopened = TilePyramidFile(self.path)
+        self.assertEqual([(0, 0, 0, 0)], reopened.keys())
+        m = random_tile(0, 2)
+        reopened.write((0, 1, 1, 0), m)
+        np.testing.assert_array_equal(
+            np.asarray(m), np.asarray(TilePyramidFile(self.path).load(
+                (0, 1, 1, 0))))
+
+    def test_tiles_written_by_other_instances_are_kept(self):
+        a, b = TilePyramidFile(self.path), TilePyramidFile(self.path)
+        tiles = {(0, 0, 0, 0): random_tile(0, 0),
+                 (0, 1, 0, 0): random_tile(0, 1),
+                 (0, 1, 1, 0): random_tile(0, 2)}
+        for pyramid, (key, m) in zip((a, b, a), tiles.items()):
+            pyramid.write(key, m)
+        reopened = TilePyramidFile(self.path)
+        self.assertEqual(sorted(tiles), sorted(reopened.keys()))
+        self.assertEqual(sorted(tiles), sorted(a.keys()))
+        for pyramid in (a, b, reopened):
+            for key in pyramid.keys():
+                np.testing.assert_array_equal(
+                    np.asarray(tiles[key]), np.asarray(pyramid.load(key)))
+
+    def test_missing_tile_raises_key_error(self):
+        with self.assertRaises(KeyError):
+            TilePyramidFile(self.path).load((0, 0, 0, 0))
@@ -0,0 +1,50 @@
+import os
+
+from unittest import TestCase, mock
+
+from pyrostex.context import ExecutionContext, MAX_THREADS_ENV, \
+    available_cpus
+
+
+class TestExecutionContext(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop(MAX_THREADS_ENV, None)
+
+    def test_threads_default_to_available_cpus(self):
+        self.assertEqual(available_cpus(), ExecutionContext().threads)
+
+    def test_shared_cpus_are_divided(self):
+        context = ExecutionContext(share=available_cpus() * 2)
+        self.assertEqual(1, context.threads)
+
+    def test_shared_context_divides_threads(self):
+        context = ExecutionContext(threads=8, schedule='dynamic',
+                                   chunk_size=4)
+        shared = context.shared(3)
+        self.assertEqual(2, shared.threads)
+        self.assertEqual(('dynamic', 4), (shared.schedule, shared.chunk_size))
+        self.assertEqual(1, context.shared(16).threads)
+
+    def test_threads_are_capped_by_environment(self):
+        os.environ[MAX_THREADS_ENV] = '2'
+        self.assertEqual(2, ExecutionContext(threads=8).threads)
+        self.assertEqual(1, ExecutionContext(threads=1).threads)
+
+    def test_schedule_kind_matches_openmp(self):
+        self.assertEqual(1, ExecutionContext().schedule_kind)
+        self.assertEqual(
+            3, ExecutionContext(schedule='guided', chunk_size=4).schedule_kind)
+
+    def test_invalid_settings_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            ExecutionContext(schedule='round-robin')
+        with self.assertRaises(ValueError):
+            ExecutionContext(threads=0)
+        with self.assertRaises(ValueError):
+            ExecutionContext(chunk_size=-1)
+        os.environ[MAX_THREADS_ENV] = 'many'
+        with self.assertRaises(ValueError):
+            ExecutionContext()
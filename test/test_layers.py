@@ -0,0 +1,102 @@
+"""
+Tests functionality of layers module
+"""
+
+import os
+import tempfile
+
+from unittest import TestCase
+
+import numpy as np
+
+from pyrostex.layers import NoiseLayerCache, layer_key
+
+
+GEOMETRY = 'cube', 96, 64
+PARAMS = {'seed': 1, 'frq': 0.5, 'octaves': 3}
+
+
+class TestLayerKey(TestCase):
+    def test_key_is_consistent(self):
+        self.assertEqual(layer_key('warp', PARAMS, GEOMETRY),
+                         layer_key('warp', dict(PARAMS), GEOMETRY))
+
+    def test_key_depends_on_params_and_geometry(self):
+        key = layer_key('warp', PARAMS, GEOMETRY)
+        self.assertNotEqual(key, layer_key('rm', PARAMS, GEOMETRY))
+        self.assertNotEqual(key, layer_key(
+            'warp', dict(PARAMS, seed=2), GEOMETRY))
+        self.assertNotEqual(key, layer_key('warp', PARAMS, ('cube', 48, 32)))
+        self.assertNotEqual(key, layer_key('warp', PARAMS, GEOMETRY, 2))
+
+
+class TestNoiseLayerCache(TestCase):
+    def test_layer_is_held_in_memory(self):
+        cache = NoiseLayerCache()
+        key = layer_key('warp', PARAMS, GEOMETRY)
+        self.assertIsNone(cache.get(key))
+        arr = np.ones((64, 96), np.float32)
+        cache.put(key, arr)
+        self.assertIn(key, cache)
+        self.assertIs(arr, cache.get(key))
+
+    def test_least_recent_layers_are_evicted(self):
+        arr = np.ones((64, 96), np.float32)
+        cache = NoiseLayerCache(max_bytes=arr.nbytes * 2)
+        keys = [layer_key('rm', dict(PARAMS, seed=i), GEOMETRY)
+                for i in range(3)]
+        cache.put(keys[0], arr)
+        cache.put(keys[1], arr.copy())
+        cache.get(keys[0])
+        cache.put(keys[2], arr.copy())
+        self.assertEqual(2, len(cache))
+        self.assertNotIn(keys[1], cache)
+        self.assertIn(keys[0], cache)
+        self.assertEqual(arr.nbytes * 2, cache.nbytes)
+
+    def test_layer_is_loaded_from_disk(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            key = layer_key('warp', PARAMS, GEOMETRY)
+            arr = np.random.RandomState(0).rand(3, 64, 96).astype(np.float32)
+            NoiseLayerCache(dir_path).put(key, arr)
+            loaded = NoiseLayerCache(dir_path).get(key)
+            np.testing.assert_array_equal(arr, loaded)
+            self.assertEqual(np.float32, loaded.dtype)
+
+    def test_stale_layers_are_removed(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            cache = NoiseLayerCache(dir_path)
+            arr = np.ones((64, 96), np.float32)
+            old_key = layer_key('rm', PARAMS, GEOMETRY)
+            new_key = layer_key('rm', dict(PARAMS, seed=2), GEOMETRY)
+            other_key = layer_key('warp', PARAMS, GEOMETRY)
+            cache.put(old_key, arr)
+            cache.put(other_key, arr)
+            cache.put(new_key, arr)
+            self.assertEqual(
+                sorted([os.path.basename(cache.path(new_key)),
+                        os.path.basename(cache.path(other_key))]),
+                sorted(os.listdir(dir_path)))
+
+    def test_layers_of_other_spheroids_and_geometries_are_kept(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            cache = NoiseLayerCache(dir_path)
+            arr = np.ones((64, 96), np.float32)
+            keys = [
+                layer_key('rm', PARAMS, GEOMETRY, {'seed': 1}),
+                layer_key('rm', dict(PARAMS, seed=2), GEOMETRY, {'seed': 2}),
+                layer_key('rm', PARAMS, ('cube', 48, 32), {'seed': 1}),
+            ]
+            for key in keys:
+                cache.put(key, arr)
+            self.assertEqual(
+                sorted(os.path.basename(cache.path(key)) for key in keys),
+                sorted(os.listdir(dir_path)))
+
+    def test_broken_layer_is_ignored(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            cache = NoiseLayerCache(dir_path)
+            key = layer_key('warp', PARAMS, GEOMETRY)
+            with open(cache.path(key), 'wb') as f:
+                f.write(b'not a layer')
+            self.assertIsNone(cache.get(key))
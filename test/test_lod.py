@@ -0,0 +1,171 @@
+import gc
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from unittest import TestCase
+
+from pyrostex.lod import TileManager, tile_bounds, face_vector, \
+    face_position, neighbours, children, parent
+from pyrostex.map import GreyCubeMap
+from pyrostex.procede import Spheroid
+
+
+class UnbuiltSpheroid(Spheroid):
+    def build(self):
+        self.tectonic_map = GreyCubeMap(width=96, height=64)
+        np.asarray(self.tectonic_map)[:] = 1000.
+
+
+class TestTileAddressing(TestCase):
+    def test_tile_bounds_divide_face(self):
+        self.assertEqual(((-1, -1), (1, 1)), tile_bounds(0, 0, 0))
+        self.assertEqual(((0., -1.), (1., 0.)), tile_bounds(1, 1, 0))
+        self.assertEqual(((-0.5, 0.5), (0., 1.)), tile_bounds(2, 1, 3))
+
+    def test_tile_outside_level_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            tile_bounds(1, 2, 0)
+
+    def test_face_position_is_inverse_of_face_vector(self):
+        for face in range(6):
+            result = face_position(face_vector(face, 0.25, -0.5))
+            self.assertEqual(face, result[0])
+            self.assertAlmostEqual(0.25, result[1])
+            self.assertAlmostEqual(-0.5, result[2])
+
+    def test_interior_tile_has_eight_neighbours_on_same_face(self):
+        keys = neighbours(4, 2, 1, 1)
+        self.assertEqual(8, len(keys))
+        self.assertTrue(all(key[0] == 4 for key in keys))
+        self.assertIn((4, 2, 0, 0), keys)
+        self.assertIn((4, 2, 2, 2), keys)
+
+    def test_edge_tile_neighbours_are_on_adjacent_face(self):
+        # face 0 is +x; its +a edge (+y) borders face 3.
+        keys = neighbours(0, 1, 1, 0)
+        self.assertIn(3, [key[0] for key in keys])
+        for face, level, x, y in keys:
+            self.assertEqual(1, level)
+            self.assertTrue(0 <= x < 2 and 0 <= y < 2)
+
+    def test_children_and_parent_are_inverse(self):
+        for key in children(2, 3, 5, 6):
+            self.assertEqual((2, 3, 5, 6), parent(*key))
+        self.assertIsNone(parent(2, 0, 0, 0))
+
+
+class TestTileManager(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spheroid = UnbuiltSpheroid(
+            124, 'rock', 1e26, 220, 5e6, 0.5, 0.1,
+            dir_path=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_tile_is_generated_once(self):
+        manager = TileManager(self.spheroid, tile_size=16)
+        tile = manager.get(1, 1, 0, 1)
+        self.assertIs(tile, manager.get(1, 1, 0, 1))
+        self.assertEqual(((-1, 0), (0, 1)), (tile.p1, tile.p2))
+        manager.close()
+
+    def test_least_recent_tiles_are_evicted(self):
+        tile_bytes = 16 * 16 * 4
+        manager = TileManager(
+            self.spheroid, max_bytes=2 * tile_bytes, tile_size=16)
+        manager.get(0, 1, 0, 0)
+        manager.get(0, 1, 1, 0)
+        manager.get(0, 1, 0, 0)
+        manager.get(0, 1, 0, 1)
+        self.assertEqual(2, len(manager))
+        self.assertIn((0, 1, 0, 0), manager)
+        self.assertNotIn((0, 1, 1, 0), manager)
+        self.assertEqual(2 * tile_bytes, manager.nbytes)
+        manager.close()
+
+    def test_evicted_tile_is_reloaded_from_spill(self):
+        manager = TileManager(
+            self.spheroid, max_bytes=1, spill=True, tile_size=16)
+        values = np.array(manager.get(0, 1, 0, 0).height_map)
+        manager.get(0, 1, 1, 0)  # evicts first tile
+        self.assertNotIn((0, 1, 0, 0), manager)
+        reloaded = manager.get(0, 1, 0, 0)
+        np.testing.assert_array_equal(values, np.asarray(reloaded.height_map))
+        manager.close()
+
+    def test_spilled_tiles_share_pyramid_file(self):
+        manager = TileManager(
+            self.spheroid, max_bytes=1, spill=True, tile_size=16)
+        manager.get(0, 1, 0, 0)
+        values = np.array(manager.get(0, 1, 1, 0).height_map)
+        manager.get(0, 1, 0, 1)  # evicts both tiles
+        self.assertEqual(
+            [os.path.basename(manager.spill_path)],
+            os.listdir(self.tmp_dir.name))
+        reopened = TileManager(self.spheroid, spill=True, tile_size=16)
+        np.testing.assert_array_equal(
+            values, np.asarray(reopened.get(0, 1, 1, 0).height_map))
+        manager.close()
+        reopened.close()
+
+    def test_tiles_spilled_with_other_settings_are_not_loaded(self):
+        manager = TileManager(
+            self.spheroid, max_bytes=1, spill=True, tile_size=16)
+        manager.get(0, 1, 0, 0)
+        manager.get(0, 1, 1, 0)  # evicts first tile
+        others = [
+            TileManager(self.spheroid, spill=True, tile_size=16,
+                        refine=True),
+            TileManager(UnbuiltSpheroid(
+                124, 'rock', 1e26, 220, 6e6, 0.5, 0.1,
+                dir_path=self.tmp_dir.name), spill=True, tile_size=16),
+            TileManager(UnbuiltSpheroid(
+                124, 'rock', 1e26, 220, 5e6, 0.5, 0.1,
+                dir_path=self.tmp_dir.name, tile_storage='int16'),
+                spill=True, tile_size=16),
+        ]
+        for other in others:
+            self.assertNotEqual(manager.spill_path, other.spill_path)
+            self.assertFalse(os.path.exists(other.spill_path))
+            other.close()
+        manager.close()
+
+    def test_prefetched_tiles_are_cached(self):
+        manager = TileManager(self.spheroid, tile_size=16)
+        futures = manager.prefetch(4, 1, 0, 0)
+        for future in futures:
+            future.result()
+        self.assertEqual(len(futures), len(manager))
+        self.assertIn((4, 2, 1, 1), manager)
+        manager.close()
+
+    def test_refined_tile_is_generated_after_its_ancestors(self):
+        manager = TileManager(self.spheroid, tile_size=16, refine=True)
+        tile = manager.get(3, 2, 3, 1)
+        self.assertIn((3, 1, 1, 0), manager)
+        self.assertIn((3, 0, 0, 0), manager)
+        self.assertIs(manager.get(3, 1, 1, 0), tile.parent)
+        manager.close()
+
+    def test_evicted_ancestors_of_refined_tiles_are_freed(self):
+        manager = TileManager(self.spheroid, max_bytes=1, tile_size=16,
+                              refine=True)
+        refs = [weakref.ref(manager.get(3, level, 0, 0))
+                for level in range(5)]
+        gc.collect()
+        self.assertEqual(1, len(manager))
+        self.assertEqual(1, sum(ref() is not None for ref in refs))
+        manager.close()
+
+    def test_tiles_share_height_detail_generator(self):
+        manager = TileManager(self.spheroid, tile_size=16, refine=True)
+        tile = manager.get(3, 1, 1, 0)
+        self.assertIs(manager.generator, tile.generator)
+        self.assertIs(tile.generator, tile.parent.generator)
+        self.assertIsNotNone(tile.parent.layers)
+        manager.close()
@@ -1,11 +1,20 @@
+import os
+import tempfile
+
+import numpy as np
+import png
+
 from unittest import TestCase
 
 from math import radians
 from mathutils import Vector
 
 from pyrostex import map
-from pyrostex.map import GreyLatLonMap, GreyCubeMap, GreyCubeSide
-from pyrostex.map import mix_region, pure_region, mix_av
+from pyrostex.map import GreyLatLonMap, GreyCubeMap, GreyCubeSide, \
+    GreyTileMap, VecCubeMap, VecLatLonMap, RegLatLonMap
+from pyrostex.map import mix_region, pure_region, mix_av, \
+    direction_table, clear_direction_tables, lat_lon_from_vector, \
+    grey_quantization
 
 
 class TestCubeMap(TestCase):
@@ -166,6 +175,436 @@ class TestCubeMap(TestCase):
         self.assertAlmostEqual(127.8, v, 5)
 
 
+class TestMapBuffer(TestCase):
+    def test_grey_map_array_has_correct_shape_and_dtype(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        arr = np.asarray(m)
+        self.assertEqual((1024, 1536), arr.shape)
+        self.assertEqual(np.float32, arr.dtype)
+
+    def test_array_is_view_of_map_data(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        arr = np.asarray(m)
+        m.set_xy((254, 256), 127.8)
+        self.assertAlmostEqual(127.8, arr[256, 254], 5)
+        arr[10, 20] = 3.5
+        self.assertAlmostEqual(3.5, m.v_from_xy((20, 10)), 5)
+
+    def test_cube_side_array_is_view_of_face(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        m.set_xy((512 + 3, 512 + 2), 4.)
+        arr = np.asarray(m.get_tile(4))
+        self.assertEqual((512, 512), arr.shape)
+        self.assertEqual(4., arr[2, 3])
+
+    def test_vector_map_array_has_structured_dtype(self):
+        m = VecCubeMap(width=6, height=4)
+        m.set_xy((1, 2), (0.5, 0.25))
+        arr = np.asarray(m)
+        self.assertEqual(map.VEC_DTYPE, arr.dtype)
+        self.assertEqual(0.5, arr[2, 1]['x'])
+        self.assertEqual(0.25, arr[2, 1]['y'])
+
+    def test_region_map_array_has_structured_dtype(self):
+        m = RegLatLonMap(width=4, height=4)
+        m.set_xy((1, 1), pure_region(3))
+        arr = np.asarray(m)
+        self.assertEqual(map.REG_DTYPE, arr.dtype)
+        self.assertEqual(3, arr[1, 1]['r0'])
+        self.assertEqual(1., arr[1, 1]['w0'])
+
+    def test_map_can_wrap_array_without_copying(self):
+        arr = np.zeros((1024, 1536), np.float32)
+        m = GreyCubeMap(width=1536, height=1024, arr=arr)
+        arr[256, 254] = 127.8
+        self.assertAlmostEqual(127.8, m.v_from_xy((254, 256)), 5)
+
+    def test_wrapped_array_of_wrong_dtype_raises_type_error(self):
+        arr = np.zeros((1024, 1536), np.float64)
+        with self.assertRaises(TypeError):
+            GreyCubeMap(width=1536, height=1024, arr=arr)
+
+    def test_wrapped_array_of_wrong_shape_raises_value_error(self):
+        arr = np.zeros((1536, 1024), np.float32)
+        with self.assertRaises(ValueError):
+            GreyCubeMap(width=1536, height=1024, arr=arr)
+
+    def test_saved_vector_map_can_be_loaded(self):
+        m = VecCubeMap(width=6, height=4)
+        m.set_xy((1, 2), (0.5, 0.25))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'vec.npy')
+            m.save(path)
+            loaded = VecCubeMap(width=6, height=4, path=path)
+        self.assertEqual((0.5, 0.25), tuple(np.asarray(loaded)[2, 1]))
+
+
+class TestMemoryMappedMap(TestCase):
+    def test_values_written_to_mapped_map_can_be_read_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            m = GreyCubeMap(
+                width=1536, height=1024, path=path, mmap_mode='w+')
+            m.set_xy((254, 256), 127.8)
+            m.flush()
+            del m
+            arr = np.load(path)
+        self.assertAlmostEqual(127.8, arr[256, 254], 5)
+
+    def test_mapped_map_reads_values_from_file(self):
+        arr = np.zeros((4, 6), np.float32)
+        arr[2, 1] = 3.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            np.save(path, arr)
+            m = GreyCubeMap(width=6, height=4, path=path, mmap_mode='r')
+            v = m.v_from_xy((1, 2))
+            del m
+        self.assertEqual(3., v)
+
+    def test_read_only_mapped_map_cannot_be_set(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            np.save(path, np.zeros((4, 6), np.float32))
+            m = GreyCubeMap(width=6, height=4, path=path, mmap_mode='r')
+            self.assertTrue(m.readonly)
+            with self.assertRaises(ValueError):
+                m.set_xy((1, 2), 3.)
+            del m
+
+    def test_only_mapped_maps_are_generated_in_bands(self):
+        self.assertEqual(64, GreyCubeMap(width=96, height=64).band_rows())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            m = GreyCubeMap(width=96, height=64, path=path, mmap_mode='w+')
+            self.assertEqual(10, m.band_rows(96 * 4 * 10))
+            self.assertEqual(1, m.band_rows(1))
+            del m
+
+    def test_released_rows_keep_their_values(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            m = GreyCubeMap(
+                width=1536, height=1024, path=path, mmap_mode='w+')
+            arr = np.asarray(m)
+            for y0 in range(0, 1024, 100):
+                y1 = min(y0 + 100, 1024)
+                arr[y0:y1] = np.arange(y0, y1)[:, None]
+                m.release_rows(y0, y1)
+            np.testing.assert_array_equal(np.arange(1024), arr[:, 700])
+            m.flush()
+            del m, arr
+            np.testing.assert_array_equal(
+                np.arange(1024), np.load(path)[:, 3])
+
+
+    def test_released_rows_of_copy_on_write_map_keep_their_values(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'height.npy')
+            np.save(path, np.ones((1024, 1536), np.float32))
+            m = GreyCubeMap(width=1536, height=1024, path=path,
+                            mmap_mode='c')
+            np.asarray(m)[:] = 5.
+            m.release_rows(0, 1024)
+            self.assertEqual((5., 5.), m.value_range())
+            del m
+            self.assertEqual(1., np.load(path).max())
+
+
+class TestGreyStorage(TestCase):
+    def tile(self, **kwargs):
+        return GreyTileMap(width=64, height=64, p1=(-1, -1), p2=(1, 1),
+                           cube_face=0, **kwargs)
+
+    def test_16_bit_storage_halves_map_size(self):
+        for storage in ('float16', 'int16', 'uint16'):
+            m = GreyCubeMap(width=96, height=64, storage=storage)
+            self.assertEqual(storage, m.storage)
+            self.assertEqual(np.dtype(storage), np.asarray(m).dtype)
+            self.assertEqual(96 * 64 * 2, np.asarray(m).nbytes)
+
+    def test_float16_values_are_rounded_as_by_numpy(self):
+        values = np.random.randn(64 * 64).astype(np.float32) * 1000
+        values[:8] = [0., 6e-8, 2.9802322e-08, 1e-10, 65504., 65520.,
+                      -np.inf, 1e-5]
+        m = self.tile(storage='float16')
+        for i, v in enumerate(values):
+            m.set_xy((i % 64, i // 64), float(v))
+        with np.errstate(over='ignore'):
+            expected = values.astype(np.float16).reshape(64, 64)
+        np.testing.assert_array_equal(
+            expected.view(np.uint16), np.asarray(m).view(np.uint16))
+
+    def test_float16_values_are_decoded_losslessly(self):
+        m = GreyTileMap(width=256, height=256, p1=(-1, -1), p2=(1, 1),
+                        cube_face=0, storage='float16')
+        bits = np.arange(2 ** 16, dtype=np.uint16).reshape(256, 256)
+        np.asarray(m)[:] = bits.view(np.float16)
+        expected = bits.view(np.float16).astype(np.float32)
+        for x, y in ((0, 0), (10, 3), (255, 123), (255, 124), (200, 255)):
+            np.testing.assert_array_equal(
+                expected[y, x], m.v_from_xy((x, y)))
+
+    def test_values_on_quantization_grid_round_trip_exactly(self):
+        scale, offset = grey_quantization('int16', -1.2e7, 1.2e7)
+        m = self.tile(storage='int16', scale=scale, offset=offset)
+        values = (np.float32(offset) + np.float32(scale) *
+                  np.arange(-32768, 32768, 16, dtype=np.float32))
+        for i, v in enumerate(values):
+            m.set_xy((i % 64, i // 64), float(v))
+        np.testing.assert_array_equal(values.reshape(64, 64), m.values())
+        self.assertEqual(-32768, np.asarray(m)[0, 0])
+
+    def test_integer_storage_clips_values_outside_range(self):
+        m = self.tile(storage='uint16', scale=0.5, offset=10.)
+        m.set_xy((1, 1), -5.)
+        m.set_xy((2, 1), 1e9)
+        self.assertEqual(10., m.v_from_xy((1, 1)))
+        self.assertEqual(10. + 65535 * 0.5, m.v_from_xy((2, 1)))
+
+    def test_quantized_values_are_interpolated_when_sampled(self):
+        m = self.tile(storage='uint16', scale=0.25, offset=-2.)
+        m.set_xy((3, 4), 1.)
+        m.set_xy((4, 4), 2.)
+        self.assertEqual(1.5, m.v_from_xy((3.5, 4)))
+
+    def test_set_values_encodes_as_set_xy(self):
+        values = np.random.rand(64, 64).astype(np.float32) * 100
+        scale, offset = grey_quantization('int16', 0., 100.)
+        m = self.tile(storage='int16', scale=scale, offset=offset)
+        m.set_values(values)
+        expected = self.tile(storage='int16', scale=scale, offset=offset)
+        for y, x in ((0, 0), (5, 60), (63, 63)):
+            expected.set_xy((x, y), float(values[y, x]))
+            self.assertEqual(np.asarray(expected)[y, x],
+                             np.asarray(m)[y, x])
+        np.testing.assert_allclose(values, m.values(), atol=scale)
+
+    def test_cube_side_and_sub_tile_share_storage(self):
+        cube = GreyCubeMap(width=96, height=64, storage='float16')
+        np.asarray(cube)[:] = np.random.rand(64, 96)
+        side = GreyCubeSide(4, cube)
+        self.assertEqual('float16', side.storage)
+        self.assertEqual(np.float16, np.asarray(side).dtype)
+        sub = side.get_sub_tile((-1, -1), (0, 0))
+        self.assertEqual('float16', sub.storage)
+        np.testing.assert_array_equal(
+            np.asarray(side)[0, :2], np.asarray(sub)[0, 0:3:2])
+
+    def test_value_range_of_quantized_map_is_decoded(self):
+        m = self.tile(storage='uint16', scale=2., offset=100.)
+        np.asarray(m)[:] = 3
+        np.asarray(m)[5, 5] = 10
+        self.assertEqual((106., 120.), m.value_range())
+
+    def test_unknown_storage_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.tile(storage='int8')
+
+    def test_scaled_float32_storage_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.tile(scale=2.)
+
+    def test_quantization_spans_value_range(self):
+        for storage in ('int16', 'uint16'):
+            scale, offset = grey_quantization(storage, -50., 150.)
+            info = np.iinfo(storage)
+            self.assertAlmostEqual(-50., info.min * scale + offset)
+            self.assertAlmostEqual(150., info.max * scale + offset)
+        self.assertEqual((1., 0.), grey_quantization('float16', 0., 300.))
+
+
+class TestBatchSampling(TestCase):
+    def test_values_from_vectors_match_scalar_values(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        np.asarray(m)[:] = np.random.rand(1024, 1536)
+        vectors = np.random.randn(100, 3)
+        values = m.v_from_vectors(vectors)
+        for vector, v in zip(vectors, values):
+            self.assertAlmostEqual(m.v_from_vector(tuple(vector)), v, 5)
+
+    def test_values_from_lat_lons_match_scalar_values(self):
+        m = GreyLatLonMap(width=256, height=128)
+        np.asarray(m)[:] = np.random.rand(128, 256)
+        positions = np.column_stack((
+            np.random.uniform(-1.5, 1.5, 100),
+            np.random.uniform(-3.1, 3.1, 100)))
+        values = m.v_from_lat_lons(positions)
+        for pos, v in zip(positions, values):
+            self.assertAlmostEqual(m.v_from_lat_lon(tuple(pos)), v, 5)
+
+    def test_values_from_xys_match_scalar_values(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        np.asarray(m)[:] = np.random.rand(1024, 1536)
+        positions = np.column_stack((
+            np.random.uniform(0, 1535, 100),
+            np.random.uniform(0, 1023, 100)))
+        values = m.v_from_xys(positions)
+        self.assertEqual(np.float32, values.dtype)
+        for pos, v in zip(positions, values):
+            self.assertAlmostEqual(m.v_from_xy(tuple(pos)), v, 5)
+
+    def test_values_from_xys_outside_map_raise_value_error(self):
+        m = GreyCubeMap(width=1536, height=1024)
+        with self.assertRaises(ValueError):
+            m.v_from_xys([(1536, 0)])
+
+    def test_vector_map_values_from_xys_have_structured_dtype(self):
+        m = VecCubeMap(width=6, height=4)
+        m.set_xy((1, 2), (0.5, 0.25))
+        values = m.v_from_xys([(1, 2)])
+        self.assertEqual(map.VEC_DTYPE, values.dtype)
+        self.assertEqual((0.5, 0.25), tuple(values[0]))
+
+
+class TestClone(TestCase):
+    def test_cube_cloned_from_lat_lon_has_values_sampled_by_vector(self):
+        lat_lon_map = GreyLatLonMap(width=256, height=128)
+        np.asarray(lat_lon_map)[:] = np.random.rand(128, 256)
+        m = GreyCubeMap(width=96, height=64, prototype=lat_lon_map)
+        for x, y in ((0, 0), (40, 12), (95, 63), (17, 50)):
+            vector = m.vector_from_xy((x, y))
+            self.assertAlmostEqual(
+                lat_lon_map.v_from_vector(vector), m.v_from_xy((x, y)), 4)
+
+    def test_tile_cloned_from_cube_has_values_sampled_by_vector(self):
+        cube = GreyCubeMap(width=96, height=64)
+        np.asarray(cube)[:] = np.random.rand(64, 96)
+        m = GreyTileMap(width=16, height=16, p1=(-0.5, -0.5), p2=(0.5, 0.5),
+                        cube_face=4, prototype=cube)
+        for x, y in ((0, 0), (3, 12), (15, 15)):
+            vector = m.vector_from_xy((x, y))
+            self.assertAlmostEqual(
+                cube.v_from_vector(vector), m.v_from_xy((x, y)), 4)
+
+    def test_repeated_clones_with_different_data_types_are_equal(self):
+        lat_lon_map = GreyLatLonMap(width=256, height=128)
+        np.asarray(lat_lon_map)[:] = np.random.rand(128, 256)
+        vec_lat_lon_map = VecLatLonMap(width=256, height=128)
+        np.asarray(vec_lat_lon_map)['x'] = np.asarray(lat_lon_map)
+        np.asarray(vec_lat_lon_map)['y'] = 0.
+        a = GreyCubeMap(width=96, height=64, prototype=lat_lon_map)
+        b = VecCubeMap(width=96, height=64, prototype=vec_lat_lon_map)
+        c = GreyCubeMap(width=96, height=64, prototype=lat_lon_map)
+        np.testing.assert_allclose(
+            np.asarray(a), np.asarray(b)['x'], atol=1e-6)
+        np.testing.assert_array_equal(np.asarray(a), np.asarray(c))
+
+
+class TestDirectionTable(TestCase):
+    def tearDown(self):
+        clear_direction_tables()
+
+    def test_table_holds_unit_position_vectors(self):
+        m = GreyTileMap(width=16, height=16, p1=(-0.5, 0), p2=(0.5, 1),
+                        cube_face=2)
+        x, y, z = direction_table(m).arrays()
+        for px, py in ((0, 0), (3, 12), (15, 15)):
+            vector = m.vector_from_xy((px, py)).normalized()
+            np.testing.assert_allclose(
+                tuple(vector), (x[py, px], y[py, px], z[py, px]), atol=1e-6)
+
+    def test_table_holds_lat_lon_when_requested(self):
+        m = GreyCubeMap(width=96, height=64)
+        self.assertFalse(direction_table(m).has_lat_lon)
+        table = direction_table(m, lat_lon=True)
+        self.assertTrue(table.has_lat_lon)
+        lat, lon = table.arrays()[3:]
+        for px, py in ((0, 0), (40, 12), (95, 63)):
+            expected = lat_lon_from_vector(m.vector_from_xy((px, py)))
+            np.testing.assert_allclose(
+                expected, (lat[py, px], lon[py, px]), atol=1e-6)
+
+    def test_maps_sharing_geometry_share_table(self):
+        a = direction_table(GreyCubeMap(width=96, height=64))
+        b = direction_table(VecCubeMap(width=96, height=64))
+        c = direction_table(GreyCubeMap(width=48, height=32))
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+
+
+class TestPngOutput(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'height.png')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_png(self, path):
+        width, height, rows, info = png.Reader(filename=path).read()
+        return np.vstack(list(rows)), info['bitdepth']
+
+    def test_value_range_is_found_correctly(self):
+        m = GreyCubeMap(width=96, height=64)
+        np.asarray(m)[:] = 1.
+        m.set_xy((20, 30), -3.)
+        m.set_xy((95, 63), 7.5)
+        self.assertEqual((-3., 7.5), m.value_range())
+
+    def test_default_range_is_expanded_to_power_of_two(self):
+        m = GreyCubeMap(width=96, height=64)
+        np.asarray(m)[:] = 0.
+        m.set_xy((1, 1), 128.)
+        m.set_xy((2, 1), 100.)
+        m.write_png(self.path)
+        pixels, bit_depth = self.read_png(self.path)
+        self.assertEqual(8, bit_depth)
+        self.assertEqual(255, pixels[1, 1])
+        self.assertEqual(199, pixels[1, 2])
+        self.assertEqual(0, pixels[0, 0])
+
+    def test_16_bit_png_uses_passed_range(self):
+        m = GreyCubeMap(width=96, height=64)
+        np.asarray(m)[:] = 5.
+        m.set_xy((2, 3), 10.)
+        m.set_xy((3, 3), 20.)
+        m.write_png(self.path, 16, (0., 10.))
+        pixels, bit_depth = self.read_png(self.path)
+        self.assertEqual(16, bit_depth)
+        self.assertEqual(65535, pixels[3, 2])
+        self.assertEqual(65535, pixels[3, 3])  # clipped
+        self.assertEqual(32768, pixels[0, 0])
+
+    def test_cube_faces_are_written_to_separate_pngs(self):
+        m = GreyCubeMap(width=96, height=64)
+        np.asarray(m)[:] = np.random.rand(64, 96)
+        paths = m.write_face_pngs(self.path, value_range=(0., 1.))
+        self.assertEqual(6, len(paths))
+        for i, path in enumerate(paths):
+            pixels, _ = self.read_png(path)
+            np.testing.assert_allclose(
+                np.asarray(GreyCubeSide(i, m)) * 255, pixels, atol=0.5001)
+
+
+class TestSubTile(TestCase):
+    def test_sub_tile_values_are_interpolated_from_tile(self):
+        m = GreyTileMap(width=64, height=64, p1=(-1, -1), p2=(1, 1),
+                        cube_face=2)
+        np.asarray(m)[:] = np.arange(64, dtype=np.float32)[None, :]
+        sub = m.get_sub_tile((0, -1), (1, 0))
+        self.assertIsInstance(sub, GreyTileMap)
+        self.assertIs(m, sub.parent)
+        self.assertEqual(('tile', 64, 64, 2, 0., -1., 1., 0.),
+                         sub.geometry[:8])
+        np.testing.assert_allclose(
+            [32., 32.5, 33.], np.asarray(sub)[10, :3])
+
+    def test_sub_tile_of_cube_side_uses_side_values(self):
+        cube = GreyCubeMap(width=96, height=64)
+        np.asarray(cube)[:] = np.random.rand(64, 96)
+        side = GreyCubeSide(4, cube)
+        sub = side.get_sub_tile((-1, -1), (0, 0))
+        np.testing.assert_allclose(
+            np.asarray(side)[0, :2], np.asarray(sub)[0, 0:3:2])
+
+    def test_sub_tile_outside_tile_raises_value_error(self):
+        m = GreyTileMap(width=16, height=16, p1=(-1, -1), p2=(0, 0),
+                        cube_face=2)
+        with self.assertRaises(ValueError):
+            m.get_sub_tile((-0.5, -0.5), (0.5, 0))
+
+
 class TestLatLonMap(TestCase):
     def test_lat_lon_to_xy_returns_correct_value_at_edge(self):
         m = GreyLatLonMap(width=2048, height=2048)
@@ -4,9 +4,15 @@ Tests functionality of noise module
 
 from unittest import TestCase
 
+import numpy as np
+
 from pyrostex.noise.noise import PyFastNoise
 
 
+def random_points(*shape):
+    return np.random.RandomState(1).rand(*shape).astype(np.float32) * 100
+
+
 class TestFastNoise(TestCase):
     def test_noise_is_consistent(self):
         n = PyFastNoise()
@@ -14,3 +20,30 @@ class TestFastNoise(TestCase):
         a = n.get_simplex_fractal_3d(100, 200, 300)
         b = n.get_simplex_fractal_3d(100, 200, 300)
         self.assertEqual(a, b)
+
+    def test_noise_array_matches_single_points(self):
+        n = PyFastNoise()
+        n.seed = 127
+        n.frq = 0.05
+        points = random_points(20, 3)
+        a = n.get_noise(points, 'simplex')
+        b = [n.get_simplex_3d(*p) for p in points]
+        np.testing.assert_array_equal(a, np.array(b, np.float32))
+
+    def test_2d_noise_array_matches_single_points(self):
+        n = PyFastNoise()
+        n.frq = 0.05
+        points = random_points(4, 5, 2)
+        a = n.get_noise(points, 'perlin_fractal')
+        self.assertEqual((4, 5), a.shape)
+        self.assertEqual(np.float32, a.dtype)
+        self.assertEqual(n.get_perlin_fractal_2d(*points[3, 2]), a[3, 2])
+
+    def test_noise_grid_matches_points(self):
+        n = PyFastNoise()
+        n.frq = 0.05
+        x, y, z = np.arange(7), np.arange(5) * 2, np.arange(3) * 3
+        grid = n.get_noise_grid(x, y, z)
+        zz, yy, xx = np.meshgrid(z, y, x, indexing='ij')
+        points = np.stack([xx, yy, zz], -1)
+        np.testing.assert_array_equal(n.get_noise(points), grid)
@@ -1,6 +1,15 @@
-from unittest import TestCase, skip
+import json
+import os
+import tempfile
 
-from pyrostex.procede import Spheroid
+import numpy as np
+
+from unittest import TestCase, mock, skip
+
+from pyrostex.layers import NoiseLayerCache
+from pyrostex.map import GreyCubeMap
+from pyrostex.procede import BUILD_INFO_NAME, TILE_HEIGHT_CACHE_NAME, \
+    Spheroid, HeightField, Tile
 
 from settings import ROOT_PATH
 
@@ -22,3 +31,221 @@ class TestSpheroid(TestCase):
         spheroid.write_debug_png()
 
     # todo: test elevation data max, min, abs-mean
+
+
+class UnbuiltSpheroid(Spheroid):
+    def build(self):
+        self.tectonic_map = GreyCubeMap(width=96, height=64)
+
+
+class TestStageCache(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.n_made = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_spheroid(self, seed=124, **kwargs):
+        return UnbuiltSpheroid(
+            seed, 'rock', 1e26, 220, 5e6, 0.5, 0.1,
+            dir_path=self.tmp_dir.name, **kwargs)
+
+    def make_map(self):
+        self.n_made += 1
+        m = GreyCubeMap(width=96, height=64)
+        np.asarray(m)[:] = 2.5
+        return m
+
+    def test_noise_engines_are_recorded(self):
+        spheroid = self.make_spheroid(noise_backend='scalar')
+        spheroid.noise_backends = spheroid.select_noise_backends()
+        spheroid.write_build_info()
+        with open(os.path.join(self.tmp_dir.name, BUILD_INFO_NAME)) as f:
+            info = json.load(f)
+        self.assertEqual('scalar', info['noise_backend'])
+        self.assertEqual(
+            {'tectonic': 'scalar', 'detail': 'simd', 'wind': 'scalar'},
+            info['noise_engines'])
+
+    def test_stage_key_depends_on_seed(self):
+        self.assertNotEqual(
+            self.make_spheroid(124).stage_key('tectonic'),
+            self.make_spheroid(125).stage_key('tectonic'))
+
+    def test_stage_key_depends_on_params_and_inputs(self):
+        spheroid = self.make_spheroid()
+        key = spheroid.stage_key('warming', rel_res=0.5)
+        self.assertEqual(key, spheroid.stage_key('warming', rel_res=0.5))
+        self.assertNotEqual(key, spheroid.stage_key('warming', rel_res=1))
+        self.assertNotEqual(key, spheroid.stage_key(
+            'warming', inputs=('a',), rel_res=0.5))
+
+    def test_detail_key_depends_on_combination_only_of_detail(self):
+        keys = self.make_spheroid().stage_keys()
+        with mock.patch('pyrostex.procede.detail_combine_params',
+                        return_value={'version': -1}):
+            changed = self.make_spheroid().stage_keys()
+        self.assertNotEqual(keys.pop('detail'), changed.pop('detail'))
+        self.assertEqual(keys, changed)
+
+    def test_detail_resolution_is_set_by_face_size(self):
+        spheroid = self.make_spheroid(detail_face_size=8192)
+        self.assertEqual((24576, 16384),
+                         (spheroid.detail_width, spheroid.detail_height))
+        with self.assertRaises(ValueError):
+            self.make_spheroid(detail_face_size=0)
+
+    def test_detail_stage_requires_only_tectonic_stage(self):
+        graph = self.make_spheroid().stage_graph()
+        self.assertEqual(('tectonic',), graph.stages['detail'].requires)
+        self.assertLess(
+            graph.order.index('tectonic'), graph.order.index('warming'))
+
+    def test_temp_stage_runs_alongside_warming_stage(self):
+        graph = self.make_spheroid().stage_graph()
+        self.assertEqual(('tectonic',), graph.stages['temp'].requires)
+
+    def test_cached_stage_is_loaded_instead_of_made(self):
+        for use_mmap in (False, True):
+            self.n_made = 0
+            spheroid = self.make_spheroid(use_mmap=use_mmap)
+            key = spheroid.stage_key('tectonic')
+            spheroid.cached_stage('tectonic', key, GreyCubeMap, self.make_map)
+            m = self.make_spheroid(use_mmap=use_mmap).cached_stage(
+                'tectonic', key, GreyCubeMap, self.make_map)
+            self.assertEqual(1, self.n_made)
+            self.assertEqual(2.5, m.v_from_xy((10, 10)))
+
+    def test_backed_stage_is_made_in_cache_file(self):
+        spheroid = self.make_spheroid(use_mmap=True)
+        key = spheroid.stage_key('detail')
+        paths = []
+
+        def make_backed_map(path):
+            paths.append(path)
+            m = GreyCubeMap(width=96, height=64, path=path, mmap_mode='w+')
+            np.asarray(m)[:] = 2.5
+            return m
+
+        m = spheroid.cached_stage(
+            'detail', key, GreyCubeMap, make_backed_map, backed=True)
+        path = spheroid.stage_path('detail', key)
+        self.assertEqual(os.path.dirname(path), os.path.dirname(paths[0]))
+        self.assertEqual(os.path.abspath(path),
+                         os.path.abspath(m.backing_path))
+        self.assertEqual([os.path.basename(path)],
+                         os.listdir(os.path.dirname(path)))
+        self.assertEqual(2.5, m.v_from_xy((10, 10)))
+
+    def test_stale_stage_is_rebuilt_and_removed(self):
+        spheroid = self.make_spheroid()
+        old_key = spheroid.stage_key('tectonic', width=1)
+        new_key = spheroid.stage_key('tectonic', width=2)
+        spheroid.cached_stage('tectonic', old_key, GreyCubeMap, self.make_map)
+        spheroid.cached_stage('tectonic', new_key, GreyCubeMap, self.make_map)
+        self.assertEqual(2, self.n_made)
+        self.assertFalse(
+            os.path.exists(spheroid.stage_path('tectonic', old_key)))
+        self.assertTrue(
+            os.path.exists(spheroid.stage_path('tectonic', new_key)))
+
+    def test_noise_layers_are_cached_beside_stages(self):
+        spheroid = self.make_spheroid()
+        self.assertEqual(os.path.join(self.tmp_dir.name, 'layers'),
+                         spheroid.layer_cache.dir_path)
+        self.assertIsNone(self.make_spheroid(use_cache=False).layer_cache)
+        shared = NoiseLayerCache()
+        self.assertIs(shared, self.make_spheroid(
+            layer_cache=shared).layer_cache)
+
+
+
+class TestHeightField(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'base.heightfield')
+        with open(self.path, 'w') as f:
+            f.write('0 0 0\n0 0 0\n1 -2 3\n0 5 0\n4 0 6\n0 0 0\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_filled_range_includes_first_and_last_filled_rows(self):
+        self.assertEqual(range(2, 5), HeightField(self.path).filled_range)
+
+    def test_dimensions_are_read_correctly(self):
+        height_field = HeightField(self.path)
+        self.assertEqual(3, height_field.n_rows)
+        self.assertEqual(3, height_field.n_cols)
+
+    def test_filled_arr_has_correct_values(self):
+        np.testing.assert_array_equal(
+            [[1, -2, 3], [0, 5, 0], [4, 0, 6]],
+            HeightField(self.path).filled_arr)
+
+    def test_filled_rows_have_correct_values(self):
+        rows = list(HeightField(self.path).filled_rows)
+        self.assertEqual(3, len(rows))
+        np.testing.assert_array_equal([0, 5, 0], rows[1])
+
+
+class TestTile(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spheroid = UnbuiltSpheroid(
+            124, 'rock', 1e26, 220, 5e6, 0.5, 0.1,
+            dir_path=self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sub_tiles_divide_tile(self):
+        tile = Tile(self.spheroid, 2, p1=(-1, 0), p2=(0, 1), size=16)
+        self.assertEqual(((-1, 0), (-0.5, 0.5)),
+                         (tile.make_sub_tile(0).p1, tile.sub_tiles[0].p2))
+        sub_tile = tile.make_sub_tile(3)
+        self.assertEqual(((-0.5, 0.5), (0., 1.)), (sub_tile.p1, sub_tile.p2))
+        self.assertIs(tile, sub_tile.parent)
+        self.assertEqual(16, sub_tile.height_map.width)
+
+    def test_sub_tiles_made_in_batch_divide_tile(self):
+        tile = Tile(self.spheroid, 2, p1=(-1, 0), p2=(0, 1), size=16)
+        sub_tiles = tile.make_sub_tiles()
+        self.assertEqual(sub_tiles, tile.sub_tiles)
+        self.assertEqual(
+            [((-1, 0), (-0.5, 0.5)), ((-0.5, 0), (0., 0.5)),
+             ((-1, 0.5), (-0.5, 1.)), ((-0.5, 0.5), (0., 1.))],
+            [(t.p1, t.p2) for t in sub_tiles])
+        for sub_tile in sub_tiles:
+            self.assertIs(tile, sub_tile.parent)
+            self.assertEqual((sub_tile.p1, sub_tile.p2),
+                             (tuple(sub_tile.height_map.geometry[4:6]),
+                              tuple(sub_tile.height_map.geometry[6:8])))
+
+    def test_sub_tile_made_in_batch_writes_cache(self):
+        tile = Tile(self.spheroid, 2, p1=(-1, 0), p2=(0, 1), size=16)
+        sub_tile = tile.make_sub_tiles()[2]
+        sub_tile.write_cache()
+        self.assertTrue(os.path.exists(
+            os.path.join(sub_tile.dir_path, TILE_HEIGHT_CACHE_NAME)))
+
+    def test_tile_height_map_uses_spheroid_tile_storage(self):
+        spheroid = UnbuiltSpheroid(
+            124, 'rock', 1e26, 220, 5e6, 0.5, 0.1,
+            dir_path=self.tmp_dir.name, tile_storage='int16')
+        tile = Tile(spheroid, 2, p1=(-1, 0), p2=(0, 1), size=16)
+        self.assertEqual('int16', tile.height_map.storage)
+        self.assertEqual(16 * 16 * 2, tile.nbytes)
+        tile.height_map.set_xy((1, 1), 1234.)
+        self.assertAlmostEqual(1234., tile.height_map.v_from_xy((1, 1)),
+                               delta=spheroid.tile_scale)
+
+    def test_refined_sub_tile_shares_parent_pixels(self):
+        tile = Tile(self.spheroid, 2, p1=(-1, 0), p2=(0, 1), size=16,
+                    refine=True)
+        sub_tile = tile.make_sub_tile(1)
+        self.assertTrue(sub_tile.refine)
+        np.testing.assert_array_equal(
+            np.asarray(tile.height_map)[:8, 8:],
+            np.asarray(sub_tile.height_map)[::2, ::2])
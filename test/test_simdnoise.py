@@ -0,0 +1,139 @@
+"""
+Tests functionality of simdnoise module
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from pyrostex.noise.points import NOISE_TYPES
+from pyrostex.noise.simdnoise import AUTO_SIMD_LEVEL, SIMD_LEVEL_NAMES, \
+    PyFastNoiseSIMD, available_simd_levels, fastest_simd_level, \
+    set_simd_level
+
+
+def make_noise():
+    n = PyFastNoiseSIMD()
+    n.seed = 127
+    n.frq = 0.05
+    return n
+
+
+def random_points(*shape):
+    return np.random.RandomState(1).rand(*shape).astype(np.float32) * 100
+
+
+class TestFastNoiseSIMDArrays(TestCase):
+    def test_noise_is_consistent(self):
+        n = make_noise()
+        points = random_points(100, 3)
+        for noise_type in NOISE_TYPES:
+            np.testing.assert_array_equal(
+                n.get_noise(points, noise_type),
+                n.get_noise(points, noise_type))
+
+    def test_noise_types_differ(self):
+        n = make_noise()
+        points = random_points(100, 3)
+        results = [n.get_noise(points, t) for t in NOISE_TYPES]
+        for i, a in enumerate(results):
+            for b in results[i + 1:]:
+                self.assertFalse(np.array_equal(a, b))
+
+    def test_noise_is_independent_of_chunking(self):
+        n = make_noise()
+        points = random_points(10000, 3)
+        a = n.get_noise(points)
+        b = np.concatenate([n.get_noise(points[i:i + 7])
+                            for i in range(0, len(points), 7)])
+        np.testing.assert_array_equal(a, b)
+
+    def test_noise_has_shape_of_points(self):
+        n = make_noise()
+        a = n.get_noise(random_points(4, 5, 3))
+        self.assertEqual((4, 5), a.shape)
+        self.assertEqual(np.float32, a.dtype)
+        self.assertEqual((), n.get_noise([1., 2., 3.]).shape)
+        self.assertEqual((0,), n.get_noise(np.zeros((0, 2))).shape)
+
+    def test_2d_noise_lies_on_z_0(self):
+        n = make_noise()
+        points = random_points(50, 2)
+        points_3d = np.concatenate([points, np.zeros((50, 1))], 1)
+        np.testing.assert_array_equal(
+            n.get_noise(points_3d), n.get_noise(points))
+
+    def test_fractal_type_is_used(self):
+        n = make_noise()
+        points = random_points(100, 3)
+        fbm = n.get_noise(points)
+        n.fractal_type = 'RigidMulti'
+        self.assertFalse(np.array_equal(fbm, n.get_noise(points)))
+
+    def test_grid_matches_points(self):
+        n = make_noise()
+        x, y, z = np.arange(7), np.arange(5) * 2., np.arange(3) * 3.
+        grid = n.get_noise_grid(x, y, z, 'perlin')
+        self.assertEqual((3, 5, 7), grid.shape)
+        zz, yy, xx = np.meshgrid(z, y, x, indexing='ij')
+        points = np.stack([xx, yy, zz], -1)
+        np.testing.assert_array_equal(n.get_noise(points, 'perlin'), grid)
+
+    def test_2d_grid_matches_3d_grid_at_z_0(self):
+        n = make_noise()
+        x, y = np.arange(7), np.arange(5)
+        np.testing.assert_array_equal(
+            n.get_noise_grid(x, y, [0.])[0], n.get_noise_grid(x, y))
+
+    def test_unknown_noise_type_raises(self):
+        with self.assertRaises(ValueError):
+            make_noise().get_noise(random_points(3, 3), 'value')
+
+    def test_invalid_points_raise(self):
+        with self.assertRaises(ValueError):
+            make_noise().get_noise(random_points(3, 4))
+
+
+class TestFastNoiseSIMDSettings(TestCase):
+    def test_getters_return_set_values(self):
+        n = PyFastNoiseSIMD()
+        self.assertEqual(3, n.fractal_octaves)
+        n.seed = 12
+        n.frq = 0.25
+        n.fractal_octaves = 5
+        n.lacunarity = 3.
+        n.fractal_gain = 0.25
+        n.fractal_type = 'Billow'
+        self.assertEqual((12, 0.25, 5, 3., 0.25, 'Billow'), (
+            n.seed, n.frq, n.fractal_octaves, n.lacunarity,
+            n.fractal_gain, n.fractal_type))
+
+    def test_unknown_fractal_type_raises(self):
+        with self.assertRaises(ValueError):
+            PyFastNoiseSIMD().fractal_type = 'Ridged'
+
+
+class TestSIMDLevel(TestCase):
+    def tearDown(self):
+        set_simd_level(AUTO_SIMD_LEVEL)
+
+    def test_available_levels_are_used_by_generators(self):
+        levels = available_simd_levels()
+        self.assertTrue(levels)
+        self.assertLessEqual(max(levels), fastest_simd_level())
+        for level in levels:
+            set_simd_level(level)
+            self.assertEqual(level, PyFastNoiseSIMD().simd_level)
+
+    def test_levels_generate_the_same_noise(self):
+        points = random_points(100, 3)
+        noise = []
+        for level in available_simd_levels():
+            set_simd_level(level)
+            noise.append(make_noise().get_noise(points))
+        for values in noise[1:]:
+            np.testing.assert_allclose(noise[0], values, atol=1e-5)
+
+    def test_unsupported_level_raises(self):
+        with self.assertRaises(ValueError):
+            set_simd_level(len(SIMD_LEVEL_NAMES))
@@ -0,0 +1,76 @@
+import threading
+
+from unittest import TestCase
+
+from pyrostex.context import ExecutionContext
+from pyrostex.stages import Stage, StageGraph
+
+
+class TestStageGraph(TestCase):
+    def test_stages_are_run_after_required_stages(self):
+        finished = []
+        graph = StageGraph([
+            Stage('c', lambda: finished.append('c'), requires=('a', 'b')),
+            Stage('b', lambda: finished.append('b'), requires=('a',)),
+            Stage('a', lambda: finished.append('a')),
+        ])
+        graph.run()
+        self.assertEqual(['a', 'b', 'c'], finished)
+
+    def test_independent_stages_are_run_concurrently(self):
+        # each stage waits until the other has started.
+        barrier = threading.Barrier(2, timeout=5)
+        graph = StageGraph([
+            Stage('a', barrier.wait),
+            Stage('b', barrier.wait),
+        ])
+        graph.run(workers=2)  # raises BrokenBarrierError if sequential
+
+    def test_concurrent_stages_share_context_threads(self):
+        threads = {}
+
+        def run(name):
+            def run_stage(context):
+                threads[name] = context.threads
+            return run_stage
+
+        graph = StageGraph([
+            Stage('a', run('a')),
+            Stage('b', run('b'), requires=('a',)),
+            Stage('c', run('c'), requires=('a',)),
+        ])
+        graph.run(context=ExecutionContext(threads=8))
+        self.assertEqual({'a': 8, 'b': 4, 'c': 4}, threads)
+
+    def test_timings_are_returned_for_each_stage(self):
+        graph = StageGraph([
+            Stage('a', lambda: None),
+            Stage('b', lambda: None, requires=('a',)),
+        ])
+        timings = graph.run()
+        self.assertEqual({'a', 'b'}, set(timings))
+        self.assertTrue(all(t >= 0 for t in timings.values()))
+
+    def test_exception_in_stage_is_raised(self):
+        def fail():
+            raise KeyError('x')
+
+        ran = []
+        graph = StageGraph([
+            Stage('a', fail),
+            Stage('b', lambda: ran.append('b'), requires=('a',)),
+        ])
+        with self.assertRaises(KeyError):
+            graph.run()
+        self.assertEqual([], ran)
+
+    def test_cyclic_stages_raise_value_error(self):
+        with self.assertRaises(ValueError):
+            StageGraph([
+                Stage('a', lambda: None, requires=('b',)),
+                Stage('b', lambda: None, requires=('a',)),
+            ])
+
+    def test_unknown_required_stage_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            StageGraph([Stage('a', lambda: None, requires=('b',))])
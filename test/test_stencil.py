@@ -0,0 +1,309 @@
+import numpy as np
+
+from unittest import TestCase
+
+from pyrostex.context import ExecutionContext
+from pyrostex.map import GreyCubeMap, GreyTileMap, GreyLatLonMap, \
+    VecCubeMap, VecTileMap
+from pyrostex.stencil import pad_faces, apply_kernel, \
+    apply_separable_kernel, gaussian_blur, laplacian, gradient, slope, \
+    thermal_erosion, halo_table, clear_halo_tables, mip_pyramid, smooth, \
+    gauss_smooth_sigma, _face_vectors
+
+FACE = 48
+
+
+def field(x, y, z):
+    """
+    Smooth function of position on the sphere.
+    """
+    return (2 * x + 3 * y + 5 * z) / np.sqrt(x * x + y * y + z * z)
+
+
+def face_field(face, halo=0):
+    """
+    Gets field at the positions of a face's pixels, padded by halo.
+    """
+    px, py = np.meshgrid(np.arange(-halo, FACE + halo),
+                         np.arange(-halo, FACE + halo))
+    a = px / (FACE - 1) * 2 - 1
+    b = py / (FACE - 1) * 2 - 1
+    return field(*_face_vectors(face, a, b))
+
+
+def field_cube():
+    m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+    arr = np.asarray(m)
+    for face in range(6):
+        x0, y0 = face % 3 * FACE, face // 3 * FACE
+        arr[y0:y0 + FACE, x0:x0 + FACE] = face_field(face)
+    return m
+
+
+class TestHalos(TestCase):
+    def setUp(self):
+        clear_halo_tables()
+
+    def test_halos_hold_adjoining_faces_in_face_orientation(self):
+        padded = pad_faces(field_cube(), 3)
+        self.assertEqual((6, FACE + 6, FACE + 6), padded.shape)
+        # halo pixels are the nearest pixel of the adjoining face
+        step = 5 * 2 / (FACE - 1)
+        for face in range(6):
+            np.testing.assert_allclose(
+                face_field(face, 3), padded[face], atol=step)
+
+    def test_face_pixels_are_copied_unchanged(self):
+        m = field_cube()
+        padded = pad_faces(m, 2)
+        np.testing.assert_array_equal(
+            np.asarray(m)[FACE:, FACE:2 * FACE], padded[4, 2:-2, 2:-2])
+
+    def test_tile_halos_repeat_edge_pixels(self):
+        m = GreyTileMap(width=8, height=8, p1=(-1, -1), p2=(0, 0),
+                        cube_face=1)
+        np.asarray(m)[:] = np.random.rand(8, 8)
+        padded = pad_faces(m, 2)
+        np.testing.assert_array_equal(np.asarray(m)[0], padded[0, 0, 2:-2])
+        self.assertEqual(np.asarray(m)[7, 7], padded[0, -1, -1])
+
+    def test_halo_tables_are_shared_by_geometry(self):
+        a = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+        b = GreyCubeMap(width=FACE * 3, height=FACE * 2, storage='float16')
+        self.assertIs(halo_table(a, 1), halo_table(b, 1))
+
+    def test_lat_lon_map_raises_type_error(self):
+        with self.assertRaises(TypeError):
+            pad_faces(GreyLatLonMap(width=16, height=8), 1)
+
+
+class TestKernels(TestCase):
+    def test_identity_kernel_copies_map(self):
+        m = field_cube()
+        out = apply_kernel(m, [[0, 0, 0], [0, 1, 0], [0, 0, 0]])
+        np.testing.assert_array_equal(np.asarray(m), np.asarray(out))
+
+    def test_even_kernel_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            apply_kernel(field_cube(), np.ones((2, 2)))
+
+    def test_blur_preserves_constant_map(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+        np.asarray(m)[:] = 3.
+        low, high = gaussian_blur(m, 2.).value_range()
+        # kernel weights sum to 1 only to within float rounding.
+        self.assertAlmostEqual(3., low, 5)
+        self.assertAlmostEqual(3., high, 5)
+
+    def test_separable_kernel_matches_its_outer_product(self):
+        m = field_cube()
+        x = np.array([0.25, 0.5, 0.25], np.float32)
+        np.testing.assert_allclose(
+            np.asarray(apply_kernel(m, np.outer(x, x))),
+            np.asarray(apply_separable_kernel(m, x)), atol=1e-6)
+
+    def test_laplacian_of_smooth_field_is_continuous_across_faces(self):
+        lap = np.asarray(laplacian(field_cube()))
+        # a misoriented halo would produce differences of the order of
+        # the field's change per pixel at face edges.
+        step = 5 * 2 / (FACE - 1)
+        self.assertLess(np.abs(lap).max(), step)
+
+    def test_results_are_independent_of_thread_count(self):
+        m = field_cube()
+        np.testing.assert_array_equal(
+            np.asarray(gaussian_blur(
+                m, 1.5, context=ExecutionContext(threads=1))),
+            np.asarray(gaussian_blur(
+                m, 1.5, context=ExecutionContext(threads=4))))
+
+    def test_quantized_map_is_blurred_to_map_of_same_storage(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2, storage='float16')
+        m.set_values(np.asarray(field_cube()))
+        out = gaussian_blur(m, 1.)
+        self.assertEqual('float16', out.storage)
+        np.testing.assert_allclose(
+            np.asarray(gaussian_blur(field_cube(), 1.)), out.values(),
+            atol=0.01)
+
+    def test_kernel_can_be_applied_in_place(self):
+        m = field_cube()
+        expected = np.asarray(laplacian(m)).copy()
+        laplacian(m, out=m)
+        np.testing.assert_array_equal(expected, np.asarray(m))
+
+
+def wave(v, frequency=2.):
+    """
+    Smooth wave on the sphere, of passed (..., 3) unit vectors.
+    """
+    return np.sin(frequency * (0.6 * v[..., 0] + 0.8 * v[..., 2])) * \
+        np.cos(frequency * v[..., 1]) + 300
+
+
+def ring_smoothed(m, pos, radius, samples):
+    """
+    Gets the mean of wave over the ring samples that
+    gauss_smooth_xy_ takes around passed pixel of a cube map.
+    """
+    p = np.array(m.vector_from_xy(pos), float)
+    p /= np.linalg.norm(p)
+    u = np.cross(p, [0.3, 0.5, 0.8])
+    u /= np.linalg.norm(u)
+    w = np.cross(p, u)
+    lon = np.arange(samples)[:, None] / samples * 2 * np.pi - np.pi
+    lat = np.pi / 2 / m.height / samples * radius * np.arange(samples)
+    vectors = np.cos(lat)[..., None] * p + np.sin(lat)[..., None] * (
+        np.cos(lon)[..., None] * u + np.sin(lon)[..., None] * w)
+    return wave(vectors).mean()
+
+
+def wave_cube(face_size):
+    m = GreyCubeMap(width=face_size * 3, height=face_size * 2)
+    arr = np.asarray(m)
+    px, py = np.meshgrid(np.arange(face_size), np.arange(face_size))
+    for face in range(6):
+        # pixel positions of CubeMap.vector_from_xy
+        v = np.stack(_face_vectors(
+            face, px / face_size * 2 - 1, py / face_size * 2 - 1), -1)
+        x0, y0 = face % 3 * face_size, face // 3 * face_size
+        arr[y0:y0 + face_size, x0:x0 + face_size] = \
+            wave(v / np.linalg.norm(v, axis=-1)[..., None])
+    return m
+
+
+class TestMipPyramid(TestCase):
+    def test_levels_halve_faces_down_to_min_face_size(self):
+        pyramid = mip_pyramid(field_cube())
+        self.assertEqual([FACE * 3, FACE * 3 // 2, FACE * 3 // 4],
+                         [level.width for level in pyramid.levels])
+        self.assertIsInstance(pyramid[1], GreyCubeMap)
+
+    def test_levels_average_blocks_of_pixels(self):
+        m = field_cube()
+        arr = np.asarray(m)
+        expected = (arr[::2, ::2] + arr[1::2, ::2] + arr[::2, 1::2] +
+                    arr[1::2, 1::2]) / 4
+        np.testing.assert_allclose(
+            expected, np.asarray(mip_pyramid(m, 1)[1]), rtol=1e-6)
+
+    def test_number_of_levels_may_be_limited(self):
+        self.assertEqual(2, len(mip_pyramid(field_cube(), 1)))
+
+    def test_vector_map_pyramid_averages_each_component(self):
+        m = VecCubeMap(width=FACE * 3, height=FACE * 2)
+        arr = np.asarray(m)
+        arr['x'] = 1.
+        arr['y'] = np.random.rand(FACE * 2, FACE * 3)
+        level = np.asarray(mip_pyramid(m, 1)[1])
+        np.testing.assert_allclose(1., level['x'])
+        np.testing.assert_allclose(
+            arr['y'].mean(), level['y'].mean(), rtol=1e-5)
+
+    def test_tile_map_pyramid_keeps_tile_bounds(self):
+        m = GreyTileMap(width=32, height=32, p1=(-1, -1), p2=(0, 0),
+                        cube_face=2)
+        level = mip_pyramid(m)[1]
+        self.assertIsInstance(level, GreyTileMap)
+        self.assertEqual((16, 16), (level.width, level.height))
+        self.assertEqual(m.geometry[3:8], level.geometry[3:8])
+
+
+class TestSmooth(TestCase):
+    def test_smooth_preserves_constant_map(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+        np.asarray(m)[:] = 3.
+        low, high = smooth(m, 6.).value_range()
+        self.assertAlmostEqual(3., low, 5)
+        self.assertAlmostEqual(3., high, 5)
+
+    def test_smooth_approximates_gaussian_blur(self):
+        m = wave_cube(64)
+        blurred = np.asarray(gaussian_blur(m, 6.))
+        change = np.abs(blurred - np.asarray(m)).mean()
+        error = np.abs(np.asarray(smooth(m, 6.)) - blurred).mean()
+        self.assertLess(error, change * 0.2)
+
+    def test_smooth_is_equivalent_to_gauss_smooth_xy(self):
+        m = wave_cube(64)
+        smoothed = np.asarray(smooth(m, gauss_smooth_sigma(32., 8)))
+        arr = np.asarray(m)
+        rng = np.random.RandomState(0)
+        error, change = [], []
+        for x, y in zip(rng.randint(m.width, size=100),
+                        rng.randint(m.height, size=100)):
+            expected = ring_smoothed(m, (x, y), 32., 8)
+            error.append(abs(smoothed[y, x] - expected))
+            change.append(abs(arr[y, x] - expected))
+        self.assertLess(np.mean(error), np.mean(change) * 0.5)
+
+    def test_small_sigma_is_blurred_at_full_resolution(self):
+        m = field_cube()
+        np.testing.assert_array_equal(
+            np.asarray(gaussian_blur(m, 1.)), np.asarray(smooth(m, 1.)))
+
+    def test_passed_pyramid_is_used(self):
+        m = wave_cube(64)
+        pyramid = mip_pyramid(m)
+        np.testing.assert_array_equal(
+            np.asarray(smooth(m, 6.)),
+            np.asarray(smooth(m, 6., pyramid=pyramid)))
+        with self.assertRaises(ValueError):
+            smooth(field_cube(), 6., pyramid=pyramid)
+
+    def test_quantized_map_is_smoothed_to_map_of_same_storage(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2, storage='float16')
+        m.set_values(np.asarray(field_cube()))
+        out = smooth(m, 6.)
+        self.assertEqual('float16', out.storage)
+        np.testing.assert_allclose(
+            np.asarray(smooth(field_cube(), 6.)), out.values(), atol=0.01)
+
+
+class TestSlope(TestCase):
+    def test_gradient_of_ramp_is_constant(self):
+        m = GreyTileMap(width=16, height=16, p1=(-1, -1), p2=(1, 1),
+                        cube_face=0)
+        np.asarray(m)[:] = np.arange(16, dtype=np.float32)[None, :] * 2
+        g = gradient(m)
+        self.assertIsInstance(g, VecTileMap)
+        arr = np.asarray(g)
+        np.testing.assert_allclose(2., arr['x'][:, 1:-1])
+        np.testing.assert_allclose(0., arr['y'])
+
+    def test_cube_gradient_is_vector_cube_map(self):
+        self.assertIsInstance(gradient(field_cube()), VecCubeMap)
+
+    def test_slope_is_scaled_by_pixel_size(self):
+        m = GreyTileMap(width=16, height=16, p1=(-1, -1), p2=(1, 1),
+                        cube_face=0)
+        np.asarray(m)[:] = np.arange(16, dtype=np.float32)[:, None] * 3
+        np.testing.assert_allclose(
+            1.5, np.asarray(slope(m, pixel_size=2.))[1:-1])
+
+
+class TestThermalErosion(TestCase):
+    def test_erosion_reduces_steep_slopes(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+        np.asarray(m)[:] = np.random.rand(FACE * 2, FACE * 3) * 10
+        before = slope(m).value_range()[1]
+        thermal_erosion(m, talus=0.5, iterations=10)
+        self.assertLess(slope(m).value_range()[1], before)
+
+    def test_erosion_moves_rather_than_removes_material(self):
+        m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+        np.asarray(m)[:] = np.random.rand(FACE * 2, FACE * 3) * 10
+        total = np.asarray(m).sum(dtype=np.float64)
+        thermal_erosion(m, talus=0.5, iterations=5)
+        self.assertAlmostEqual(
+            1., np.asarray(m).sum(dtype=np.float64) / total, 2)
+
+    def test_gentle_slopes_are_not_eroded(self):
+        m = field_cube()
+        before = np.asarray(m).copy()
+        thermal_erosion(m, talus=1.)
+        np.testing.assert_array_equal(before, np.asarray(m))
+
+    def test_invalid_rate_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            thermal_erosion(field_cube(), talus=1., rate=2.)
@@ -0,0 +1,99 @@
+"""
+Tests functionality of temp module
+"""
+
+import numpy as np
+
+from unittest import TestCase
+
+from pyrostex.context import ExecutionContext
+from pyrostex.map import GreyCubeMap
+from pyrostex.temp import make_warming_map, make_temp_map
+
+MEAN_TEMP = 288.
+ATM_WARMING = 33.
+TEC_UNITS_PER_M = 300  # see elevation.pxi
+
+
+def height_cube(elevation=0.):
+    m = GreyCubeMap(width=96, height=64)
+    np.asarray(m)[:] = elevation
+    return m
+
+
+def cos_lat(m, x, y):
+    v = np.array(m.vector_from_xy((x, y)), float)
+    return np.sqrt(1 - (v[2] / np.linalg.norm(v)) ** 2)
+
+
+class TestWarmingMap(TestCase):
+    def test_warming_follows_cross_section(self):
+        warming_map = make_warming_map(
+            height_cube(), 0.5, MEAN_TEMP, 1., ATM_WARMING, 1., 6.3e6)
+        self.assertEqual((48, 32), (warming_map.width, warming_map.height))
+        for x, y in ((0, 0), (7, 20), (24, 24), (40, 3)):
+            self.assertAlmostEqual(
+                (MEAN_TEMP - ATM_WARMING) * cos_lat(warming_map, x, y) /
+                0.866, warming_map.v_from_xy((x, y)), 3)
+
+    def test_warming_is_independent_of_thread_count(self):
+        a, b = (make_warming_map(
+            height_cube(), 1., MEAN_TEMP, 1., ATM_WARMING, 1., 6.3e6,
+            ExecutionContext(threads=threads)) for threads in (1, 4))
+        np.testing.assert_array_equal(np.asarray(a), np.asarray(b))
+
+
+class TestTempMap(TestCase):
+    def test_sea_level_temp_is_warmed_by_atmosphere(self):
+        temp_map = make_temp_map(
+            height_cube(), MEAN_TEMP, 1., ATM_WARMING, 1.)
+        warming_map = make_warming_map(
+            height_cube(), 1., MEAN_TEMP, 1., ATM_WARMING, 1., 6.3e6)
+        np.testing.assert_allclose(
+            np.asarray(warming_map) + ATM_WARMING, np.asarray(temp_map),
+            rtol=1e-6)
+
+    def test_temp_falls_with_elevation(self):
+        low = make_temp_map(height_cube(0.), MEAN_TEMP, 1., ATM_WARMING, 1.)
+        high = make_temp_map(
+            height_cube(5e3 * TEC_UNITS_PER_M), MEAN_TEMP, 1., ATM_WARMING,
+            1.)
+        self.assertTrue((np.asarray(high) < np.asarray(low)).all())
+        # warming by the atmosphere falls with pressure
+        self.assertTrue(
+            (np.asarray(low) - np.asarray(high) < ATM_WARMING).all())
+
+    def test_elevation_is_read_in_tectonic_map_units(self):
+        temp_map = make_temp_map(
+            height_cube(2e3 * TEC_UNITS_PER_M), MEAN_TEMP, 1., ATM_WARMING,
+            1.)
+        base_t = np.asarray(make_warming_map(
+            height_cube(), 1., MEAN_TEMP, 1., ATM_WARMING, 1., 6.3e6))
+        # pressure at 2 km, from the barometric formula
+        pressure = np.exp(-9.80665 * 0.029 * 2e3 /
+                          (8.3144598 * (base_t + ATM_WARMING)))
+        np.testing.assert_allclose(
+            base_t + ATM_WARMING * pressure, np.asarray(temp_map), rtol=1e-5)
+
+    def test_submarine_positions_are_at_sea_level(self):
+        np.testing.assert_array_equal(
+            np.asarray(make_temp_map(
+                height_cube(0.), MEAN_TEMP, 1., ATM_WARMING, 1.)),
+            np.asarray(make_temp_map(
+                height_cube(-3e3), MEAN_TEMP, 1., ATM_WARMING, 1.)))
+
+    def test_temp_without_atmosphere_is_not_warmed(self):
+        temp_map = make_temp_map(height_cube(1e3), MEAN_TEMP, 0., 0., 1.)
+        warming_map = make_warming_map(
+            height_cube(), 1., MEAN_TEMP, 0., 0., 1., 6.3e6)
+        np.testing.assert_array_equal(
+            np.asarray(warming_map), np.asarray(temp_map))
+
+    def test_quantized_height_map_is_read(self):
+        m = GreyCubeMap(width=96, height=64, storage='float16')
+        m.set_values(np.full((64, 96), 5e3, np.float32))
+        np.testing.assert_allclose(
+            np.asarray(make_temp_map(
+                height_cube(5e3), MEAN_TEMP, 1., ATM_WARMING, 1.)),
+            np.asarray(make_temp_map(m, MEAN_TEMP, 1., ATM_WARMING, 1.)),
+            rtol=1e-5)
@@ -0,0 +1,47 @@
+"""
+Tests functionality of wind module
+"""
+
+import numpy as np
+
+from unittest import TestCase
+
+from pyrostex.context import ExecutionContext
+from pyrostex.map import GreyCubeMap, VecCubeMap
+from pyrostex.wind import make_wind_map
+
+FACE = 32
+
+
+def warming_cube():
+    m = GreyCubeMap(width=FACE * 3, height=FACE * 2)
+    np.asarray(m)[:] = 280.
+    return m
+
+
+class TestWindMap(TestCase):
+    def test_wind_map_has_warming_map_geometry(self):
+        wind_map = make_wind_map(warming_cube(), 5, 1., 6.3e6, 1.)
+        self.assertIsInstance(wind_map, VecCubeMap)
+        self.assertEqual((FACE * 3, FACE * 2),
+                         (wind_map.width, wind_map.height))
+        arr = np.asarray(wind_map)
+        self.assertTrue(np.isfinite(arr['x']).all())
+        self.assertTrue(np.isfinite(arr['y']).all())
+
+    def test_wind_is_independent_of_thread_count(self):
+        a = make_wind_map(warming_cube(), 5, 1., 6.3e6, 1.,
+                          ExecutionContext(threads=1))
+        b = make_wind_map(warming_cube(), 5, 1., 6.3e6, 1.,
+                          ExecutionContext(threads=4))
+        np.testing.assert_array_equal(np.asarray(a), np.asarray(b))
+
+    def test_wind_depends_on_seed(self):
+        a = make_wind_map(warming_cube(), 5, 1., 6.3e6, 1.)
+        b = make_wind_map(warming_cube(), 6, 1., 6.3e6, 1.)
+        self.assertFalse(np.array_equal(np.asarray(a), np.asarray(b)))
+
+    def test_scalar_noise_wind_map_is_finite(self):
+        wind_map = make_wind_map(
+            warming_cube(), 5, 1., 6.3e6, 1., simd=False)
+        self.assertTrue(np.isfinite(np.asarray(wind_map)['x']).all())